@@ -0,0 +1,56 @@
+"""
+Compares the CPU time spent recording the metrics of a consumer batch (a
+timing per message, and a few counters and timings per batch) when each
+metric is sent to DogStatsd as it is recorded and when the metrics are
+aggregated in memory first.
+"""
+import socket
+import time
+from functools import partial
+
+from datadog import DogStatsd
+
+from snuba.utils.metrics.backends.abstract import MetricsBackend
+from snuba.utils.metrics.backends.aggregating import AggregatingMetricsBackend
+from snuba.utils.metrics.backends.datadog import DatadogMetricsBackend
+
+BATCHES = 100
+MESSAGES = 1000
+
+
+def run(name: str, metrics: MetricsBackend) -> float:
+    tags = {"topic": "events", "partition": "1"}
+
+    start = time.process_time()
+    for _ in range(BATCHES):
+        for i in range(MESSAGES):
+            metrics.timing("latency_ms", i % 100, tags=tags)
+        metrics.increment("batch.messages", MESSAGES, tags=tags)
+        metrics.timing("batch.flush", 100.0, tags=tags)
+        metrics.gauge("batch.size", MESSAGES, tags=tags)
+    duration = time.process_time() - start
+
+    calls = BATCHES * (MESSAGES + 3)
+    print(f"{name}: {duration / calls * 1000000:.2f} us CPU/call")
+    return duration
+
+
+def main() -> None:
+    # The packets are sent to a socket that is never read.
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(("127.0.0.1", 0))
+        host, port = receiver.getsockname()
+
+        client_factory = partial(DogStatsd, host=host, port=port)
+        direct = run("dogstatsd", DatadogMetricsBackend(client_factory))
+        aggregating = AggregatingMetricsBackend(
+            DatadogMetricsBackend(client_factory), 10.0
+        )
+        aggregated = run("aggregated", aggregating)
+        aggregating.flush()
+
+    print(f"speedup: {direct / aggregated:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares the CPU time spent processing API queries (from the request body
+to the formatted SQL, without running it) when both the legacy and the AST
+representations of the query are maintained and when only the AST is.
+"""
+import time
+from typing import Any, Mapping, Sequence
+
+from snuba.clickhouse.astquery import AstSqlQuery
+from snuba.clickhouse.query import Query
+from snuba.datasets.factory import get_dataset
+from snuba.reader import Reader
+from snuba.request.request_settings import HTTPRequestSettings, RequestSettings
+from snuba.request.schema import RequestSchema
+from snuba.web import QueryResult
+
+ITERATIONS = 200
+
+BODIES: Sequence[Mapping[str, Any]] = [
+    {
+        "project": [1, 2, 3],
+        "selected_columns": ["event_id", "transaction_name", "duration"],
+        "conditions": [
+            ["tags[environment]", "=", "prod"],
+            ["tags[browser]", "!=", "firefox"],
+            ["transaction_op", "IN", ["http", "db", "cache"]],
+            ["duration", ">", 100],
+        ],
+        "orderby": ["-finish_ts"],
+        "limit": 50,
+        "from_date": "2020-06-01T00:00:00",
+        "to_date": "2020-06-08T00:00:00",
+    },
+    {
+        "project": [1],
+        "aggregations": [
+            ["count()", "", "count"],
+            ["quantile(0.95)", "duration", "p95"],
+        ],
+        "conditions": [
+            ["transaction_name", "LIKE", "/api/%"],
+            ["tags[release]", "IN", ["1.0", "1.1", "1.2"]],
+        ],
+        "groupby": ["transaction_name"],
+        "orderby": "-count",
+        "from_date": "2020-06-01T00:00:00",
+        "to_date": "2020-06-02T00:00:00",
+    },
+]
+
+
+def run_query(body: Mapping[str, Any], ast_only: bool) -> None:
+    dataset = get_dataset("transactions")
+    schema = RequestSchema.build_with_extensions(
+        dataset.get_extensions(), HTTPRequestSettings
+    )
+    request = schema.validate(body, dataset, "test")
+    if ast_only:
+        request.query.set_ast_only()
+
+    for name, extension in dataset.get_extensions().items():
+        extension.get_processor().process_query(
+            request.query, request.extensions[name], request.settings
+        )
+    for processor in dataset.get_query_processors():
+        processor.process_query(request.query, request.settings)
+
+    query_plan = dataset.get_query_plan_builder().build_plan(request)
+    for clickhouse_processor in query_plan.plan_processors:
+        clickhouse_processor.process_query(query_plan.query, request.settings)
+
+    def runner(
+        query: Query, request_settings: RequestSettings, reader: Reader[Any]
+    ) -> QueryResult:
+        AstSqlQuery(query, request_settings).format_sql()
+        return QueryResult({"data": [], "meta": []}, {})
+
+    query_plan.execution_strategy.execute(query_plan.query, request.settings, runner)
+
+
+def run(name: str, ast_only: bool) -> float:
+    start = time.process_time()
+    for _ in range(ITERATIONS):
+        for body in BODIES:
+            run_query(body, ast_only)
+    duration = time.process_time() - start
+
+    queries = ITERATIONS * len(BODIES)
+    print(f"{name}: {duration / queries * 1000:.3f} ms CPU/query")
+    return duration
+
+
+def main() -> None:
+    dual = run("legacy and AST", False)
+    ast_only = run("AST only", True)
+    print(f"saving: {(1 - ast_only / dual) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares the time spent writing and reading back a partition of messages
+with the file message storage, one message at a time, and with the memory
+mapped file message storage, in batches.
+"""
+import time
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from typing import Sequence
+
+from snuba.utils.streams.backends.local.storages.abstract import MessageStorage
+from snuba.utils.streams.backends.local.storages.file import (
+    FileMessageStorage,
+    MappedFileMessageStorage,
+)
+from snuba.utils.streams.types import Message, Partition, Topic
+
+MESSAGES = 50000
+BATCH_SIZE = 1000
+PAYLOAD = b"x" * 500
+
+
+def produce(
+    storage: MessageStorage[bytes], partition: Partition, batch_size: int
+) -> None:
+    timestamp = datetime.now()
+    if batch_size == 1:
+        for _ in range(MESSAGES):
+            storage.produce(partition, PAYLOAD, timestamp)
+    else:
+        for _ in range(MESSAGES // batch_size):
+            storage.produce_batch(partition, [PAYLOAD] * batch_size, timestamp)
+
+
+def consume(
+    storage: MessageStorage[bytes], partition: Partition, batch_size: int
+) -> int:
+    count = 0
+    offset = 0
+    while True:
+        messages: Sequence[Message[bytes]]
+        if batch_size == 1:
+            message = storage.consume(partition, offset)
+            messages = [message] if message is not None else []
+        else:
+            messages = storage.consume_batch(partition, offset, batch_size)
+
+        if not messages:
+            return count
+
+        count += len(messages)
+        offset = messages[-1].next_offset
+
+
+def run(name: str, storage_class: type, batch_size: int) -> float:
+    topic = Topic("topic")
+    partition = Partition(topic, 0)
+
+    with TemporaryDirectory() as directory:
+        storage = storage_class(directory)
+        storage.create_topic(topic, 1)
+
+        start = time.perf_counter()
+        produce(storage, partition, batch_size)
+        produce_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert consume(storage, partition, batch_size) == MESSAGES
+        consume_duration = time.perf_counter() - start
+
+    print(
+        f"{name}: produce {MESSAGES / produce_duration:.0f} messages/s, "
+        f"consume {MESSAGES / consume_duration:.0f} messages/s"
+    )
+    return produce_duration + consume_duration
+
+
+def main() -> None:
+    file = run("file", FileMessageStorage, 1)
+    mapped = run("mapped file", MappedFileMessageStorage, BATCH_SIZE)
+    print(f"speedup: {file / mapped:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares the cost of encoding the rows of the events storage in the
+JSONEachRow and RowBinary insert formats.
+"""
+import time
+from datetime import datetime
+from typing import Sequence
+
+import rapidjson
+
+from snuba.clickhouse.http import JSONRow, JSONRowEncoder
+from snuba.clickhouse.rowbinary import RowBinaryEncoder
+from snuba.consumer import KafkaMessageMetadata
+from snuba.datasets.storages import StorageKey
+from snuba.datasets.storages.factory import get_writable_storage
+from snuba.processor import InsertBatch
+from snuba.util import settings_override
+from snuba.utils.codecs import Encoder
+from snuba.writer import WriterTableRow
+
+ROWS = 20000
+
+
+def get_rows() -> Sequence[WriterTableRow]:
+    processor = (
+        get_writable_storage(StorageKey.EVENTS)
+        .get_table_writer()
+        .get_stream_loader()
+        .get_processor()
+    )
+    with open("tests/perf-event.json") as f:
+        message = rapidjson.loads(f.readline())
+
+    with settings_override({"DISCARD_OLD_EVENTS": False}):
+        processed = processor.process_message(
+            message, KafkaMessageMetadata(0, 0, datetime.now())
+        )
+
+    assert isinstance(processed, InsertBatch)
+    return list(processed.rows) * ROWS
+
+
+def run(
+    name: str,
+    encoder: Encoder[JSONRow, WriterTableRow],
+    rows: Sequence[WriterTableRow],
+) -> int:
+    start = time.perf_counter()
+    size = sum(len(encoder.encode(row)) for row in rows)
+    duration = time.perf_counter() - start
+    print(
+        f"{name}: {len(rows) / duration:.0f} rows/sec, {size / len(rows):.0f} bytes/row"
+    )
+    return size
+
+
+def main() -> None:
+    rows = get_rows()
+    columns = (
+        get_writable_storage(StorageKey.EVENTS)
+        .get_table_writer()
+        .get_schema()
+        .get_columns()
+    )
+
+    json_size = run("JSONEachRow", JSONRowEncoder(), rows)
+    row_binary_size = run("RowBinary", RowBinaryEncoder(columns), rows)
+
+    assert row_binary_size < json_size
+
+
+if __name__ == "__main__":
+    main()
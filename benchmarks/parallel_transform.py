@@ -0,0 +1,154 @@
+"""
+Measures the throughput (messages per second) of the parallel transform
+step with different numbers of processes, using the shared memory batch
+format and the previous format, where each message was pickled in its
+entirety and only its payload buffers were written to shared memory.
+"""
+import pickle
+import time
+from datetime import datetime
+from multiprocessing.shared_memory import SharedMemory
+from pickle import PickleBuffer
+from typing import Any, Iterator, MutableSequence, Optional, Sequence, Tuple
+from unittest.mock import patch
+
+from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+from snuba.utils.streams.backends.kafka import KafkaPayload
+from snuba.utils.streams.processing.strategies.abstract import (
+    MessageRejected,
+    ProcessingStrategy as ProcessingStep,
+)
+from snuba.utils.streams.processing.strategies.streaming import transform
+from snuba.utils.streams.processing.strategies.streaming.transform import (
+    ParallelTransformStep,
+    ValueTooLarge,
+)
+from snuba.utils.streams.types import Message, Partition, Topic
+
+MESSAGES = 50000
+PROCESSES = [1, 2, 4]
+
+
+class PickledMessageBatch:
+    """
+    The previous implementation of ``MessageBatch``, for comparison.
+    """
+
+    def __init__(self, block: SharedMemory) -> None:
+        self.block = block
+        self.__items: MutableSequence[Tuple[bytes, Sequence[Tuple[int, int]]]] = []
+        self.__offset = 0
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def __getitem__(self, index: int) -> Message[Any]:
+        data, buffers = self.__items[index]
+        return pickle.loads(
+            data,
+            buffers=[
+                self.block.buf[offset : offset + length].tobytes()
+                for offset, length in buffers
+            ],
+        )
+
+    def __iter__(self) -> Iterator[Message[Any]]:
+        for i in range(len(self.__items)):
+            yield self[i]
+
+    def append(self, message: Message[Any]) -> None:
+        buffers: MutableSequence[Tuple[int, int]] = []
+
+        def buffer_callback(buffer: PickleBuffer) -> None:
+            value = buffer.raw()
+            offset = self.__offset
+            length = len(value)
+            if offset + length > self.block.size:
+                raise ValueTooLarge()
+            self.block.buf[offset : offset + length] = value
+            self.__offset += length
+            buffers.append((offset, length))
+
+        data = pickle.dumps(message, protocol=5, buffer_callback=buffer_callback)
+
+        self.__items.append((data, buffers))
+
+
+class CountingStep(ProcessingStep[KafkaPayload]):
+    def __init__(self) -> None:
+        self.count = 0
+
+    def poll(self) -> None:
+        pass
+
+    def submit(self, message: Message[KafkaPayload]) -> None:
+        self.count += 1
+
+    def close(self) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        pass
+
+
+def transform_function(message: Message[KafkaPayload]) -> KafkaPayload:
+    return message.payload
+
+
+def run(processes: int) -> float:
+    partition = Partition(Topic("events"), 0)
+    now = datetime.now()
+    messages = [
+        Message(partition, i, KafkaPayload(None, b"x" * 1000, []), now)
+        for i in range(MESSAGES)
+    ]
+
+    next_step = CountingStep()
+    transform_step = ParallelTransformStep(
+        transform_function,
+        next_step,
+        processes=processes,
+        max_batch_size=1000,
+        max_batch_time=1,
+        input_block_size=16 * 1024 * 1024,
+        output_block_size=16 * 1024 * 1024,
+        metrics=DummyMetricsBackend(),
+    )
+
+    start = time.perf_counter()
+    for message in messages:
+        while True:
+            transform_step.poll()
+            try:
+                transform_step.submit(message)
+            except MessageRejected:
+                time.sleep(0.001)
+            else:
+                break
+
+    transform_step.close()
+    transform_step.join()
+    duration = time.perf_counter() - start
+
+    assert next_step.count == MESSAGES
+
+    return MESSAGES / duration
+
+
+def main() -> None:
+    for processes in PROCESSES:
+        throughput = run(processes)
+
+        with patch.object(transform, "MessageBatch", PickledMessageBatch):
+            pickled_throughput = run(processes)
+
+        print(
+            f"{processes} processes: {throughput:.0f} messages/s ({pickled_throughput:.0f} messages/s with pickled messages)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compares the CPU time spent consuming messages from a local broker and
+processing them with the batching strategy when the messages are fetched
+and submitted one at a time and in batches.
+"""
+import time
+from typing import MutableSequence, Sequence
+
+from snuba.utils.clock import TestingClock
+from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+from snuba.utils.streams.backends.local.backend import LocalBroker
+from snuba.utils.streams.backends.local.storages.memory import MemoryMessageStorage
+from snuba.utils.streams.processing.processor import StreamProcessor
+from snuba.utils.streams.processing.strategies.batching import (
+    AbstractBatchWorker,
+    BatchProcessingStrategyFactory,
+)
+from snuba.utils.streams.types import Message, Topic
+
+MESSAGES = 50000
+PARTITIONS = 4
+MAX_BATCH_SIZE = 1000
+
+
+class Worker(AbstractBatchWorker[int, int]):
+    def __init__(self) -> None:
+        self.flushed: MutableSequence[int] = []
+
+    def process_message(self, message: Message[int]) -> int:
+        return message.payload
+
+    def flush_batch(self, batch: Sequence[int]) -> None:
+        self.flushed.extend(batch)
+
+
+def run(name: str, max_poll_batch_size: int) -> float:
+    topic = Topic("topic")
+    broker: LocalBroker[int] = LocalBroker(MemoryMessageStorage(), TestingClock())
+    broker.create_topic(topic, PARTITIONS)
+    producer = broker.get_producer()
+    for i in range(MESSAGES):
+        producer.produce(topic, i)
+
+    worker = Worker()
+    processor = StreamProcessor(
+        broker.get_consumer("group"),
+        topic,
+        BatchProcessingStrategyFactory(
+            worker=worker,
+            max_batch_size=MAX_BATCH_SIZE,
+            max_batch_time=60000,
+            metrics=DummyMetricsBackend(),
+        ),
+        max_poll_batch_size=max_poll_batch_size,
+    )
+
+    start = time.process_time()
+    while len(worker.flushed) < MESSAGES:
+        processor._run_once()
+    duration = time.process_time() - start
+
+    processor._shutdown()
+    assert sorted(worker.flushed) == list(range(MESSAGES))
+
+    print(f"{name}: {duration / MESSAGES * 1000000:.2f} us CPU/message")
+    return duration
+
+
+def main() -> None:
+    single = run("poll", 1)
+    batch = run("poll_batch", 500)
+    print(f"speedup: {single / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compares encoding a large query response with ``simplejson.dumps`` and
+with the streaming encoder used by the query endpoint: the time until the
+first rows can be sent, the total encoding time and the peak memory
+allocated while encoding (as traced by ``tracemalloc``).
+"""
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, Mapping, Tuple
+
+import simplejson as json
+
+from snuba.web.encoding import stream_json
+
+ROWS = 100000
+
+
+def get_payload() -> Mapping[str, Any]:
+    return {
+        "data": [
+            {
+                "event_id": f"{i:032x}",
+                "project_id": 1,
+                "timestamp": "2020-01-02T03:04:05+00:00",
+                "title": f"Error: something went wrong ({i})",
+                "count": i,
+                "avg": i / 3,
+            }
+            for i in range(ROWS)
+        ],
+        "meta": [
+            {"name": "event_id", "type": "String"},
+            {"name": "project_id", "type": "UInt64"},
+            {"name": "timestamp", "type": "DateTime"},
+            {"name": "title", "type": "String"},
+            {"name": "count", "type": "UInt64"},
+            {"name": "avg", "type": "Float64"},
+        ],
+        "timing": {"timestamp": 1, "duration_ms": 10},
+    }
+
+
+def run(name: str, encode: Callable[[], Iterable[str]]) -> Tuple[float, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    first_byte = None
+    size = 0
+    for chunk in encode():
+        # The response only starts being useful once it contains rows.
+        if first_byte is None and size + len(chunk) > 100:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert first_byte is not None
+    print(
+        f"{name}: {first_byte * 1000:.1f}ms to first rows, {duration * 1000:.1f}ms total, {peak / 2 ** 20:.1f}MiB peak, {size} bytes"
+    )
+    return first_byte, duration, peak
+
+
+def main() -> None:
+    payload = get_payload()
+
+    assert "".join(stream_json(payload)) == json.dumps(payload)
+
+    dumps_first_byte, _, dumps_peak = run("dumps", lambda: [json.dumps(payload)])
+    stream_first_byte, _, stream_peak = run("stream", lambda: stream_json(payload))
+
+    assert stream_first_byte < dumps_first_byte
+    assert stream_peak < dumps_peak
+
+
+if __name__ == "__main__":
+    main()
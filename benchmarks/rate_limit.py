@@ -0,0 +1,50 @@
+"""
+Compares the number of round trips to Redis and the number of commands
+sent to it to run a query through the global and project rate limits, with
+a pipeline per rate limit and with the rate limit script.
+"""
+import uuid
+from typing import Tuple
+from unittest.mock import patch
+
+from redis.connection import Connection
+
+from snuba import settings
+from snuba.state.rate_limit import RateLimitAggregator, RateLimitParameters
+
+QUERIES = 100
+
+
+def run(name: str) -> Tuple[int, int]:
+    rate_limit_params = [
+        RateLimitParameters("global", uuid.uuid4().hex, None, 1000),
+        RateLimitParameters("project", uuid.uuid4().hex, 1000, 1000),
+    ]
+
+    with patch.object(
+        Connection, "pack_command", autospec=True, side_effect=Connection.pack_command
+    ) as commands, patch.object(
+        Connection,
+        "send_packed_command",
+        autospec=True,
+        side_effect=Connection.send_packed_command,
+    ) as round_trips:
+        for _ in range(QUERIES):
+            with RateLimitAggregator(rate_limit_params):
+                pass
+
+    print(
+        f"{name}: {round_trips.call_count / QUERIES:.1f} round trips, {commands.call_count / QUERIES:.1f} commands per query"
+    )
+    return round_trips.call_count, commands.call_count
+
+
+def main() -> None:
+    with patch.object(settings, "USE_REDIS_CLUSTER", True):
+        run("pipeline")
+
+    run("script")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares the cost of copying a request with large condition lists (as done
+to record the query log and by the subscription worker) with a deep copy
+and with the copy of the query, and the overhead of handling such a request
+before it is sent to ClickHouse.
+"""
+import copy
+import time
+from typing import Callable
+
+from snuba.datasets.factory import get_dataset
+from snuba.request import Request
+from snuba.request.request_settings import HTTPRequestSettings
+from snuba.request.schema import RequestSchema
+
+REQUESTS = 10
+CONDITIONS = 20
+VALUES = 500
+
+
+def build_request() -> Request:
+    dataset = get_dataset("events")
+    schema = RequestSchema.build_with_extensions(
+        dataset.get_extensions(), HTTPRequestSettings
+    )
+    return schema.validate(
+        {
+            "project": list(range(1, VALUES + 1)),
+            "selected_columns": ["event_id", "title"],
+            "conditions": [
+                [f"tags[key{i}]", "IN", [f"value{j}" for j in range(VALUES)]]
+                for i in range(CONDITIONS)
+            ],
+            "from_date": "2020-01-01T00:00:00",
+            "to_date": "2020-01-02T00:00:00",
+        },
+        dataset,
+        "test",
+    )
+
+
+def process(request: Request) -> None:
+    dataset = get_dataset("events")
+    for name, extension in dataset.get_extensions().items():
+        extension.get_processor().process_query(
+            request.query, request.extensions[name], request.settings
+        )
+    for processor in dataset.get_query_processors():
+        processor.process_query(request.query, request.settings)
+    dataset.get_query_plan_builder().build_plan(request)
+
+
+def run(name: str, copy_request: Callable[[Request], Request]) -> float:
+    requests = [build_request() for _ in range(REQUESTS)]
+
+    start = time.perf_counter()
+    copies = [copy_request(request) for request in requests]
+    copy_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for request in requests:
+        process(request)
+    process_duration = time.perf_counter() - start
+
+    for request, request_copy in zip(requests, copies):
+        assert (
+            request_copy.body["conditions"] == request.body["conditions"][:CONDITIONS]
+        )
+
+    print(
+        f"{name}: copy {copy_duration / REQUESTS * 1000:.2f} ms/request, "
+        f"processing {process_duration / REQUESTS * 1000:.2f} ms/request"
+    )
+    return copy_duration
+
+
+def main() -> None:
+    deep_copy = run("deepcopy", copy.deepcopy)
+    query_copy = run("copy", copy.copy)
+    print(f"speedup: {deep_copy / query_copy:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
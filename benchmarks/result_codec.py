@@ -0,0 +1,65 @@
+"""
+Compares the size of a large query result and the time needed to encode
+and decode it with the JSON codec and the result codec used by the query
+cache.
+"""
+import time
+from typing import Any
+
+from snuba.reader import Result
+from snuba.utils.codecs import Codec, JSONCodec
+from snuba.web.codecs import ResultCodec
+
+ROWS = 50000
+
+
+def get_result() -> Result:
+    return {
+        "data": [
+            {
+                "event_id": f"{i:032x}",
+                "project_id": 1,
+                "timestamp": "2020-01-02T03:04:05+00:00",
+                "title": f"Error: something went wrong ({i % 100})",
+                "count": i,
+            }
+            for i in range(ROWS)
+        ],
+        "meta": [
+            {"name": "event_id", "type": "String"},
+            {"name": "project_id", "type": "UInt64"},
+            {"name": "timestamp", "type": "DateTime"},
+            {"name": "title", "type": "String"},
+            {"name": "count", "type": "UInt64"},
+        ],
+    }
+
+
+def run(name: str, codec: Codec[Any, Result], result: Result) -> int:
+    start = time.perf_counter()
+    encoded = codec.encode(result)
+    encode_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded = codec.decode(encoded)
+    decode_duration = time.perf_counter() - start
+
+    assert decoded == result
+
+    print(
+        f"{name}: {len(encoded)} bytes, encode {encode_duration * 1000:.1f}ms, decode {decode_duration * 1000:.1f}ms"
+    )
+    return len(encoded)
+
+
+def main() -> None:
+    result = get_result()
+
+    json_size = run("json", JSONCodec(), result)
+    result_size = run("result", ResultCodec(), result)
+
+    assert result_size < json_size
+
+
+if __name__ == "__main__":
+    main()
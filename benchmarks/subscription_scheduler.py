@@ -0,0 +1,64 @@
+"""
+Measures the time needed to find the scheduled subscriptions of a partition
+with 100k subscriptions over a tick spanning a 10 minute gap, as happens
+when the subscriptions consumer is catching up.
+"""
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterable, MutableMapping, Tuple
+from uuid import UUID
+
+from snuba.subscriptions.data import PartitionId, SubscriptionData
+from snuba.subscriptions.scheduler import SubscriptionScheduler
+from snuba.subscriptions.store import SubscriptionDataStore
+from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+from snuba.utils.types import Interval
+
+SUBSCRIPTIONS = 100000
+RESOLUTIONS = [timedelta(minutes=minutes) for minutes in [1, 5, 10, 15, 30, 60]]
+
+
+class MemorySubscriptionDataStore(SubscriptionDataStore):
+    def __init__(self) -> None:
+        self.__subscriptions: MutableMapping[UUID, SubscriptionData] = {}
+
+    def create(self, key: UUID, data: SubscriptionData) -> None:
+        self.__subscriptions[key] = data
+
+    def delete(self, key: UUID) -> None:
+        del self.__subscriptions[key]
+
+    def all(self) -> Iterable[Tuple[UUID, SubscriptionData]]:
+        return [*self.__subscriptions.items()]
+
+
+def main() -> None:
+    store = MemorySubscriptionDataStore()
+    for i in range(SUBSCRIPTIONS):
+        store.create(
+            uuid.uuid4(),
+            SubscriptionData(
+                1, [], [], timedelta(minutes=1), RESOLUTIONS[i % len(RESOLUTIONS)]
+            ),
+        )
+
+    scheduler = SubscriptionScheduler(
+        store, PartitionId(0), timedelta(minutes=1), DummyMetricsBackend()
+    )
+
+    now = datetime.now().replace(second=0, microsecond=0)
+    interval = Interval(now - timedelta(minutes=10), now)
+
+    # Populate the schedule before measuring.
+    list(scheduler.find(Interval(now, now)))
+
+    start = time.perf_counter()
+    tasks = sum(1 for _ in scheduler.find(interval))
+    duration = time.perf_counter() - start
+
+    print(f"{tasks} tasks in {duration * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
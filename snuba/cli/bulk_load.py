@@ -8,7 +8,7 @@ from snuba.datasets.storages import StorageKey
 from snuba.datasets.storages.factory import get_cdc_storage, CDC_STORAGES
 from snuba.environment import setup_logging, setup_sentry
 from snuba.snapshots.postgres_snapshot import PostgresSnapshot
-from snuba.writer import BufferedWriterWrapper
+from snuba.writer import BatchWriterEncoderWrapper, BufferedWriterWrapper
 
 
 @click.command()
@@ -23,9 +23,40 @@ from snuba.writer import BufferedWriterWrapper
     help="Source of the dump. Depending on the storage it may have different meaning.",
 )
 @click.option("--dest-table", help="Clickhouse destination table.")
+@click.option(
+    "--processes",
+    default=0,
+    type=int,
+    help="Number of processes processing the rows in parallel. The rows are processed by this process if 0.",
+)
+@click.option(
+    "--writers",
+    default=1,
+    type=int,
+    help="Number of concurrent writers when the rows are processed in parallel.",
+)
+@click.option(
+    "--range-size",
+    default=settings.BULK_LOAD_RANGE_SIZE,
+    type=int,
+    help="Size in bytes of the parts of the table processed in parallel.",
+)
+@click.option(
+    "--checkpoint",
+    "checkpoint_path",
+    help="File recording the progress of a parallel load. An interrupted load restarted with the same checkpoint skips what was already loaded.",
+)
 @click.option("--log-level", help="Logging level to use.")
 def bulk_load(
-    *, storage_name: str, dest_table: str, source: str, log_level: Optional[str] = None,
+    *,
+    storage_name: str,
+    dest_table: str,
+    source: str,
+    processes: int,
+    writers: int,
+    range_size: int,
+    checkpoint_path: Optional[str] = None,
+    log_level: Optional[str] = None,
 ) -> None:
     setup_logging(log_level)
     setup_sentry()
@@ -49,12 +80,33 @@ def bulk_load(
         dest_table,
         storage.get_row_processor(),
     )
+
+    if processes > 0:
+        loader.load_parallel(
+            [
+                table_writer.get_batch_writer(
+                    environment.metrics,
+                    table_name=dest_table,
+                    chunk_size=settings.BULK_CLICKHOUSE_BUFFER,
+                )
+                for _ in range(writers)
+            ],
+            table_writer.get_row_encoder(),
+            processes,
+            range_size,
+            checkpoint_path,
+        )
+        return
+
     # TODO: see whether we need to pass options to the writer
     writer = BufferedWriterWrapper(
-        table_writer.get_batch_writer(
-            environment.metrics,
-            table_name=dest_table,
-            chunk_size=settings.BULK_CLICKHOUSE_BUFFER,
+        BatchWriterEncoderWrapper(
+            table_writer.get_batch_writer(
+                environment.metrics,
+                table_name=dest_table,
+                chunk_size=settings.BULK_CLICKHOUSE_BUFFER,
+            ),
+            table_writer.get_row_encoder(),
         ),
         settings.BULK_CLICKHOUSE_BUFFER,
     )
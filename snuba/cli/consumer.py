@@ -87,6 +87,41 @@ from snuba.stateful_consumer.consumer_state_machine import ConsumerStateMachine
 @click.option(
     "--output-block-size", type=int,
 )
+@click.option(
+    "--max-pending-batches",
+    default=0,
+    type=int,
+    help="Max number of closed batches that can be written to ClickHouse in the background while the next batch is collected.",
+)
+@click.option(
+    "--adaptive-batching/--no-adaptive-batching",
+    default=False,
+    help="Adjust the batch size and time between the minimum and maximum limits according to the consumer lag and insert latency.",
+)
+@click.option(
+    "--min-batch-size",
+    default=settings.DEFAULT_MIN_BATCH_SIZE,
+    type=int,
+    help="Min number of messages to batch in memory when using adaptive batching.",
+)
+@click.option(
+    "--min-batch-time-ms",
+    default=settings.DEFAULT_MIN_BATCH_TIME_MS,
+    type=int,
+    help="Min length of time to buffer messages in memory when using adaptive batching.",
+)
+@click.option(
+    "--max-batch-bytes",
+    default=settings.DEFAULT_MAX_BATCH_BYTES,
+    type=int,
+    help="Max number of bytes to write in a single batch when using adaptive batching.",
+)
+@click.option(
+    "--max-poll-batch-size",
+    default=1,
+    type=int,
+    help="Max number of messages to fetch from Kafka and submit for processing at once. Messages submitted together are handed to the message processor together.",
+)
 @click.option(
     "--profile-path", type=click.Path(dir_okay=True, file_okay=False, exists=True)
 )
@@ -109,6 +144,12 @@ def consumer(
     processes: Optional[int],
     input_block_size: Optional[int],
     output_block_size: Optional[int],
+    max_pending_batches: int,
+    adaptive_batching: bool,
+    min_batch_size: int,
+    min_batch_time_ms: int,
+    max_batch_bytes: int,
+    max_poll_batch_size: int,
     log_level: Optional[str] = None,
     profile_path: Optional[str] = None,
 ) -> None:
@@ -139,6 +180,12 @@ def consumer(
         processes=processes,
         input_block_size=input_block_size,
         output_block_size=output_block_size,
+        max_pending_batches=max_pending_batches,
+        adaptive_batching=adaptive_batching,
+        min_batch_size=min_batch_size,
+        min_batch_time_ms=min_batch_time_ms,
+        max_batch_bytes=max_batch_bytes,
+        max_poll_batch_size=max_poll_batch_size,
         profile_path=profile_path,
     )
 
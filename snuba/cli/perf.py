@@ -44,6 +44,12 @@ from snuba.environment import setup_logging
     type=click.Choice(DATASET_NAMES),
     help="The dataset to consume/run replacements for (currently only events supported)",
 )
+@click.option(
+    "--batch-size",
+    type=int,
+    default=1000,
+    help="Number of events per batch when measuring batch processing.",
+)
 @click.option("--log-level", help="Logging level to use.")
 def perf(
     *,
@@ -52,6 +58,7 @@ def perf(
     profile_process: bool,
     profile_write: bool,
     dataset_name: str,
+    batch_size: int,
     log_level: Optional[str] = None,
 ) -> None:
     from snuba.perf import run, logger
@@ -72,4 +79,5 @@ def perf(
         repeat=repeat,
         profile_process=profile_process,
         profile_write=profile_write,
+        batch_size=batch_size,
     )
@@ -1,4 +1,5 @@
 import signal
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional, Sequence
 
 import click
@@ -62,6 +63,12 @@ from snuba.utils.metrics.wrapper import MetricsWrapper
     type=int,
     help="Minimum number of messages per topic+partition librdkafka tries to maintain in the local consumer queue.",
 )
+@click.option(
+    "--max-query-workers",
+    default=1,
+    type=int,
+    help="Maximum number of worker threads executing the replacements of different projects concurrently.",
+)
 @click.option("--log-level", help="Logging level to use.")
 def replacer(
     *,
@@ -74,6 +81,7 @@ def replacer(
     auto_offset_reset: str,
     queued_max_messages_kbytes: int,
     queued_min_messages: int,
+    max_query_workers: int,
     log_level: Optional[str] = None,
 ) -> None:
 
@@ -105,6 +113,8 @@ def replacer(
 
     metrics = MetricsWrapper(environment.metrics, "replacer", tags=metrics_tags,)
 
+    executor = ThreadPoolExecutor(max_workers=max_query_workers)
+
     replacer = StreamProcessor(
         KafkaConsumer(
             build_kafka_consumer_configuration(
@@ -117,7 +127,7 @@ def replacer(
         ),
         Topic(replacements_topic),
         BatchProcessingStrategyFactory(
-            worker=ReplacerWorker(storage, metrics=metrics),
+            worker=ReplacerWorker(storage, metrics=metrics, executor=executor),
             max_batch_size=max_batch_size,
             max_batch_time=max_batch_time_ms,
             metrics=metrics,
@@ -131,4 +141,5 @@ def replacer(
     signal.signal(signal.SIGINT, handler)
     signal.signal(signal.SIGTERM, handler)
 
-    replacer.run()
+    with executor:
+        replacer.run()
@@ -91,6 +91,11 @@ logger = logging.getLogger(__name__)
 @click.option("--result-topic")
 @click.option("--log-level", help="Logging level to use.")
 @click.option("--delay-seconds", type=int)
+@click.option(
+    "--batch-queries/--no-batch-queries",
+    default=False,
+    help="Execute the queries of subscriptions that only differ by project together.",
+)
 def subscriptions(
     *,
     dataset_name: str,
@@ -108,6 +113,7 @@ def subscriptions(
     result_topic: Optional[str],
     log_level: Optional[str],
     delay_seconds: Optional[int],
+    batch_queries: bool,
 ) -> None:
     """Evaluates subscribed queries for a dataset."""
 
@@ -207,6 +213,7 @@ def subscriptions(
                     producer,
                     Topic(result_topic),
                     metrics,
+                    batch_queries=batch_queries,
                 ),
                 max_batch_size,
                 max_batch_time_ms,
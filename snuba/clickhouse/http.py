@@ -1,14 +1,20 @@
 import re
+import zlib
+from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Iterable, Mapping, Optional
+from enum import Enum
+from typing import Any, Iterable, Mapping, Optional, Sequence
 from urllib.parse import urlencode
 
+import lz4.frame
 import rapidjson
+import zstandard
 from urllib3.connectionpool import HTTPConnectionPool
 from urllib3.exceptions import HTTPError
 
 from snuba.clickhouse import DATETIME_FORMAT
 from snuba.clickhouse.errors import ClickhouseWriterError
+from snuba.clickhouse.escaping import escape_identifier
 from snuba.utils.codecs import Encoder
 from snuba.utils.metrics import MetricsBackend
 from snuba.utils.metrics.wrapper import MetricsWrapper
@@ -24,6 +30,97 @@ CLICKHOUSE_ERROR_RE = re.compile(
 JSONRow = bytes  # a single row in JSONEachRow format
 
 
+class InsertFormat(Enum):
+    """
+    The ClickHouse input formats the HTTPBatchWriter can send rows in. The
+    rows passed to the writer must be encoded with the matching encoder.
+    """
+
+    JSON_EACH_ROW = "JSONEachRow"
+    ROW_BINARY = "RowBinary"
+
+
+class HTTPCompression(Enum):
+    """
+    The ``Content-Encoding`` the HTTPBatchWriter can compress the insert body
+    with. ClickHouse always accepts gzip and deflate, lz4 and zstd request
+    bodies require a server that supports them.
+    """
+
+    NONE = "none"
+    GZIP = "gzip"
+    DEFLATE = "deflate"
+    LZ4 = "lz4"
+    ZSTD = "zstd"
+
+
+class StreamCompressor(ABC):
+    """
+    Compresses a stream of chunks. Each call to ``compress`` may return only
+    part of the compressed data (or none at all), the remainder is returned
+    by ``flush`` once the stream is over.
+    """
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def flush(self) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibStreamCompressor(StreamCompressor):
+    def __init__(self, wbits: int, level: int = 1) -> None:
+        self.__compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush()
+
+
+class LZ4StreamCompressor(StreamCompressor):
+    def __init__(self) -> None:
+        self.__compressor = lz4.frame.LZ4FrameCompressor()
+        self.__header: Optional[bytes] = self.__compressor.begin()
+
+    def compress(self, data: bytes) -> bytes:
+        compressed = self.__compressor.compress(data)
+        if self.__header is not None:
+            compressed = self.__header + compressed
+            self.__header = None
+        return compressed
+
+    def flush(self) -> bytes:
+        return (self.__header or b"") + self.__compressor.flush()
+
+
+class ZstdStreamCompressor(StreamCompressor):
+    def __init__(self, level: int = 1) -> None:
+        self.__compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush()
+
+
+def build_stream_compressor(compression: HTTPCompression) -> StreamCompressor:
+    if compression is HTTPCompression.GZIP:
+        return ZlibStreamCompressor(zlib.MAX_WBITS | 16)
+    elif compression is HTTPCompression.DEFLATE:
+        return ZlibStreamCompressor(zlib.MAX_WBITS)
+    elif compression is HTTPCompression.LZ4:
+        return LZ4StreamCompressor()
+    elif compression is HTTPCompression.ZSTD:
+        return ZstdStreamCompressor()
+    else:
+        raise ValueError(f"{compression} does not have a compressor")
+
+
 class JSONRowEncoder(Encoder[JSONRow, WriterTableRow]):
     def __default(self, value: Any) -> Any:
         if isinstance(value, datetime):
@@ -47,21 +144,37 @@ class HTTPBatchWriter(BatchWriter[JSONRow]):
         metrics: MetricsBackend,
         options: Optional[Mapping[str, Any]] = None,
         chunk_size: Optional[int] = 1,
+        insert_format: InsertFormat = InsertFormat.JSON_EACH_ROW,
+        columns: Optional[Sequence[str]] = None,
+        compression: HTTPCompression = HTTPCompression.NONE,
     ):
         """
         Builds a writer to send a batch to Clickhouse.
         The encoder function will be applied to each row to turn it into bytes.
         We send data to the server with Transfer-Encoding: chunked. If chunk size is 0
         we send the entire content in one chunk, otherwise it is the rows per chunk.
+        Formats without field names (RowBinary) require the list of columns each
+        row provides, in the order they are encoded.
+        If a compression is provided the chunks are compressed as a single
+        stream and sent with the matching Content-Encoding.
         """
         self.__pool = HTTPConnectionPool(host, port)
         self.__options = options if options is not None else {}
-        self.__table_name = table_name
         self.__chunk_size = chunk_size
         self.__user = user
         self.__password = password
-        self.__database = database
         self.__metrics = MetricsWrapper(metrics, "writer", {"table_name": table_name})
+        self.__compression = compression
+
+        if insert_format is InsertFormat.ROW_BINARY:
+            assert columns, "RowBinary inserts require an explicit column list"
+
+        columns_clause = ""
+        if columns:
+            columns_clause = " ({})".format(
+                ", ".join(str(escape_identifier(column)) for column in columns)
+            )
+        self.__statement = f"INSERT INTO {database}.{table_name}{columns_clause} FORMAT {insert_format.value}"
 
     def _prepare_chunks(self, rows: Iterable[JSONRow]) -> Iterable[bytes]:
         total_bytes_size = 0
@@ -84,23 +197,41 @@ class HTTPBatchWriter(BatchWriter[JSONRow]):
 
         self.__metrics.timing("total.size", total_bytes_size)
 
+    def _compress_chunks(self, chunks: Iterable[bytes]) -> Iterable[bytes]:
+        compressor = build_stream_compressor(self.__compression)
+        compressed_bytes_size = 0
+
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+                compressed_bytes_size += len(compressed)
+
+        compressed = compressor.flush()
+        if compressed:
+            yield compressed
+            compressed_bytes_size += len(compressed)
+
+        self.__metrics.timing("total.compressed_size", compressed_bytes_size)
+
     def write(self, values: Iterable[JSONRow]) -> None:
+        headers = {
+            "X-ClickHouse-User": self.__user,
+            "X-ClickHouse-Key": self.__password,
+            "Connection": "keep-alive",
+            "Accept-Encoding": "gzip,deflate",
+        }
+
+        body = self._prepare_chunks(values)
+        if self.__compression is not HTTPCompression.NONE:
+            headers["Content-Encoding"] = self.__compression.value
+            body = self._compress_chunks(body)
+
         response = self.__pool.urlopen(
             "POST",
-            "/?"
-            + urlencode(
-                {
-                    **self.__options,
-                    "query": f"INSERT INTO {self.__database}.{self.__table_name} FORMAT JSONEachRow",
-                }
-            ),
-            headers={
-                "X-ClickHouse-User": self.__user,
-                "X-ClickHouse-Key": self.__password,
-                "Connection": "keep-alive",
-                "Accept-Encoding": "gzip,deflate",
-            },
-            body=self._prepare_chunks(values),
+            "/?" + urlencode({**self.__options, "query": self.__statement}),
+            headers=headers,
+            body=body,
             chunked=True,
         )
 
@@ -12,7 +12,7 @@ from dateutil.tz import tz
 from snuba import settings
 from snuba.clickhouse.errors import ClickhouseError
 from snuba.clickhouse.sql import SqlQuery
-from snuba.reader import Reader, Result, build_result_transformer
+from snuba.reader import Reader, Result, build_column_transformer
 
 
 logger = logging.getLogger("snuba.clickhouse")
@@ -158,6 +158,8 @@ def transform_date(value: date) -> str:
     # just assume UTC. (Ideally, we'd have just left these as timezone naive to
     # begin with and not done this transformation at all, since the time
     # portion has no benefit or significance here.)
+    if type(value) is date:
+        return f"{value.isoformat()}T00:00:00+00:00"
     return datetime(*value.timetuple()[:6]).replace(tzinfo=tz.tzutc()).isoformat()
 
 
@@ -167,10 +169,11 @@ def transform_datetime(value: datetime) -> str:
     and time string representation.
     """
     if value.tzinfo is None:
-        value = value.replace(tzinfo=tz.tzutc())
+        # Same as formatting the value with a UTC time zone, without the
+        # cost of building a new datetime object.
+        return value.isoformat() + "+00:00"
     else:
-        value = value.astimezone(tz.tzutc())
-    return value.isoformat()
+        return value.astimezone(tz.tzutc()).isoformat()
 
 
 def transform_uuid(value: UUID) -> str:
@@ -180,7 +183,7 @@ def transform_uuid(value: UUID) -> str:
     return str(value)
 
 
-transform_column_types = build_result_transformer(
+get_column_transformer = build_column_transformer(
     [
         (re.compile(r"^Date(\(.+\))?$"), transform_date),
         (re.compile(r"^DateTime(\(.+\))?$"), transform_datetime),
@@ -197,6 +200,11 @@ class NativeDriverReader(Reader[SqlQuery]):
         """
         Transform a native driver response into a response that is
         structurally similar to a ClickHouse-flavored JSON response.
+
+        The result is expected to be in columnar form (a sequence of values
+        for each column) so that the type transformations can be applied to
+        each column as a whole before the rows are assembled in a single
+        pass.
         """
         data, meta = result
 
@@ -206,24 +214,29 @@ class NativeDriverReader(Reader[SqlQuery]):
         # duplicated names are discarded at this stage.
         columns = {c[0]: i for i, c in enumerate(meta)}
 
-        data = [
-            {column: row[index] for column, index in columns.items()} for row in data
-        ]
+        names = []
+        values = []
+        for name, index in columns.items():
+            # A result without any rows does not contain any columns.
+            column = data[index] if data else ()
+            transformer = get_column_transformer(meta[index][1])
+            names.append(name)
+            values.append(
+                column if transformer is None else [*map(transformer, column)]
+            )
+
+        rows = [dict(zip(names, row)) for row in zip(*values)]
 
         meta = [
             {"name": m[0], "type": m[1]} for m in [meta[i] for i in columns.values()]
         ]
 
         if with_totals:
-            assert len(data) > 0
-            totals = data.pop(-1)
-            result = {"data": data, "meta": meta, "totals": totals}
+            assert len(rows) > 0
+            totals = rows.pop(-1)
+            return {"data": rows, "meta": meta, "totals": totals}
         else:
-            result = {"data": data, "meta": meta}
-
-        transform_column_types(result)
-
-        return result
+            return {"data": rows, "meta": meta}
 
     def execute(
         self,
@@ -240,7 +253,17 @@ class NativeDriverReader(Reader[SqlQuery]):
 
         return self.__transform_result(
             self.__client.execute(
-                query.format_sql(), with_column_types=True, settings=settings, **kwargs
+                query.format_sql(),
+                with_column_types=True,
+                columnar=True,
+                settings=settings,
+                **kwargs,
             ),
             with_totals=with_totals,
         )
+
+    def cancel(self, query_id: str) -> None:
+        # Read-only users can still kill their own queries.
+        self.__client.execute(
+            "KILL QUERY WHERE query_id = %(query_id)s ASYNC", {"query_id": query_id}
+        )
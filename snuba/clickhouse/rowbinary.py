@@ -0,0 +1,361 @@
+import calendar
+import ipaddress
+import re
+import struct
+import uuid
+from datetime import date, datetime
+from itertools import chain
+from typing import Any, Callable, List, Optional, Sequence, Tuple, cast
+
+from snuba.clickhouse import DATETIME_FORMAT
+from snuba.clickhouse.columns import (
+    UUID,
+    Array,
+    ColumnSet,
+    ColumnType,
+    Date,
+    DateTime,
+    Enum,
+    FixedString,
+    Float,
+    IPv4,
+    IPv6,
+    LowCardinality,
+    Materialized,
+    Nullable,
+    String,
+    UInt,
+    WithCodecs,
+    WithDefault,
+)
+from snuba.utils.codecs import Encoder
+from snuba.writer import WriterTableRow
+
+
+RowBinaryRow = bytes  # a single row in RowBinary format
+
+ValueEncoder = Callable[[Any], bytes]
+
+EPOCH = date(1970, 1, 1)
+EPOCH_DATETIME = datetime(1970, 1, 1)
+
+NULL_MARKER = b"\x01"
+NOT_NULL_MARKER = b"\x00"
+
+UINT_FORMATS = {8: "<B", 16: "<H", 32: "<I", 64: "<Q"}
+FLOAT_FORMATS = {32: "<f", 64: "<d"}
+
+STRING_LITERAL_RE = re.compile(r"^'((?:[^'\\]|\\.)*)'$")
+
+
+def encode_varint(value: int) -> bytes:
+    """
+    Encodes an unsigned integer as LEB128, which is what ClickHouse uses
+    to prefix the length of strings and arrays.
+    """
+    if value < 0x80:
+        return SMALL_VARINTS[value]
+
+    buffer = bytearray()
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+    return bytes(buffer)
+
+
+# Most strings and arrays are short enough to have a single byte length.
+SMALL_VARINTS = [bytes((i,)) for i in range(0x80)]
+SMALL_VARINT_CHARS = [chr(i) for i in range(0x80)]
+
+
+def _encode_string(value: Any) -> bytes:
+    if value.__class__ is str:
+        encoded = value.encode("utf-8")
+    elif isinstance(value, bytes):
+        encoded = value
+    else:
+        encoded = str(value).encode("utf-8")
+
+    size = len(encoded)
+    return (SMALL_VARINTS[size] if size < 0x80 else encode_varint(size)) + encoded
+
+
+def _build_fixed_string_encoder(length: int) -> ValueEncoder:
+    def encode(value: Any) -> bytes:
+        encoded = value if isinstance(value, bytes) else str(value).encode("utf-8")
+        if len(encoded) > length:
+            raise ValueError(f"value too long for FixedString({length})")
+        return encoded.ljust(length, b"\x00")
+
+    return encode
+
+
+def _build_struct_encoder(fmt: str, convert: Callable[[Any], Any]) -> ValueEncoder:
+    pack = struct.Struct(fmt).pack
+
+    def encode(value: Any) -> bytes:
+        return pack(convert(value))
+
+    return encode
+
+
+def _build_number_encoder(fmt: str, convert: Callable[[Any], Any]) -> ValueEncoder:
+    pack = struct.Struct(fmt).pack
+
+    def encode(value: Any) -> bytes:
+        # Values are almost always of the right type already.
+        try:
+            return pack(value)
+        except struct.error:
+            return pack(convert(value))
+
+    return encode
+
+
+def _encode_uuid(value: Any) -> bytes:
+    if not isinstance(value, uuid.UUID):
+        value = uuid.UUID(value)
+    # ClickHouse stores UUIDs as two little endian UInt64 (high bits first.)
+    raw = value.bytes
+    return raw[7::-1] + raw[:7:-1]
+
+
+def _encode_ipv4(value: Any) -> bytes:
+    return struct.pack("<I", int(ipaddress.IPv4Address(value)))
+
+
+def _encode_ipv6(value: Any) -> bytes:
+    return ipaddress.IPv6Address(value).packed
+
+
+def _to_timestamp(value: Any) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            # Naive datetimes are always UTC in Snuba, which is also what the
+            # JSON writer relies on when it formats them without a timezone.
+            delta = value - EPOCH_DATETIME
+            return delta.days * 86400 + delta.seconds
+        return int(value.timestamp())
+    elif isinstance(value, str):
+        return calendar.timegm(datetime.strptime(value, DATETIME_FORMAT).timetuple())
+    else:
+        return int(value)
+
+
+def _to_days(value: Any) -> int:
+    if isinstance(value, datetime):
+        return (value.date() - EPOCH).days
+    elif isinstance(value, date):
+        return (value - EPOCH).days
+    else:
+        return _to_timestamp(value) // 86400
+
+
+def _build_enum_encoder(values: Sequence[Tuple[str, int]]) -> ValueEncoder:
+    # ClickHouse picks Enum8 for `Enum` when all the values fit into an Int8.
+    fmt = "<b" if all(-128 <= value <= 127 for _, value in values) else "<h"
+    pack = struct.Struct(fmt).pack
+    lookup = {name: pack(value) for name, value in values}
+
+    def encode(value: Any) -> bytes:
+        try:
+            return lookup[value]
+        except KeyError:
+            return pack(int(value))
+
+    return encode
+
+
+def _build_array_encoder(inner: ValueEncoder) -> ValueEncoder:
+    def encode(value: Any) -> bytes:
+        return encode_varint(len(value)) + b"".join([inner(item) for item in value])
+
+    return encode
+
+
+def _build_nullable_array_encoder(inner: ValueEncoder) -> ValueEncoder:
+    # Saves a function call per item compared to an array of nullable values.
+    def encode(value: Any) -> bytes:
+        return encode_varint(len(value)) + b"".join(
+            [
+                NULL_MARKER if item is None else NOT_NULL_MARKER + inner(item)
+                for item in value
+            ]
+        )
+
+    return encode
+
+
+def _encode_string_array(value: Any) -> bytes:
+    # Arrays of strings are the bulk of most rows (tags, contexts, modules.)
+    # When all the items are short ASCII strings, their length prefixes are
+    # ASCII characters as well, so the whole array can be built and encoded
+    # in one go without looping over the items in Python.
+    try:
+        text = "".join(
+            chain.from_iterable(
+                zip(map(SMALL_VARINT_CHARS.__getitem__, map(len, value)), value)
+            )
+        )
+    except (TypeError, IndexError):
+        text = None
+
+    if text is not None and text.isascii():
+        body = text.encode("ascii")
+    else:
+        body = b"".join([_encode_string(item) for item in value])
+    return encode_varint(len(value)) + body
+
+
+def _build_nullable_encoder(inner: ValueEncoder) -> ValueEncoder:
+    def encode(value: Any) -> bytes:
+        if value is None:
+            return NULL_MARKER
+        return NOT_NULL_MARKER + inner(value)
+
+    return encode
+
+
+def build_value_encoder(column_type: ColumnType) -> ValueEncoder:
+    """
+    Returns a function that serializes a single (non null unless the type is
+    Nullable) value of the provided type in RowBinary format.
+    """
+    if isinstance(column_type, (WithCodecs, WithDefault, LowCardinality)):
+        # LowCardinality is transparent for RowBinary input.
+        return build_value_encoder(column_type.inner_type)
+    elif isinstance(column_type, Nullable):
+        return _build_nullable_encoder(build_value_encoder(column_type.inner_type))
+    elif isinstance(column_type, Array):
+        if isinstance(column_type.inner_type, Nullable):
+            return _build_nullable_array_encoder(
+                build_value_encoder(column_type.inner_type.inner_type)
+            )
+        inner = build_value_encoder(column_type.inner_type)
+        if inner is _encode_string:
+            return _encode_string_array
+        return _build_array_encoder(inner)
+    elif isinstance(column_type, String):
+        return _encode_string
+    elif isinstance(column_type, FixedString):
+        return _build_fixed_string_encoder(column_type.length)
+    elif isinstance(column_type, UInt):
+        return _build_number_encoder(UINT_FORMATS[column_type.size], int)
+    elif isinstance(column_type, Float):
+        return _build_number_encoder(FLOAT_FORMATS[column_type.size], float)
+    elif isinstance(column_type, DateTime):
+        return _build_struct_encoder("<I", _to_timestamp)
+    elif isinstance(column_type, Date):
+        return _build_struct_encoder("<H", _to_days)
+    elif isinstance(column_type, UUID):
+        return _encode_uuid
+    elif isinstance(column_type, IPv4):
+        return _encode_ipv4
+    elif isinstance(column_type, IPv6):
+        return _encode_ipv6
+    elif isinstance(column_type, Enum):
+        return _build_enum_encoder(column_type.values)
+    else:
+        raise TypeError(f"{column_type!r} is not supported by RowBinary")
+
+
+def _parse_default_literal(expression: str) -> Any:
+    match = STRING_LITERAL_RE.match(expression.strip())
+    if match is not None:
+        return re.sub(r"\\(.)", r"\1", match.group(1))
+
+    for convert in (int, float):
+        try:
+            return convert(expression)
+        except ValueError:
+            pass
+
+    raise ValueError(expression)
+
+
+def _get_type_default(column_type: ColumnType) -> Any:
+    if isinstance(column_type, (WithCodecs, LowCardinality)):
+        return _get_type_default(column_type.inner_type)
+    elif isinstance(column_type, Nullable):
+        return None
+    elif isinstance(column_type, Array):
+        return []
+    elif isinstance(column_type, (String, FixedString)):
+        return ""
+    elif isinstance(column_type, UUID):
+        return uuid.UUID(int=0)
+    elif isinstance(column_type, Enum):
+        # ClickHouse sorts enum values, the default is the lowest one.
+        return min(column_type.values, key=lambda item: item[1])[0]
+    else:
+        return 0
+
+
+def build_default_value(column_type: ColumnType) -> Optional[bytes]:
+    """
+    Returns the encoded value ClickHouse would use for a column that is
+    omitted (or null) in a JSONEachRow insert, or None if the column has a
+    default expression that cannot be evaluated on the client.
+    """
+    if isinstance(column_type, WithCodecs):
+        return build_default_value(column_type.inner_type)
+    elif isinstance(column_type, WithDefault):
+        try:
+            value = _parse_default_literal(column_type.default)
+        except ValueError:
+            return None
+    else:
+        value = _get_type_default(column_type)
+
+    return build_value_encoder(column_type)(value)
+
+
+class RowBinaryEncoder(Encoder[RowBinaryRow, WriterTableRow]):
+    """
+    Encodes rows in the ClickHouse RowBinary format. Since RowBinary has no
+    field names, the encoder is driven by the writable columns of a storage:
+    every row is serialized with all the columns returned by
+    `get_column_names` in that order. Materialized columns are skipped since
+    ClickHouse does not accept values for them.
+    """
+
+    def __init__(self, columns: ColumnSet) -> None:
+        self.__columns = columns
+        writable = [
+            column
+            for column in columns
+            if Materialized not in column.type.get_all_modifiers()
+        ]
+        self.__names = [column.flattened for column in writable]
+        self.__fields = list(
+            zip(
+                [build_value_encoder(column.type) for column in writable],
+                [build_default_value(column.type) for column in writable],
+            )
+        )
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # The field encoders are closures, so this is rebuilt from the columns
+        # when it is sent to a subprocess.
+        return type(self), (self.__columns,)
+
+    def get_column_names(self) -> Sequence[str]:
+        return self.__names
+
+    def encode(self, value: WriterTableRow) -> RowBinaryRow:
+        chunks = [
+            encode(field) if field is not None else default
+            for field, (encode, default) in zip(
+                map(value.get, self.__names), self.__fields
+            )
+        ]
+        try:
+            # Fields without a value nor a default are left as None and make
+            # the join fail, which is cheaper than checking every field.
+            return b"".join(cast(List[bytes], chunks))
+        except TypeError:
+            name = self.__names[chunks.index(None)]
+            raise ValueError(
+                f"column {name} has no value and its default cannot be encoded"
+            )
@@ -16,7 +16,12 @@ from typing import (
 
 from snuba import settings
 from snuba.clickhouse.escaping import escape_string
-from snuba.clickhouse.http import HTTPBatchWriter, JSONRow
+from snuba.clickhouse.http import (
+    HTTPBatchWriter,
+    HTTPCompression,
+    InsertFormat,
+    JSONRow,
+)
 from snuba.clickhouse.native import ClickhousePool, NativeDriverReader
 from snuba.clickhouse.sql import SqlQuery
 from snuba.clusters.storage_sets import StorageSetKey
@@ -112,6 +117,8 @@ class Cluster(ABC, Generic[TQuery, TWriterOptions]):
         metrics: MetricsBackend,
         options: TWriterOptions,
         chunk_size: Optional[int],
+        insert_format: InsertFormat = InsertFormat.JSON_EACH_ROW,
+        columns: Optional[Sequence[str]] = None,
     ) -> BatchWriter[JSONRow]:
         raise NotImplementedError
 
@@ -151,6 +158,7 @@ class ClickhouseCluster(Cluster[SqlQuery, ClickhouseWriterOptions]):
         # The cluster name and distributed cluster name only apply if single_node is set to False
         cluster_name: Optional[str] = None,
         distributed_cluster_name: Optional[str] = None,
+        http_compression: HTTPCompression = HTTPCompression.NONE,
     ):
         super().__init__(storage_sets)
         self.__query_node = ClickhouseNode(host, port)
@@ -161,6 +169,7 @@ class ClickhouseCluster(Cluster[SqlQuery, ClickhouseWriterOptions]):
         self.__single_node = single_node
         self.__cluster_name = cluster_name
         self.__distributed_cluster_name = distributed_cluster_name
+        self.__http_compression = http_compression
         self.__reader: Optional[Reader[SqlQuery]] = None
         self.__connection_cache: MutableMapping[
             Tuple[ClickhouseNode, ClickhouseClientSettings], ClickhousePool
@@ -220,6 +229,8 @@ class ClickhouseCluster(Cluster[SqlQuery, ClickhouseWriterOptions]):
         metrics: MetricsBackend,
         options: ClickhouseWriterOptions,
         chunk_size: Optional[int],
+        insert_format: InsertFormat = InsertFormat.JSON_EACH_ROW,
+        columns: Optional[Sequence[str]] = None,
     ) -> BatchWriter[JSONRow]:
         return HTTPBatchWriter(
             table_name,
@@ -231,6 +242,9 @@ class ClickhouseCluster(Cluster[SqlQuery, ClickhouseWriterOptions]):
             metrics=metrics,
             options=options,
             chunk_size=chunk_size,
+            insert_format=insert_format,
+            columns=columns,
+            compression=self.__http_compression,
         )
 
     def is_single_node(self) -> bool:
@@ -284,6 +298,9 @@ CLUSTERS = [
         distributed_cluster_name=cluster["distributed_cluster_name"]
         if "distributed_cluster_name" in cluster
         else None,
+        http_compression=HTTPCompression(
+            cluster.get("http_compression", HTTPCompression.NONE.value)
+        ),
     )
     for cluster in settings.CLUSTERS
 ]
@@ -2,6 +2,7 @@ import functools
 import itertools
 import logging
 import time
+from concurrent.futures import Future
 from datetime import datetime
 from pickle import PickleBuffer
 from typing import (
@@ -27,6 +28,8 @@ from snuba.processor import (
     ProcessedMessage,
     ReplacementBatch,
 )
+from snuba.utils.codecs import Encoder
+from snuba.utils.concurrent import execute
 from snuba.utils.metrics import MetricsBackend
 from snuba.utils.metrics.wrapper import MetricsWrapper
 from snuba.utils.streams import Message, Partition, Topic
@@ -40,6 +43,8 @@ from snuba.utils.streams.processing.strategies import (
 )
 from snuba.utils.streams.processing.strategies.batching import AbstractBatchWorker
 from snuba.utils.streams.processing.strategies.streaming import (
+    BatchSizePolicy,
+    BatchStep,
     CollectStep,
     FilterStep,
     ParallelTransformStep,
@@ -78,7 +83,7 @@ class ConsumerWorker(AbstractBatchWorker[KafkaPayload, ProcessedMessage]):
             table_writer.get_batch_writer(
                 metrics, {"load_balancing": "in_order", "insert_distributed_sync": 1}
             ),
-            JSONRowEncoder(),
+            table_writer.get_row_encoder(),
         )
 
         self.__processor: MessageProcessor
@@ -109,6 +114,34 @@ class ConsumerWorker(AbstractBatchWorker[KafkaPayload, ProcessedMessage]):
             ),
         )
 
+    def process_messages(
+        self, messages: Sequence[Message[KafkaPayload]]
+    ) -> Sequence[Optional[ProcessedMessage]]:
+        results: MutableSequence[Optional[ProcessedMessage]] = [None] * len(messages)
+
+        indices = [
+            i
+            for i, message in enumerate(messages)
+            if not (self.__pre_filter and self.__pre_filter.should_drop(message))
+        ]
+        processed = self._get_processor().process_batch(
+            [
+                (
+                    rapidjson.loads(messages[i].payload.value),
+                    KafkaMessageMetadata(
+                        offset=messages[i].offset,
+                        partition=messages[i].partition.index,
+                        timestamp=messages[i].timestamp,
+                    ),
+                )
+                for i in indices
+            ]
+        )
+        for i, result in zip(indices, processed):
+            results[i] = result
+
+        return results
+
     def delivery_callback(self, error, message):
         if error is not None:
             # errors are KafkaError objects and inherit from BaseException
@@ -158,11 +191,31 @@ class JSONRowInsertBatch(NamedTuple):
 
 
 class InsertBatchWriter(ProcessingStep[JSONRowInsertBatch]):
-    def __init__(self, writer: BatchWriter[JSONRow], metrics: MetricsBackend) -> None:
+    """
+    Writes the rows of all the batches submitted to it once it is closed.
+
+    If ``background`` is set the write happens in a background thread while
+    the caller continues, and ``join`` waits for the write to be completed
+    (raising any error that occurred during the write.)
+
+    If a ``batch_size_policy`` is provided, the size, latency and lag of
+    every write is recorded so the policy can adjust the following batches.
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter[JSONRow],
+        metrics: MetricsBackend,
+        background: bool = False,
+        batch_size_policy: Optional[BatchSizePolicy] = None,
+    ) -> None:
         self.__writer = writer
         self.__metrics = metrics
+        self.__background = background
+        self.__batch_size_policy = batch_size_policy
 
         self.__messages: MutableSequence[Message[JSONRowInsertBatch]] = []
+        self.__future: Optional[Future[None]] = None
         self.__closed = False
 
     def poll(self) -> None:
@@ -173,12 +226,7 @@ class InsertBatchWriter(ProcessingStep[JSONRowInsertBatch]):
 
         self.__messages.append(message)
 
-    def close(self) -> None:
-        self.__closed = True
-
-        if not self.__messages:
-            return
-
+    def __write(self) -> None:
         write_start = time.time()
         self.__writer.write(
             itertools.chain.from_iterable(
@@ -199,11 +247,42 @@ class InsertBatchWriter(ProcessingStep[JSONRowInsertBatch]):
             self.__writer,
         )
 
+        if self.__batch_size_policy is not None:
+            self.__batch_size_policy.record_batch(
+                len(self.__messages),
+                sum(
+                    len(row)
+                    for message in self.__messages
+                    for row in message.payload.rows
+                ),
+                write_finish - write_start,
+                write_finish - self.__messages[-1].timestamp.timestamp(),
+            )
+
+    def close(self) -> None:
+        self.__closed = True
+
+        if not self.__messages:
+            return
+
+        if self.__background:
+            self.__future = execute(self.__write, name="insert-batch-writer")
+        else:
+            self.__write()
+
     def terminate(self) -> None:
         self.__closed = True
 
+    def done(self) -> bool:
+        """
+        Returns whether the rows have been written (or the write failed),
+        without waiting for a write in progress.
+        """
+        return self.__closed and (self.__future is None or self.__future.done())
+
     def join(self, timeout: Optional[float] = None) -> None:
-        pass
+        if self.__future is not None:
+            self.__future.result(timeout)
 
 
 class ReplacementBatchWriter(ProcessingStep[ReplacementBatch]):
@@ -264,7 +343,7 @@ class ReplacementBatchWriter(ProcessingStep[ReplacementBatch]):
 
 
 class ProcessedMessageBatchWriter(
-    ProcessingStep[Union[None, JSONRowInsertBatch, ReplacementBatch]]
+    BatchStep[Union[None, JSONRowInsertBatch, ReplacementBatch]]
 ):
     def __init__(
         self,
@@ -309,9 +388,6 @@ class ProcessedMessageBatchWriter(
 
         self.__insert_batch_writer.close()
 
-        if self.__replacement_batch_writer is not None:
-            self.__replacement_batch_writer.close()
-
     def terminate(self) -> None:
         self.__closed = True
 
@@ -320,11 +396,20 @@ class ProcessedMessageBatchWriter(
         if self.__replacement_batch_writer is not None:
             self.__replacement_batch_writer.terminate()
 
+    def done(self) -> bool:
+        # The replacements are only produced once this step is joined.
+        return self.__insert_batch_writer.done()
+
     def join(self, timeout: Optional[float] = None) -> None:
         start = time.time()
         self.__insert_batch_writer.join(timeout)
 
         if self.__replacement_batch_writer is not None:
+            # Replacements are only produced once the inserts they may depend
+            # on have been written, since the insert can be still in progress
+            # after this step has been closed.
+            self.__replacement_batch_writer.close()
+
             if timeout is not None:
                 timeout = max(timeout - (time.time() - start), 0)
 
@@ -334,8 +419,20 @@ class ProcessedMessageBatchWriter(
 json_row_encoder = JSONRowEncoder()
 
 
+def encode_processed_message(
+    result: Optional[ProcessedMessage],
+    encoder: Encoder[JSONRow, WriterTableRow] = json_row_encoder,
+) -> Union[None, JSONRowInsertBatch, ReplacementBatch]:
+    if isinstance(result, InsertBatch):
+        return JSONRowInsertBatch([encoder.encode(row) for row in result.rows])
+    else:
+        return result
+
+
 def process_message(
-    processor: MessageProcessor, message: Message[KafkaPayload]
+    processor: MessageProcessor,
+    message: Message[KafkaPayload],
+    encoder: Encoder[JSONRow, WriterTableRow] = json_row_encoder,
 ) -> Union[None, JSONRowInsertBatch, ReplacementBatch]:
     result = processor.process_message(
         rapidjson.loads(message.payload.value),
@@ -344,10 +441,31 @@ def process_message(
         ),
     )
 
-    if isinstance(result, InsertBatch):
-        return JSONRowInsertBatch([json_row_encoder.encode(row) for row in result.rows])
-    else:
-        return result
+    return encode_processed_message(result, encoder)
+
+
+def process_message_batch(
+    processor: MessageProcessor,
+    messages: Sequence[Message[KafkaPayload]],
+    encoder: Encoder[JSONRow, WriterTableRow] = json_row_encoder,
+) -> Sequence[Union[None, JSONRowInsertBatch, ReplacementBatch]]:
+    """
+    Equivalent to calling ``process_message`` on each message, but all of
+    the messages are handed to the processor at once.
+    """
+    results = processor.process_batch(
+        [
+            (
+                rapidjson.loads(message.payload.value),
+                KafkaMessageMetadata(
+                    message.offset, message.partition.index, message.timestamp
+                ),
+            )
+            for message in messages
+        ]
+    )
+
+    return [encode_processed_message(result, encoder) for result in results]
 
 
 class StreamingConsumerStrategyFactory(ProcessingStrategyFactory[KafkaPayload]):
@@ -364,14 +482,20 @@ class StreamingConsumerStrategyFactory(ProcessingStrategyFactory[KafkaPayload]):
         output_block_size: Optional[int],
         replacements_producer: Optional[ConfluentKafkaProducer] = None,
         replacements_topic: Optional[Topic] = None,
+        encoder: Encoder[JSONRow, WriterTableRow] = json_row_encoder,
+        max_pending_batches: int = 0,
+        batch_size_policy: Optional[BatchSizePolicy] = None,
     ) -> None:
         self.__prefilter = prefilter
         self.__processor = processor
         self.__writer = writer
+        self.__encoder = encoder
         self.__metrics = metrics
 
         self.__max_batch_size = max_batch_size
         self.__max_batch_time = max_batch_time
+        self.__max_pending_batches = max_pending_batches
+        self.__batch_size_policy = batch_size_policy
 
         if processes is not None:
             assert input_block_size is not None, "input block size required"
@@ -399,7 +523,10 @@ class StreamingConsumerStrategyFactory(ProcessingStrategyFactory[KafkaPayload]):
 
     def __build_write_step(self) -> ProcessedMessageBatchWriter:
         insert_batch_writer = InsertBatchWriter(
-            self.__writer, MetricsWrapper(self.__metrics, "insertions")
+            self.__writer,
+            MetricsWrapper(self.__metrics, "insertions"),
+            background=self.__max_pending_batches > 0,
+            batch_size_policy=self.__batch_size_policy,
         )
 
         replacement_batch_writer: Optional[ReplacementBatchWriter]
@@ -424,13 +551,22 @@ class StreamingConsumerStrategyFactory(ProcessingStrategyFactory[KafkaPayload]):
             commit,
             self.__max_batch_size,
             self.__max_batch_time,
+            self.__max_pending_batches,
+            self.__batch_size_policy,
         )
 
-        transform_function = functools.partial(process_message, self.__processor)
+        transform_function = functools.partial(
+            process_message, self.__processor, encoder=self.__encoder
+        )
+        batch_transform_function = functools.partial(
+            process_message_batch, self.__processor, encoder=self.__encoder
+        )
 
         strategy: ProcessingStrategy[KafkaPayload]
         if self.__processes is None:
-            strategy = TransformStep(transform_function, collect)
+            strategy = TransformStep(
+                transform_function, collect, batch_function=batch_transform_function
+            )
         else:
             assert self.__input_block_size is not None
             assert self.__output_block_size is not None
@@ -443,6 +579,8 @@ class StreamingConsumerStrategyFactory(ProcessingStrategyFactory[KafkaPayload]):
                 input_block_size=self.__input_block_size,
                 output_block_size=self.__output_block_size,
                 metrics=MetricsWrapper(self.__metrics, "process"),
+                batch_size_policy=self.__batch_size_policy,
+                batch_function=batch_transform_function,
             )
 
         if self.__prefilter is not None:
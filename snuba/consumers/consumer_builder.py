@@ -3,7 +3,7 @@ from typing import Optional, Sequence
 
 from confluent_kafka import KafkaError, KafkaException, Producer
 
-from snuba import environment
+from snuba import environment, settings
 from snuba.consumer import ConsumerWorker, StreamingConsumerStrategyFactory
 from snuba.consumers.snapshot_worker import SnapshotAwareWorker
 from snuba.datasets.storages import StorageKey
@@ -25,6 +25,10 @@ from snuba.utils.streams.processing.strategies import ProcessingStrategyFactory
 from snuba.utils.streams.processing.strategies.batching import (
     BatchProcessingStrategyFactory,
 )
+from snuba.utils.streams.processing.strategies.streaming import (
+    AdaptiveBatchSizePolicy,
+    BatchSizePolicy,
+)
 from snuba.utils.streams.profiler import ProcessingStrategyProfilerWrapperFactory
 
 
@@ -55,8 +59,14 @@ class ConsumerBuilder:
         processes: Optional[int],
         input_block_size: Optional[int],
         output_block_size: Optional[int],
+        max_pending_batches: int = 0,
         commit_retry_policy: Optional[RetryPolicy] = None,
         profile_path: Optional[str] = None,
+        adaptive_batching: bool = False,
+        min_batch_size: int = settings.DEFAULT_MIN_BATCH_SIZE,
+        min_batch_time_ms: int = settings.DEFAULT_MIN_BATCH_TIME_MS,
+        max_batch_bytes: int = settings.DEFAULT_MAX_BATCH_BYTES,
+        max_poll_batch_size: int = 1,
     ) -> None:
         self.storage = get_writable_storage(storage_key)
         self.bootstrap_servers = bootstrap_servers
@@ -115,6 +125,12 @@ class ConsumerBuilder:
         self.processes = processes
         self.input_block_size = input_block_size
         self.output_block_size = output_block_size
+        self.max_pending_batches = max_pending_batches
+        self.adaptive_batching = adaptive_batching
+        self.min_batch_size = min_batch_size
+        self.min_batch_time_ms = min_batch_time_ms
+        self.max_batch_bytes = max_batch_bytes
+        self.max_poll_batch_size = max_poll_batch_size
         self.__profile_path = profile_path
 
         if (
@@ -125,6 +141,22 @@ class ConsumerBuilder:
                 "process count can only be specified when using streaming strategy"
             )
 
+        if (
+            self.max_pending_batches
+            and self.strategy_factory_type is not StrategyFactoryType.STREAMING
+        ):
+            raise ValueError(
+                "pending batches can only be specified when using streaming strategy"
+            )
+
+        if (
+            self.adaptive_batching
+            and self.strategy_factory_type is not StrategyFactoryType.STREAMING
+        ):
+            raise ValueError(
+                "adaptive batching can only be used with the streaming strategy"
+            )
+
         if commit_retry_policy is None:
             commit_retry_policy = BasicRetryPolicy(
                 3,
@@ -168,6 +200,7 @@ class ConsumerBuilder:
             self.raw_topic,
             strategy_factory,
             recoverable_errors=[TransportError],
+            max_poll_batch_size=self.max_poll_batch_size,
         )
 
     def __build_batching_strategy_factory(
@@ -188,6 +221,19 @@ class ConsumerBuilder:
     def __build_streaming_strategy_factory(self) -> StreamingConsumerStrategyFactory:
         table_writer = self.storage.get_table_writer()
         stream_loader = table_writer.get_stream_loader()
+
+        batch_size_policy: Optional[BatchSizePolicy] = None
+        if self.adaptive_batching:
+            batch_size_policy = AdaptiveBatchSizePolicy(
+                min_batch_size=min(self.min_batch_size, self.max_batch_size),
+                max_batch_size=self.max_batch_size,
+                min_batch_time=min(self.min_batch_time_ms, self.max_batch_time_ms)
+                / 1000.0,
+                max_batch_time=self.max_batch_time_ms / 1000.0,
+                max_batch_bytes=self.max_batch_bytes,
+                metrics=MetricsWrapper(self.metrics, "batching"),
+            )
+
         return StreamingConsumerStrategyFactory(
             stream_loader.get_pre_filter(),
             stream_loader.get_processor(),
@@ -205,6 +251,9 @@ class ConsumerBuilder:
                 self.producer if self.replacements_topic is not None else None
             ),
             replacements_topic=self.replacements_topic,
+            encoder=table_writer.get_row_encoder(),
+            max_pending_batches=self.max_pending_batches,
+            batch_size_policy=batch_size_policy,
         )
 
     def build_base_consumer(self) -> StreamProcessor[KafkaPayload]:
@@ -19,16 +19,13 @@ logger = logging.getLogger(__name__)
 class ErrorsProcessor(EventsProcessorBase):
     def __init__(self, promoted_tag_columns: Mapping[str, str]):
         self._promoted_tag_columns = promoted_tag_columns
+        self.__promoted_tag_items = [*promoted_tag_columns.items()]
 
     def extract_promoted_tags(
         self, output: MutableMapping[str, Any], tags: Mapping[str, Any],
     ) -> None:
-        output.update(
-            {
-                col_name: _unicodify(tags.get(tag_name, None))
-                for tag_name, col_name in self._promoted_tag_columns.items()
-            }
-        )
+        for tag_name, col_name in self.__promoted_tag_items:
+            output[col_name] = _unicodify(tags.get(tag_name))
 
     def _should_process(self, event: InsertEvent) -> bool:
         return event["data"].get("type") != "transaction"
@@ -1,10 +1,24 @@
 import logging
 import time
+import uuid
 
-from collections import deque
+from collections import OrderedDict, deque
 from datetime import datetime
 from enum import Enum
-from typing import Any, Deque, Mapping, Optional, Sequence, Tuple
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Hashable,
+    List,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from snuba import settings
 from snuba.clickhouse import DATETIME_FORMAT
@@ -25,6 +39,12 @@ logger = logging.getLogger(__name__)
 EXCLUDE_GROUPS = object()
 NEEDS_FINAL = object()
 
+# The condition on the time of the replacement in the queries of the
+# replacements that exclude groups. It is replaced when these replacements are
+# coalesced (see ``coalesce_replacements``).
+RECEIVED_CONDITION = "AND received <= CAST('%(timestamp)s' AS DateTime)"
+COALESCED_RECEIVED_CONDITION = "AND (%(received_conditions)s)"
+
 """
 Disambiguate the dataset/storage when there are multiple tables representing errors
 that perform event replacements.
@@ -43,6 +63,10 @@ def get_project_exclude_groups_key(
     return f"project_exclude_groups:{f'{state_name.value}:' if state_name else ''}{project_id}"
 
 
+def get_replacements_version_key(state_name: Optional[ReplacerState]) -> str:
+    return f"project_replacements_version{f':{state_name.value}' if state_name else ''}"
+
+
 def set_project_exclude_groups(
     project_id: int, group_ids: Sequence[int], state_name: Optional[ReplacerState]
 ) -> None:
@@ -57,8 +81,10 @@ def set_project_exclude_groups(
     p.zadd(key, **{str(group_id): now for group_id in group_ids})
     p.zremrangebyscore(key, -1, now - settings.REPLACER_KEY_TTL)
     p.expire(key, int(settings.REPLACER_KEY_TTL))
+    p.set(get_replacements_version_key(state_name), uuid.uuid4().hex)
 
     p.execute()
+    query_flags_cache.invalidate()
 
 
 def get_project_needs_final_key(
@@ -70,11 +96,157 @@ def get_project_needs_final_key(
 def set_project_needs_final(
     project_id: int, state_name: Optional[ReplacerState]
 ) -> Optional[bool]:
-    return redis_client.set(
+    p = redis_client.pipeline()
+
+    p.set(
         get_project_needs_final_key(project_id, state_name),
         True,
         ex=settings.REPLACER_KEY_TTL,
     )
+    p.set(get_replacements_version_key(state_name), uuid.uuid4().hex)
+
+    result: Optional[bool] = p.execute()[0]
+    query_flags_cache.invalidate()
+    return result
+
+
+class ProjectQueryFlags(NamedTuple):
+    version: Optional[bytes]
+    fetched_at: float
+    needs_final: bool
+    # The time each group was excluded at.
+    exclude_groups: Mapping[int, float]
+
+
+class QueryFlagsCache:
+    """
+    Keeps the query flags of the most recently queried projects in the
+    memory of this process, so that queries do not need to fetch them from
+    Redis every time.
+
+    The replacer replaces the version of the flags (per replacer state) every
+    time it changes them. The version is checked at most once every
+    ``check_interval`` seconds, and the flags of a project are fetched again
+    when the version changed or when they are older than ``max_age`` seconds.
+    Since the flags are set before the replacement queries start, a short
+    check interval mostly overlaps with the time it takes to run them.
+    """
+
+    def __init__(
+        self,
+        check_interval: float,
+        max_age: float,
+        max_size: int,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.__check_interval = check_interval
+        self.__max_age = max_age
+        self.__max_size = max_size
+        self.__clock = clock
+
+        self.__lock = Lock()
+        self.__versions: MutableMapping[
+            Optional[ReplacerState], Tuple[float, Optional[bytes]]
+        ] = {}
+        self.__flags: OrderedDict[
+            Tuple[Optional[ReplacerState], int], ProjectQueryFlags
+        ] = OrderedDict()
+
+    def __get_version(
+        self, state_name: Optional[ReplacerState], now: float
+    ) -> Optional[bytes]:
+        with self.__lock:
+            checked = self.__versions.get(state_name)
+        if checked is not None and now <= checked[0] + self.__check_interval:
+            return checked[1]
+
+        version = redis_client.get(get_replacements_version_key(state_name))
+        with self.__lock:
+            self.__versions[state_name] = (now, version)
+        return version
+
+    def __fetch(
+        self,
+        project_ids: Sequence[int],
+        state_name: Optional[ReplacerState],
+        version: Optional[bytes],
+        now: float,
+    ) -> Sequence[ProjectQueryFlags]:
+        p = redis_client.pipeline()
+
+        for project_id in project_ids:
+            p.get(get_project_needs_final_key(project_id, state_name))
+        for project_id in project_ids:
+            # Expired groups are removed by the replacer when it sets new
+            # ones, so they are only filtered out here.
+            p.zrangebyscore(
+                get_project_exclude_groups_key(project_id, state_name),
+                now - settings.REPLACER_KEY_TTL,
+                float("inf"),
+                withscores=True,
+            )
+
+        results = p.execute()
+
+        return [
+            ProjectQueryFlags(
+                version,
+                now,
+                bool(needs_final),
+                {int(group_id): score for group_id, score in exclude_groups},
+            )
+            for needs_final, exclude_groups in zip(
+                results[: len(project_ids)], results[len(project_ids) :]
+            )
+        ]
+
+    def get(
+        self, project_ids: Sequence[int], state_name: Optional[ReplacerState]
+    ) -> Sequence[ProjectQueryFlags]:
+        now = self.__clock()
+        version = self.__get_version(state_name, now)
+
+        flags: List[ProjectQueryFlags] = []
+        missing: List[int] = []
+        with self.__lock:
+            for project_id in project_ids:
+                key = (state_name, project_id)
+                project_flags = self.__flags.get(key)
+                if (
+                    project_flags is not None
+                    and project_flags.version == version
+                    and now <= project_flags.fetched_at + self.__max_age
+                ):
+                    self.__flags.move_to_end(key)
+                    flags.append(project_flags)
+                else:
+                    missing.append(project_id)
+
+        if missing:
+            fetched = self.__fetch(missing, state_name, version, now)
+            flags.extend(fetched)
+            with self.__lock:
+                for project_id, project_flags in zip(missing, fetched):
+                    self.__flags[(state_name, project_id)] = project_flags
+                    self.__flags.move_to_end((state_name, project_id))
+                while len(self.__flags) > self.__max_size:
+                    self.__flags.popitem(last=False)
+
+        return flags
+
+    def invalidate(self) -> None:
+        """
+        Checks the version of the flags on the next access.
+        """
+        with self.__lock:
+            self.__versions.clear()
+
+
+query_flags_cache = QueryFlagsCache(
+    settings.REPLACER_QUERY_FLAGS_CHECK_INTERVAL,
+    settings.REPLACER_QUERY_FLAGS_MAX_AGE,
+    settings.REPLACER_QUERY_FLAGS_CACHE_SIZE,
+)
 
 
 def get_projects_query_flags(
@@ -83,39 +255,24 @@ def get_projects_query_flags(
     """\
     1. Fetch `needs_final` for each Project
     2. Fetch groups to exclude for each Project
-    3. Trim groups to exclude ZSET for each Project
+
+    The flags are served from the memory of this process when they did not
+    change (see ``QueryFlagsCache``).
 
     Returns (needs_final, group_ids_to_exclude)
     """
 
-    s_project_ids = set(project_ids)
-    now = time.time()
-    p = redis_client.pipeline()
-
-    needs_final_keys = [
-        get_project_needs_final_key(project_id, state_name)
-        for project_id in s_project_ids
-    ]
-    for needs_final_key in needs_final_keys:
-        p.get(needs_final_key)
-
-    exclude_groups_keys = [
-        get_project_exclude_groups_key(project_id, state_name)
-        for project_id in s_project_ids
-    ]
-    for exclude_groups_key in exclude_groups_keys:
-        p.zremrangebyscore(
-            exclude_groups_key, float("-inf"), now - settings.REPLACER_KEY_TTL
-        )
-        p.zrevrangebyscore(
-            exclude_groups_key, float("inf"), now - settings.REPLACER_KEY_TTL
-        )
+    min_score = time.time() - settings.REPLACER_KEY_TTL
+    flags = query_flags_cache.get(sorted(set(project_ids)), state_name)
 
-    results = p.execute()
-
-    needs_final = any(results[: len(s_project_ids)])
+    needs_final = any(project_flags.needs_final for project_flags in flags)
     exclude_groups = sorted(
-        {int(group_id) for group_id in sum(results[(len(s_project_ids) + 1) :: 2], [])}
+        {
+            group_id
+            for project_flags in flags
+            for group_id, score in project_flags.exclude_groups.items()
+            if score >= min_score
+        }
     )
 
     return (needs_final, exclude_groups)
@@ -196,6 +353,139 @@ class ErrorsReplacer(ReplacerProcessor):
 
         return False
 
+    def get_partition_key(self, replacement: Replacement) -> Optional[Hashable]:
+        # Replacements never affect the rows of more than one project.
+        project_id: int = replacement.query_time_flags[1]
+        return project_id
+
+    def coalesce_replacements(
+        self, replacements: Sequence[Replacement]
+    ) -> Sequence[Replacement]:
+        return coalesce_replacements(replacements)
+
+
+def _get_group_ids_arg(replacement: Replacement) -> Optional[str]:
+    """
+    Returns the query argument holding the ids of the groups a group
+    deletion or merge applies to, or None for any other replacement.
+    """
+    if replacement.query_time_flags[0] is not EXCLUDE_GROUPS:
+        return None
+    for arg in ("group_ids", "previous_group_ids"):
+        if arg in replacement.query_args:
+            return arg
+    return None
+
+
+def _can_coalesce(first: Replacement, replacement: Replacement) -> bool:
+    """
+    Group deletions or merges (to the same group) of the same project only
+    differ by the groups and the time they apply to.
+    """
+    arg = _get_group_ids_arg(first)
+    if arg is None or _get_group_ids_arg(replacement) != arg:
+        return False
+
+    def get_other_args(replacement: Replacement) -> Mapping[str, Any]:
+        return {
+            key: value
+            for key, value in replacement.query_args.items()
+            if key not in (arg, "timestamp")
+        }
+
+    return (
+        replacement.count_query_template == first.count_query_template
+        and replacement.insert_query_template == first.insert_query_template
+        and replacement.query_time_flags[1] == first.query_time_flags[1]
+        and get_other_args(replacement) == get_other_args(first)
+    )
+
+
+def _coalesce(replacements: Sequence[Replacement]) -> Replacement:
+    first = replacements[0]
+    if len(replacements) == 1:
+        return first
+
+    arg = _get_group_ids_arg(first)
+    assert arg is not None
+
+    group_ids_by_timestamp: MutableMapping[str, List[int]] = {}
+    for replacement in replacements:
+        group_ids_by_timestamp.setdefault(
+            replacement.query_args["timestamp"], []
+        ).extend(replacement.query_time_flags[2])
+    group_ids = list(
+        dict.fromkeys(
+            group_id
+            for replacement in replacements
+            for group_id in replacement.query_time_flags[2]
+        )
+    )
+
+    count_query_template = first.count_query_template
+    insert_query_template = first.insert_query_template
+    query_args = {
+        **first.query_args,
+        arg: ", ".join(str(gid) for gid in group_ids),
+    }
+
+    if len(group_ids_by_timestamp) > 1:
+        # Every group is only replaced up to the time of its own replacement.
+        assert RECEIVED_CONDITION in count_query_template
+        assert RECEIVED_CONDITION in insert_query_template
+        count_query_template = count_query_template.replace(
+            RECEIVED_CONDITION, COALESCED_RECEIVED_CONDITION
+        )
+        insert_query_template = insert_query_template.replace(
+            RECEIVED_CONDITION, COALESCED_RECEIVED_CONDITION
+        )
+        query_args["received_conditions"] = " OR ".join(
+            "(group_id IN (%s) AND received <= CAST('%s' AS DateTime))"
+            % (", ".join(str(gid) for gid in timestamp_group_ids), timestamp)
+            for timestamp, timestamp_group_ids in group_ids_by_timestamp.items()
+        )
+
+    query_time_flags = (EXCLUDE_GROUPS, first.query_time_flags[1], group_ids)
+
+    return Replacement(
+        count_query_template, insert_query_template, query_args, query_time_flags
+    )
+
+
+def coalesce_replacements(replacements: Sequence[Replacement]) -> List[Replacement]:
+    """
+    Combines consecutive deletions of groups, or merges into the same group,
+    of a project into a single replacement, so that they only need one count
+    and one insert query. Running the combined replacement has the same
+    effect as running the original ones in order since each group is still
+    only replaced up to the time of its original replacement.
+    """
+    coalesced: List[Replacement] = []
+    pending: List[Replacement] = []
+    pending_group_ids = 0
+
+    for replacement in replacements:
+        group_ids = (
+            len(replacement.query_time_flags[2])
+            if _get_group_ids_arg(replacement) is not None
+            else 0
+        )
+        if pending and (
+            not _can_coalesce(pending[0], replacement)
+            or pending_group_ids + group_ids > settings.REPLACER_MAX_COALESCED_GROUP_IDS
+        ):
+            coalesced.append(_coalesce(pending))
+            pending = []
+            pending_group_ids = 0
+
+        pending.append(replacement)
+        pending_group_ids += group_ids
+
+    if pending:
+        coalesced.append(_coalesce(pending))
+
+    return coalesced
+
 
 def process_delete_groups(
     message: Mapping[str, Any], required_columns: Sequence[str]
@@ -208,10 +498,10 @@ def process_delete_groups(
     timestamp = datetime.strptime(message["datetime"], settings.PAYLOAD_DATETIME_FORMAT)
     select_columns = map(lambda i: i if i != "deleted" else "1", required_columns)
 
-    where = """\
+    where = f"""\
         PREWHERE group_id IN (%(group_ids)s)
         WHERE project_id = %(project_id)s
-        AND received <= CAST('%(timestamp)s' AS DateTime)
+        {RECEIVED_CONDITION}
         AND NOT deleted
     """
 
@@ -273,10 +563,10 @@ def process_merge(
         all_column_names,
     )
 
-    where = """\
+    where = f"""\
         PREWHERE group_id IN (%(previous_group_ids)s)
         WHERE project_id = %(project_id)s
-        AND received <= CAST('%(timestamp)s' AS DateTime)
+        {RECEIVED_CONDITION}
         AND NOT deleted
     """
 
@@ -20,16 +20,13 @@ logger = logging.getLogger("snuba.processor")
 class EventsProcessor(EventsProcessorBase):
     def __init__(self, promoted_tag_columns: ColumnSet):
         self._promoted_tag_columns = promoted_tag_columns
+        self.__promoted_tag_names = [col.name for col in promoted_tag_columns]
 
     def extract_promoted_tags(
         self, output: MutableMapping[str, Any], tags: Mapping[str, Any],
     ) -> None:
-        output.update(
-            {
-                col.name: _unicodify(tags.get(col.name, None))
-                for col in self._promoted_tag_columns
-            }
-        )
+        for name in self.__promoted_tag_names:
+            output[name] = _unicodify(tags.get(name))
 
     def _should_process(self, event: InsertEvent) -> bool:
         return True
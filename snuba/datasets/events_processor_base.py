@@ -1,7 +1,7 @@
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Any, Mapping, MutableMapping, Optional, Sequence
+from typing import Any, Mapping, MutableMapping, Optional, Sequence, Tuple
 
 from typing_extensions import TypedDict
 
@@ -59,6 +59,62 @@ class InsertEvent(TypedDict):
     retention_days: int
 
 
+class BatchLookups:
+    """
+    Values that are shared by all of the events processed as part of the
+    same batch, so that they only need to be computed once per batch.
+
+    The events of a batch generally come from a small number of projects
+    (and releases) and tend to share the same module lists and timestamps
+    (at second resolution), which are expensive to sanitize and parse.
+    """
+
+    def __init__(self) -> None:
+        self.__modules: MutableMapping[
+            Tuple[Tuple[Any, Any], ...], Tuple[Sequence[Optional[str]], Sequence[str]]
+        ] = {}
+        self.__datetimes: MutableMapping[str, datetime] = {}
+
+    def parse_datetime(self, value: str) -> datetime:
+        parsed = self.__datetimes.get(value)
+        if parsed is None:
+            parsed = self.__datetimes[value] = datetime.strptime(
+                value, settings.PAYLOAD_DATETIME_FORMAT
+            )
+        return parsed
+
+    def extract_modules(
+        self, modules: Mapping[Any, Any]
+    ) -> Tuple[Sequence[Optional[str]], Sequence[str]]:
+        # Only module lists where all versions are strings are shared, since
+        # versions of different types could compare as equal (``1 == 1.0``)
+        # or not be hashable at all.
+        if not all(type(version) is str for version in modules.values()):
+            return _extract_modules(modules)
+
+        key = tuple(modules.items())
+        result = self.__modules.get(key)
+        if result is None:
+            result = self.__modules[key] = _extract_modules(modules)
+
+        # The rows of the batch must not share mutable values.
+        names, versions = result
+        return [*names], [*versions]
+
+
+def _extract_modules(
+    modules: Mapping[Any, Any]
+) -> Tuple[Sequence[Optional[str]], Sequence[str]]:
+    module_names = []
+    module_versions = []
+    for name, version in modules.items():
+        module_names.append(_unicodify(name))
+        # Being extra careful about a stray (incorrect by spec) `null`
+        # value blowing up the write.
+        module_versions.append(_unicodify(version) or "")
+    return module_names, module_versions
+
+
 class EventsProcessorBase(MessageProcessor, ABC):
     """
     Base class for events and errors processors.
@@ -119,13 +175,18 @@ class EventsProcessorBase(MessageProcessor, ABC):
         raise NotImplementedError
 
     def extract_required(
-        self, output: MutableMapping[str, Any], event: InsertEvent,
+        self,
+        output: MutableMapping[str, Any],
+        event: InsertEvent,
+        lookups: Optional[BatchLookups] = None,
     ) -> None:
         output["group_id"] = event["group_id"] or 0
 
         # This is not ideal but it should never happen anyways
         timestamp = _ensure_valid_date(
-            datetime.strptime(event["datetime"], settings.PAYLOAD_DATETIME_FORMAT)
+            lookups.parse_datetime(event["datetime"])
+            if lookups is not None
+            else datetime.strptime(event["datetime"], settings.PAYLOAD_DATETIME_FORMAT)
         )
         if timestamp is None:
             timestamp = datetime.utcnow()
@@ -152,6 +213,20 @@ class EventsProcessorBase(MessageProcessor, ABC):
         Process a raw message into an insertion or replacement batch. Returns
         `None` if the event is too old to be written.
         """
+        return self.__process_message(message, metadata, None)
+
+    def process_batch(
+        self, messages: Sequence[Tuple[Any, KafkaMessageMetadata]]
+    ) -> Sequence[Optional[ProcessedMessage]]:
+        lookups = BatchLookups()
+        return [
+            self.__process_message(message, metadata, lookups)
+            for message, metadata in messages
+        ]
+
+    def __process_message(
+        self, message, metadata: KafkaMessageMetadata, lookups: Optional[BatchLookups],
+    ) -> Optional[ProcessedMessage]:
         version = message[0]
         if version != 2:
             raise InvalidMessageVersion(f"Unsupported message version: {version}")
@@ -160,7 +235,7 @@ class EventsProcessorBase(MessageProcessor, ABC):
         type_, event = message[1:3]
         if type_ == "insert":
             try:
-                row = self.process_insert(event, metadata)
+                row = self.process_insert(event, metadata, lookups)
             except EventTooOld:
                 return None
 
@@ -175,7 +250,10 @@ class EventsProcessorBase(MessageProcessor, ABC):
             raise InvalidMessageType(f"Invalid message type: {type_}")
 
     def process_insert(
-        self, event: InsertEvent, metadata: KafkaMessageMetadata
+        self,
+        event: InsertEvent,
+        metadata: KafkaMessageMetadata,
+        lookups: Optional[BatchLookups] = None,
     ) -> Optional[Mapping[str, Any]]:
         if not self._should_process(event):
             return None
@@ -185,17 +263,19 @@ class EventsProcessorBase(MessageProcessor, ABC):
         self._extract_event_id(processed, event)
         processed["retention_days"] = enforce_retention(
             event,
-            datetime.strptime(event["datetime"], settings.PAYLOAD_DATETIME_FORMAT),
+            lookups.parse_datetime(event["datetime"])
+            if lookups is not None
+            else datetime.strptime(event["datetime"], settings.PAYLOAD_DATETIME_FORMAT),
         )
 
-        self.extract_required(processed, event)
+        self.extract_required(processed, event, lookups)
 
         data = event.get("data", {})
         # HACK: https://sentry.io/sentry/snuba/issues/802102397/
         if not data:
             logger.error("No data for event: %s", event, exc_info=True)
             return None
-        self.extract_common(processed, event, metadata)
+        self.extract_common(processed, event, metadata, lookups)
         self.extract_custom(processed, event, metadata)
 
         sdk = data.get("sdk", None) or {}
@@ -232,6 +312,7 @@ class EventsProcessorBase(MessageProcessor, ABC):
         output: MutableMapping[str, Any],
         event: InsertEvent,
         metadata: KafkaMessageMetadata,
+        lookups: Optional[BatchLookups] = None,
     ) -> None:
         # Properties we get from the top level of the message payload
         output["platform"] = _unicodify(event["platform"])
@@ -250,15 +331,14 @@ class EventsProcessorBase(MessageProcessor, ABC):
         output["title"] = _unicodify(data.get("title", None))
         output["location"] = _unicodify(data.get("location", None))
 
-        module_names = []
-        module_versions = []
+        module_names: Sequence[Optional[str]] = []
+        module_versions: Sequence[str] = []
         modules = data.get("modules", {})
         if isinstance(modules, dict):
-            for name, version in modules.items():
-                module_names.append(_unicodify(name))
-                # Being extra careful about a stray (incorrect by spec) `null`
-                # value blowing up the write.
-                module_versions.append(_unicodify(version) or "")
+            if lookups is not None:
+                module_names, module_versions = lookups.extract_modules(modules)
+            else:
+                module_names, module_versions = _extract_modules(modules)
 
         output["modules.name"] = module_names
         output["modules.version"] = module_versions
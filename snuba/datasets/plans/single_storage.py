@@ -61,7 +61,10 @@ class SimpleQueryPlanExecutionStrategy(QueryPlanExecutionStrategy):
                     description=type(splitter).__name__, op="splitter"
                 ):
                     result = splitter.execute(
-                        query, request_settings, process_and_run_query
+                        query,
+                        request_settings,
+                        process_and_run_query,
+                        self.__cluster.get_reader().cancel,
                     )
                     if result is not None:
                         return result
@@ -6,6 +6,9 @@ from snuba.request.request_settings import RequestSettings
 from snuba.web import QueryResult
 
 SplitQueryRunner = Callable[[Query, RequestSettings], QueryResult]
+# Cancels a query started by the SplitQueryRunner with the query id provided
+# by the request settings (see ``CancellableRequestSettings``).
+QueryCanceller = Callable[[str], None]
 
 
 class QuerySplitStrategy(ABC):
@@ -29,12 +32,18 @@ class QuerySplitStrategy(ABC):
 
     @abstractmethod
     def execute(
-        self, query: Query, request_settings: RequestSettings, runner: SplitQueryRunner,
+        self,
+        query: Query,
+        request_settings: RequestSettings,
+        runner: SplitQueryRunner,
+        canceller: Optional[QueryCanceller] = None,
     ) -> Optional[QueryResult]:
         """
         Executes and/or splits the query provided, like the equivalent method in
         QueryPlanExecutionStrategy.
         Since not every split algorithm can work on every query, this method should
         return None when the query is not supported by this strategy.
+        The canceller, when provided, can be used to stop queries whose results
+        are not needed anymore.
         """
         raise NotImplementedError
@@ -25,6 +25,6 @@ class QueryTranslator:
         self.__expression_translator = SnubaClickhouseMappingTranslator(mappers)
 
     def translate(self, query: LogicalQuery) -> ClickhouseQuery:
-        translated = ClickhouseQuery(copy.deepcopy(query))
+        translated = ClickhouseQuery(copy.copy(query))
         translated.transform(self.__expression_translator)
         return translated
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from typing import NamedTuple, Optional, Sequence
 
+from snuba import settings
+from snuba.clickhouse.http import InsertFormat
 from snuba.clickhouse.processors import QueryProcessor
 from snuba.clickhouse.translators.snuba.mapping import TranslationMappers
 from snuba.clusters.cluster import (
@@ -141,6 +143,11 @@ class WritableTableStorage(ReadableTableStorage, WritableStorage):
             stream_loader=stream_loader,
             replacer_processor=replacer_processor,
             writer_options=writer_options,
+            insert_format=InsertFormat(
+                settings.WRITER_INSERT_FORMATS.get(
+                    storage_key.value, InsertFormat.JSON_EACH_ROW.value
+                )
+            ),
         )
 
     def get_table_writer(self) -> TableWriter:
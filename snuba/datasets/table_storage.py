@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from typing import Any, Mapping, Optional, Sequence
 
 from snuba import settings
-from snuba.clickhouse.http import JSONRow
+from snuba.clickhouse.http import InsertFormat, JSONRow, JSONRowEncoder
+from snuba.clickhouse.rowbinary import RowBinaryEncoder
 from snuba.clusters.cluster import (
     ClickhouseClientSettings,
     ClickhouseCluster,
@@ -15,9 +16,10 @@ from snuba.replacers.replacer_processor import ReplacerProcessor
 from snuba.snapshots import BulkLoadSource
 from snuba.snapshots.loaders import BulkLoader
 from snuba.snapshots.loaders.single_table import RowProcessor, SingleTableBulkLoader
+from snuba.utils.codecs import Encoder
 from snuba.utils.metrics import MetricsBackend
 from snuba.utils.streams.backends.kafka import KafkaPayload
-from snuba.writer import BatchWriter
+from snuba.writer import BatchWriter, WriterTableRow
 
 
 @dataclass(frozen=True)
@@ -118,16 +120,34 @@ class TableWriter:
         stream_loader: KafkaStreamLoader,
         replacer_processor: Optional[ReplacerProcessor] = None,
         writer_options: ClickhouseWriterOptions = None,
+        insert_format: InsertFormat = InsertFormat.JSON_EACH_ROW,
     ) -> None:
         self.__cluster = cluster
         self.__table_schema = write_schema
         self.__stream_loader = stream_loader
         self.__replacer_processor = replacer_processor
         self.__writer_options = writer_options
+        self.__insert_format = insert_format
+        self.__row_encoder: Optional[Encoder[JSONRow, WriterTableRow]] = None
 
     def get_schema(self) -> WritableTableSchema:
         return self.__table_schema
 
+    def get_insert_format(self) -> InsertFormat:
+        return self.__insert_format
+
+    def get_row_encoder(self) -> Encoder[JSONRow, WriterTableRow]:
+        """
+        Returns the encoder that turns processed rows into the bytes expected
+        by the writers returned by `get_batch_writer`.
+        """
+        if self.__row_encoder is None:
+            if self.__insert_format is InsertFormat.ROW_BINARY:
+                self.__row_encoder = RowBinaryEncoder(self.__table_schema.get_columns())
+            else:
+                self.__row_encoder = JSONRowEncoder()
+        return self.__row_encoder
+
     def get_batch_writer(
         self,
         metrics: MetricsBackend,
@@ -139,8 +159,19 @@ class TableWriter:
 
         options = self.__update_writer_options(options)
 
+        columns: Optional[Sequence[str]] = None
+        if self.__insert_format is InsertFormat.ROW_BINARY:
+            encoder = self.get_row_encoder()
+            assert isinstance(encoder, RowBinaryEncoder)
+            columns = encoder.get_column_names()
+
         return self.__cluster.get_batch_writer(
-            table_name, metrics, options, chunk_size=chunk_size,
+            table_name,
+            metrics,
+            options,
+            chunk_size=chunk_size,
+            insert_format=self.__insert_format,
+            columns=columns,
         )
 
     def get_bulk_loader(
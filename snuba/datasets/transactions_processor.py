@@ -1,7 +1,8 @@
 import logging
 import uuid
+from collections import defaultdict
 from datetime import datetime
-from typing import Any, MutableMapping, Optional
+from typing import Any, MutableMapping, Optional, Sequence, Tuple
 
 from sentry_relay.consts import SPAN_STATUS_NAME_TO_CODE
 
@@ -51,6 +52,30 @@ class TransactionsMessageProcessor(MessageProcessor):
         return (timestamp, milliseconds)
 
     def process_message(self, message, metadata) -> Optional[ProcessedMessage]:
+        counts: MutableMapping[str, int] = defaultdict(int)
+        result = self.__process_message(message, metadata, counts)
+        self.__record_counts(counts)
+        return result
+
+    def process_batch(
+        self, messages: Sequence[Tuple[Any, Any]]
+    ) -> Sequence[Optional[ProcessedMessage]]:
+        # The metrics of all the messages in the batch are recorded together.
+        counts: MutableMapping[str, int] = defaultdict(int)
+        results = [
+            self.__process_message(message, metadata, counts)
+            for message, metadata in messages
+        ]
+        self.__record_counts(counts)
+        return results
+
+    def __record_counts(self, counts: MutableMapping[str, int]) -> None:
+        for name, value in counts.items():
+            metrics.increment(name, value)
+
+    def __process_message(
+        self, message, metadata, counts: MutableMapping[str, int]
+    ) -> Optional[ProcessedMessage]:
         processed = {"deleted": 0}
         if not (isinstance(message, (list, tuple)) and len(message) >= 2):
             return None
@@ -94,7 +119,7 @@ class TransactionsMessageProcessor(MessageProcessor):
 
             if data["timestamp"] - data["start_timestamp"] < 0:
                 # Seems we have some negative durations in the DB
-                metrics.increment("negative_duration")
+                counts["negative_duration"] += 1
         except Exception:
             # all these fields are required but we saw some events go through here
             # in the past.  For now bail.
@@ -181,8 +206,8 @@ class TransactionsMessageProcessor(MessageProcessor):
         processed["sdk_version"] = _unicodify(sdk.get("version") or "")
 
         if processed["sdk_name"] == "":
-            metrics.increment("missing_sdk_name")
+            counts["missing_sdk_name"] += 1
         if processed["sdk_version"] == "":
-            metrics.increment("missing_sdk_version")
+            counts["missing_sdk_version"] += 1
 
         return InsertBatch([processed])
@@ -36,12 +36,22 @@ def get_messages(events_file) -> Sequence[Message[KafkaPayload]]:
     return messages
 
 
-def run(events_file, dataset, repeat=1, profile_process=False, profile_write=False):
+def run(
+    events_file,
+    dataset,
+    repeat=1,
+    profile_process=False,
+    profile_write=False,
+    batch_size=1000,
+):
     """
-    Measures the write performance of a dataset
+    Measures the write performance of a dataset, and the performance of
+    processing the same events in batches of ``batch_size`` events.
     """
 
-    from snuba.consumer import ConsumerWorker
+    import rapidjson
+
+    from snuba.consumer import ConsumerWorker, KafkaMessageMetadata
     from snuba.migrations.runner import Runner
 
     Runner().run_all(force=True)
@@ -50,8 +60,7 @@ def run(events_file, dataset, repeat=1, profile_process=False, profile_write=Fal
 
     consumer = ConsumerWorker(writable_storage, metrics=DummyMetricsBackend())
 
-    messages = get_messages(events_file)
-    messages = chain(*([messages] * repeat))
+    messages = [*chain(*([get_messages(events_file)] * repeat))]
     processed = []
 
     def process():
@@ -99,3 +108,41 @@ def run(events_file, dataset, repeat=1, profile_process=False, profile_write=Fal
     logger.info("Total write:      %sms" % format_time(time_to_write))
     logger.info("Process event:    %sms/ea" % format_time(time_to_process / num_events))
     logger.info("Write event:      %sms/ea" % format_time(time_to_write / num_events))
+
+    table_writer = writable_storage.get_table_writer()
+    processor = table_writer.get_stream_loader().get_processor()
+    pre_filter = table_writer.get_stream_loader().get_pre_filter()
+
+    def process_batches():
+        with settings_override({"DISCARD_OLD_EVENTS": False}):
+            for i in range(0, len(messages), batch_size):
+                processor.process_batch(
+                    [
+                        (
+                            rapidjson.loads(message.payload.value),
+                            KafkaMessageMetadata(
+                                message.offset,
+                                message.partition.index,
+                                message.timestamp,
+                            ),
+                        )
+                        for message in messages[i : i + batch_size]
+                        if pre_filter is None or not pre_filter.should_drop(message)
+                    ]
+                )
+
+    time_start = time.time()
+    process_batches()
+    time_to_process_batches = (time.time() - time_start) * 1000
+
+    logger.info(
+        "Process batch:    %sms/ea (batches of %s events)"
+        % (format_time(time_to_process_batches / num_events), batch_size)
+    )
+    logger.info(
+        "Process rate:     %sev/s" % format_time(len(messages) / time_to_process * 1000)
+    )
+    logger.info(
+        "Batch rate:       %sev/s"
+        % format_time(len(messages) / time_to_process_batches * 1000)
+    )
@@ -3,7 +3,7 @@ import re
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 from hashlib import md5
-from typing import Any, NamedTuple, Optional, Sequence, Union
+from typing import Any, NamedTuple, Optional, Sequence, Tuple, Union
 
 import simplejson as json
 
@@ -39,6 +39,20 @@ class MessageProcessor(ABC):
     def process_message(self, message, metadata) -> Optional[ProcessedMessage]:
         raise NotImplementedError
 
+    def process_batch(
+        self, messages: Sequence[Tuple[Any, Any]]
+    ) -> Sequence[Optional[ProcessedMessage]]:
+        """
+        Process a sequence of (message, metadata) pairs, returning the result
+        of each message in the same order as ``process_message`` would.
+
+        Processors can override this to share work between the messages of
+        a batch, by default each message is processed independently.
+        """
+        return [
+            self.process_message(message, metadata) for message, metadata in messages
+        ]
+
 
 class InvalidMessageType(Exception):
     pass
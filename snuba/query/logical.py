@@ -123,6 +123,7 @@ class Query:
         self.__final = False
         self.__data_source = data_source
         self.__prewhere_conditions: Sequence[Condition] = []
+        self.__ast_only = False
 
         self.__selected_columns = selected_columns or []
         self.__array_join = array_join
@@ -132,6 +133,21 @@ class Query:
         self.__having = having
         self.__order_by = order_by or []
 
+    def __copy__(self) -> Query:
+        """
+        Returns a copy of the query that is not affected by the changes made
+        to this query (and vice versa) without copying the whole tree.
+
+        The expressions are immutable and the query is only ever changed by
+        replacing its nodes, sequences and the values of the body (never by
+        modifying them in place), so the copy can share all of them with the
+        original query. Only the body itself needs to be copied.
+        """
+        query = type(self).__new__(type(self))
+        query.__dict__.update(self.__dict__)
+        query.__body = {**self.__body}
+        return query
+
     def get_all_expressions(self) -> Iterable[Expression]:
         """
         Returns an expression container that iterates over all the expressions
@@ -241,10 +257,28 @@ class Query:
     def set_data_source(self, data_source: RelationalSource) -> None:
         self.__data_source = data_source
 
+    def is_ast_only(self) -> bool:
+        return self.__ast_only
+
+    def set_ast_only(self) -> None:
+        """
+        Stops maintaining the legacy (body based) representation of the
+        selected columns, aggregations, conditions, group by, order by,
+        array join and pre where clauses: from now on the methods that
+        change them do nothing, so they keep the values they had when the
+        query was parsed, and processors can skip the work they only do on
+        the legacy representation. Only the AST is used to format the SQL.
+        """
+        self.__ast_only = True
+
+    def __set_legacy_field(self, field: str, value: Any) -> None:
+        if not self.__ast_only:
+            self.__body[field] = value
+
     def __extend_sequence(self, field: str, content: Sequence[TElement],) -> None:
-        if field not in self.__body:
-            self.__body[field] = []
-        self.__body[field].extend(content)
+        # The sequence is replaced rather than extended in place so that the
+        # copies of this query are not affected (see ``__copy__``).
+        self.__set_legacy_field(field, [*self.__body.get(field, []), *content])
 
     def get_selected_columns(self) -> Optional[Sequence[Any]]:
         return self.__body.get("selected_columns")
@@ -253,7 +287,7 @@ class Query:
         return self.__selected_columns
 
     def set_selected_columns(self, columns: Sequence[Any],) -> None:
-        self.__body["selected_columns"] = columns
+        self.__set_legacy_field("selected_columns", columns)
 
     def set_ast_selected_columns(
         self, selected_columns: Sequence[SelectedExpression]
@@ -264,7 +298,7 @@ class Query:
         return self.__body.get("aggregations")
 
     def set_aggregations(self, aggregations: Sequence[Aggregation],) -> None:
-        self.__body["aggregations"] = aggregations
+        self.__set_legacy_field("aggregations", aggregations)
 
     def get_groupby(self) -> Optional[Sequence[Groupby]]:
         return self.__body.get("groupby")
@@ -273,7 +307,7 @@ class Query:
         return self.__groupby
 
     def set_groupby(self, groupby: Sequence[Aggregation],) -> None:
-        self.__body["groupby"] = groupby
+        self.__set_legacy_field("groupby", groupby)
 
     def add_groupby(self, groupby: Sequence[Groupby],) -> None:
         self.__extend_sequence("groupby", groupby)
@@ -288,7 +322,7 @@ class Query:
         self.__condition = condition
 
     def set_conditions(self, conditions: Sequence[Condition]) -> None:
-        self.__body["conditions"] = conditions
+        self.__set_legacy_field("conditions", conditions)
 
     def add_conditions(self, conditions: Sequence[Condition],) -> None:
         self.__extend_sequence("conditions", conditions)
@@ -320,10 +354,11 @@ class Query:
         """
         Temporary method until pre where management is moved to Clickhouse query
         """
-        self.__prewhere_conditions = conditions
+        if not self.__ast_only:
+            self.__prewhere_conditions = conditions
 
     def set_arrayjoin(self, arrayjoin: str) -> None:
-        self.__body["arrayjoin"] = arrayjoin
+        self.__set_legacy_field("arrayjoin", arrayjoin)
 
     def get_arrayjoin(self) -> Optional[str]:
         return self.__body.get("arrayjoin", None)
@@ -347,7 +382,7 @@ class Query:
         return self.__order_by
 
     def set_orderby(self, orderby: Sequence[Any]) -> None:
-        self.__body["orderby"] = orderby
+        self.__set_legacy_field("orderby", orderby)
 
     def get_limitby(self) -> Optional[Limitby]:
         return self.__body.get("limitby")
@@ -54,9 +54,10 @@ class PrewhereProcessor(QueryProcessor):
         # interfere with each other since one depend on the legacy
         # representation and the other on the AST thus we can execute
         # the two independently.
-        LegacyPrewhereProcessor().process_query(
-            query, max_prewhere_conditions, prewhere_keys
-        )
+        if not query.is_ast_only():
+            LegacyPrewhereProcessor().process_query(
+                query, max_prewhere_conditions, prewhere_keys
+            )
         ASTPrewhereProcessor().process_query(
             query, max_prewhere_conditions, prewhere_keys
         )
@@ -118,6 +118,10 @@ class NestedFieldConditionOptimizer(QueryProcessor):
         return False
 
     def process_query(self, query: Query, request_settings: RequestSettings) -> None:
+        # This only rewrites the legacy conditions.
+        if query.is_ast_only():
+            return
+
         conditions = query.get_conditions()
         if not conditions:
             return
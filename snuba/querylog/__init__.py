@@ -1,3 +1,4 @@
+import random
 from typing import Optional
 
 from snuba import environment, settings, state
@@ -9,6 +10,21 @@ from snuba.utils.metrics.wrapper import MetricsWrapper
 metrics = MetricsWrapper(environment.metrics, "api")
 
 
+def _get_sample_rate(referrer: str) -> float:
+    """
+    Returns the fraction of the queries of a referrer that are recorded in
+    the query log. It is set with the ``querylog_sample_rate:<referrer>``
+    runtime config, and defaults to ``querylog_sample_rate`` (1 by default.)
+    """
+    for sample_rate in state.get_configs(
+        [(f"querylog_sample_rate:{referrer}", None), ("querylog_sample_rate", None)]
+    ):
+        if sample_rate is not None:
+            return float(sample_rate)
+
+    return 1.0
+
+
 def record_query(
     request: Request, timer: Timer, query_metadata: SnubaQueryMetadata
 ) -> None:
@@ -17,14 +33,15 @@ def record_query(
     we actually ran a query or not.
     """
     if settings.RECORD_QUERIES:
-        # Send to redis
-        # We convert this to a dict before passing it to state in order to avoid a
-        # circular dependency, where state would depend on the higher level
-        # QueryMetadata class
-        state.record_query(query_metadata.to_dict())
+        referrer = request.referrer or "none"
+        if random.random() < _get_sample_rate(referrer):
+            # Send to redis
+            # We convert this to a dict before passing it to state in order to avoid a
+            # circular dependency, where state would depend on the higher level
+            # QueryMetadata class
+            state.record_query(query_metadata.to_dict())
 
         final = str(request.query.get_final())
-        referrer = request.referrer or "none"
         timer.send_metrics_to(
             metrics,
             tags={
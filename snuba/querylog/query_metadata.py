@@ -10,6 +10,7 @@ class QueryStatus(Enum):
     SUCCESS = "success"
     ERROR = "error"  # A system error
     RATE_LIMITED = "rate-limited"
+    CANCELLED = "cancelled"
     INVALID_REQUEST = "invalid-request"
 
 
@@ -107,5 +108,12 @@ class SnubaQueryMetadata:
     @property
     def status(self) -> QueryStatus:
         # If we do not have any recorded query and we did not specifically log
-        # invalid_query, we assume there was an error somewhere.
-        return self.query_list[-1].status if self.query_list else QueryStatus.ERROR
+        # invalid_query, we assume there was an error somewhere. Queries that
+        # were cancelled because their results were not needed anymore do not
+        # affect the status of the request.
+        statuses = [
+            query.status
+            for query in self.query_list
+            if query.status != QueryStatus.CANCELLED
+        ]
+        return statuses[-1] if statuses else QueryStatus.ERROR
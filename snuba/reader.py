@@ -66,6 +66,36 @@ def transform_nullable(
     return transform_column
 
 
+def build_column_transformer(
+    column_transformations: Sequence[Tuple[Pattern[str], Callable[[Any], Any]]],
+) -> Callable[[str], Optional[Callable[[Any], Any]]]:
+    """
+    Builds and returns a function that returns the transformation function
+    that should be applied to the values of a column of the provided data
+    type, or ``None`` if the values of that type do not need to be
+    transformed.
+    """
+
+    def get_transformer(column_type: str) -> Optional[Callable[[Any], Any]]:
+        is_nullable, type = unwrap_nullable_type(column_type)
+
+        transformer = next(
+            (
+                transformer
+                for pattern, transformer in column_transformations
+                if pattern.match(type)
+            ),
+            None,
+        )
+
+        if transformer is not None and is_nullable:
+            transformer = transform_nullable(transformer)
+
+        return transformer
+
+    return get_transformer
+
+
 def build_result_transformer(
     column_transformations: Sequence[Tuple[Pattern[str], Callable[[Any], Any]]],
 ) -> Callable[[Result], None]:
@@ -74,26 +104,14 @@ def build_result_transformer(
     instance in-place by transforming all values for columns that have a
     transformation function specified for their data type.
     """
+    get_transformer = build_column_transformer(column_transformations)
 
     def transform_result(result: Result) -> None:
         for column in result["meta"]:
-            is_nullable, type = unwrap_nullable_type(column["type"])
-
-            transformer = next(
-                (
-                    transformer
-                    for pattern, transformer in column_transformations
-                    if pattern.match(type)
-                ),
-                None,
-            )
-
+            transformer = get_transformer(column["type"])
             if transformer is None:
                 continue
 
-            if is_nullable:
-                transformer = transform_nullable(transformer)
-
             name = column["name"]
             for row in iterate_rows(result):
                 row[name] = transformer(row[name])
@@ -114,3 +132,11 @@ class Reader(ABC, Generic[TQuery]):
     ) -> Result:
         """Execute a query."""
         raise NotImplementedError
+
+    @abstractmethod
+    def cancel(self, query_id: str) -> None:
+        """
+        Cancel a query that was executed with the ``query_id`` setting and
+        may still be running.
+        """
+        raise NotImplementedError
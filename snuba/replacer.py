@@ -2,8 +2,9 @@ import logging
 import time
 import simplejson as json
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Optional, Sequence
+from typing import Hashable, List, MutableMapping, Optional, Sequence
 
 from snuba.clusters.cluster import ClickhouseClientSettings
 from snuba.datasets.storage import WritableTableStorage
@@ -19,12 +20,25 @@ logger = logging.getLogger("snuba.replacer")
 
 
 class ReplacerWorker(AbstractBatchWorker[KafkaPayload, Replacement]):
-    def __init__(self, storage: WritableTableStorage, metrics: MetricsBackend) -> None:
+    """
+    Executes the replacements of a batch in order, after coalescing the
+    consecutive replacements that can run as a single query. If an executor
+    is provided, the replacements of different partitions (projects) are
+    executed concurrently.
+    """
+
+    def __init__(
+        self,
+        storage: WritableTableStorage,
+        metrics: MetricsBackend,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
         self.clickhouse = storage.get_cluster().get_query_connection(
             ClickhouseClientSettings.REPLACE
         )
 
         self.metrics = metrics
+        self.__executor = executor
         processor = storage.get_table_writer().get_replacer_processor()
         assert (
             processor
@@ -45,9 +59,9 @@ class ReplacerWorker(AbstractBatchWorker[KafkaPayload, Replacement]):
         else:
             raise InvalidMessageVersion("Unknown message format: " + str(seq_message))
 
-    def flush_batch(self, batch: Sequence[Replacement]) -> None:
+    def __execute(self, replacements: Sequence[Replacement]) -> bool:
         need_optimize = False
-        for replacement in batch:
+        for replacement in replacements:
             query_args = {
                 **replacement.query_args,
                 "dist_read_table_name": self.__replacer_processor.get_read_schema().get_table_name(),
@@ -75,6 +89,38 @@ class ReplacerWorker(AbstractBatchWorker[KafkaPayload, Replacement]):
             self.metrics.timing("replacements.count", count)
             self.metrics.timing("replacements.duration", duration)
 
+        return need_optimize
+
+    def flush_batch(self, batch: Sequence[Replacement]) -> None:
+        partitions: MutableMapping[Optional[Hashable], List[Replacement]] = {}
+        for replacement in batch:
+            partitions.setdefault(
+                self.__replacer_processor.get_partition_key(replacement), []
+            ).append(replacement)
+
+        replacements = [
+            self.__replacer_processor.coalesce_replacements(partition)
+            for partition in partitions.values()
+        ]
+        self.metrics.increment(
+            "replacements.coalesced",
+            len(batch) - sum(len(partition) for partition in replacements),
+        )
+
+        if self.__executor is None or len(replacements) <= 1:
+            need_optimize = any(
+                [self.__execute(partition) for partition in replacements]
+            )
+        else:
+            futures = [
+                self.__executor.submit(self.__execute, partition)
+                for partition in replacements
+            ]
+            # Wait for all the partitions before raising any error, so no
+            # replacement is still running when the batch is retried.
+            wait(futures)
+            need_optimize = any([future.result() for future in futures])
+
         if need_optimize:
             from snuba.optimize import run_optimize
 
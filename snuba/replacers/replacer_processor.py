@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Mapping, NamedTuple, Optional
+from typing import Any, Hashable, Mapping, NamedTuple, Optional, Sequence
 
 from snuba.datasets.schemas.tables import TableSchema, WritableTableSchema
 
@@ -51,6 +51,25 @@ class ReplacerProcessor(ABC):
     def get_read_schema(self) -> TableSchema:
         return self.__read_schema
 
+    def get_partition_key(self, replacement: Replacement) -> Optional[Hashable]:
+        """
+        Replacements with the same partition key are executed in the order
+        they were received. Replacements with different keys must not affect
+        the same rows, since they can be executed concurrently.
+        By default all the replacements are executed in order.
+        """
+        return None
+
+    def coalesce_replacements(
+        self, replacements: Sequence[Replacement]
+    ) -> Sequence[Replacement]:
+        """
+        Receives a sequence of replacements with the same partition key and
+        can combine consecutive replacements into a single one, when running
+        it has the same effect as running them in sequence.
+        """
+        return replacements
+
     def pre_replacement(self, replacement: Replacement, matching_records: int) -> bool:
         """
         Custom actions to run before the replacements when we already know how
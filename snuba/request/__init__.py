@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import copy
 from collections import ChainMap
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from deprecation import deprecated
 from typing import Any, Mapping
 
@@ -17,6 +18,13 @@ class Request:
     extensions: Mapping[str, Mapping[str, Any]]
     referrer: str
 
+    def __copy__(self) -> Request:
+        """
+        Returns a request with a copy of the query (see ``Query.__copy__``),
+        which can be processed without affecting this request.
+        """
+        return replace(self, query=copy.copy(self.query))
+
     @property
     @deprecated(
         details="Do not access the internal query representation "
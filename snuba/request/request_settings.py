@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 
-from typing import Sequence
+from typing import Optional, Sequence
 
 from snuba.state.rate_limit import get_global_rate_limit_params, RateLimitParameters
 
@@ -36,6 +36,13 @@ class RequestSettings(ABC):
     def add_rate_limit(self, rate_limit_param: RateLimitParameters) -> None:
         pass
 
+    def get_query_id(self) -> Optional[str]:
+        """
+        The id to run the query with on ClickHouse. It is only provided when
+        the query may need to be cancelled while it runs.
+        """
+        return None
+
 
 class HTTPRequestSettings(RequestSettings):
     """
@@ -88,3 +95,33 @@ class SubscriptionRequestSettings(RequestSettings):
 
     def add_rate_limit(self, rate_limit_param: RateLimitParameters) -> None:
         pass
+
+
+class CancellableRequestSettings(RequestSettings):
+    """
+    Settings to run one of the queries of a request with its own query id,
+    so that it can be cancelled while it runs. Everything else is delegated
+    to the settings of the request.
+    """
+
+    def __init__(self, request_settings: RequestSettings, query_id: str) -> None:
+        self.__request_settings = request_settings
+        self.__query_id = query_id
+
+    def get_turbo(self) -> bool:
+        return self.__request_settings.get_turbo()
+
+    def get_consistent(self) -> bool:
+        return self.__request_settings.get_consistent()
+
+    def get_debug(self) -> bool:
+        return self.__request_settings.get_debug()
+
+    def get_rate_limit_params(self) -> Sequence[RateLimitParameters]:
+        return self.__request_settings.get_rate_limit_params()
+
+    def add_rate_limit(self, rate_limit_param: RateLimitParameters) -> None:
+        self.__request_settings.add_rate_limit(rate_limit_param)
+
+    def get_query_id(self) -> Optional[str]:
+        return self.__query_id
@@ -2,17 +2,19 @@ from __future__ import annotations
 
 import itertools
 import uuid
-from typing import Any, Mapping, Type
+from typing import Any, Mapping, Optional, Type
 
 import jsonschema
 
-from snuba import environment
+from snuba import environment, settings
 from snuba.datasets.dataset import Dataset
 from snuba.query.extensions import QueryExtension
+from snuba.query.logical import Query
 from snuba.query.parser import parse_query
 from snuba.query.schema import GENERIC_QUERY_SCHEMA
 from snuba.request import Request
 from snuba.request.exceptions import JsonSchemaValidationException
+from snuba.request.shape_cache import ParsedQueryCache, get_query_shape_fingerprint
 from snuba.request.request_settings import (
     HTTPRequestSettings,
     RequestSettings,
@@ -23,6 +25,10 @@ from snuba.utils.metrics.wrapper import MetricsWrapper
 
 metrics = MetricsWrapper(environment.metrics, "parser")
 
+parsed_query_cache = ParsedQueryCache(
+    settings.QUERY_SHAPE_CACHE_SIZE, MetricsWrapper(metrics, "shape_cache")
+)
+
 
 class RequestSchema:
     def __init__(
@@ -73,6 +79,28 @@ class RequestSchema:
 
         self.__composite_schema["required"] = set(self.__composite_schema["required"])
 
+        # The schema of everything but the query, used to validate requests
+        # whose query was already validated and parsed before.
+        parameters_schemas = [
+            self.__settings_schema,
+            *self.__extension_schemas.values(),
+        ]
+        self.__parameters_schema = {
+            "type": "object",
+            "properties": {
+                property_name: property_schema
+                for schema in parameters_schemas
+                for property_name, property_schema in schema["properties"].items()
+            },
+            "required": {
+                property_name
+                for schema in parameters_schemas
+                for property_name in schema.get("required", [])
+            },
+            "definitions": self.__composite_schema["definitions"],
+            "additionalProperties": False,
+        }
+
     @classmethod
     def build_with_extensions(
         cls,
@@ -88,8 +116,30 @@ class RequestSchema:
         return cls(generic_schema, settings_schema, extensions_schemas, settings_class)
 
     def validate(self, value, dataset: Dataset, referrer: str) -> Request:
+        query_body = {
+            key: value[key]
+            for key in self.__query_schema["properties"].keys()
+            if key in value
+        }
+
+        fingerprint: Optional[str] = None
+        query: Optional[Query] = None
+        try:
+            fingerprint = get_query_shape_fingerprint(query_body)
+        except TypeError:
+            # Not serializable, this is left to the validation to reject.
+            pass
+        else:
+            query = parsed_query_cache.get(dataset, fingerprint)
+
         try:
-            value = validate_jsonschema(value, self.__composite_schema)
+            if query is None:
+                value = validate_jsonschema(value, self.__composite_schema)
+            else:
+                value = validate_jsonschema(
+                    {key: v for key, v in value.items() if key not in query_body},
+                    self.__parameters_schema,
+                )
         except jsonschema.ValidationError as error:
             raise JsonSchemaValidationException(str(error)) from error
 
@@ -98,7 +148,7 @@ class RequestSchema:
             for key in self.__query_schema["properties"].keys()
             if key in value
         }
-        settings = {
+        settings_values = {
             key: value.pop(key)
             for key in self.__settings_schema["properties"].keys()
             if key in value
@@ -112,11 +162,18 @@ class RequestSchema:
                 if key in value
             }
 
-        query = parse_query(query_body, dataset)
+        if query is None:
+            query = parse_query(query_body, dataset)
+            if fingerprint is not None:
+                parsed_query_cache.set(dataset, fingerprint, query)
 
         request_id = uuid.uuid4().hex
         return Request(
-            request_id, query, self.__setting_class(**settings), extensions, referrer
+            request_id,
+            query,
+            self.__setting_class(**settings_values),
+            extensions,
+            referrer,
         )
 
     def __generate_template_impl(self, schema) -> Any:
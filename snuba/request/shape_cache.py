@@ -0,0 +1,97 @@
+import copy
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Mapping, Optional, Tuple
+
+import simplejson as json
+
+from snuba.datasets.dataset import Dataset
+from snuba.query.logical import Query
+from snuba.state import get_config
+from snuba.utils.metrics import MetricsBackend
+
+
+def get_query_shape_fingerprint(query_body: Mapping[str, Any]) -> str:
+    """
+    Returns a fingerprint of the query part of a request body (everything
+    but the settings and the extensions, which carry the project ids and the
+    time range). Requests sent by the same dashboard widget or subscription
+    share the same fingerprint since they only differ by the values bound
+    through the extensions.
+    """
+    return hashlib.md5(
+        json.dumps(
+            [
+                query_body,
+                # The parser output depends on this setting, so a change of
+                # its value must not reuse the queries parsed before.
+                get_config("format_clickhouse_arrays", 1),
+            ],
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _copy_query(query: Query) -> Query:
+    """
+    Copies a freshly parsed query. Query processors never modify a query in
+    place (see ``Query.__copy__``), so the copy shares everything but the
+    body with the cached query.
+    """
+    return copy.copy(query)
+
+
+class ParsedQueryCache:
+    """
+    Keeps the queries parsed for the ``max_size`` most recently used query
+    shapes in the memory of this process, so that a request with a known
+    shape does not need to be validated and parsed again.
+
+    Only the output of the parser is cached: the query processors, the plan
+    and the formatted SQL depend on the values of the extensions (the time
+    range selects the table and the sampling rate, the projects decide which
+    replacements apply), so they still run on every request.
+
+    Every call to ``get`` returns a new copy of the query that can be
+    modified freely by the caller.
+    """
+
+    def __init__(self, max_size: int, metrics: MetricsBackend) -> None:
+        self.__max_size = max_size
+        self.__metrics = metrics
+
+        self.__lock = Lock()
+        self.__queries: OrderedDict[Tuple[Dataset, str], Query] = OrderedDict()
+
+    def get(self, dataset: Dataset, fingerprint: str) -> Optional[Query]:
+        if self.__max_size <= 0:
+            return None
+
+        key = (dataset, fingerprint)
+        with self.__lock:
+            query = self.__queries.get(key)
+            if query is not None:
+                self.__queries.move_to_end(key)
+
+        if query is None:
+            self.__metrics.increment("miss")
+            return None
+
+        self.__metrics.increment("hit")
+        return _copy_query(query)
+
+    def set(self, dataset: Dataset, fingerprint: str, query: Query) -> None:
+        """
+        Stores a query that was just returned by the parser. This needs to
+        happen before the query is processed any further.
+        """
+        if self.__max_size <= 0:
+            return
+
+        template = _copy_query(query)
+        with self.__lock:
+            self.__queries[(dataset, fingerprint)] = template
+            self.__queries.move_to_end((dataset, fingerprint))
+            while len(self.__queries) > self.__max_size:
+                self.__queries.popitem(last=False)
@@ -12,6 +12,9 @@ PORT = 1218
 
 DEFAULT_DATASET_NAME = "events"
 DISABLED_DATASETS: Set[str] = set()
+# Datasets whose queries are only processed on the AST, without maintaining
+# the legacy representation of the query.
+AST_ONLY_DATASETS: Set[str] = set()
 
 # Clickhouse Options
 CLICKHOUSE_MAX_POOL_SIZE = 25
@@ -24,6 +27,8 @@ CLUSTERS: Sequence[Mapping[str, Any]] = [
         "password": os.environ.get("CLICKHOUSE_PASSWORD", ""),
         "database": os.environ.get("CLICKHOUSE_DATABASE", "default"),
         "http_port": int(os.environ.get("CLICKHOUSE_HTTP_PORT", 8123)),
+        # Content-Encoding of insert bodies: none, gzip, deflate, lz4 or zstd
+        "http_compression": os.environ.get("CLICKHOUSE_HTTP_COMPRESSION", "none"),
         "storage_sets": {
             "events",
             "events_ro",
@@ -40,6 +45,10 @@ CLUSTERS: Sequence[Mapping[str, Any]] = [
 # Dogstatsd Options
 DOGSTATSD_HOST = "localhost"
 DOGSTATSD_PORT = 8125
+# Interval (in seconds) over which each process aggregates the metrics it
+# records before sending them, rather than sending a packet for every call.
+# 0 disables the aggregation.
+DOGSTATSD_AGGREGATION_INTERVAL = 0
 
 # Redis Options
 USE_REDIS_CLUSTER = False
@@ -50,13 +59,34 @@ REDIS_PASSWORD = None
 REDIS_DB = 1
 
 USE_RESULT_CACHE = True
+# Max total size (in bytes) of the encoded query results each process keeps
+# in memory in front of the Redis query cache. 0 disables the local cache.
+LOCAL_QUERY_CACHE_MAX_BYTES = 0
+# Store query results in the cache with the compact (columnar and compressed)
+# encoding. Results stored as JSON can always be read, but processes running
+# a release that predates the compact encoding cannot read it.
+QUERY_CACHE_BINARY_ENCODING = False
+
+# Number of query shapes (query bodies without the project ids and the time
+# range) whose parsed query each process keeps in memory. 0 disables it.
+QUERY_SHAPE_CACHE_SIZE = 1000
 
 # Query Recording Options
 RECORD_QUERIES = False
 QUERIES_TOPIC = "snuba-queries"
+# Queries are recorded from a background thread. Queries recorded while this
+# many queries are waiting to be recorded are dropped.
+RECORD_QUERIES_MAX_QUEUE_SIZE = 10000
+# Max number of queries recorded with a single Redis pipeline.
+RECORD_QUERIES_BATCH_SIZE = 100
 
 # Runtime Config Options
+# How often (in seconds) each process checks whether the runtime config has
+# changed, and the maximum age of its local copy of the config. The copy is
+# reloaded at least this often even without changes, in case the config was
+# changed by a process that does not update the config version.
 CONFIG_MEMOIZE_TIMEOUT = 10
+CONFIG_SNAPSHOT_MAX_AGE = 300
 
 # Sentry Options
 SENTRY_DSN = None
@@ -67,6 +97,9 @@ SNAPSHOT_LOAD_PRODUCT = "snuba"
 
 SNAPSHOT_CONTROL_TOPIC_INIT_TIMEOUT = 30
 BULK_CLICKHOUSE_BUFFER = 10000
+# The size, in bytes, of the ranges the snapshot tables are split into by the
+# parallel bulk load.
+BULK_LOAD_RANGE_SIZE = 16 * 1024 * 1024
 
 # Processor/Writer Options
 DEFAULT_BROKERS = ["localhost:9092"]
@@ -74,10 +107,18 @@ DEFAULT_STORAGE_BROKERS: Mapping[str, Sequence[str]] = {}
 
 DEFAULT_MAX_BATCH_SIZE = 50000
 DEFAULT_MAX_BATCH_TIME_MS = 2 * 1000
+# Lower bounds (and the byte limit) of the batches of consumers using
+# adaptive batching, where the limits above are used as upper bounds.
+DEFAULT_MIN_BATCH_SIZE = 1000
+DEFAULT_MIN_BATCH_TIME_MS = 200
+DEFAULT_MAX_BATCH_BYTES = 100 * 1024 * 1024
 DEFAULT_QUEUED_MAX_MESSAGE_KBYTES = 10000
 DEFAULT_QUEUED_MIN_MESSAGES = 10000
 DISCARD_OLD_EVENTS = True
 CLICKHOUSE_HTTP_CHUNK_SIZE = 8192
+# Input format used when writing each storage (storage key: "JSONEachRow" or
+# "RowBinary"). Storages that are not listed write JSONEachRow.
+WRITER_INSERT_FORMATS: Mapping[str, str] = {}
 
 DEFAULT_RETENTION_DAYS = 90
 RETENTION_OVERRIDES: Mapping[int, int] = {}
@@ -96,6 +137,15 @@ REPLACER_MAX_MEMORY_USAGE = 10 * (1024 ** 3)  # 10GB
 REPLACER_KEY_TTL = 12 * 60 * 60
 REPLACER_MAX_GROUP_IDS_TO_EXCLUDE = 256
 REPLACER_IMMEDIATE_OPTIMIZE = False
+# Maximum number of groups a single replacement query can apply to when
+# consecutive group replacements are coalesced.
+REPLACER_MAX_COALESCED_GROUP_IDS = 1000
+# How often (in seconds) queries check whether the replacer changed the query
+# flags (needs final, groups to exclude) of the projects, the maximum age of
+# the flags kept in memory, and the maximum number of projects kept.
+REPLACER_QUERY_FLAGS_CHECK_INTERVAL = 1
+REPLACER_QUERY_FLAGS_MAX_AGE = 60
+REPLACER_QUERY_FLAGS_CACHE_SIZE = 10000
 
 TURBO_SAMPLE_RATE = 0.1
 
@@ -111,6 +161,10 @@ AST_REFERRER_ROLLOUT: Mapping[
 COLUMN_SPLIT_MAX_LIMIT = 1000
 COLUMN_SPLIT_MAX_RESULTS = 5000
 
+# Maximum number of time split windows queried speculatively at the same time
+# by each API process.
+TIME_SPLIT_SPECULATIVE_WORKERS = 10
+
 # Migrations in skipped groups will not be run
 SKIPPED_MIGRATION_GROUPS: Set[str] = {"querylog", "spans_experimental"}
 
@@ -6,6 +6,7 @@ TESTING = True
 REDIS_DB = 2
 STATS_IN_RESPONSE = True
 CONFIG_MEMOIZE_TIMEOUT = 0
+REPLACER_QUERY_FLAGS_CHECK_INTERVAL = 0
 
 RECORD_QUERIES = True
 USE_RESULT_CACHE = True
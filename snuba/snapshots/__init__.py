@@ -36,6 +36,34 @@ class SnapshotDescriptor:
         raise ValueError(f"Table {table_name} does not exists in the snapshot")
 
 
+class TableRange(ABC):
+    """
+    A part of a table of a bulk load source that can be read independently
+    of the rest of the table. Ranges are read in other processes by the
+    parallel bulk loader, so implementations must be picklable.
+    """
+
+    @abstractmethod
+    def get_id(self) -> str:
+        """
+        Identifies the range within its table. The same source must always
+        split a table into ranges with the same ids so that an interrupted
+        load can be resumed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_size(self) -> int:
+        """
+        The size of the range in bytes.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def read(self) -> Iterable[SnapshotTableRow]:
+        raise NotImplementedError
+
+
 class BulkLoadSource(ABC):
     """
     Represent a source we can bulk load Snuba datasets from.
@@ -54,3 +82,11 @@ class BulkLoadSource(ABC):
         self, table: str
     ) -> Generator[Iterable[SnapshotTableRow], None, None]:
         raise NotImplementedError
+
+    @abstractmethod
+    def get_table_ranges(self, table: str, range_size: int) -> Sequence[TableRange]:
+        """
+        Splits a table into ranges of about ``range_size`` bytes that can be
+        read in parallel.
+        """
+        raise NotImplementedError
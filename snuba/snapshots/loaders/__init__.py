@@ -1,6 +1,9 @@
 from abc import ABC, abstractmethod
+from typing import Optional, Sequence
 
-from snuba.writer import BufferedWriterWrapper
+from snuba.clickhouse.http import JSONRow
+from snuba.utils.codecs import Encoder
+from snuba.writer import BatchWriter, BufferedWriterWrapper, WriterTableRow
 
 
 class BulkLoader(ABC):
@@ -15,3 +18,22 @@ class BulkLoader(ABC):
     @abstractmethod
     def load(self, writer: BufferedWriterWrapper) -> None:
         raise NotImplementedError
+
+    @abstractmethod
+    def load_parallel(
+        self,
+        writers: Sequence[BatchWriter[JSONRow]],
+        encoder: Encoder[JSONRow, WriterTableRow],
+        processes: int,
+        range_size: int,
+        checkpoint_path: Optional[str] = None,
+    ) -> None:
+        """
+        Loads the data by splitting the source into ranges of about
+        ``range_size`` bytes, which are processed and encoded by a pool of
+        ``processes`` processes and written concurrently by the ``writers``.
+
+        If a checkpoint path is provided, the ranges that were loaded are
+        recorded in that file and are skipped when the load is restarted.
+        """
+        raise NotImplementedError
@@ -1,14 +1,113 @@
+import json
 import logging
-from typing import Callable
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
+from multiprocessing import get_context
+from queue import Queue
+from typing import Any, Callable, MutableSet, Optional, Sequence, Set, Tuple
 
+from snuba.clickhouse.http import JSONRow
 from snuba.clickhouse.native import ClickhousePool
-from snuba.snapshots import BulkLoadSource, SnapshotTableRow
+from snuba.snapshots import BulkLoadSource, SnapshotId, SnapshotTableRow, TableRange
 from snuba.snapshots.loaders import BulkLoader
-from snuba.writer import BufferedWriterWrapper, WriterTableRow
+from snuba.utils.codecs import Encoder
+from snuba.writer import BatchWriter, BufferedWriterWrapper, WriterTableRow
 
 
 RowProcessor = Callable[[SnapshotTableRow], WriterTableRow]
 
+logger = logging.getLogger("snuba.bulk-loader")
+
+# How often, in seconds, the progress of a parallel load is logged.
+PROGRESS_INTERVAL = 10.0
+
+
+class BulkLoadCheckpoint:
+    """
+    Records the ranges of a table that were loaded in a file, so that an
+    interrupted load can be resumed without loading them again. The first
+    line of the file identifies the load, and the id of each range that is
+    loaded is appended to it on its own line.
+
+    A range is recorded once it has been written, so the ranges that were
+    being written when the load was interrupted are written again when it is
+    resumed. The rows of the CDC tables are deduplicated by ClickHouse when
+    parts are merged, so this does not introduce duplicates permanently.
+    """
+
+    def __init__(
+        self, path: str, snapshot_id: SnapshotId, table: str, range_size: int
+    ) -> None:
+        header = json.dumps(
+            {"snapshot_id": snapshot_id, "table": table, "range_size": range_size}
+        )
+        self.__completed: MutableSet[str] = set()
+
+        if os.path.exists(path):
+            with open(path, "r") as checkpoint_file:
+                lines = checkpoint_file.readlines()
+            if not lines or lines[0] != f"{header}\n":
+                raise ValueError(
+                    "The checkpoint %s was created by a different bulk load" % path
+                )
+            # The last line is incomplete if the load was interrupted while
+            # it was written, in which case it is truncated.
+            if not lines[-1].endswith("\n"):
+                lines.pop()
+                os.truncate(path, sum(len(line.encode("utf-8")) for line in lines))
+            self.__completed.update(line.rstrip("\n") for line in lines[1:])
+            self.__file = open(path, "a")
+        else:
+            self.__file = open(path, "w")
+            self.__file.write(f"{header}\n")
+        self.__file.flush()
+
+    def is_resuming(self) -> bool:
+        return len(self.__completed) > 0
+
+    def is_completed(self, table_range: TableRange) -> bool:
+        return table_range.get_id() in self.__completed
+
+    def add(self, table_range: TableRange) -> None:
+        self.__completed.add(table_range.get_id())
+        self.__file.write(f"{table_range.get_id()}\n")
+        self.__file.flush()
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+# The row processor and encoder used by the processes of a parallel load.
+# They are set when the processes are started rather than sent with each
+# range since row processors are generally not picklable.
+_row_processor: Optional[RowProcessor] = None
+_encoder: Optional[Encoder[JSONRow, WriterTableRow]] = None
+
+
+def _initialize_process(
+    row_processor: RowProcessor, encoder: Encoder[JSONRow, WriterTableRow]
+) -> None:
+    global _row_processor, _encoder
+    _row_processor = row_processor
+    _encoder = encoder
+
+
+def _process_range(table_range: TableRange,) -> Tuple[TableRange, Sequence[JSONRow]]:
+    assert _row_processor is not None and _encoder is not None
+    row_processor, encoder = _row_processor, _encoder
+    return (
+        table_range,
+        [encoder.encode(row_processor(row)) for row in table_range.read()],
+    )
+
 
 class SingleTableBulkLoader(BulkLoader):
     """
@@ -29,19 +128,23 @@ class SingleTableBulkLoader(BulkLoader):
         self.__row_processor = row_processor
         self.__clickhouse = clickhouse
 
-    def load(self, writer: BufferedWriterWrapper) -> None:
-        logger = logging.getLogger("snuba.bulk-loader")
-
+    def __check_destination(self, resuming: bool) -> None:
         clickhouse_tables = self.__clickhouse.execute("show tables")
         if (self.__dest_table,) not in clickhouse_tables:
             raise ValueError("Destination table %s does not exists" % self.__dest_table)
 
+        if resuming:
+            return
+
         table_content = self.__clickhouse.execute(
             "select count(*) from %s" % self.__dest_table
         )
         if table_content != [(0,)]:
             raise ValueError("Destination Table is not empty")
 
+    def load(self, writer: BufferedWriterWrapper) -> None:
+        self.__check_destination(resuming=False)
+
         descriptor = self.__source.get_descriptor()
         logger.info("Loading snapshot %s", descriptor.id)
 
@@ -54,3 +157,162 @@ class SingleTableBulkLoader(BulkLoader):
                     buffer_writer.write(clickhouse_data)
                     row_count += 1
             logger.info("Load complete %d records loaded", row_count)
+
+    def load_parallel(
+        self,
+        writers: Sequence[BatchWriter[JSONRow]],
+        encoder: Encoder[JSONRow, WriterTableRow],
+        processes: int,
+        range_size: int,
+        checkpoint_path: Optional[str] = None,
+    ) -> None:
+        assert processes > 0 and len(writers) > 0
+
+        descriptor = self.__source.get_descriptor()
+        checkpoint = (
+            BulkLoadCheckpoint(
+                checkpoint_path, descriptor.id, self.__source_table, range_size
+            )
+            if checkpoint_path is not None
+            else None
+        )
+        try:
+            self.__check_destination(
+                resuming=checkpoint is not None and checkpoint.is_resuming()
+            )
+            logger.info("Loading snapshot %s", descriptor.id)
+            self.__load_ranges(writers, encoder, processes, range_size, checkpoint)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    def __load_ranges(
+        self,
+        writers: Sequence[BatchWriter[JSONRow]],
+        encoder: Encoder[JSONRow, WriterTableRow],
+        processes: int,
+        range_size: int,
+        checkpoint: Optional[BulkLoadCheckpoint],
+    ) -> None:
+
+        ranges = self.__source.get_table_ranges(self.__source_table, range_size)
+        pending = [
+            table_range
+            for table_range in ranges
+            if checkpoint is None or not checkpoint.is_completed(table_range)
+        ]
+        total_bytes = sum(table_range.get_size() for table_range in pending)
+        logger.info(
+            "Loading table %s from %d ranges (%d bytes), %d ranges already loaded",
+            self.__source_table,
+            len(pending),
+            total_bytes,
+            len(ranges) - len(pending),
+        )
+
+        # Each writer is only used by one thread at a time.
+        available_writers: Queue[BatchWriter[JSONRow]] = Queue()
+        for writer in writers:
+            available_writers.put(writer)
+
+        def write(
+            table_range: TableRange, rows: Sequence[JSONRow]
+        ) -> Tuple[TableRange, int]:
+            writer = available_writers.get()
+            try:
+                writer.write(rows)
+            finally:
+                available_writers.put(writer)
+            return table_range, len(rows)
+
+        # Bounds the number of ranges held in memory, either while they are
+        # processed or while they wait for a writer.
+        max_in_flight = processes + len(writers) * 2
+        pending_ranges = iter(pending)
+        processing: Set[Future[Tuple[TableRange, Sequence[JSONRow]]]] = set()
+        writing: Set[Future[Tuple[TableRange, int]]] = set()
+
+        loaded_ranges = 0
+        loaded_rows = 0
+        loaded_bytes = 0
+        start = last_report = time.time()
+
+        # The processes are forked (rather than spawned) so that the row
+        # processor does not need to be picklable. They are all started by
+        # the first submission, before the writer threads are.
+        with ProcessPoolExecutor(
+            processes,
+            mp_context=get_context("fork"),
+            initializer=_initialize_process,
+            initargs=(self.__row_processor, encoder),
+        ) as process_executor, ThreadPoolExecutor(len(writers)) as write_executor:
+
+            def submit() -> None:
+                for table_range in islice(
+                    pending_ranges, max_in_flight - len(processing) - len(writing)
+                ):
+                    processing.add(process_executor.submit(_process_range, table_range))
+
+            submit()
+            while processing or writing:
+                in_flight: Set[Future[Any]] = {*processing, *writing}
+                done, _ = wait(
+                    in_flight, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future in processing:
+                        processing.remove(future)
+                        table_range, rows = future.result()
+                        writing.add(write_executor.submit(write, table_range, rows))
+                    else:
+                        writing.remove(future)
+                        table_range, row_count = future.result()
+                        if checkpoint is not None:
+                            checkpoint.add(table_range)
+                        loaded_ranges += 1
+                        loaded_rows += row_count
+                        loaded_bytes += table_range.get_size()
+
+                submit()
+
+                now = time.time()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    self.__log_progress(
+                        loaded_ranges,
+                        len(pending),
+                        loaded_rows,
+                        loaded_bytes,
+                        total_bytes,
+                        now - start,
+                    )
+
+        self.__log_progress(
+            loaded_ranges,
+            len(pending),
+            loaded_rows,
+            loaded_bytes,
+            total_bytes,
+            time.time() - start,
+        )
+        logger.info("Load complete %d records loaded", loaded_rows)
+
+    def __log_progress(
+        self,
+        loaded_ranges: int,
+        total_ranges: int,
+        loaded_rows: int,
+        loaded_bytes: int,
+        total_bytes: int,
+        duration: float,
+    ) -> None:
+        duration = max(duration, 0.001)
+        logger.info(
+            "Loaded %d of %d ranges (%.1f%%), %d records at %.0f records/s, %.1f MB/s",
+            loaded_ranges,
+            total_ranges,
+            loaded_bytes / total_bytes * 100 if total_bytes else 100.0,
+            loaded_rows,
+            loaded_rows / duration,
+            loaded_bytes / duration / 1000000,
+        )
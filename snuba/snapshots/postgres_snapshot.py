@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import csv
+import io
 import jsonschema
 import json
 import logging
@@ -8,13 +9,16 @@ import os.path
 
 from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import NewType, Generator, Iterable, Sequence
+from typing import NewType, Generator, Iterable, MutableSequence, Sequence
 
 from snuba.snapshots import SnapshotDescriptor, TableConfig
-from snuba.snapshots import BulkLoadSource, SnapshotTableRow
+from snuba.snapshots import BulkLoadSource, SnapshotTableRow, TableRange
 
 Xid = NewType("Xid", int)
 
+# The size of the blocks read when splitting a table file into ranges.
+SPLIT_BLOCK_SIZE = 1024 * 1024
+
 SNAPSHOT_METADATA_SCHEMA = {
     "type": "object",
     "properties": {
@@ -66,6 +70,33 @@ class PostgresSnapshotDescriptor(SnapshotDescriptor):
 logger = logging.getLogger("snuba.postgres-snapshot")
 
 
+@dataclass(frozen=True)
+class PostgresTableRange(TableRange):
+    """
+    A range of the CSV file of a table. It starts and ends at the boundaries
+    of records and does not contain the header.
+    """
+
+    path: str
+    columns: Sequence[str]
+    start: int  # inclusive
+    end: int  # exclusive
+
+    def get_id(self) -> str:
+        return f"{self.start}-{self.end}"
+
+    def get_size(self) -> int:
+        return self.end - self.start
+
+    def read(self) -> Iterable[SnapshotTableRow]:
+        with open(self.path, "rb") as table_file:
+            table_file.seek(self.start)
+            content = table_file.read(self.end - self.start)
+        return csv.DictReader(
+            io.StringIO(content.decode("utf-8"), newline=""), fieldnames=self.columns
+        )
+
+
 class PostgresSnapshot(BulkLoadSource):
     """
     TODO: Make this a library to be reused outside of Snuba when after this
@@ -116,40 +147,101 @@ class PostgresSnapshot(BulkLoadSource):
     def get_descriptor(self) -> PostgresSnapshotDescriptor:
         return self.__descriptor
 
+    def __get_table_path(self, table: str) -> str:
+        return os.path.join(self.__path, "tables", "%s.csv" % table)
+
+    def __validate_columns(self, table: str, columns: Sequence[str]) -> None:
+        expected_columns = self.__descriptor.get_table(table).columns
+        if expected_columns:
+            expected_set = set(expected_columns)
+            existing_set = set(columns)
+            if not expected_set <= existing_set:
+                raise ValueError(
+                    "The table %s is missing columns %r "
+                    % (table, expected_set - existing_set,)
+                )
+
+            if len(existing_set) != len(expected_set):
+                logger.warning(
+                    "The table %s contains more columns than expected %r",
+                    table,
+                    existing_set - expected_set,
+                )
+        else:
+            logger.info(
+                "Won't pre-validate snapshot columns. There is nothing in the descriptor"
+            )
+
     @contextmanager
     def get_table_file(
         self, table: str,
     ) -> Generator[Iterable[SnapshotTableRow], None, None]:
-        table_path = os.path.join(self.__path, "tables", "%s.csv" % table)
+        table_path = self.__get_table_path(table)
         try:
             with open(table_path, "r") as table_file:
                 csv_file = csv.DictReader(table_file)
-                columns = csv_file.fieldnames
-
-                expected_columns = self.__descriptor.get_table(table).columns
-                if expected_columns:
-                    expected_set = set(expected_columns)
-                    existing_set = set(columns)
-                    if not expected_set <= existing_set:
-                        raise ValueError(
-                            "The table %s is missing columns %r "
-                            % (table, expected_set - existing_set,)
-                        )
-
-                    if len(existing_set) != len(expected_set):
-                        logger.warning(
-                            "The table %s contains more columns than expected %r",
-                            table,
-                            existing_set - expected_set,
-                        )
-                else:
-                    logger.info(
-                        "Won't pre-validate snapshot columns. There is nothing in the descriptor"
-                    )
-
+                self.__validate_columns(table, csv_file.fieldnames or [])
                 yield csv_file
 
         except FileNotFoundError:
             raise ValueError(
                 "The snapshot does not contain the requested table %s" % table,
             )
+
+    def get_table_ranges(
+        self, table: str, range_size: int
+    ) -> Sequence[PostgresTableRange]:
+        """
+        Splits the CSV file of a table into ranges of records of at least
+        ``range_size`` bytes (except for the last one.)
+
+        Fields can contain line feeds when they are quoted, so a line feed is
+        only a record boundary when it is preceded by an even number of
+        quotes (escaped quotes are doubled, so they do not change the parity.)
+        The file is scanned once to find the boundaries without parsing it.
+        """
+        table_path = self.__get_table_path(table)
+        try:
+            table_file = open(table_path, "rb")
+        except FileNotFoundError:
+            raise ValueError(
+                "The snapshot does not contain the requested table %s" % table,
+            )
+
+        ranges: MutableSequence[PostgresTableRange] = []
+        with table_file:
+            columns = next(csv.reader([table_file.readline().decode("utf-8")]))
+            self.__validate_columns(table, columns)
+
+            start = position = table_file.tell()
+            # The number of quotes before ``position``, which is even at every
+            # record boundary.
+            quotes = 0
+            while True:
+                block = table_file.read(SPLIT_BLOCK_SIZE)
+                if not block:
+                    break
+
+                offset = max(start + range_size - position, 0)
+                while offset < len(block):
+                    line_feed = block.find(b"\n", offset)
+                    if line_feed == -1:
+                        break
+
+                    if (quotes + block.count(b'"', 0, line_feed)) % 2 == 0:
+                        end = position + line_feed + 1
+                        ranges.append(
+                            PostgresTableRange(table_path, columns, start, end)
+                        )
+                        start = end
+                        offset = max(start + range_size - position, line_feed + 1)
+                    else:
+                        offset = line_feed + 1
+
+                quotes += block.count(b'"')
+                position += len(block)
+
+            if position > start:
+                ranges.append(PostgresTableRange(table_path, columns, start, position))
+
+        return ranges
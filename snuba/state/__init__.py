@@ -1,11 +1,25 @@
 from __future__ import absolute_import
 
+import itertools
 import logging
 import random
 import re
 import time
+import uuid
+from bisect import bisect_left
 from functools import partial
-from typing import Any, Iterable, Mapping, Optional, Sequence, Tuple
+from queue import Empty, Full, Queue
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 import simplejson as json
 from confluent_kafka import KafkaError
@@ -14,19 +28,19 @@ from confluent_kafka import Producer
 
 from snuba import environment, settings
 from snuba.redis import redis_client as rds
+from snuba.utils.concurrent import execute
 from snuba.utils.metrics.wrapper import MetricsWrapper
 
 metrics = MetricsWrapper(environment.metrics, "snuba.state")
 logger = logging.getLogger("snuba.state")
 
-kfk = None
-
 ratelimit_prefix = "snuba-ratelimit:"
 query_lock_prefix = "snuba-query-lock:"
 config_hash = "snuba-config"
 config_history_hash = "snuba-config-history"
 config_changes_list = "snuba-config-changes"
 config_changes_list_limit = 25
+config_version_key = "snuba-config-version"
 queries_list = "snuba-queries"
 
 # Rate Limiting and Deduplication
@@ -56,26 +70,6 @@ def get_rates(bucket: str, rollup: int = 60) -> Sequence[Any]:
 # Runtime Configuration
 
 
-class memoize:
-    """
-    Simple expiring memoizer for functions with no args.
-    """
-
-    def __init__(self, timeout: int = 1) -> None:
-        self.timeout = timeout
-        self.saved = None
-        self.at = 0
-
-    def __call__(self, func):
-        def wrapper():
-            now = time.time()
-            if now > self.at + self.timeout or self.saved is None:
-                self.saved, self.at = func(), now
-            return self.saved
-
-        return wrapper
-
-
 def numeric(value: Optional[Any]) -> Optional[Any]:
     try:
         return int(value)
@@ -89,6 +83,30 @@ def numeric(value: Optional[Any]) -> Optional[Any]:
 ABTEST_RE = re.compile("(?:(-?\d+\.?\d*)(?:\:(\d+))?\/?)")
 
 
+class ABTest:
+    """
+    A runtime config value that is picked at random among a set of weighted
+    values every time it is read (see ``abtest``).
+    """
+
+    def __init__(self, value: str) -> None:
+        values = ABTEST_RE.findall(value)
+        self.__values = [numeric(v) for (v, _) in values]
+        self.__cumulative_weights = list(
+            itertools.accumulate(int(weight or 1) for (_, weight) in values)
+        )
+
+    @classmethod
+    def parse(cls, value: Optional[Any]) -> Optional["ABTest"]:
+        if isinstance(value, str) and ABTEST_RE.match(value):
+            return cls(value)
+        return None
+
+    def pick(self) -> Optional[Any]:
+        r = random.randint(1, self.__cumulative_weights[-1])
+        return self.__values[bisect_left(self.__cumulative_weights, r)]
+
+
 def abtest(value: Optional[Any]) -> Optional[Any]:
     """
     Recognizes a value that consists of a '/'-separated sequence of
@@ -99,17 +117,120 @@ def abtest(value: Optional[Any]) -> Optional[Any]:
     1000:1/2000:1 => returns 1000 or 2000 with equal weight
     1000:2/2000:1 => returns 1000 twice as often as 2000
     """
-    if isinstance(value, str) and ABTEST_RE.match(value):
-        values = ABTEST_RE.findall(value)
-        total_weight = sum(int(weight or 1) for (_, weight) in values)
-        r = random.randint(1, total_weight)
-        i = 0
-        for (v, weight) in values:
-            i += int(weight or 1)
-            if i >= r:
-                return numeric(v)
-    else:
-        return value
+    test = ABTest.parse(value)
+    return test.pick() if test is not None else value
+
+
+class ConfigSnapshot:
+    """
+    The runtime config as of a given version, with the values already parsed.
+    """
+
+    def __init__(
+        self, version: Optional[bytes], configs: Mapping[str, Any], loaded_at: float
+    ) -> None:
+        self.version = version
+        self.configs = configs
+        self.loaded_at = loaded_at
+
+        self.__values: MutableMapping[str, Any] = {}
+        self.__abtests: MutableMapping[str, ABTest] = {}
+        for key, value in configs.items():
+            test = ABTest.parse(value)
+            if test is not None:
+                self.__abtests[key] = test
+            else:
+                self.__values[key] = value
+
+    def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        test = self.__abtests.get(key)
+        if test is not None:
+            return test.pick()
+        return self.__values.get(key, default)
+
+    def get_all(self) -> Mapping[str, Optional[Any]]:
+        if not self.__abtests:
+            return self.__values
+        return {
+            **self.__values,
+            **{key: test.pick() for key, test in self.__abtests.items()},
+        }
+
+
+class ConfigSnapshotLoader:
+    """
+    Keeps a snapshot of the runtime config in memory. Every
+    ``refresh_interval`` seconds the version of the config (replaced by
+    ``set_config`` on every change) is checked, and the whole config is only
+    loaded again when the version changed or the snapshot is older than
+    ``max_age`` seconds.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float,
+        max_age: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.__refresh_interval = refresh_interval
+        self.__max_age = max_age
+        self.__clock = clock
+
+        self.__snapshot: Optional[ConfigSnapshot] = None
+        self.__checked_at = 0.0
+        self.__stale = True
+
+    def __load(self, version: Optional[bytes], now: float) -> ConfigSnapshot:
+        configs = rds.hgetall(config_hash)
+        metrics.increment("config.reload")
+        return ConfigSnapshot(
+            version,
+            {
+                k.decode("utf-8"): numeric(v.decode("utf-8"))
+                for k, v in configs.items()
+                if v is not None
+            },
+            now,
+        )
+
+    def get(self) -> ConfigSnapshot:
+        now = self.__clock()
+        snapshot = self.__snapshot
+        if snapshot is not None and now <= self.__checked_at + self.__refresh_interval:
+            return snapshot
+
+        try:
+            # The version is read before the config, so a change made while
+            # the config is loaded is picked up by the next check.
+            version = rds.get(config_version_key)
+            if (
+                snapshot is None
+                or self.__stale
+                or version != snapshot.version
+                or now > snapshot.loaded_at + self.__max_age
+            ):
+                snapshot = self.__load(version, now)
+                self.__stale = False
+        except Exception as ex:
+            logger.exception(ex)
+            if snapshot is None:
+                snapshot = ConfigSnapshot(None, {}, now)
+
+        self.__snapshot = snapshot
+        self.__checked_at = now
+        return snapshot
+
+    def invalidate(self) -> None:
+        """
+        Loads the config again on the next access.
+        """
+        self.__stale = True
+        self.__checked_at = 0.0
+
+
+config_snapshot = ConfigSnapshotLoader(
+    settings.CONFIG_MEMOIZE_TIMEOUT, settings.CONFIG_SNAPSHOT_MAX_AGE
+)
 
 
 def set_config(key: str, value: Optional[Any], user: Optional[str] = None) -> None:
@@ -130,6 +251,8 @@ def set_config(key: str, value: Optional[Any], user: Optional[str] = None) -> No
             rds.hset(config_history_hash, key, json.dumps(change_record))
         rds.lpush(config_changes_list, json.dumps((key, change_record)))
         rds.ltrim(config_changes_list, 0, config_changes_list_limit)
+        rds.set(config_version_key, uuid.uuid4().hex)
+        config_snapshot.invalidate()
     except Exception as ex:
         logger.exception(ex)
 
@@ -142,32 +265,22 @@ def set_configs(
 
 
 def get_config(key: str, default: Optional[Any] = None) -> Optional[Any]:
-    return get_all_configs().get(key, default)
+    return config_snapshot.get().get(key, default)
 
 
 def get_configs(
     key_defaults: Iterable[Tuple[str, Optional[Any]]]
 ) -> Sequence[Optional[Any]]:
-    all_confs = get_all_configs()
-    return [all_confs.get(k, d) for k, d in key_defaults]
+    snapshot = config_snapshot.get()
+    return [snapshot.get(k, d) for k, d in key_defaults]
 
 
 def get_all_configs() -> Mapping[str, Optional[Any]]:
-    return {k: abtest(v) for k, v in get_raw_configs().items()}
+    return config_snapshot.get().get_all()
 
 
-@memoize(settings.CONFIG_MEMOIZE_TIMEOUT)
 def get_raw_configs() -> Mapping[str, Optional[Any]]:
-    try:
-        all_configs = rds.hgetall(config_hash)
-        return {
-            k.decode("utf-8"): numeric(v.decode("utf-8"))
-            for k, v in all_configs.items()
-            if v is not None
-        }
-    except Exception as ex:
-        logger.exception(ex)
-        return {}
+    return config_snapshot.get().configs
 
 
 def delete_config(key: str, user: Optional[Any] = None) -> None:
@@ -204,26 +317,107 @@ def _record_query_delivery_callback(
         logger.warning("Could not record query due to error: %r", error)
 
 
-def record_query(query_metadata: Mapping[str, Any]) -> None:
-    global kfk
-    max_redis_queries = 200
-    try:
-        data = safe_dumps(query_metadata)
-        rds.pipeline(transaction=False).lpush(queries_list, data).ltrim(
-            queries_list, 0, max_redis_queries - 1
+class QueryRecorder:
+    """
+    Records queries to Redis (where the most recent ones are kept for the
+    admin interface) and to Kafka from a background thread, so that the
+    serialization of the query metadata and the latency of Redis and Kafka
+    do not add up to the duration of the requests.
+
+    Queries are recorded in batches of up to ``batch_size`` queries, with a
+    single Redis pipeline per batch. Queries recorded while ``max_queue_size``
+    queries are waiting to be recorded (if Redis or Kafka cannot keep up)
+    are dropped rather than blocking the request.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int,
+        batch_size: int,
+        max_redis_queries: int = 200,
+        producer: Optional[Producer] = None,
+    ) -> None:
+        self.__batch_size = batch_size
+        self.__max_redis_queries = max_redis_queries
+        self.__producer = producer
+
+        self.__queue: Queue[Mapping[str, Any]] = Queue(max_queue_size)
+        self.__lock = Lock()
+        self.__started = False
+
+    def record(self, query_metadata: Mapping[str, Any]) -> bool:
+        """
+        Queues a query to be recorded. Returns whether the query was queued.
+        """
+        # The thread is started on first use rather than when the module is
+        # imported, since the API server forks its workers after importing.
+        if not self.__started:
+            with self.__lock:
+                if not self.__started:
+                    execute(self.__run, name="query-recorder", daemon=True)
+                    self.__started = True
+
+        try:
+            self.__queue.put_nowait(query_metadata)
+        except Full:
+            metrics.increment("record_query.dropped")
+            return False
+
+        return True
+
+    def flush(self) -> None:
+        """
+        Blocks until all the queued queries have been recorded.
+        """
+        self.__queue.join()
+
+    def __run(self) -> None:
+        while True:
+            batch = [self.__queue.get()]
+            while len(batch) < self.__batch_size:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except Empty:
+                    break
+
+            try:
+                self.__record_batch(batch)
+            except Exception as ex:
+                logger.exception("Could not record query due to error: %r", ex)
+            finally:
+                for _ in batch:
+                    self.__queue.task_done()
+
+            metrics.gauge("record_query.queue_size", self.__queue.qsize())
+
+    def __record_batch(self, batch: Sequence[Mapping[str, Any]]) -> None:
+        data = [safe_dumps(query_metadata) for query_metadata in batch]
+
+        rds.pipeline(transaction=False).lpush(queries_list, *data).ltrim(
+            queries_list, 0, self.__max_redis_queries - 1
         ).execute()
 
-        if kfk is None:
-            kfk = Producer({"bootstrap.servers": ",".join(settings.DEFAULT_BROKERS)})
+        if self.__producer is None:
+            self.__producer = Producer(
+                {"bootstrap.servers": ",".join(settings.DEFAULT_BROKERS)}
+            )
 
-        kfk.poll(0)  # trigger queued delivery callbacks
-        kfk.produce(
-            settings.QUERIES_TOPIC,
-            data.encode("utf-8"),
-            on_delivery=_record_query_delivery_callback,
-        )
-    except Exception as ex:
-        logger.exception("Could not record query due to error: %r", ex)
+        self.__producer.poll(0)  # trigger queued delivery callbacks
+        for value in data:
+            self.__producer.produce(
+                settings.QUERIES_TOPIC,
+                value.encode("utf-8"),
+                on_delivery=_record_query_delivery_callback,
+            )
+
+
+query_recorder = QueryRecorder(
+    settings.RECORD_QUERIES_MAX_QUEUE_SIZE, settings.RECORD_QUERIES_BATCH_SIZE
+)
+
+
+def record_query(query_metadata: Mapping[str, Any]) -> None:
+    query_recorder.record(query_metadata)
 
 
 def get_queries() -> Sequence[Mapping[str, Optional[Any]]]:
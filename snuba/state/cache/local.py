@@ -0,0 +1,143 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Generic, List, Optional, Sized, Tuple, TypeVar
+
+from snuba.state import get_configs
+from snuba.state.cache.abstract import Cache, TValue
+from snuba.utils.codecs import Codec
+from snuba.utils.metrics import MetricsBackend
+from snuba.utils.metrics.timer import Timer
+
+
+TEncoded = TypeVar("TEncoded", bound=Sized)
+
+
+class LocalCache(Generic[TEncoded, TValue], Cache[TValue]):
+    """
+    Wraps a shared cache, keeping the most recently used values in the
+    memory of this process so that the values of hot keys do not need to be
+    fetched from the shared cache each time they are requested.
+
+    Values are held in their encoded form (and decoded on every hit) so
+    that callers never share mutable values, and the memory used can be
+    bounded by the size of the encoded values. Values are kept for no
+    longer than ``cache_expiry_sec`` (or ``local_cache_expiry_sec`` if
+    smaller) after they have been retrieved from or stored in the shared
+    cache. Since the remaining time to live of values retrieved from the
+    shared cache is not known, a value may be returned for up to twice the
+    configured expiry after it was initially computed.
+    """
+
+    def __init__(
+        self,
+        cache: Cache[TEncoded],
+        codec: Codec[TEncoded, TValue],
+        max_bytes: int,
+        metrics: MetricsBackend,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.__cache: Cache[TEncoded] = cache
+        self.__codec: Codec[TEncoded, TValue] = codec
+        self.__max_bytes = max_bytes
+        self.__metrics = metrics
+        self.__clock = clock
+
+        self.__lock = Lock()
+        self.__values: OrderedDict[str, Tuple[float, TEncoded]] = OrderedDict()
+        self.__bytes = 0
+
+    def __get_local(self, key: str) -> Optional[TEncoded]:
+        with self.__lock:
+            item = self.__values.get(key)
+            if item is not None:
+                expiry, value = item
+                if expiry > self.__clock():
+                    self.__values.move_to_end(key)
+                    self.__metrics.increment("hit")
+                    return value
+
+                del self.__values[key]
+                self.__bytes -= len(value)
+
+        self.__metrics.increment("miss")
+        return None
+
+    def __set_local(self, key: str, value: TEncoded) -> None:
+        size = len(value)
+        if size > self.__max_bytes:
+            return
+
+        expiry = self.__clock() + min(
+            int(ttl)
+            for ttl in get_configs(
+                [("cache_expiry_sec", 1), ("local_cache_expiry_sec", 1)]
+            )
+            if ttl is not None
+        )
+
+        evictions = 0
+        with self.__lock:
+            previous = self.__values.pop(key, None)
+            if previous is not None:
+                self.__bytes -= len(previous[1])
+
+            self.__values[key] = (expiry, value)
+            self.__bytes += size
+
+            while self.__bytes > self.__max_bytes:
+                _, (_, evicted) = self.__values.popitem(last=False)
+                self.__bytes -= len(evicted)
+                evictions += 1
+
+            total_bytes = self.__bytes
+
+        if evictions:
+            self.__metrics.increment("eviction", evictions)
+        self.__metrics.gauge("bytes", total_bytes)
+
+    def get(self, key: str) -> Optional[TValue]:
+        value = self.__get_local(key)
+        if value is None:
+            value = self.__cache.get(key)
+            if value is None:
+                return None
+
+            self.__set_local(key, value)
+
+        return self.__codec.decode(value)
+
+    def set(self, key: str, value: TValue) -> None:
+        encoded = self.__codec.encode(value)
+        self.__cache.set(key, encoded)
+        self.__set_local(key, encoded)
+
+    def get_readthrough(
+        self,
+        key: str,
+        function: Callable[[], TValue],
+        timeout: int,
+        timer: Optional[Timer] = None,
+    ) -> TValue:
+        value = self.__get_local(key)
+        if value is not None:
+            if timer is not None:
+                timer.mark("cache_get")
+            return self.__codec.decode(value)
+
+        # If this client ends up executing the function, the value it
+        # returned can be used as is rather than decoding it again.
+        results: List[TValue] = []
+
+        def execute() -> TEncoded:
+            result = function()
+            results.append(result)
+            return self.__codec.encode(result)
+
+        value = self.__cache.get_readthrough(key, execute, timeout, timer)
+        self.__set_local(key, value)
+
+        if results:
+            return results[0]
+
+        return self.__codec.decode(value)
@@ -11,11 +11,15 @@ from typing import (
     MutableMapping,
     Optional,
     Sequence,
+    Tuple,
     Type,
 )
 import uuid
 
-from snuba import state
+from pkg_resources import resource_string
+from redis.client import Script
+
+from snuba import settings, state
 
 logger = logging.getLogger("snuba.state.rate_limit")
 
@@ -87,40 +91,55 @@ class RateLimitStatsContainer:
         return ChainMap(*grouped_stats)
 
 
+def _get_exceeded_limit(
+    rate_limit_params: RateLimitParameters, stats: RateLimitStats
+) -> Optional[str]:
+    """
+    Returns the description of the first limit of `rate_limit_params` that is
+    exceeded by `stats`, if any.
+    """
+    rate_limit_name = rate_limit_params.rate_limit_name
+
+    Reason = namedtuple("reason", "scope name val limit")
+    reasons = [
+        Reason(
+            rate_limit_name,
+            "concurrent",
+            stats.concurrent,
+            rate_limit_params.concurrent_limit,
+        ),
+        Reason(
+            rate_limit_name,
+            "per-second",
+            stats.rate,
+            rate_limit_params.per_second_limit,
+        ),
+    ]
+
+    reason = next((r for r in reasons if r.limit is not None and r.val > r.limit), None)
+    if reason is None:
+        return None
+
+    return "{r.scope} {r.name} of {r.val:.0f} exceeds limit of {r.limit:.0f}".format(
+        r=reason
+    )
+
+
 @contextmanager
-def rate_limit(
+def _rate_limit_pipeline(
     rate_limit_params: RateLimitParameters,
 ) -> Iterator[Optional[RateLimitStats]]:
     """
-    A context manager for rate limiting that allows for limiting based on
-    on a rolling-window per-second rate as well as the number of requests
-    concurrently running.
-
-    Uses a single redis sorted set per rate-limiting bucket to track both the
-    concurrency and rate, the score is the query timestamp. Queries are thrown
-    ahead in time when they start so we can count them as concurrent, and
-    thrown back to their start time once they finish so we can count them
-    towards the historical rate.
-
-               time >>----->
-    +-----------------------------+--------------------------------+
-    | historical query window     | currently executing queries    |
-    +-----------------------------+--------------------------------+
-                                  ^
-                                 now
+    Runs a single rate limit with a pipeline of commands. This is used
+    instead of the rate limit script where the buckets of several rate limits
+    cannot be accessed by a single script (on Redis Cluster.)
     """
 
     bucket = "{}{}".format(state.ratelimit_prefix, rate_limit_params.bucket)
     query_id = uuid.uuid4()
 
     now = time.time()
-    bypass_rate_limit, rate_history_s = state.get_configs(
-        [("bypass_rate_limit", 0), ("rate_history_sec", 3600)]
-    )
-
-    if bypass_rate_limit == 1:
-        yield None
-        return
+    rate_history_s = state.get_config("rate_history_sec", 3600)
 
     pipe = state.rds.pipeline(transaction=False)
     pipe.zremrangebyscore(
@@ -149,37 +168,14 @@ def rate_limit(
 
     stats = RateLimitStats(rate=per_second, concurrent=concurrent)
 
-    rate_limit_name = rate_limit_params.rate_limit_name
-
-    Reason = namedtuple("reason", "scope name val limit")
-    reasons = [
-        Reason(
-            rate_limit_name,
-            "concurrent",
-            concurrent,
-            rate_limit_params.concurrent_limit,
-        ),
-        Reason(
-            rate_limit_name,
-            "per-second",
-            per_second,
-            rate_limit_params.per_second_limit,
-        ),
-    ]
-
-    reason = next((r for r in reasons if r.limit is not None and r.val > r.limit), None)
-
+    reason = _get_exceeded_limit(rate_limit_params, stats)
     if reason:
         try:
             state.rds.zrem(bucket, query_id)  # not allowed / not counted
         except Exception as ex:
             logger.exception(ex)
 
-        raise RateLimitExceeded(
-            "{r.scope} {r.name} of {r.val:.0f} exceeds limit of {r.limit:.0f}".format(
-                r=reason
-            )
-        )
+        raise RateLimitExceeded(reason)
 
     try:
         yield stats
@@ -191,6 +187,32 @@ def rate_limit(
             logger.exception(ex)
 
 
+@contextmanager
+def rate_limit(
+    rate_limit_params: RateLimitParameters,
+) -> Iterator[Optional[RateLimitStats]]:
+    """
+    A context manager for rate limiting that allows for limiting based on
+    on a rolling-window per-second rate as well as the number of requests
+    concurrently running.
+
+    Uses a single redis sorted set per rate-limiting bucket to track both the
+    concurrency and rate, the score is the query timestamp. Queries are thrown
+    ahead in time when they start so we can count them as concurrent, and
+    thrown back to their start time once they finish so we can count them
+    towards the historical rate.
+
+               time >>----->
+    +-----------------------------+--------------------------------+
+    | historical query window     | currently executing queries    |
+    +-----------------------------+--------------------------------+
+                                  ^
+                                 now
+    """
+    with RateLimitAggregator([rate_limit_params]) as stats:
+        yield stats.get_stats(rate_limit_params.rate_limit_name)
+
+
 def get_global_rate_limit_params() -> RateLimitParameters:
     """
     Returns the configuration object for the global rate limit
@@ -208,11 +230,42 @@ def get_global_rate_limit_params() -> RateLimitParameters:
     )
 
 
+_rate_limit_script: Optional[Script] = None
+
+
+def _get_rate_limit_script() -> Script:
+    global _rate_limit_script
+    if _rate_limit_script is None:
+        _rate_limit_script = state.rds.register_script(
+            resource_string("snuba", "state/scripts/rate_limit.lua")
+        )
+    return _rate_limit_script
+
+
+def _release(members: Sequence[Tuple[str, str]]) -> None:
+    """
+    Returns the query to its start time in each of the buckets it was added
+    to by the rate limit script.
+    """
+    try:
+        pipe = state.rds.pipeline(transaction=False)
+        for bucket, member in members:
+            pipe.zincrby(bucket, member, -float(state.max_query_duration_s))
+        pipe.execute()
+    except Exception as ex:
+        logger.exception(ex)
+
+
 class RateLimitAggregator(AbstractContextManager):
     """
     Runs the rate limits provided by the `rate_limit_params` configuration object.
 
-    It runs the rate limits in the order described by `rate_limit_params`.
+    It runs the rate limits in the order described by `rate_limit_params`. All
+    the rate limits are checked, and the query is admitted, atomically by a
+    single script, and the query is released from all of them with a single
+    pipeline, so running a query takes two round trips to Redis regardless of
+    the number of rate limits. If any of the rate limits is exceeded, the
+    query is not counted towards any of them.
     """
 
     def __init__(self, rate_limit_params: Sequence[RateLimitParameters]) -> None:
@@ -222,10 +275,78 @@ class RateLimitAggregator(AbstractContextManager):
     def __enter__(self) -> RateLimitStatsContainer:
         stats = RateLimitStatsContainer()
 
+        bypass_rate_limit, rate_history_s = state.get_configs(
+            [("bypass_rate_limit", 0), ("rate_history_sec", 3600)]
+        )
+        if bypass_rate_limit == 1 or not self.rate_limit_params:
+            return stats
+
+        if settings.USE_REDIS_CLUSTER:
+            # The buckets of the rate limits are not guaranteed to be on the
+            # same node, so they cannot all be accessed by a single script.
+            with ExitStack() as stack:
+                for rate_limit_param in self.rate_limit_params:
+                    child_stats = stack.enter_context(
+                        _rate_limit_pipeline(rate_limit_param)
+                    )
+                    if child_stats:
+                        stats.add_stats(rate_limit_param.rate_limit_name, child_stats)
+                self.stack = stack.pop_all()
+            return stats
+
+        buckets = [
+            "{}{}".format(state.ratelimit_prefix, rate_limit_param.bucket)
+            for rate_limit_param in self.rate_limit_params
+        ]
+        query_id = str(uuid.uuid4())
+
+        now = time.time()
+        args = [
+            "({:f}".format(now - rate_history_s),
+            "{:f}".format(now + state.max_query_duration_s),
+            "{:f}".format(now - state.rate_lookback_s),
+            "{:f}".format(now),
+            "({:f}".format(now),
+            state.rate_lookback_s,
+            query_id,
+        ]
         for rate_limit_param in self.rate_limit_params:
-            child_stats = self.stack.enter_context(rate_limit(rate_limit_param))
-            if child_stats:
-                stats.add_stats(rate_limit_param.rate_limit_name, child_stats)
+            args.append(
+                ""
+                if rate_limit_param.per_second_limit is None
+                else rate_limit_param.per_second_limit
+            )
+            args.append(
+                ""
+                if rate_limit_param.concurrent_limit is None
+                else rate_limit_param.concurrent_limit
+            )
+
+        try:
+            exceeded, *counts = _get_rate_limit_script()(keys=buckets, args=args)
+        except Exception as ex:
+            logger.exception(ex)
+            return stats  # fail open if redis is having issues
+
+        for i, (historical, concurrent) in enumerate(zip(counts[::2], counts[1::2])):
+            rate_limit_param = self.rate_limit_params[i]
+            child_stats = RateLimitStats(
+                rate=int(historical) / float(state.rate_lookback_s),
+                concurrent=int(concurrent),
+            )
+
+            if i + 1 == exceeded:
+                raise RateLimitExceeded(
+                    _get_exceeded_limit(rate_limit_param, child_stats)
+                    or f"{rate_limit_param.rate_limit_name} rate limit exceeded"
+                )
+
+            stats.add_stats(rate_limit_param.rate_limit_name, child_stats)
+
+        self.stack.callback(
+            _release,
+            [(bucket, f"{query_id}:{i}") for i, bucket in enumerate(buckets, 1)],
+        )
 
         return stats
 
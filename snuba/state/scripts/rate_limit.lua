@@ -0,0 +1,51 @@
+-- KEYS[i]: The bucket of the i-th rate limit.
+-- ARGV[1]: The score below which queries are removed from the buckets.
+-- ARGV[2]: The score of the query while it is running.
+-- ARGV[3]: The start of the window used to determine the query rate.
+-- ARGV[4]: The current time.
+-- ARGV[5]: The score above which queries are currently running.
+-- ARGV[6]: The length of the window used to determine the query rate.
+-- ARGV[7]: The query ID.
+-- ARGV[6 + 2 * i]: The per second limit of the i-th rate limit. (optional)
+-- ARGV[7 + 2 * i]: The concurrent limit of the i-th rate limit. (optional)
+--
+-- Returns the index of the first rate limit that was exceeded (or 0 if the
+-- query was admitted) followed by the historical and concurrent query counts
+-- of each rate limit that was checked.
+
+local rate_lookback = tonumber(ARGV[6])
+local result = {0}
+
+for i, bucket in ipairs(KEYS) do
+    local per_second_limit = tonumber(ARGV[6 + 2 * i])
+    local concurrent_limit = tonumber(ARGV[7 + 2 * i])
+
+    redis.call('ZREMRANGEBYSCORE', bucket, '-inf', ARGV[1])
+    redis.call('ZADD', bucket, ARGV[2], ARGV[7] .. ':' .. i)
+
+    local historical = 0
+    if per_second_limit then
+        historical = redis.call('ZCOUNT', bucket, ARGV[3], ARGV[4])
+    end
+
+    local concurrent = 0
+    if concurrent_limit then
+        concurrent = redis.call('ZCOUNT', bucket, ARGV[5], '+inf')
+    end
+
+    table.insert(result, historical)
+    table.insert(result, concurrent)
+
+    if (concurrent_limit and concurrent > concurrent_limit) or
+            (per_second_limit and historical / rate_lookback > per_second_limit) then
+        -- The query is not allowed, so it should not be counted towards any
+        -- of the rate limits it has been added to.
+        for j = 1, i do
+            redis.call('ZREM', KEYS[j], ARGV[7] .. ':' .. j)
+        end
+        result[1] = i
+        return result
+    end
+end
+
+return result
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import NamedTuple, NewType, Optional, Sequence
+from typing import Any, Mapping, NamedTuple, NewType, Optional, Sequence
 from uuid import UUID
 
 from snuba.datasets.dataset import Dataset
@@ -77,6 +77,46 @@ class SubscriptionData:
         :param timestamp: Date that the query should run up until
         :param offset: Maximum offset we should query for
         """
+        return self.__build_request(
+            dataset, {"project": self.project_id}, timestamp, offset, timer
+        )
+
+    def build_grouped_request(
+        self,
+        dataset: Dataset,
+        project_ids: Sequence[int],
+        timestamp: datetime,
+        offset: Optional[int],
+        timer: Timer,
+    ) -> Request:
+        """
+        Returns a Request for the query of this subscription run over all of
+        the projects in `project_ids` at once, with the results grouped by
+        project. The row of each project contains the same values as the
+        result of the request returned by `build_request` for that project,
+        plus the `project_id` column. Projects without any matching rows are
+        not returned.
+        """
+        return self.__build_request(
+            dataset,
+            {
+                "project": [*project_ids],
+                "groupby": ["project_id"],
+                "limit": len(project_ids),
+            },
+            timestamp,
+            offset,
+            timer,
+        )
+
+    def __build_request(
+        self,
+        dataset: Dataset,
+        body: Mapping[str, Any],
+        timestamp: datetime,
+        offset: Optional[int],
+        timer: Timer,
+    ) -> Request:
         schema = RequestSchema.build_with_extensions(
             dataset.get_extensions(), SubscriptionRequestSettings,
         )
@@ -85,7 +125,7 @@ class SubscriptionData:
             extra_conditions = [[["ifnull", ["offset", 0]], "<=", offset]]
         return build_request(
             {
-                "project": self.project_id,
+                **body,
                 "conditions": [*self.conditions, *extra_conditions],
                 "aggregations": self.aggregations,
                 "from_date": (timestamp - self.time_window).isoformat(),
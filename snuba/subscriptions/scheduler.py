@@ -1,8 +1,15 @@
 import math
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Iterator, List, Optional
+from typing import Iterator, List, Mapping, MutableMapping, Optional
+from uuid import UUID
 
-from snuba.subscriptions.data import PartitionId, Subscription, SubscriptionIdentifier
+from snuba.subscriptions.data import (
+    PartitionId,
+    Subscription,
+    SubscriptionData,
+    SubscriptionIdentifier,
+)
 from snuba.subscriptions.store import SubscriptionDataStore
 from snuba.utils.metrics import MetricsBackend
 from snuba.utils.scheduler import Scheduler, ScheduledTask
@@ -10,6 +17,20 @@ from snuba.utils.types import Interval
 
 
 class SubscriptionScheduler(Scheduler[Subscription]):
+    """
+    Schedules the subscriptions of a partition. Each subscription is
+    scheduled at every timestamp that is a multiple of its resolution.
+
+    Subscriptions are indexed by their resolution (in seconds) so that
+    finding the tasks of an interval only requires visiting the timestamps
+    at which each resolution is due, and the subscriptions with that
+    resolution, rather than every subscription for every second.
+
+    All of the subscriptions are fetched from the store when the scheduler
+    starts. After that, only the changes made since are fetched and applied
+    to the index, unless the store does not provide them.
+    """
+
     def __init__(
         self,
         store: SubscriptionDataStore,
@@ -22,26 +43,68 @@ class SubscriptionScheduler(Scheduler[Subscription]):
         self.__partition_id = partition_id
         self.__metrics = metrics
 
-        self.__subscriptions: List[Subscription] = []
+        self.__subscriptions: MutableMapping[
+            int, MutableMapping[UUID, Subscription]
+        ] = {}
+        self.__resolutions: MutableMapping[UUID, int] = {}
+        self.__version: Optional[int] = None
         self.__last_refresh: Optional[datetime] = None
 
-    def __get_subscriptions(self) -> List[Subscription]:
+    def __add(self, uuid: UUID, data: SubscriptionData) -> None:
+        self.__remove(uuid)
+
+        resolution = int(data.resolution.total_seconds())
+        self.__subscriptions.setdefault(resolution, {})[uuid] = Subscription(
+            SubscriptionIdentifier(self.__partition_id, uuid), data
+        )
+        self.__resolutions[uuid] = resolution
+
+    def __remove(self, uuid: UUID) -> None:
+        resolution = self.__resolutions.pop(uuid, None)
+        if resolution is not None:
+            subscriptions = self.__subscriptions[resolution]
+            del subscriptions[uuid]
+            if not subscriptions:
+                del self.__subscriptions[resolution]
+
+    def __refresh(self) -> None:
+        tags = {"partition": str(self.__partition_id)}
+
+        changes = (
+            self.__store.get_changes(self.__version)
+            if self.__version is not None
+            else None
+        )
+
+        if changes is not None:
+            for uuid, data in changes.changes:
+                if data is not None:
+                    self.__add(uuid, data)
+                else:
+                    self.__remove(uuid)
+            self.__version = changes.version
+            self.__metrics.increment("schedule.changes", len(changes.changes), tags)
+        else:
+            # The version has to be fetched first, so that changes made while
+            # fetching the subscriptions are applied on the next refresh.
+            self.__version = self.__store.get_version()
+            self.__subscriptions = {}
+            self.__resolutions = {}
+            for uuid, data in self.__store.all():
+                self.__add(uuid, data)
+            self.__metrics.increment("schedule.reload", tags=tags)
+
+        self.__metrics.gauge("schedule.size", len(self.__resolutions), tags=tags)
+
+    def __get_subscriptions(self) -> Mapping[int, Mapping[UUID, Subscription]]:
         current_time = datetime.now()
 
         if (
             self.__last_refresh is None
             or (current_time - self.__last_refresh) > self.__cache_ttl
         ):
-            self.__subscriptions = [
-                Subscription(SubscriptionIdentifier(self.__partition_id, uuid), data)
-                for uuid, data in self.__store.all()
-            ]
+            self.__refresh()
             self.__last_refresh = current_time
-            self.__metrics.gauge(
-                "schedule.size",
-                len(self.__subscriptions),
-                tags={"partition": str(self.__partition_id)},
-            )
 
         self.__metrics.timing(
             "schedule.staleness",
@@ -56,11 +119,18 @@ class SubscriptionScheduler(Scheduler[Subscription]):
     ) -> Iterator[ScheduledTask[Subscription]]:
         subscriptions = self.__get_subscriptions()
 
-        for timestamp in range(
-            math.ceil(interval.lower.timestamp()),
-            math.ceil(interval.upper.timestamp()),
-        ):
-            for subscription in subscriptions:
-                resolution = int(subscription.data.resolution.total_seconds())
-                if timestamp % resolution == 0:
-                    yield ScheduledTask(datetime.fromtimestamp(timestamp), subscription)
+        lower = math.ceil(interval.lower.timestamp())
+        upper = math.ceil(interval.upper.timestamp())
+
+        # Find the resolutions that are due at each timestamp of the interval.
+        schedule: MutableMapping[int, List[int]] = defaultdict(list)
+        for resolution in subscriptions:
+            first = math.ceil(lower / resolution) * resolution
+            for timestamp in range(first, upper, resolution):
+                schedule[timestamp].append(resolution)
+
+        for timestamp in sorted(schedule):
+            scheduled_at = datetime.fromtimestamp(timestamp)
+            for resolution in schedule[timestamp]:
+                for subscription in subscriptions[resolution].values():
+                    yield ScheduledTask(scheduled_at, subscription)
@@ -0,0 +1,26 @@
+-- KEYS[1]: The subscriptions hash key.
+-- KEYS[2]: The version key.
+-- KEYS[3]: The change log key.
+-- KEYS[4]: The key of the last version removed from the change log.
+-- ARGV[1]: The version that the changes should be returned since.
+--
+-- Returns the current version of the store, followed by the ID and data
+-- (false if the subscription was deleted) of each subscription changed since
+-- the requested version. Returns false if some of these changes have been
+-- removed from the change log, or the store is behind the requested version.
+
+local version = tonumber(redis.call('GET', KEYS[2]) or 0)
+local trimmed = tonumber(redis.call('GET', KEYS[4]) or 0)
+local since = tonumber(ARGV[1])
+
+if trimmed > since or version < since then
+    return false
+end
+
+local result = {version}
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '(' .. ARGV[1], '+inf')) do
+    table.insert(result, key)
+    table.insert(result, redis.call('HGET', KEYS[1], key))
+end
+
+return result
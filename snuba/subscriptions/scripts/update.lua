@@ -0,0 +1,32 @@
+-- KEYS[1]: The subscriptions hash key.
+-- KEYS[2]: The version key.
+-- KEYS[3]: The change log key.
+-- KEYS[4]: The key of the last version removed from the change log.
+-- ARGV[1]: The maximum number of changes to keep in the change log.
+-- ARGV[2]: The subscription ID.
+-- ARGV[3]: The subscription data. (optional, deletes the subscription if
+--          not provided)
+--
+-- Returns the version of the store after the change.
+
+if ARGV[3] ~= nil then
+    redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+else
+    redis.call('HDEL', KEYS[1], ARGV[2])
+end
+
+-- The change log contains the ID of each subscription that was changed,
+-- scored by the version of its most recent change.
+local version = redis.call('INCR', KEYS[2])
+redis.call('ZADD', KEYS[3], version, ARGV[2])
+
+-- Trim the oldest changes, keeping track of the last version that was
+-- removed so that readers know whether they have missed any changes.
+local overflow = redis.call('ZCARD', KEYS[3]) - tonumber(ARGV[1])
+if overflow > 0 then
+    local trimmed = redis.call('ZRANGE', KEYS[3], overflow - 1, overflow - 1, 'WITHSCORES')
+    redis.call('SET', KEYS[4], trimmed[2])
+    redis.call('ZREMRANGEBYRANK', KEYS[3], 0, overflow - 1)
+end
+
+return version
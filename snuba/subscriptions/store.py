@@ -1,6 +1,8 @@
 import abc
 from uuid import UUID
-from typing import Iterable, Tuple
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+
+from pkg_resources import resource_string
 
 from snuba.datasets.dataset import Dataset
 from snuba.datasets.factory import get_dataset_name
@@ -9,6 +11,17 @@ from snuba.subscriptions.codecs import SubscriptionDataCodec
 from snuba.subscriptions.data import PartitionId, SubscriptionData
 
 
+class SubscriptionDataChanges(NamedTuple):
+    """
+    The subscriptions changed in a store since a previous version. The data
+    of each changed subscription is its current data, or ``None`` if the
+    subscription has been deleted.
+    """
+
+    version: int
+    changes: Sequence[Tuple[UUID, Optional[SubscriptionData]]]
+
+
 class SubscriptionDataStore(abc.ABC):
     @abc.abstractmethod
     def create(self, key: UUID, data: SubscriptionData) -> None:
@@ -33,35 +46,81 @@ class SubscriptionDataStore(abc.ABC):
         """
         pass
 
+    def get_version(self) -> Optional[int]:
+        """
+        Returns the current version of the store, which can be passed to
+        `get_changes` after fetching all of the `Subscriptions`, or ``None``
+        if the store does not keep track of its changes. This must be called
+        before `all`, so that no change made in between can be missed.
+        """
+        return None
+
+    def get_changes(self, version: int) -> Optional[SubscriptionDataChanges]:
+        """
+        Returns the `Subscriptions` changed since `version`, or ``None`` if
+        these changes are not available and all of the `Subscriptions` have
+        to be fetched again.
+        """
+        return None
+
 
 class RedisSubscriptionDataStore(SubscriptionDataStore):
     """
     A Redis backed store for subscription data. Stores subscriptions using
     `SubscriptionDataCodec`. Each instance of the store operates on a
     partition of data, defined by the `key` constructor param.
+
+    Every change is also recorded in a change log, so that readers can keep
+    up to date with the store without fetching all of the subscriptions. The
+    change log is bounded to the `max_changes` most recently changed
+    subscriptions.
     """
 
     KEY_TEMPLATE = "subscriptions:{}:{}"
 
     def __init__(
-        self, client: RedisClientType, dataset: Dataset, partition_id: PartitionId
+        self,
+        client: RedisClientType,
+        dataset: Dataset,
+        partition_id: PartitionId,
+        max_changes: int = 10000,
     ):
         self.client = client
         self.codec = SubscriptionDataCodec()
         self.__key = f"subscriptions:{get_dataset_name(dataset)}:{partition_id}"
+        self.__max_changes = max_changes
+
+        # The change log keys use the subscriptions key as their hash tag, so
+        # that they are in the same slot when using Redis Cluster.
+        self.__keys = [
+            self.__key,
+            f"{{{self.__key}}}:version",
+            f"{{{self.__key}}}:changes",
+            f"{{{self.__key}}}:trimmed",
+        ]
+
+        self.__script_update = client.register_script(
+            resource_string("snuba", "subscriptions/scripts/update.lua")
+        )
+        self.__script_changes = client.register_script(
+            resource_string("snuba", "subscriptions/scripts/changes.lua")
+        )
 
     def create(self, key: UUID, data: SubscriptionData) -> None:
         """
         Stores subscription data in Redis. Will overwrite any existing
         subscriptions with the same id.
         """
-        self.client.hset(self.__key, key.hex.encode("utf-8"), self.codec.encode(data))
+        self.__script_update(
+            keys=self.__keys,
+            args=[self.__max_changes, key.hex, self.codec.encode(data)],
+        )
 
     def delete(self, key: UUID) -> None:
         """
         Removes a subscription from the Redis store.
         """
-        self.client.hdel(self.__key, key.hex.encode("utf-8"))
+        self.__script_update(keys=self.__keys, args=[self.__max_changes, key.hex])
 
     def all(self) -> Iterable[Tuple[UUID, SubscriptionData]]:
         """
@@ -72,3 +131,23 @@ class RedisSubscriptionDataStore(SubscriptionDataStore):
             (UUID(key.decode("utf-8")), self.codec.decode(val))
             for key, val in self.client.hgetall(self.__key).items()
         ]
+
+    def get_version(self) -> Optional[int]:
+        return int(self.client.get(self.__keys[1]) or 0)
+
+    def get_changes(self, version: int) -> Optional[SubscriptionDataChanges]:
+        result = self.__script_changes(keys=self.__keys, args=[version])
+        if result is None:
+            return None
+
+        current_version, *changes = result
+        return SubscriptionDataChanges(
+            int(current_version),
+            [
+                (
+                    UUID(key.decode("utf-8")),
+                    self.codec.decode(val) if val is not None else None,
+                )
+                for key, val in zip(changes[::2], changes[1::2])
+            ],
+        )
@@ -2,9 +2,19 @@ from __future__ import annotations
 
 import copy
 import itertools
+import json
 import time
 from concurrent.futures import Future, ThreadPoolExecutor, as_completed
-from typing import Mapping, NamedTuple, Optional, Sequence, Tuple
+from typing import (
+    Any,
+    List,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from snuba.datasets.dataset import Dataset
 from snuba.reader import Result
@@ -30,6 +40,41 @@ class SubscriptionTaskResult(NamedTuple):
     result: Tuple[Request, Result]
 
 
+# The value returned by the aggregate functions that can be used by batched
+# subscriptions when there are no rows to aggregate. The query of a batch of
+# subscriptions does not return any row for projects without matching rows,
+# while the query of a single subscription returns these values.
+EMPTY_AGGREGATE_VALUES: Mapping[str, Any] = {"count": 0, "uniq": 0}
+
+# The maximum number of tasks executed by a single query. This is bounded by
+# the maximum limit of a query, since each project returns a row.
+MAX_BATCH_SIZE = 1000
+
+
+def get_batch_key(task: ScheduledTask[Subscription]) -> Optional[Tuple[Any, ...]]:
+    """
+    Returns the key shared by all of the tasks that can be executed together
+    with a single query grouped by project, or ``None`` if the task has to be
+    executed on its own.
+    """
+    data = task.task.data
+    for aggregation in data.aggregations:
+        if (
+            len(aggregation) != 3
+            or not aggregation[2]
+            or aggregation[2] == "project_id"
+            or aggregation[0].split("(")[0] not in EMPTY_AGGREGATE_VALUES
+        ):
+            return None
+
+    return (
+        task.timestamp,
+        data.time_window,
+        json.dumps(data.conditions),
+        json.dumps(data.aggregations),
+    )
+
+
 class SubscriptionWorker(
     AbstractBatchWorker[Tick, Sequence[SubscriptionTaskResultFuture]]
 ):
@@ -41,6 +86,7 @@ class SubscriptionWorker(
         producer: Producer[SubscriptionTaskResult],
         topic: Topic,
         metrics: MetricsBackend,
+        batch_queries: bool = False,
     ) -> None:
         self.__dataset = dataset
         self.__executor = executor
@@ -48,6 +94,7 @@ class SubscriptionWorker(
         self.__producer = producer
         self.__topic = topic
         self.__metrics = metrics
+        self.__batch_queries = batch_queries
 
         self.__concurrent_gauge: Gauge = ThreadSafeGauge(
             self.__metrics, "executor.concurrent"
@@ -80,11 +127,83 @@ class SubscriptionWorker(
             # processing.
             return (
                 request,
-                parse_and_run_query(
-                    self.__dataset, copy.deepcopy(request), timer
-                ).result,
+                parse_and_run_query(self.__dataset, copy.copy(request), timer).result,
+            )
+
+    def __execute_batch(
+        self, tasks: Sequence[ScheduledTask[Subscription]], tick: Tick
+    ) -> Sequence[Tuple[Request, Result]]:
+        # All of the tasks in the batch share the same timestamp.
+        self.__metrics.timing(
+            "executor.latency", (time.time() - tasks[0].timestamp.timestamp()) * 1000
+        )
+        self.__metrics.timing("executor.batch_size", len(tasks))
+
+        timer = Timer("query")
+
+        data = tasks[0].task.data
+        request = data.build_grouped_request(
+            self.__dataset,
+            sorted({task.task.data.project_id for task in tasks}),
+            tasks[0].timestamp,
+            tick.offsets.upper,
+            timer,
+        )
+
+        with self.__concurrent_gauge:
+            result = parse_and_run_query(self.__dataset, request, timer).result
+
+        # Split the result of the batch into the results each subscription
+        # would have received if its query was run on its own.
+        meta = [column for column in result["meta"] if column["name"] != "project_id"]
+        rows: MutableMapping[int, Mapping[str, Any]] = {}
+        for row in result["data"]:
+            rows[row["project_id"]] = {
+                key: value for key, value in row.items() if key != "project_id"
+            }
+        empty_row = {
+            alias: EMPTY_AGGREGATE_VALUES[function.split("(")[0]]
+            for function, _, alias in data.aggregations
+        }
+
+        results = []
+        for task in tasks:
+            task_result = copy.copy(result)
+            task_result["meta"] = [*meta]
+            task_result["data"] = [{**rows.get(task.task.data.project_id, empty_row)}]
+            results.append(
+                (
+                    task.task.data.build_request(
+                        self.__dataset,
+                        task.timestamp,
+                        tick.offsets.upper,
+                        Timer("query"),
+                    ),
+                    task_result,
+                )
             )
 
+        return results
+
+    def __submit_batch(
+        self, tasks: Sequence[ScheduledTask[Subscription]], tick: Tick
+    ) -> Sequence[Future[Tuple[Request, Result]]]:
+        futures: Sequence[Future[Tuple[Request, Result]]] = [Future() for _ in tasks]
+
+        def set_results(batch_future: Future[Sequence[Tuple[Request, Result]]]) -> None:
+            exception = batch_future.exception()
+            if exception is not None:
+                for future in futures:
+                    future.set_exception(exception)
+            else:
+                for future, result in zip(futures, batch_future.result()):
+                    future.set_result(result)
+
+        self.__executor.submit(self.__execute_batch, tasks, tick).add_done_callback(
+            set_results
+        )
+        return futures
+
     def process_message(
         self, message: Message[Tick]
     ) -> Optional[Sequence[SubscriptionTaskResultFuture]]:
@@ -98,12 +217,45 @@ class SubscriptionWorker(
         # consumer poll timeout (or session timeout during consumer
         # rebalancing) and cause the entire batch to be have to be replayed.
         tick = message.payload
-        return [
-            SubscriptionTaskResultFuture(
-                task, self.__executor.submit(self.__execute, task, tick)
-            )
-            for task in self.__schedulers[message.partition.index].find(tick.timestamps)
-        ]
+        tasks = [*self.__schedulers[message.partition.index].find(tick.timestamps)]
+
+        if not self.__batch_queries:
+            return [
+                SubscriptionTaskResultFuture(
+                    task, self.__executor.submit(self.__execute, task, tick)
+                )
+                for task in tasks
+            ]
+
+        # Tasks that only differ by project are executed together with a
+        # single query, and the result of each task is split out of it.
+        batches: MutableMapping[Tuple[Any, ...], List[int]] = {}
+        futures: List[Optional[Future[Tuple[Request, Result]]]] = [None] * len(tasks)
+        for i, task in enumerate(tasks):
+            key = get_batch_key(task)
+            if key is not None:
+                batches.setdefault(key, []).append(i)
+            else:
+                futures[i] = self.__executor.submit(self.__execute, task, tick)
+
+        for indices in batches.values():
+            for start in range(0, len(indices), MAX_BATCH_SIZE):
+                chunk = indices[start : start + MAX_BATCH_SIZE]
+                if len(chunk) == 1:
+                    futures[chunk[0]] = self.__executor.submit(
+                        self.__execute, tasks[chunk[0]], tick
+                    )
+                else:
+                    for i, future in zip(
+                        chunk, self.__submit_batch([tasks[i] for i in chunk], tick)
+                    ):
+                        futures[i] = future
+
+        result_futures = []
+        for task, result_future in zip(tasks, futures):
+            assert result_future is not None
+            result_futures.append(SubscriptionTaskResultFuture(task, result_future))
+        return result_futures
 
     def flush_batch(
         self, batch: Sequence[Sequence[SubscriptionTaskResultFuture]]
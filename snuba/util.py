@@ -1,3 +1,4 @@
+import atexit
 import inspect
 import logging
 import numbers
@@ -254,7 +255,7 @@ def create_metrics(prefix: str, tags: Optional[Tags] = None) -> MetricsBackend:
     from datadog import DogStatsd
     from snuba.utils.metrics.backends.datadog import DatadogMetricsBackend
 
-    return DatadogMetricsBackend(
+    backend: MetricsBackend = DatadogMetricsBackend(
         partial(
             DogStatsd,
             host=host,
@@ -266,6 +267,17 @@ def create_metrics(prefix: str, tags: Optional[Tags] = None) -> MetricsBackend:
         ),
     )
 
+    if settings.DOGSTATSD_AGGREGATION_INTERVAL > 0:
+        from snuba.utils.metrics.backends.aggregating import AggregatingMetricsBackend
+
+        aggregating_backend = AggregatingMetricsBackend(
+            backend, settings.DOGSTATSD_AGGREGATION_INTERVAL
+        )
+        atexit.register(aggregating_backend.flush)
+        backend = aggregating_backend
+
+    return backend
+
 
 F = TypeVar("F", bound=Callable[..., Any])
 
@@ -23,6 +23,15 @@ class MetricsBackend(ABC):
 
     @abstractmethod
     def timing(
-        self, name: str, value: Union[int, float], tags: Optional[Tags] = None
+        self,
+        name: str,
+        value: Union[int, float],
+        tags: Optional[Tags] = None,
+        sample_rate: float = 1.0,
     ) -> None:
+        """
+        Records a value of a timing. A ``sample_rate`` lower than 1 means
+        that the value was sampled from the recorded values, and stands for
+        ``1 / sample_rate`` of them (so that their count can be estimated.)
+        """
         raise NotImplementedError
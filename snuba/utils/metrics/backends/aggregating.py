@@ -0,0 +1,159 @@
+import random
+import time
+from threading import Lock
+from typing import (
+    Callable,
+    MutableMapping,
+    MutableSequence,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from snuba.utils.metrics.backends.abstract import MetricsBackend
+from snuba.utils.metrics.types import Tags
+
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class TimingSamples:
+    """
+    Keeps a uniform sample of at most ``max_samples`` of the values of a
+    timing (with reservoir sampling), and the number of values that were
+    recorded, accounting for the values that were already sampled.
+    """
+
+    __slots__ = ["count", "seen", "values"]
+
+    def __init__(self) -> None:
+        self.count = 0.0
+        self.seen = 0
+        self.values: MutableSequence[Union[int, float]] = []
+
+    def add(
+        self, value: Union[int, float], max_samples: int, sample_rate: float = 1.0
+    ) -> None:
+        self.count += 1 / sample_rate
+        self.seen += 1
+        if len(self.values) < max_samples:
+            self.values.append(value)
+        else:
+            index = int(random.random() * self.seen)
+            if index < max_samples:
+                self.values[index] = value
+
+    def get_sample_rate(self) -> float:
+        """
+        Returns the fraction of the recorded values that the values of this
+        sample stand for.
+        """
+        return min(len(self.values) / self.count, 1.0)
+
+
+class AggregatingMetricsBackend(MetricsBackend):
+    """
+    Wraps a metrics backend, aggregating the metrics recorded in the memory
+    of this process and sending them to the wrapped backend once every
+    ``flush_interval`` seconds rather than every time they are recorded.
+    Metrics are aggregated per name and set of tags:
+
+    - the values of counters are summed,
+    - only the latest value of gauges is sent,
+    - at most ``max_timing_samples`` values of each timing are sent. If more
+      values were recorded, a uniform sample of them is sent with the
+      corresponding sample rate, so that both the distribution and the count
+      of the timing are preserved.
+
+    Metrics are flushed by the first call made after the interval has
+    expired (there is no background thread), or by calling ``flush``.
+    """
+
+    def __init__(
+        self,
+        backend: MetricsBackend,
+        flush_interval: float,
+        max_timing_samples: int = 100,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.__backend = backend
+        self.__flush_interval = flush_interval
+        self.__max_timing_samples = max_timing_samples
+        self.__clock = clock
+
+        self.__lock = Lock()
+        self.__tags: MutableMapping[MetricKey, Optional[Tags]] = {}
+        self.__counters: MutableMapping[MetricKey, Union[int, float]] = {}
+        self.__gauges: MutableMapping[MetricKey, Union[int, float]] = {}
+        self.__timings: MutableMapping[MetricKey, TimingSamples] = {}
+        self.__next_flush = clock() + flush_interval
+
+    def __get_key(self, name: str, tags: Optional[Tags]) -> MetricKey:
+        if tags is None:
+            key: MetricKey = (name, ())
+        else:
+            key = (name, tuple(sorted(tags.items())))
+
+        if key not in self.__tags:
+            self.__tags[key] = {**tags} if tags is not None else None
+        return key
+
+    def increment(
+        self, name: str, value: Union[int, float] = 1, tags: Optional[Tags] = None
+    ) -> None:
+        with self.__lock:
+            key = self.__get_key(name, tags)
+            self.__counters[key] = self.__counters.get(key, 0) + value
+        if self.__clock() >= self.__next_flush:
+            self.flush()
+
+    def gauge(
+        self, name: str, value: Union[int, float], tags: Optional[Tags] = None
+    ) -> None:
+        with self.__lock:
+            self.__gauges[self.__get_key(name, tags)] = value
+        if self.__clock() >= self.__next_flush:
+            self.flush()
+
+    def timing(
+        self,
+        name: str,
+        value: Union[int, float],
+        tags: Optional[Tags] = None,
+        sample_rate: float = 1.0,
+    ) -> None:
+        with self.__lock:
+            key = self.__get_key(name, tags)
+            samples = self.__timings.get(key)
+            if samples is None:
+                samples = self.__timings[key] = TimingSamples()
+            samples.add(value, self.__max_timing_samples, sample_rate)
+        if self.__clock() >= self.__next_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Sends all the metrics aggregated since the previous flush to the
+        wrapped backend.
+        """
+        with self.__lock:
+            tags = self.__tags
+            counters = self.__counters
+            gauges = self.__gauges
+            timings = self.__timings
+            self.__tags = {}
+            self.__counters = {}
+            self.__gauges = {}
+            self.__timings = {}
+            self.__next_flush = self.__clock() + self.__flush_interval
+
+        # The metrics are sent outside of the lock so that the threads
+        # recording metrics are not blocked while they are sent.
+        for key, value in counters.items():
+            self.__backend.increment(key[0], value, tags[key])
+        for key, value in gauges.items():
+            self.__backend.gauge(key[0], value, tags[key])
+        for key, samples in timings.items():
+            sample_rate = samples.get_sample_rate()
+            for value in samples.values:
+                self.__backend.timing(key[0], value, tags[key], sample_rate)
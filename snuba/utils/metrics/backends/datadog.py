@@ -1,3 +1,4 @@
+import random
 import threading
 from typing import Callable, Optional, Mapping, Sequence, Union
 
@@ -65,11 +66,34 @@ class DatadogMetricsBackend(MetricsBackend):
         )
 
     def timing(
-        self, name: str, value: Union[int, float], tags: Optional[Tags] = None
+        self,
+        name: str,
+        value: Union[int, float],
+        tags: Optional[Tags] = None,
+        sample_rate: float = 1.0,
     ) -> None:
-        self.__client.timing(
-            name,
-            value,
-            tags=self.__normalize_tags(tags),
-            sample_rate=self.__sample_rates.get(name, 1.0),
+        if sample_rate == 1.0:
+            self.__client.timing(
+                name,
+                value,
+                tags=self.__normalize_tags(tags),
+                sample_rate=self.__sample_rates.get(name, 1.0),
+            )
+            return
+
+        # ``DogStatsd`` drops values at random according to the sample rate
+        # it is given, but this value was already sampled: only the configured
+        # sample rate is applied here, and the packet is sent with the
+        # combined rate (formatted as ``DogStatsd._report`` does) so that the
+        # agent scales the count of the timing accordingly.
+        configured_sample_rate = self.__sample_rates.get(name, 1.0)
+        if configured_sample_rate < 1.0 and random.random() > configured_sample_rate:
+            return
+
+        client = self.__client
+        prefix = f"{client.namespace}." if client.namespace else ""
+        packet_tags = [*(self.__normalize_tags(tags) or []), *client.constant_tags]
+        suffix = f"|#{','.join(packet_tags)}" if packet_tags else ""
+        client._send(
+            f"{prefix}{name}:{value}|ms|@{configured_sample_rate * sample_rate}{suffix}"
         )
@@ -43,10 +43,15 @@ class DummyMetricsBackend(MetricsBackend):
                 self.__validate_tags(tags)
 
     def timing(
-        self, name: str, value: Union[int, float], tags: Optional[Tags] = None
+        self,
+        name: str,
+        value: Union[int, float],
+        tags: Optional[Tags] = None,
+        sample_rate: float = 1.0,
     ) -> None:
         if self.__strict:
             assert isinstance(name, str)
             assert isinstance(value, (int, float))
+            assert 0 < sample_rate <= 1
             if tags is not None:
                 self.__validate_tags(tags)
@@ -43,6 +43,12 @@ class MetricsWrapper(MetricsBackend):
         self.__backend.gauge(self.__merge_name(name), value, self.__merge_tags(tags))
 
     def timing(
-        self, name: str, value: Union[int, float], tags: Optional[Tags] = None
+        self,
+        name: str,
+        value: Union[int, float],
+        tags: Optional[Tags] = None,
+        sample_rate: float = 1.0,
     ) -> None:
-        self.__backend.timing(self.__merge_name(name), value, self.__merge_tags(tags))
+        self.__backend.timing(
+            self.__merge_name(name), value, self.__merge_tags(tags), sample_rate
+        )
@@ -104,6 +104,25 @@ class Consumer(Generic[TPayload], ABC):
         """
         raise NotImplementedError
 
+    def poll_batch(
+        self, max_messages: int, timeout: Optional[float] = None
+    ) -> Sequence[Message[TPayload]]:
+        """
+        Fetch up to ``max_messages`` messages from the consumer, in the
+        order they would have been returned by consecutive calls to
+        ``poll``. This method blocks up to the timeout until at least one
+        message is available, and returns an empty sequence otherwise.
+
+        Errors that would have been raised by ``poll`` once some messages
+        have been fetched are raised by the following call instead, so that
+        the messages fetched before the error are not lost.
+
+        The default implementation fetches at most one message: backends
+        should override it to amortize the cost of fetching messages.
+        """
+        message = self.poll(timeout)
+        return [message] if message is not None else []
+
     @abstractmethod
     def pause(self, partitions: Sequence[Partition]) -> None:
         """
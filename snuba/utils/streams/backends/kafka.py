@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+from collections import deque
 from concurrent.futures import Future
 from datetime import datetime
 from enum import Enum
@@ -10,6 +11,7 @@ from threading import Event
 from typing import (
     Any,
     Callable,
+    Deque,
     Mapping,
     MutableMapping,
     MutableSequence,
@@ -196,6 +198,14 @@ class KafkaConsumer(Consumer[KafkaPayload]):
         self.__staged_offsets: MutableMapping[Partition, int] = {}
         self.__paused: Set[Partition] = set()
 
+        self.__partitions: MutableMapping[Tuple[str, int], Partition] = {}
+
+        # Errors received together with messages by ``poll_batch``, that are
+        # raised by the next call to ``poll`` or ``poll_batch``. They are
+        # discarded when the assignment changes or the consumer seeks, since
+        # they refer to the previous position of the consumer.
+        self.__pending_errors: Deque[ConsumerError] = deque()
+
         self.__commit_retry_policy = commit_retry_policy
 
         self.__state = KafkaConsumerState.CONSUMING
@@ -326,6 +336,8 @@ class KafkaConsumer(Consumer[KafkaPayload]):
 
                     self.__paused.discard(partition)
 
+                self.__pending_errors.clear()
+
                 self.__state = KafkaConsumerState.CONSUMING
 
         self.__consumer.subscribe(
@@ -344,6 +356,7 @@ class KafkaConsumer(Consumer[KafkaPayload]):
             raise InvalidState(self.__state)
 
         self.__consumer.unsubscribe()
+        self.__pending_errors.clear()
 
     def poll(self, timeout: Optional[float] = None) -> Optional[Message[KafkaPayload]]:
         """
@@ -376,18 +389,69 @@ class KafkaConsumer(Consumer[KafkaPayload]):
         if self.__state is not KafkaConsumerState.CONSUMING:
             raise InvalidState(self.__state)
 
+        if self.__pending_errors:
+            raise self.__pending_errors.popleft()
+
         message: Optional[ConfluentMessage] = self.__consumer.poll(
             *[timeout] if timeout is not None else []
         )
         if message is None:
             return None
 
+        return self.__parse_message(message)
+
+    def poll_batch(
+        self, max_messages: int, timeout: Optional[float] = None
+    ) -> Sequence[Message[KafkaPayload]]:
+        """
+        Return up to ``max_messages`` messages, blocking up to the
+        ``timeout`` value until at least one message is available. The
+        messages are fetched from the Confluent consumer with a single call.
+
+        Errors are raised in the same conditions as ``poll``. Errors that are
+        received together with messages are raised on the next call, after
+        these messages have been returned.
+
+        Raises an ``InvalidState`` exception if called on a closed consumer.
+        """
+        if self.__state is not KafkaConsumerState.CONSUMING:
+            raise InvalidState(self.__state)
+
+        if self.__pending_errors:
+            raise self.__pending_errors.popleft()
+
+        messages: Sequence[ConfluentMessage] = self.__consumer.consume(
+            max_messages, *[timeout] if timeout is not None else []
+        )
+
+        result: MutableSequence[Message[KafkaPayload]] = []
+        for message in messages:
+            try:
+                result.append(self.__parse_message(message))
+            except ConsumerError as error:
+                self.__pending_errors.append(error)
+
+        if not result and self.__pending_errors:
+            raise self.__pending_errors.popleft()
+
+        return result
+
+    def __get_partition(self, topic: str, index: int) -> Partition:
+        # Messages reference the same ``Partition`` instances rather than
+        # creating new ones for every message.
+        key = (topic, index)
+        partition = self.__partitions.get(key)
+        if partition is None:
+            partition = self.__partitions[key] = Partition(Topic(topic), index)
+        return partition
+
+    def __parse_message(self, message: ConfluentMessage) -> Message[KafkaPayload]:
         error: Optional[KafkaError] = message.error()
         if error is not None:
             code = error.code()
             if code == KafkaError._PARTITION_EOF:
                 raise EndOfPartition(
-                    Partition(Topic(message.topic()), message.partition()),
+                    self.__get_partition(message.topic(), message.partition()),
                     message.offset(),
                 )
             elif code == KafkaError._TRANSPORT:
@@ -399,7 +463,7 @@ class KafkaConsumer(Consumer[KafkaPayload]):
 
         headers: Optional[Headers] = message.headers()
         result = Message(
-            Partition(Topic(message.topic()), message.partition()),
+            self.__get_partition(message.topic(), message.partition()),
             message.offset(),
             KafkaPayload(
                 message.key(), message.value(), headers if headers is not None else [],
@@ -454,6 +518,7 @@ class KafkaConsumer(Consumer[KafkaPayload]):
                 )
 
         self.__offsets.update(offsets)
+        self.__pending_errors.clear()
 
     def seek(self, offsets: Mapping[Partition, int]) -> None:
         """
@@ -659,6 +724,12 @@ class KafkaConsumerWithCommitLog(KafkaConsumer):
         self.__producer.poll(0.0)
         return super().poll(timeout)
 
+    def poll_batch(
+        self, max_messages: int, timeout: Optional[float] = None
+    ) -> Sequence[Message[KafkaPayload]]:
+        self.__producer.poll(0.0)
+        return super().poll_batch(max_messages, timeout)
+
     def __commit_message_delivery_callback(
         self, error: Optional[KafkaError], message: ConfluentMessage
     ) -> None:
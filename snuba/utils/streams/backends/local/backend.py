@@ -74,6 +74,14 @@ class LocalBroker(Generic[TPayload]):
                 partition, payload, datetime.fromtimestamp(self.__clock.time())
             )
 
+    def produce_batch(
+        self, partition: Partition, payloads: Sequence[TPayload]
+    ) -> Sequence[Message[TPayload]]:
+        with self.__lock:
+            return self.__message_storage.produce_batch(
+                partition, payloads, datetime.fromtimestamp(self.__clock.time())
+            )
+
     def subscribe(
         self, consumer: LocalConsumer[TPayload], topics: Sequence[Topic]
     ) -> Mapping[Partition, int]:
@@ -117,6 +125,12 @@ class LocalBroker(Generic[TPayload]):
         with self.__lock:
             return self.__message_storage.consume(partition, offset)
 
+    def consume_batch(
+        self, partition: Partition, offset: int, max_messages: int
+    ) -> Sequence[Message[TPayload]]:
+        with self.__lock:
+            return self.__message_storage.consume_batch(partition, offset, max_messages)
+
     def commit(
         self, consumer: LocalConsumer[TPayload], offsets: Mapping[Partition, int]
     ) -> None:
@@ -227,29 +241,62 @@ class LocalConsumer(Consumer[TPayload]):
                 callback = self.__pending_callbacks.popleft()
                 callback()
 
-            for partition, offset in sorted(self.__offsets.items()):
-                if partition in self.__paused:
-                    continue  # skip paused partitions
+            messages = self.__consume(1)
+            return messages[0] if messages else None
+
+    def poll_batch(
+        self, max_messages: int, timeout: Optional[float] = None
+    ) -> Sequence[Message[TPayload]]:
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError("consumer is closed")
+
+            while self.__pending_callbacks:
+                callback = self.__pending_callbacks.popleft()
+                callback()
+
+            return self.__consume(max_messages)
+
+    def __consume(self, max_messages: int) -> Sequence[Message[TPayload]]:
+        # Partitions are consumed in order, which returns the messages in the
+        # same order as consecutive calls to ``poll`` would.
+        messages: MutableSequence[Message[TPayload]] = []
 
+        for partition, offset in sorted(self.__offsets.items()):
+            if partition in self.__paused:
+                continue  # skip paused partitions
+
+            while len(messages) < max_messages:
                 try:
-                    message = self.__broker.consume(partition, offset)
+                    batch = self.__broker.consume_batch(
+                        partition, offset, max_messages - len(messages)
+                    )
                 except ConsumerError:
                     raise
                 except Exception as e:
                     raise ConsumerError("error consuming mesage") from e
 
-                if message is None:
+                if not batch:
                     if self.__enable_end_of_partition and (
                         partition not in self.__last_eof_at
                         or offset > self.__last_eof_at[partition]
                     ):
+                        # The end of the partition is raised on the next
+                        # call if some messages were already consumed.
+                        if messages:
+                            return messages
+
                         self.__last_eof_at[partition] = offset
                         raise EndOfPartition(partition, offset)
-                else:
-                    self.__offsets[partition] = message.next_offset
-                    return message
+                    break
+
+                messages.extend(batch)
+                offset = self.__offsets[partition] = batch[-1].next_offset
+
+            if len(messages) >= max_messages:
+                break
 
-            return None
+        return messages
 
     def pause(self, partitions: Sequence[Partition]) -> None:
         with self.__lock:
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import Iterator, Generic, Optional
+from typing import Iterator, Generic, MutableSequence, Optional, Sequence
 
 from snuba.utils.streams.types import Message, Partition, Topic, TPayload
 
@@ -75,6 +75,24 @@ class MessageStorage(ABC, Generic[TPayload]):
         """
         raise NotImplementedError
 
+    def consume_batch(
+        self, partition: Partition, offset: int, max_messages: int
+    ) -> Sequence[Message[TPayload]]:
+        """
+        Consume up to ``max_messages`` consecutive messages from the provided
+        partition, reading from the given offset. An empty sequence is
+        returned when reading from the tail of the partition. Exceptions are
+        raised in the same conditions as ``consume``.
+        """
+        messages: MutableSequence[Message[TPayload]] = []
+        while len(messages) < max_messages:
+            message = self.consume(partition, offset)
+            if message is None:
+                break
+            messages.append(message)
+            offset = message.next_offset
+        return messages
+
     @abstractmethod
     def produce(
         self, partition: Partition, payload: TPayload, timestamp: datetime
@@ -87,3 +105,12 @@ class MessageStorage(ABC, Generic[TPayload]):
         ``PartitionDoesNotExist`` exception will be raised.
         """
         raise NotImplementedError
+
+    def produce_batch(
+        self, partition: Partition, payloads: Sequence[TPayload], timestamp: datetime
+    ) -> Sequence[Message[TPayload]]:
+        """
+        Produce a sequence of messages to the provided partition, in order.
+        Exceptions are raised in the same conditions as ``produce``.
+        """
+        return [self.produce(partition, payload, timestamp) for payload in payloads]
@@ -1,4 +1,6 @@
 import itertools
+import mmap
+import os
 import pickle
 from binascii import crc32
 from datetime import datetime
@@ -172,3 +174,211 @@ class FileMessageStorage(MessageStorage[TPayload]):
         payload, timestamp = self.__codec.decode(encoded)
 
         return Message(partition, offset, payload, timestamp, file.tell())
+
+
+class MappedFilePartition:
+    """
+    Appends records to a partition file and reads them through a memory map
+    of the file. Records are addressed by their sequence number in the file
+    rather than by their position: the position of every
+    ``index_interval``-th record is kept in a sparse index, which is rebuilt
+    by scanning the record headers when the partition is opened, and the
+    position following the last record read is remembered so that
+    sequential reads never need to scan.
+    """
+
+    def __init__(self, path: Path, header: Struct, index_interval: int) -> None:
+        self.__path = path
+        self.__header = header
+        self.__index_interval = index_interval
+
+        self.__map: Optional[mmap.mmap] = None
+
+        # The positions of the records at offsets 0, ``index_interval``,
+        # 2 * ``index_interval``...
+        self.__index: MutableSequence[int] = []
+        self.__count = 0
+        self.__size = 0
+        self.__cursor: Tuple[int, int] = (0, 0)
+
+        self.__load()
+        self.__writer = path.open("ab")
+
+    def __load(self) -> None:
+        file_size = self.__path.lstat().st_size
+        if file_size > 0:
+            data = self.__get_map(file_size)
+            position = 0
+            while position + self.__header.size <= file_size:
+                [size, _] = self.__header.unpack_from(data, position)
+                end = position + self.__header.size + size
+                if end > file_size:
+                    break
+                if self.__count % self.__index_interval == 0:
+                    self.__index.append(position)
+                self.__count += 1
+                position = end
+            self.__size = position
+
+        # A partial record at the end of the file (left by an interrupted
+        # write) is dropped, so that the next records are written after the
+        # last complete one.
+        if self.__size < file_size:
+            self.__map = None
+            os.truncate(self.__path, self.__size)
+
+    def __get_map(self, size: int) -> mmap.mmap:
+        # The map is replaced (rather than resized) when the file grows, as
+        # the previous map may still be referenced.
+        if self.__map is None or len(self.__map) < size:
+            with self.__path.open("rb") as file:
+                self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__map
+
+    def close(self) -> None:
+        self.__writer.close()
+        self.__map = None
+
+    def append(self, records: Sequence[bytes]) -> int:
+        """
+        Appends records to the file with a single write, and returns the
+        offset of the first record.
+        """
+        offset = self.__count
+        buffer = bytearray()
+        index: MutableSequence[int] = []
+        for i, encoded in enumerate(records):
+            if (offset + i) % self.__index_interval == 0:
+                index.append(self.__size + len(buffer))
+            buffer += self.__header.pack(len(encoded), crc32(encoded))
+            buffer += encoded
+
+        self.__writer.write(buffer)
+        self.__writer.flush()
+
+        self.__index.extend(index)
+        self.__count += len(records)
+        self.__size += len(buffer)
+        return offset
+
+    def __find(self, offset: int) -> int:
+        if self.__cursor[0] == offset:
+            return self.__cursor[1]
+
+        data = self.__get_map(self.__size)
+        indexed_offset = offset - offset % self.__index_interval
+        position = self.__index[indexed_offset // self.__index_interval]
+        for _ in range(offset - indexed_offset):
+            [size, _] = self.__header.unpack_from(data, position)
+            position += self.__header.size + size
+        return position
+
+    def read(self, offset: int, max_records: int) -> Sequence[bytes]:
+        """
+        Reads up to ``max_records`` consecutive records from the given
+        offset, verifying their checksums.
+        """
+        if offset > self.__count:
+            raise OffsetOutOfRange()
+
+        end = min(offset + max_records, self.__count)
+        if offset >= end:
+            return []
+
+        position = self.__find(offset)
+        data = self.__get_map(self.__size)
+        header_size = self.__header.size
+        unpack_header = self.__header.unpack_from
+
+        records: MutableSequence[bytes] = []
+        for _ in range(end - offset):
+            [size, expected_checksum] = unpack_header(data, position)
+            position += header_size
+            encoded = data[position : position + size]
+            position += size
+            actual_checksum = crc32(encoded)
+            if not actual_checksum == expected_checksum:
+                raise InvalidChecksum(
+                    f"checksum mismatch: expected {expected_checksum:#0x}, got {actual_checksum:#0x}"
+                )
+            records.append(encoded)
+
+        self.__cursor = (end, position)
+        return records
+
+
+class MappedFileMessageStorage(FileMessageStorage[TPayload]):
+    """
+    Stores messages in the same files as ``FileMessageStorage``, but reads
+    them through memory maps, writes batches of messages with a single write
+    and flush, and uses the sequence numbers of the messages in their
+    partition as offsets (like Kafka does.) This avoids a system call for
+    every message read, which makes replaying large files much faster.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        codec: Codec[bytes, Tuple[TPayload, datetime]] = PickleCodec(),
+        index_interval: int = 1000,
+    ) -> None:
+        super().__init__(directory, codec)
+        self.__directory = Path(directory)
+        self.__codec = codec
+        self.__index_interval = index_interval
+
+        self.__record_header = Struct("!LI")
+        self.__partitions: MutableMapping[Partition, MappedFilePartition] = {}
+
+    def delete_topic(self, topic: Topic) -> None:
+        for partition in [p for p in self.__partitions if p.topic == topic]:
+            self.__partitions.pop(partition).close()
+
+        super().delete_topic(topic)
+
+    def __get_mapped_partition(self, partition: Partition) -> MappedFilePartition:
+        mapped_partition = self.__partitions.get(partition)
+        if mapped_partition is None:
+            partition_count = self.get_partition_count(partition.topic)
+            if not 0 <= partition.index < partition_count:
+                raise PartitionDoesNotExist(partition)
+
+            mapped_partition = self.__partitions[partition] = MappedFilePartition(
+                self.__directory / partition.topic.name / str(partition.index),
+                self.__record_header,
+                self.__index_interval,
+            )
+
+        return mapped_partition
+
+    def produce(
+        self, partition: Partition, payload: TPayload, timestamp: datetime
+    ) -> Message[TPayload]:
+        return self.produce_batch(partition, [payload], timestamp)[0]
+
+    def produce_batch(
+        self, partition: Partition, payloads: Sequence[TPayload], timestamp: datetime
+    ) -> Sequence[Message[TPayload]]:
+        offset = self.__get_mapped_partition(partition).append(
+            [self.__codec.encode((payload, timestamp)) for payload in payloads]
+        )
+        return [
+            Message(partition, offset + i, payload, timestamp)
+            for i, payload in enumerate(payloads)
+        ]
+
+    def consume(self, partition: Partition, offset: int) -> Optional[Message[TPayload]]:
+        messages = self.consume_batch(partition, offset, 1)
+        return messages[0] if messages else None
+
+    def consume_batch(
+        self, partition: Partition, offset: int, max_messages: int
+    ) -> Sequence[Message[TPayload]]:
+        messages: MutableSequence[Message[TPayload]] = []
+        for encoded in self.__get_mapped_partition(partition).read(
+            offset, max_messages
+        ):
+            payload, timestamp = self.__codec.decode(encoded)
+            messages.append(Message(partition, offset, payload, timestamp))
+            offset += 1
+        return messages
@@ -33,16 +33,20 @@ class StreamProcessor(Generic[TPayload]):
         topic: Topic,
         processor_factory: ProcessingStrategyFactory[TPayload],
         recoverable_errors: Optional[Sequence[Type[ConsumerError]]] = None,
+        max_poll_batch_size: int = 1,
     ) -> None:
         self.__consumer = consumer
         self.__processor_factory = processor_factory
+        self.__max_poll_batch_size = max_poll_batch_size
 
         # The types passed to the `except` clause must be a tuple, not a Sequence.
         self.__recoverable_errors = tuple(recoverable_errors or [])
 
         self.__processing_strategy: Optional[ProcessingStrategy[TPayload]] = None
 
-        self.__message: Optional[Message[TPayload]] = None
+        # The messages that were fetched from the consumer but not accepted
+        # by the processing strategy yet.
+        self.__messages: Sequence[Message[TPayload]] = []
 
         self.__shutdown_requested = False
 
@@ -77,7 +81,7 @@ class StreamProcessor(Generic[TPayload]):
                 self.__processing_strategy,
             )
             self.__processing_strategy = None
-            self.__message = None  # avoid leaking buffered messages across assignments
+            self.__messages = []  # avoid leaking buffered messages across assignments
 
         self.__consumer.subscribe(
             [topic], on_assign=on_partitions_assigned, on_revoke=on_partitions_revoked
@@ -115,53 +119,81 @@ class StreamProcessor(Generic[TPayload]):
 
             raise
 
+    def __poll(self, timeout: float) -> Sequence[Message[TPayload]]:
+        if self.__max_poll_batch_size > 1:
+            return self.__consumer.poll_batch(self.__max_poll_batch_size, timeout)
+
+        message = self.__consumer.poll(timeout=timeout)
+        return [message] if message is not None else []
+
+    def __submit(
+        self,
+        processing_strategy: ProcessingStrategy[TPayload],
+        messages: Sequence[Message[TPayload]],
+    ) -> int:
+        if len(messages) > 1:
+            return processing_strategy.submit_batch(messages)
+
+        try:
+            processing_strategy.submit(messages[0])
+        except MessageRejected:
+            return 0
+        return 1
+
     def _run_once(self) -> None:
-        message_carried_over = self.__message is not None
+        messages_carried_over = len(self.__messages) > 0
+
+        if messages_carried_over:
+            # If messages were carried over from the previous run, the consumer
+            # should be paused and not returning any messages on ``poll``. It
+            # may still raise the errors it received together with these
+            # messages, which are handled as usual.
+            try:
+                messages = self.__poll(timeout=0)
+            except self.__recoverable_errors:
+                messages = []
 
-        if message_carried_over:
-            # If a message was carried over from the previous run, the consumer
-            # should be paused and not returning any messages on ``poll``.
-            if self.__consumer.poll(timeout=0) is not None:
+            if messages:
                 raise InvalidStateError(
                     "received message when consumer was expected to be paused"
                 )
         else:
-            # Otherwise, we need to try fetch a new message from the consumer,
+            # Otherwise, we need to try fetch new messages from the consumer,
             # even if there is no active assignment and/or processing strategy.
             try:
-                self.__message = self.__consumer.poll(timeout=1.0)
+                self.__messages = self.__poll(timeout=1.0)
             except self.__recoverable_errors:
                 return
 
         if self.__processing_strategy is not None:
             self.__processing_strategy.poll()
-            if self.__message is not None:
-                try:
-                    self.__processing_strategy.submit(self.__message)
-                except MessageRejected as e:
-                    # If the processing strategy rejected our message, we need
-                    # to pause the consumer and hold the message until it is
-                    # accepted, at which point we can resume consuming.
-                    if not message_carried_over:
+            if self.__messages:
+                accepted = self.__submit(self.__processing_strategy, self.__messages)
+                if accepted < len(self.__messages):
+                    # If the processing strategy rejected some messages, we
+                    # need to pause the consumer and hold the messages until
+                    # they are accepted, at which point we can resume
+                    # consuming.
+                    if not messages_carried_over:
                         logger.debug(
-                            "Caught %r while submitting %r, pausing consumer...",
-                            e,
-                            self.__message,
+                            "Processing strategy rejected %r, pausing consumer...",
+                            self.__messages[accepted],
                         )
                         self.__consumer.pause([*self.__consumer.tell().keys()])
+                    self.__messages = self.__messages[accepted:]
                 else:
-                    # If we were trying to submit a message that failed to be
+                    # If we were trying to submit messages that failed to be
                     # submitted on a previous run, we can resume accepting new
                     # messages.
-                    if message_carried_over:
+                    if messages_carried_over:
                         logger.debug(
                             "Successfully submitted %r, resuming consumer...",
-                            self.__message,
+                            self.__messages[-1],
                         )
                         self.__consumer.resume([*self.__consumer.tell().keys()])
-                    self.__message = None
+                    self.__messages = []
         else:
-            if self.__message is not None:
+            if self.__messages:
                 raise InvalidStateError(
                     "received message without active processing strategy"
                 )
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Mapping, Optional
+from typing import Callable, Generic, Mapping, Optional, Sequence
 
 from snuba.utils.streams.types import Message, Partition, TPayload
 
@@ -51,6 +51,27 @@ class ProcessingStrategy(ABC, Generic[TPayload]):
         """
         raise NotImplementedError
 
+    def submit_batch(self, messages: Sequence[Message[TPayload]]) -> int:
+        """
+        Submit a sequence of messages for processing, in order.
+
+        The processing strategy may only accept the first messages of the
+        sequence (due to it reaching its capacity, for example.) The number
+        of messages that were accepted is returned, and the remaining
+        messages must be submitted again later.
+
+        The default implementation submits the messages one by one:
+        strategies can override it to amortize the cost of processing each
+        message.
+        """
+        for accepted, message in enumerate(messages):
+            try:
+                self.submit(message)
+            except MessageRejected:
+                return accepted
+
+        return len(messages)
+
     @abstractmethod
     def close(self) -> None:
         """
@@ -50,6 +50,18 @@ class AbstractBatchWorker(ABC, Generic[TPayload, TResult]):
         """
         pass
 
+    def process_messages(
+        self, messages: Sequence[Message[TPayload]]
+    ) -> Sequence[Optional[TResult]]:
+        """
+        Called with a sequence of raw messages, returning the result of
+        processing each of them (as ``process_message`` would.)
+
+        The default implementation calls ``process_message`` for every
+        message: workers can override it to process the messages together.
+        """
+        return [self.process_message(message) for message in messages]
+
     @abstractmethod
     def flush_batch(self, batch: Sequence[TResult]) -> None:
         """
@@ -168,6 +180,80 @@ class BatchProcessingStrategy(ProcessingStrategy[TPayload]):
                 message.offset, message.next_offset
             )
 
+    def submit_batch(self, messages: Sequence[Message[TPayload]]) -> int:
+        """
+        Process a sequence of messages. The metrics are recorded once per
+        call rather than once per message, and the batch is flushed as soon
+        as it is full so that it never exceeds the maximum batch size.
+        """
+        assert not self.__closed
+
+        position = 0
+        while position < len(messages):
+            if self.__batch is not None and (
+                len(self.__batch.results) >= self.__max_batch_size
+            ):
+                self.__flush()
+            position = self.__process_messages(messages, position)
+
+        return len(messages)
+
+    def __process_messages(
+        self, messages: Sequence[Message[TPayload]], position: int
+    ) -> int:
+        """
+        Process messages into the active batch, starting at ``position``,
+        until the batch is full or all the messages have been processed. The
+        messages are handed to the worker together.
+        Returns the position of the first message that was not processed.
+        """
+        start = time.time()
+
+        if self.__batch is None:
+            self.__batch = Batch()
+
+        results = self.__batch.results
+        offsets = self.__batch.offsets
+        latest: MutableMapping[Partition, Message[TPayload]] = {}
+
+        # Each message produces at most one result, so processing at most
+        # as many messages as the batch has room for cannot overflow it.
+        end = min(len(messages), position + self.__max_batch_size - len(results))
+        chunk = messages[position:end]
+
+        for message, result in zip(chunk, self.__worker.process_messages(chunk)):
+            # XXX: ``None`` is indistinguishable from a potentially valid return
+            # value of ``TResult``!
+            if result is not None:
+                results.append(result)
+
+            partition_offsets = offsets.get(message.partition)
+            if partition_offsets is not None:
+                partition_offsets.hi = message.next_offset
+            else:
+                offsets[message.partition] = Offsets(
+                    message.offset, message.next_offset
+                )
+
+            latest[message.partition] = message
+
+        # The receive latency is only recorded for the last message of each
+        # partition.
+        for partition, message in latest.items():
+            self.__metrics.timing(
+                "receive_latency",
+                (start - message.timestamp.timestamp()) * 1000,
+                tags={"topic": partition.topic.name, "partition": str(partition.index)},
+            )
+
+        count = end - position
+        duration = (time.time() - start) * 1000
+        self.__batch.messages_processed_count += count
+        self.__batch.processing_time_ms += duration
+        self.__metrics.timing("process_message", duration / count)
+
+        return end
+
     def close(self) -> None:
         self.__closed = True
 
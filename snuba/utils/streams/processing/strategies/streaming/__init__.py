@@ -1,9 +1,19 @@
-from .collect import CollectStep
+from .collect import (
+    AdaptiveBatchSizePolicy,
+    BatchSizePolicy,
+    BatchStep,
+    CollectStep,
+    FixedBatchSizePolicy,
+)
 from .filter import FilterStep
 from .transform import ParallelTransformStep, TransformStep
 
 __all__ = [
+    "AdaptiveBatchSizePolicy",
+    "BatchSizePolicy",
+    "BatchStep",
     "CollectStep",
+    "FixedBatchSizePolicy",
     "FilterStep",
     "ParallelTransformStep",
     "TransformStep",
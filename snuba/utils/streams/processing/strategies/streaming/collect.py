@@ -1,8 +1,20 @@
 import logging
 import time
+from abc import ABC, abstractmethod
+from collections import deque
 from dataclasses import dataclass
-from typing import Callable, Generic, Mapping, MutableMapping, Optional
+from threading import Lock
+from typing import (
+    Callable,
+    Deque,
+    Generic,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+)
 
+from snuba.utils.metrics import MetricsBackend
 from snuba.utils.streams.processing.strategies.abstract import (
     ProcessingStrategy as ProcessingStep,
 )
@@ -20,10 +32,149 @@ class OffsetRange:
     hi: int  # exclusive
 
 
+class BatchSizePolicy(ABC):
+    """
+    Determines the limits of the batches built by a ``CollectStep``. The
+    limits are read again before each batch is checked, so policies may
+    adjust them based on the batches that have been written so far.
+    """
+
+    @abstractmethod
+    def get_max_batch_size(self) -> int:
+        """
+        Returns the maximum number of messages in a batch.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_max_batch_time(self) -> float:
+        """
+        Returns the maximum amount of time (in seconds) a batch is open.
+        """
+        raise NotImplementedError
+
+    def record_batch(self, length: int, size: int, latency: float, lag: float) -> None:
+        """
+        Records that a batch of ``length`` messages (of ``size`` bytes in
+        total) was written in ``latency`` seconds, ``lag`` seconds after the
+        last message in the batch was produced.
+        """
+        pass
+
+
+class FixedBatchSizePolicy(BatchSizePolicy):
+    def __init__(self, max_batch_size: int, max_batch_time: float) -> None:
+        self.__max_batch_size = max_batch_size
+        self.__max_batch_time = max_batch_time
+
+    def get_max_batch_size(self) -> int:
+        return self.__max_batch_size
+
+    def get_max_batch_time(self) -> float:
+        return self.__max_batch_time
+
+
+class AdaptiveBatchSizePolicy(BatchSizePolicy):
+    """
+    Adjusts the batch limits between the provided bounds according to the
+    batches that have been written.
+
+    Consumers that are keeping up with the stream use the smallest batches,
+    minimizing the time it takes for messages to become visible. When the
+    lag of the written batches exceeds ``max_lag`` the limits are doubled
+    (to write fewer, larger batches until the consumer catches up) and they
+    are halved again once the lag drops below half of ``max_lag``.
+
+    The batch size is also halved whenever a write takes longer than
+    ``max_latency``, and is always capped so that the expected size of a
+    batch (based on the average message size of the last batch) does not
+    exceed ``max_batch_bytes``.
+    """
+
+    def __init__(
+        self,
+        min_batch_size: int,
+        max_batch_size: int,
+        min_batch_time: float,
+        max_batch_time: float,
+        max_batch_bytes: int,
+        metrics: MetricsBackend,
+        max_lag: float = 10.0,
+        max_latency: float = 5.0,
+    ) -> None:
+        assert 0 < min_batch_size <= max_batch_size
+        assert 0 < min_batch_time <= max_batch_time
+
+        self.__min_batch_size = min_batch_size
+        self.__max_batch_size = max_batch_size
+        self.__min_batch_time = min_batch_time
+        self.__max_batch_time = max_batch_time
+        self.__max_batch_bytes = max_batch_bytes
+        self.__max_lag = max_lag
+        self.__max_latency = max_latency
+        self.__metrics = metrics
+
+        # Batches may be written by a background thread (when the collect
+        # step allows pending batches) while the limits are being read.
+        self.__lock = Lock()
+        self.__batch_size = min_batch_size
+        self.__batch_time = min_batch_time
+
+    def get_max_batch_size(self) -> int:
+        return self.__batch_size
+
+    def get_max_batch_time(self) -> float:
+        return self.__batch_time
+
+    def record_batch(self, length: int, size: int, latency: float, lag: float) -> None:
+        with self.__lock:
+            batch_size = self.__batch_size
+            batch_time = self.__batch_time
+
+            if lag > self.__max_lag:
+                batch_size *= 2
+                batch_time *= 2
+            elif lag < self.__max_lag / 2:
+                batch_size //= 2
+                batch_time /= 2
+
+            if latency > self.__max_latency:
+                batch_size = min(batch_size, self.__batch_size) // 2
+
+            if length > 0 and size > 0:
+                batch_size = min(batch_size, self.__max_batch_bytes * length // size)
+
+            self.__batch_size = max(
+                self.__min_batch_size, min(batch_size, self.__max_batch_size)
+            )
+            self.__batch_time = max(
+                self.__min_batch_time, min(batch_time, self.__max_batch_time)
+            )
+
+            self.__metrics.gauge("max_batch_size", self.__batch_size)
+            self.__metrics.gauge("max_batch_time_ms", self.__batch_time * 1000)
+
+
+class BatchStep(ProcessingStep[TPayload]):
+    """
+    A processing step that handles the messages of a single batch of a
+    ``CollectStep``.
+    """
+
+    @abstractmethod
+    def done(self) -> bool:
+        """
+        Returns whether this step has been closed and has completed all the
+        work submitted to it, without blocking. Joining a step that is done
+        does not wait for that work.
+        """
+        raise NotImplementedError
+
+
 class Batch(Generic[TPayload]):
     def __init__(
         self,
-        step: ProcessingStep[TPayload],
+        step: BatchStep[TPayload],
         commit_function: Callable[[Mapping[Partition, int]], None],
     ) -> None:
         self.__step = step
@@ -63,6 +214,9 @@ class Batch(Generic[TPayload]):
         self.__closed = True
         self.__step.close()
 
+    def done(self) -> bool:
+        return self.__closed and self.__step.done()
+
     def terminate(self) -> None:
         self.__closed = True
 
@@ -82,31 +236,71 @@ class CollectStep(ProcessingStep[TPayload]):
     """
     Collects messages into batches, periodically closing the batch and
     committing the offsets once the batch has successfully been closed.
+
+    By default a batch is joined as soon as it is closed, which blocks the
+    consumer until the batch has been completely processed. Setting
+    ``max_pending_batches`` allows that many closed batches to finish
+    processing in the background (if the step supports it) while the next
+    batch is collected. Batches are always joined, and their offsets
+    committed, in the order they were created.
+
+    The size and time limits of each batch are provided by the
+    ``batch_size_policy`` if one is provided, otherwise the fixed
+    ``max_batch_size`` and ``max_batch_time`` limits are used.
     """
 
     def __init__(
         self,
-        step_factory: Callable[[], ProcessingStep[TPayload]],
+        step_factory: Callable[[], BatchStep[TPayload]],
         commit_function: Callable[[Mapping[Partition, int]], None],
         max_batch_size: int,
         max_batch_time: float,
+        max_pending_batches: int = 0,
+        batch_size_policy: Optional[BatchSizePolicy] = None,
     ) -> None:
         self.__step_factory = step_factory
         self.__commit_function = commit_function
-        self.__max_batch_size = max_batch_size
-        self.__max_batch_time = max_batch_time
+        self.__batch_size_policy = (
+            batch_size_policy
+            if batch_size_policy is not None
+            else FixedBatchSizePolicy(max_batch_size, max_batch_time)
+        )
+        self.__max_pending_batches = max_pending_batches
 
         self.__batch: Optional[Batch[TPayload]] = None
+        self.__pending: Deque[Batch[TPayload]] = deque()
         self.__closed = False
 
+    def __join_pending_batch(self, timeout: Optional[float] = None) -> None:
+        # The batch is only removed once it has been joined, so that a batch
+        # that fails (or times out) while being joined can be joined again
+        # or terminated later.
+        batch = self.__pending[0]
+        batch.join(timeout)
+        self.__pending.popleft()
+        logger.info("Completed processing %r.", batch)
+
+    def __join_done_batches(self) -> None:
+        while self.__pending and self.__pending[0].done():
+            self.__join_pending_batch()
+
     def __close_and_reset_batch(self) -> None:
         assert self.__batch is not None
         self.__batch.close()
-        self.__batch.join()
-        logger.info("Completed processing %r.", self.__batch)
+        self.__pending.append(self.__batch)
         self.__batch = None
 
+        while len(self.__pending) > self.__max_pending_batches:
+            self.__join_pending_batch()
+
     def poll(self) -> None:
+        # Only the pending batches that are already done are joined here:
+        # ``poll`` is called before every message is submitted, so waiting
+        # for the others would block until they are complete before the next
+        # batch could be started. They are joined once there are more than
+        # ``max_pending_batches`` of them or when this step is joined.
+        self.__join_done_batches()
+
         if self.__batch is None:
             return
 
@@ -114,10 +308,10 @@ class CollectStep(ProcessingStep[TPayload]):
 
         # XXX: This adds a substantially blocking operation to the ``poll``
         # method which is bad.
-        if len(self.__batch) >= self.__max_batch_size:
+        if len(self.__batch) >= self.__batch_size_policy.get_max_batch_size():
             logger.debug("Size limit reached, closing %r...", self.__batch)
             self.__close_and_reset_batch()
-        elif self.__batch.duration() >= self.__max_batch_time:
+        elif self.__batch.duration() >= self.__batch_size_policy.get_max_batch_time():
             logger.debug("Time limit reached, closing %r...", self.__batch)
             self.__close_and_reset_batch()
 
@@ -129,21 +323,54 @@ class CollectStep(ProcessingStep[TPayload]):
 
         self.__batch.submit(message)
 
+    def submit_batch(self, messages: Sequence[Message[TPayload]]) -> int:
+        """
+        Submit a sequence of messages. The batch is closed as soon as it is
+        full (and a new batch is started for the following messages) so that
+        it never exceeds the maximum batch size.
+        """
+        assert not self.__closed
+
+        for message in messages:
+            if (
+                self.__batch is not None
+                and len(self.__batch) >= self.__batch_size_policy.get_max_batch_size()
+            ):
+                logger.debug("Size limit reached, closing %r...", self.__batch)
+                self.__close_and_reset_batch()
+
+            self.submit(message)
+
+        return len(messages)
+
     def close(self) -> None:
         self.__closed = True
 
         if self.__batch is not None:
             logger.debug("Closing %r...", self.__batch)
             self.__batch.close()
+            self.__pending.append(self.__batch)
+            self.__batch = None
 
     def terminate(self) -> None:
         self.__closed = True
 
         if self.__batch is not None:
-            self.__batch.terminate()
+            self.__pending.append(self.__batch)
+            self.__batch = None
+
+        for batch in self.__pending:
+            batch.terminate()
+
+        self.__pending.clear()
 
     def join(self, timeout: Optional[float] = None) -> None:
         if self.__batch is not None:
-            self.__batch.join(timeout)
-            logger.info("Completed processing %r.", self.__batch)
+            self.__pending.append(self.__batch)
             self.__batch = None
+
+        deadline = time.time() + timeout if timeout is not None else None
+        while self.__pending:
+            self.__join_pending_batch(
+                max(deadline - time.time(), 0) if deadline is not None else None
+            )
@@ -1,5 +1,5 @@
 import logging
-from typing import Callable, Optional
+from typing import Callable, Optional, Sequence
 
 from snuba.utils.streams.processing.strategies.abstract import (
     ProcessingStrategy as ProcessingStep,
@@ -34,6 +34,18 @@ class FilterStep(ProcessingStep[TPayload]):
         if self.__test_function(message):
             self.__next_step.submit(message)
 
+    def submit_batch(self, messages: Sequence[Message[TPayload]]) -> int:
+        assert not self.__closed
+
+        indices = [
+            i for i, message in enumerate(messages) if self.__test_function(message)
+        ]
+        accepted = self.__next_step.submit_batch([messages[i] for i in indices])
+
+        # The messages that were filtered out before the first message that
+        # was rejected by the next step are accepted.
+        return indices[accepted] if accepted < len(indices) else len(messages)
+
     def close(self) -> None:
         self.__closed = True
 
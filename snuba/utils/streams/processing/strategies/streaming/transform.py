@@ -1,24 +1,32 @@
+import itertools
 import logging
 import multiprocessing
 import pickle
 import signal
+import struct
 import time
+from array import array
 from collections import deque
+from datetime import datetime, timedelta
 from multiprocessing import Pool
 from multiprocessing.managers import SharedMemoryManager
 from multiprocessing.pool import AsyncResult
 from multiprocessing.shared_memory import SharedMemory
 from pickle import PickleBuffer
 from typing import (
+    Any,
     Callable,
     Deque,
     Generic,
     Iterator,
+    MutableMapping,
     MutableSequence,
     Optional,
     Sequence,
     Tuple,
     TypeVar,
+    Union,
+    cast,
 )
 
 from snuba.utils.metrics import MetricsBackend
@@ -27,7 +35,11 @@ from snuba.utils.streams.processing.strategies.abstract import MessageRejected
 from snuba.utils.streams.processing.strategies.abstract import (
     ProcessingStrategy as ProcessingStep,
 )
-from snuba.utils.streams.types import Message, TPayload
+from snuba.utils.streams.processing.strategies.streaming.collect import (
+    BatchSizePolicy,
+    FixedBatchSizePolicy,
+)
+from snuba.utils.streams.types import Message, Partition, TPayload
 
 
 logger = logging.getLogger(__name__)
@@ -40,24 +52,49 @@ class TransformStep(ProcessingStep[TPayload]):
     """
     Transforms a message and submits the transformed value to the next
     processing step.
+
+    If a ``batch_function`` is provided, the messages submitted together
+    with ``submit_batch`` are transformed with a single call to it instead
+    of calling ``function`` for every message. Both functions must return
+    the same values for the same messages.
+
+    Batches are always accepted in their entirety, so that no message is
+    transformed more than once: the transformed messages that the next step
+    rejects are held and submitted again when this step is polled, and no
+    more messages are accepted until all of them have been submitted.
     """
 
     def __init__(
         self,
         function: Callable[[Message[TPayload]], TTransformed],
         next_step: ProcessingStep[TTransformed],
+        batch_function: Optional[
+            Callable[[Sequence[Message[TPayload]]], Sequence[TTransformed]]
+        ] = None,
     ) -> None:
         self.__transform_function = function
+        self.__batch_transform_function = batch_function
         self.__next_step = next_step
 
+        self.__pending: Sequence[Message[Any]] = []
         self.__closed = False
 
+    def __submit_pending(self) -> None:
+        accepted = self.__next_step.submit_batch(self.__pending)
+        self.__pending = self.__pending[accepted:]
+
     def poll(self) -> None:
         self.__next_step.poll()
 
+        if self.__pending:
+            self.__submit_pending()
+
     def submit(self, message: Message[TPayload]) -> None:
         assert not self.__closed
 
+        if self.__pending:
+            raise MessageRejected()
+
         self.__next_step.submit(
             Message(
                 message.partition,
@@ -67,24 +104,51 @@ class TransformStep(ProcessingStep[TPayload]):
             )
         )
 
+    def submit_batch(self, messages: Sequence[Message[TPayload]]) -> int:
+        assert not self.__closed
+
+        if self.__batch_transform_function is None:
+            return super().submit_batch(messages)
+
+        if self.__pending:
+            return 0
+
+        values = self.__batch_transform_function(messages)
+        self.__pending = [
+            Message(message.partition, message.offset, value, message.timestamp)
+            for message, value in zip(messages, values)
+        ]
+        self.__submit_pending()
+        return len(messages)
+
     def close(self) -> None:
         self.__closed = True
 
     def terminate(self) -> None:
         self.__closed = True
+        self.__pending = []
 
         logger.debug("Terminating %r...", self.__next_step)
         self.__next_step.terminate()
 
     def join(self, timeout: Optional[float] = None) -> None:
-        self.__next_step.close()
-        self.__next_step.join(timeout)
+        deadline = time.time() + timeout if timeout is not None else None
 
+        while self.__pending:
+            if deadline is not None and time.time() > deadline:
+                logger.warning(
+                    "Timed out with %s transformed messages not submitted to %r.",
+                    len(self.__pending),
+                    self.__next_step,
+                )
+                break
 
-# A serialized message is composed of a pickled ``Message`` instance (bytes)
-# and a sequence of ``(offset, length)`` that referenced locations in a shared
-# memory block for out of band buffer transfer.
-SerializedMessage = Tuple[bytes, Sequence[Tuple[int, int]]]
+            self.poll()
+
+        self.__next_step.close()
+        self.__next_step.join(
+            timeout=max(deadline - time.time(), 0) if deadline is not None else None
+        )
 
 
 class ValueTooLarge(ValueError):
@@ -93,22 +157,45 @@ class ValueTooLarge(ValueError):
     """
 
 
+# The header of a message record: the message offset, next offset and
+# timestamp (as microseconds since the epoch), the index of the message
+# partition within the batch, whether the timestamp is serialized with the
+# payload instead, the length of the serialized payload and the number of
+# payload buffers transferred out of band.
+RECORD_HEADER = struct.Struct("<qqqHBIH")
+RECORD_BUFFER_LENGTH = struct.Struct("<Q")
+
+EPOCH = datetime(1970, 1, 1)
+
+
 class MessageBatch(Generic[TPayload]):
     """
     Contains a sequence of ``Message`` instances that are intended to be
     shared across processes.
+
+    Each message is written to the shared memory block of the batch as a
+    record with a fixed layout: a header (see ``RECORD_HEADER``), followed by
+    the payload serialized with ``pickle``, the length of each buffer of the
+    payload that supports out-of-band transfer, and these buffers. Only the
+    position of each record within the block and the partitions of the
+    messages are kept outside of the block, so sending a batch to a different
+    process does not require serializing its messages again.
     """
 
     def __init__(self, block: SharedMemory) -> None:
         self.block = block
-        self.__items: MutableSequence[SerializedMessage] = []
+        self.__positions = array("Q")
+        self.__partitions: MutableSequence[Partition] = []
+        self.__partition_indices: MutableMapping[Partition, int] = {}
+        self.__last_partition: Optional[Partition] = None
+        self.__last_partition_index = -1
         self.__offset = 0
 
     def __repr__(self) -> str:
         return f"<{type(self).__name__}: {len(self)} items, {self.__offset} bytes>"
 
     def __len__(self) -> int:
-        return len(self.__items)
+        return len(self.__positions)
 
     def __getitem__(self, index: int) -> Message[TPayload]:
         """
@@ -119,7 +206,29 @@ class MessageBatch(Generic[TPayload]):
         around without requiring any special accomodation to keep the shared
         block open or free from conflicting updates.
         """
-        data, buffers = self.__items[index]
+        buf = self.block.buf
+        position = self.__positions[index]
+        (
+            offset,
+            next_offset,
+            timestamp,
+            partition_index,
+            timestamp_in_payload,
+            length,
+            buffer_count,
+        ) = RECORD_HEADER.unpack_from(buf, position)
+        position += RECORD_HEADER.size
+
+        # The serialized payload is read directly from the shared memory
+        # block, since it is no longer needed once it has been deserialized.
+        data = buf[position : position + length]
+        position += length
+
+        buffer_lengths = []
+        for _ in range(buffer_count):
+            buffer_lengths.append(RECORD_BUFFER_LENGTH.unpack_from(buf, position)[0])
+            position += RECORD_BUFFER_LENGTH.size
+
         # The buffers read from the shared memory block are converted to
         # ``bytes`` rather than being forwarded as ``memoryview`` for two
         # reasons. First, true buffer support protocol is still pretty rare (at
@@ -134,12 +243,25 @@ class MessageBatch(Generic[TPayload]):
         # was still "alive" in a different part of the processing pipeline, the
         # contents of the message would be liable to be corrupted (at best --
         # possibly causing a data leak/security issue at worst.)
-        return pickle.loads(
-            data,
-            buffers=[
-                self.block.buf[offset : offset + length].tobytes()
-                for offset, length in buffers
-            ],
+        buffers = []
+        for buffer_length in buffer_lengths:
+            buffers.append(buf[position : position + buffer_length].tobytes())
+            position += buffer_length
+
+        with data:
+            payload = pickle.loads(data, buffers=buffers)
+
+        if timestamp_in_payload:
+            payload, message_timestamp = payload
+        else:
+            message_timestamp = EPOCH + timedelta(microseconds=timestamp)
+
+        return Message(
+            self.__partitions[partition_index],
+            offset,
+            payload,
+            message_timestamp,
+            next_offset,
         )
 
     def __iter__(self) -> Iterator[Message[TPayload]]:
@@ -149,38 +271,92 @@ class MessageBatch(Generic[TPayload]):
         See ``__getitem__`` for more details about the ``Message`` instances
         yielded by the iterator returned by this method.
         """
-        for i in range(len(self.__items)):
+        for i in range(len(self.__positions)):
             yield self[i]
 
     def append(self, message: Message[TPayload]) -> None:
         """
         Add a message to this batch.
 
-        Internally, this serializes the message using ``pickle`` (effectively
-        creating a copy of the input), writing any data that supports
-        out-of-band buffer transfer via the ``PickleBuffer`` interface to the
-        shared memory block associated with this batch. If there is not
-        enough space in the shared memory block to write all buffers to be
-        transferred out-of-band, this method will raise a ``ValueTooLarge``
-        error.
+        Internally, this serializes the message payload using ``pickle``
+        (effectively creating a copy of the input) and writes it to the
+        shared memory block associated with this batch, along with any data
+        that supports out-of-band buffer transfer via the ``PickleBuffer``
+        interface. If there is not enough space in the shared memory block to
+        write the message, this method will raise a ``ValueTooLarge`` error.
         """
-        buffers: MutableSequence[Tuple[int, int]] = []
+        buffers: MutableSequence[memoryview] = []
 
         def buffer_callback(buffer: PickleBuffer) -> None:
-            value = buffer.raw()
-            offset = self.__offset
-            length = len(value)
-            if offset + length > self.block.size:
-                raise ValueTooLarge(
-                    f"value exceeds available space in block, {length} bytes needed but {self.block.size - offset} bytes free"
-                )
-            self.block.buf[offset : offset + length] = value
-            self.__offset += length
-            buffers.append((offset, length))
+            buffers.append(buffer.raw())
+
+        # Timestamps with time zones cannot be represented in the header, so
+        # they are serialized along with the payload.
+        timestamp_in_payload = message.timestamp.tzinfo is not None
+        data = pickle.dumps(
+            (message.payload, message.timestamp)
+            if timestamp_in_payload
+            else message.payload,
+            protocol=5,
+            buffer_callback=buffer_callback,
+        )
 
-        data = pickle.dumps(message, protocol=5, buffer_callback=buffer_callback)
+        offset = self.__offset
+        length = (
+            RECORD_HEADER.size
+            + len(data)
+            + RECORD_BUFFER_LENGTH.size * len(buffers)
+            + sum(map(len, buffers))
+        )
+        if offset + length > self.block.size:
+            raise ValueTooLarge(
+                f"value exceeds available space in block, {length} bytes needed but {self.block.size - offset} bytes free"
+            )
+
+        # Consecutive messages usually share the same ``Partition`` instance,
+        # which avoids hashing it to find its index.
+        partition = message.partition
+        if partition is self.__last_partition:
+            partition_index = self.__last_partition_index
+        else:
+            partition_index = self.__partition_indices.get(partition, -1)
+            if partition_index < 0:
+                partition_index = len(self.__partitions)
+                self.__partition_indices[partition] = partition_index
+                self.__partitions.append(partition)
+            self.__last_partition = partition
+            self.__last_partition_index = partition_index
+
+        buf = self.block.buf
+        position = offset
+        RECORD_HEADER.pack_into(
+            buf,
+            position,
+            message.offset,
+            message.next_offset,
+            0
+            if timestamp_in_payload
+            else (message.timestamp - EPOCH) // timedelta(microseconds=1),
+            partition_index,
+            timestamp_in_payload,
+            len(data),
+            len(buffers),
+        )
+        position += RECORD_HEADER.size
+
+        buf[position : position + len(data)] = data
+        position += len(data)
+
+        for buffer in buffers:
+            RECORD_BUFFER_LENGTH.pack_into(buf, position, len(buffer))
+            position += RECORD_BUFFER_LENGTH.size
+
+        for buffer in buffers:
+            buf[position : position + len(buffer)] = buffer
+            position += len(buffer)
 
-        self.__items.append((data, buffers))
+        self.__positions.append(offset)
+        self.__offset += length
 
 
 class BatchBuilder(Generic[TPayload]):
@@ -250,7 +426,48 @@ def parallel_transform_worker_apply(
     return (i, output_batch)
 
 
+def parallel_transform_worker_apply_batch(
+    function: Callable[[Sequence[Message[TPayload]]], Sequence[TTransformed]],
+    input_batch: MessageBatch[TPayload],
+    output_block: SharedMemory,
+) -> Tuple[MessageBatch[TTransformed], Sequence[Message[TTransformed]]]:
+    """
+    Transforms all of the messages of the input batch with a single call.
+    The transformed messages are written to the output batch, and the ones
+    that do not fit in it are returned along with it (rather than being
+    transformed again later, which would repeat any side effects of the
+    function.)
+    """
+    output_batch: MessageBatch[TTransformed] = MessageBatch(output_block)
+    overflow: MutableSequence[Message[TTransformed]] = []
+
+    values = function(list(input_batch))
+    for message, value in zip(input_batch, values):
+        transformed = Message(
+            message.partition, message.offset, value, message.timestamp
+        )
+        if not overflow:
+            try:
+                output_batch.append(transformed)
+                continue
+            except ValueTooLarge:
+                pass
+        overflow.append(transformed)
+
+    return output_batch, overflow
+
+
 class ParallelTransformStep(ProcessingStep[TPayload]):
+    """
+    Transforms messages in batches using a pool of worker processes, and
+    submits the transformed values to the next processing step in order.
+
+    If a ``batch_function`` is provided, the workers use it to transform all
+    of the messages of a batch with a single call instead of calling
+    ``function`` for every message. Both functions must return the same
+    values for the same messages.
+    """
+
     def __init__(
         self,
         function: Callable[[Message[TPayload]], TTransformed],
@@ -261,11 +478,19 @@ class ParallelTransformStep(ProcessingStep[TPayload]):
         input_block_size: int,
         output_block_size: int,
         metrics: MetricsBackend,
+        batch_size_policy: Optional[BatchSizePolicy] = None,
+        batch_function: Optional[
+            Callable[[Sequence[Message[TPayload]]], Sequence[TTransformed]]
+        ] = None,
     ) -> None:
         self.__transform_function = function
+        self.__batch_transform_function = batch_function
         self.__next_step = next_step
-        self.__max_batch_size = max_batch_size
-        self.__max_batch_time = max_batch_time
+        self.__batch_size_policy = (
+            batch_size_policy
+            if batch_size_policy is not None
+            else FixedBatchSizePolicy(max_batch_size, max_batch_time)
+        )
 
         self.__shared_memory_manager = SharedMemoryManager()
         self.__shared_memory_manager.start()
@@ -287,7 +512,14 @@ class ParallelTransformStep(ProcessingStep[TPayload]):
         self.__results: Deque[
             Tuple[
                 MessageBatch[TPayload],
-                AsyncResult[Tuple[int, MessageBatch[TTransformed]]],
+                Union[
+                    AsyncResult[Tuple[int, MessageBatch[TTransformed]]],
+                    AsyncResult[
+                        Tuple[
+                            MessageBatch[TTransformed], Sequence[Message[TTransformed]]
+                        ]
+                    ],
+                ],
             ]
         ] = deque()
 
@@ -295,17 +527,37 @@ class ParallelTransformStep(ProcessingStep[TPayload]):
 
         self.__closed = False
 
+    def __apply_async(
+        self,
+        input_batch: MessageBatch[TPayload],
+        output_block: SharedMemory,
+        start_index: int = 0,
+    ) -> "AsyncResult[Tuple[int, MessageBatch[TTransformed]]]":
+        return self.__pool.apply_async(
+            parallel_transform_worker_apply,
+            (self.__transform_function, input_batch, output_block, start_index),
+        )
+
+    def __apply_batch_async(
+        self, input_batch: MessageBatch[TPayload], output_block: SharedMemory,
+    ) -> "AsyncResult[Tuple[MessageBatch[TTransformed], Sequence[Message[TTransformed]]]]":
+        assert self.__batch_transform_function is not None
+        return self.__pool.apply_async(
+            parallel_transform_worker_apply_batch,
+            (self.__batch_transform_function, input_batch, output_block),
+        )
+
     def __submit_batch(self) -> None:
         assert self.__batch_builder is not None
         batch = self.__batch_builder.build()
         logger.debug("Submitting %r to %r...", batch, self.__pool)
+        output_block = self.__output_blocks.pop()
         self.__results.append(
             (
                 batch,
-                self.__pool.apply_async(
-                    parallel_transform_worker_apply,
-                    (self.__transform_function, batch, self.__output_blocks.pop()),
-                ),
+                self.__apply_batch_async(batch, output_block)
+                if self.__batch_transform_function is not None
+                else self.__apply_async(batch, output_block),
             )
         )
         self.__batches_in_progress.increment()
@@ -322,10 +574,21 @@ class ParallelTransformStep(ProcessingStep[TPayload]):
             # ``TimeoutError``) maintains consistency with ``AsyncResult.get``.
             raise multiprocessing.TimeoutError()
 
-        i, output_batch = result.get(timeout=timeout)
+        # Batch transforms always transform the entire input batch, returning
+        # the messages that did not fit in the output batch separately.
+        overflow: Sequence[Message[Any]] = []
+        if self.__batch_transform_function is not None:
+            output_batch, overflow = cast(
+                "AsyncResult[Tuple[MessageBatch[Any], Sequence[Message[Any]]]]", result
+            ).get(timeout=timeout)
+            i = len(input_batch)
+        else:
+            i, output_batch = cast(
+                "AsyncResult[Tuple[int, MessageBatch[Any]]]", result
+            ).get(timeout=timeout)
 
         # TODO: This does not handle rejections from the next step!
-        for message in output_batch:
+        for message in itertools.chain(output_batch, overflow):
             self.__next_step.poll()
             self.__next_step.submit(message)
 
@@ -334,16 +597,9 @@ class ParallelTransformStep(ProcessingStep[TPayload]):
                 "Received incomplete batch (%0.2f%% complete), resubmitting...",
                 i / len(input_batch) * 100,
             )
-            # TODO: This reserializes all the ``SerializedMessage`` data prior
-            # to the processed index even though the values at those indices
-            # will never be unpacked. It probably makes sense to remove that
-            # data from the batch to avoid unnecessary serialization overhead.
             self.__results[0] = (
                 input_batch,
-                self.__pool.apply_async(
-                    parallel_transform_worker_apply,
-                    (self.__transform_function, input_batch, output_batch.block, i,),
-                ),
+                self.__apply_async(input_batch, output_batch.block, i),
             )
             return
 
@@ -373,7 +629,9 @@ class ParallelTransformStep(ProcessingStep[TPayload]):
             raise MessageRejected("no available input blocks") from e
 
         self.__batch_builder = BatchBuilder(
-            MessageBatch(input_block), self.__max_batch_size, self.__max_batch_time,
+            MessageBatch(input_block),
+            self.__batch_size_policy.get_max_batch_size(),
+            self.__batch_size_policy.get_max_batch_time(),
         )
 
     def submit(self, message: Message[TPayload]) -> None:
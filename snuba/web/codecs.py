@@ -0,0 +1,90 @@
+from typing import Any, Mapping, MutableMapping, cast
+
+import rapidjson
+import zstandard
+
+from snuba.reader import Result
+from snuba.utils.codecs import Codec
+
+
+class ResultCodec(Codec[bytes, Result]):
+    """
+    Encodes query results in a compact format: the rows are stored as a
+    list of values for each column of the result metadata (rather than
+    repeating the column names in every row), and the encoded value is
+    compressed with zstd once it is larger than ``compression_threshold``
+    bytes.
+
+    Encoded values start with a version byte. Values encoded as plain JSON
+    objects (by ``JSONCodec``, or by this codec when ``binary`` is not set)
+    can always be decoded, which allows switching between both formats
+    while there are values of both kinds stored.
+    """
+
+    VERSION = 1
+
+    COMPRESSION_NONE = 0
+    COMPRESSION_ZSTD = 1
+
+    def __init__(self, binary: bool = True, compression_threshold: int = 4096) -> None:
+        self.__binary = binary
+        self.__compression_threshold = compression_threshold
+
+    def encode(self, value: Result) -> bytes:
+        if not self.__binary:
+            return rapidjson.dumps(value).encode("utf-8")
+
+        names = [column["name"] for column in value["meta"]]
+
+        # The rows can only be stored as columns if their keys are the
+        # columns of the metadata, in the same order. The columns replace
+        # the rows without changing the order of the keys of the result.
+        body: Mapping[str, Any] = value
+        if all(list(row) == names for row in value["data"]):
+            columnar: MutableMapping[str, Any] = {}
+            for key, item in cast(Mapping[str, Any], value).items():
+                if key == "data":
+                    columnar["columns"] = [
+                        list(column) for column in zip(*(row.values() for row in item))
+                    ]
+                else:
+                    columnar[key] = item
+            body = columnar
+
+        encoded = rapidjson.dumps(body).encode("utf-8")
+        if len(encoded) > self.__compression_threshold:
+            return bytes(
+                [self.VERSION, self.COMPRESSION_ZSTD]
+            ) + zstandard.ZstdCompressor().compress(encoded)
+        else:
+            return bytes([self.VERSION, self.COMPRESSION_NONE]) + encoded
+
+    def decode(self, value: bytes) -> Result:
+        if value[:1] == b"{":
+            return rapidjson.loads(value)
+
+        version, compression = value[0], value[1]
+        if version != self.VERSION:
+            raise ValueError(f"unsupported result encoding version: {version}")
+
+        if compression == self.COMPRESSION_ZSTD:
+            # (De)compressors cannot be used by multiple threads at once.
+            body = zstandard.ZstdDecompressor().decompress(value[2:])
+        elif compression == self.COMPRESSION_NONE:
+            body = value[2:]
+        else:
+            raise ValueError(f"unsupported result compression: {compression}")
+
+        decoded = rapidjson.loads(body)
+        if "columns" not in decoded:
+            return decoded
+
+        names = [column["name"] for column in decoded["meta"]]
+
+        result: MutableMapping[str, Any] = {}
+        for key, item in decoded.items():
+            if key == "columns":
+                result["data"] = [dict(zip(names, row)) for row in zip(*item)]
+            else:
+                result[key] = item
+        return cast(Result, result)
@@ -5,9 +5,10 @@ from hashlib import md5
 from typing import Any, Mapping, MutableMapping, Optional
 
 import sentry_sdk
+from clickhouse_driver import errors
 from sentry_sdk.api import configure_scope
 
-from snuba import settings, state
+from snuba import environment, settings, state
 from snuba.clickhouse.errors import ClickhouseError
 from snuba.clickhouse.query import Query
 from snuba.clickhouse.query_profiler import generate_profile
@@ -21,6 +22,7 @@ from snuba.reader import Reader, Result
 from snuba.redis import redis_client
 from snuba.request.request_settings import RequestSettings
 from snuba.state.cache.abstract import Cache
+from snuba.state.cache.local import LocalCache
 from snuba.state.cache.redis.backend import RedisCache
 from snuba.state.rate_limit import (
     PROJECT_RATE_LIMIT_NAME,
@@ -28,13 +30,31 @@ from snuba.state.rate_limit import (
     RateLimitExceeded,
 )
 from snuba.util import force_bytes, with_span
-from snuba.utils.codecs import JSONCodec, JSONData
+from snuba.utils.codecs import PassthroughCodec
 from snuba.utils.metrics.timer import Timer
+from snuba.utils.metrics.wrapper import MetricsWrapper
 from snuba.web import QueryException, QueryResult
-
-cache: Cache[JSONData] = RedisCache(
-    redis_client, "snuba-query-cache:", JSONCodec(), ThreadPoolExecutor()
-)
+from snuba.web.codecs import ResultCodec
+
+result_codec = ResultCodec(binary=settings.QUERY_CACHE_BINARY_ENCODING)
+
+cache: Cache[Result]
+if settings.LOCAL_QUERY_CACHE_MAX_BYTES > 0:
+    cache = LocalCache(
+        RedisCache(
+            redis_client,
+            "snuba-query-cache:",
+            PassthroughCodec[bytes](),
+            ThreadPoolExecutor(),
+        ),
+        result_codec,
+        settings.LOCAL_QUERY_CACHE_MAX_BYTES,
+        MetricsWrapper(environment.metrics, "query_cache.local"),
+    )
+else:
+    cache = RedisCache(
+        redis_client, "snuba-query-cache:", result_codec, ThreadPoolExecutor()
+    )
 
 logger = logging.getLogger("snuba.query")
 
@@ -280,11 +300,18 @@ def raw_query(
         trace_id,
     )
 
-    execute_query_strategy = (
-        execute_query_with_readthrough_caching
-        if state.get_config("use_readthrough_query_cache", 1)
-        else execute_query_with_caching
-    )
+    query_id = request_settings.get_query_id()
+    if query_id is not None:
+        # A query that may be cancelled must not be shared with other
+        # requests through the readthrough cache.
+        query_settings["query_id"] = query_id
+        execute_query_strategy = execute_query_with_caching
+    else:
+        execute_query_strategy = (
+            execute_query_with_readthrough_caching
+            if state.get_config("use_readthrough_query_cache", 1)
+            else execute_query_with_caching
+        )
 
     try:
         result = execute_query_strategy(
@@ -299,6 +326,12 @@ def raw_query(
     except Exception as cause:
         if isinstance(cause, RateLimitExceeded):
             stats = update_with_status(QueryStatus.RATE_LIMITED)
+        elif (
+            query_id is not None
+            and isinstance(cause, ClickhouseError)
+            and cause.code == errors.ErrorCodes.QUERY_WAS_CANCELLED
+        ):
+            stats = update_with_status(QueryStatus.CANCELLED)
         else:
             with configure_scope() as scope:
                 if isinstance(cause, ClickhouseError):
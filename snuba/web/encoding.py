@@ -0,0 +1,32 @@
+from typing import Any, Iterator, Mapping
+
+import simplejson as json
+
+
+def stream_json(payload: Mapping[str, Any], block_size: int = 1000) -> Iterator[str]:
+    """
+    Encodes a query response payload as JSON, yielding the rows of the
+    ``data`` key incrementally (``block_size`` rows at a time) rather than
+    building the whole document in memory. The concatenated output is
+    identical to the output of ``simplejson.dumps(payload)``.
+    """
+    encoder = json.JSONEncoder()
+
+    separator = "{"
+    for key, value in payload.items():
+        yield f"{separator}{encoder.encode(key)}: "
+        separator = ", "
+
+        if key == "data" and isinstance(value, list):
+            yield "["
+            for i in range(0, len(value), block_size):
+                # Each block is encoded as a list, without its brackets, so
+                # that the rows are encoded exactly as they would be as part
+                # of the entire payload.
+                rows = encoder.encode(value[i : i + block_size])[1:-1]
+                yield rows if i == 0 else f", {rows}"
+            yield "]"
+        else:
+            yield encoder.encode(value)
+
+    yield "}" if separator == ", " else "{}"
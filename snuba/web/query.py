@@ -5,7 +5,7 @@ from functools import partial
 
 import sentry_sdk
 
-from snuba import environment
+from snuba import environment, settings
 from snuba.clickhouse.astquery import AstSqlQuery
 from snuba.clickhouse.query import Query
 from snuba.clickhouse.sql import SqlQuery
@@ -35,12 +35,13 @@ def parse_and_run_query(
     """
     Runs a Snuba Query, then records the metadata about each split query that was run.
     """
-    request_copy = copy.deepcopy(request)
+    request_copy = copy.copy(request)
+    dataset_name = get_dataset_name(dataset)
+    if dataset_name in settings.AST_ONLY_DATASETS:
+        request.query.set_ast_only()
+
     query_metadata = SnubaQueryMetadata(
-        request=request_copy,
-        dataset=get_dataset_name(dataset),
-        timer=timer,
-        query_list=[],
+        request=request_copy, dataset=dataset_name, timer=timer, query_list=[],
     )
 
     try:
@@ -1,15 +1,22 @@
 import copy
 import logging
 import math
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import replace
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Any as AnyType
-from typing import List, Optional, Union
+from typing import Deque, List, Optional, Tuple, Union
 
 from snuba import environment, settings, state, util
 from snuba.clickhouse.query import Query
 from snuba.clickhouse.query_dsl.accessors import get_time_range
-from snuba.datasets.plans.split_strategy import QuerySplitStrategy, SplitQueryRunner
+from snuba.datasets.plans.split_strategy import (
+    QueryCanceller,
+    QuerySplitStrategy,
+    SplitQueryRunner,
+)
 from snuba.query.conditions import (
     OPERATOR_TO_FUNCTION,
     ConditionFunctions,
@@ -23,7 +30,10 @@ from snuba.query.expressions import Expression
 from snuba.query.expressions import Literal as LiteralExpr
 from snuba.query.logical import SelectedExpression
 from snuba.query.matchers import AnyExpression, Column, FunctionCall, Or, Param, String
-from snuba.request.request_settings import RequestSettings
+from snuba.request.request_settings import (
+    CancellableRequestSettings,
+    RequestSettings,
+)
 from snuba.util import is_condition
 from snuba.utils.metrics.wrapper import MetricsWrapper
 from snuba.web import QueryResult
@@ -37,6 +47,12 @@ metrics = MetricsWrapper(environment.metrics, "query.splitter")
 # queries before hitting the 90d limit (2+20+200+2000 hours == 92 days).
 STEP_GROWTH = 10
 
+# Runs the time windows that are queried speculatively (see
+# ``TimeSplitQueryStrategy``).
+speculative_executor = ThreadPoolExecutor(
+    max_workers=settings.TIME_SPLIT_SPECULATIVE_WORKERS
+)
+
 
 def _identify_condition(condition: AnyType, field: str, operator: str) -> bool:
     return (
@@ -82,6 +98,9 @@ def _replace_ast_condition(
 def _replace_condition(
     query: Query, field: str, operator: str, new_literal: Union[str, List[AnyType]]
 ) -> None:
+    if query.is_ast_only():
+        return
+
     query.set_conditions(
         [
             cond
@@ -96,13 +115,23 @@ class TimeSplitQueryStrategy(QuerySplitStrategy):
     """
     A strategy that breaks the time window into smaller ones and executes
     them in sequence.
+
+    If the ``time_split_speculative_windows`` runtime config is set, up to
+    that many of the following windows are queried concurrently with the
+    current one. These windows grow as if all the previous ones were empty,
+    since their results are not known yet. The queries still running once
+    enough results were found are cancelled.
     """
 
     def __init__(self, timestamp_col: str) -> None:
         self.__timestamp_col = timestamp_col
 
     def execute(
-        self, query: Query, request_settings: RequestSettings, runner: SplitQueryRunner,
+        self,
+        query: Query,
+        request_settings: RequestSettings,
+        runner: SplitQueryRunner,
+        canceller: Optional[QueryCanceller] = None,
     ) -> Optional[QueryResult]:
         """
         If a query is:
@@ -126,42 +155,63 @@ class TimeSplitQueryStrategy(QuerySplitStrategy):
         if not orderby or orderby[0] != f"-{self.__timestamp_col}":
             return None
 
-        conditions = query.get_conditions() or []
-        from_date_str = next(
-            (
-                condition[2]
-                for condition in conditions
-                if _identify_condition(condition, self.__timestamp_col, ">=")
-            ),
-            None,
-        )
-
-        to_date_str = next(
-            (
-                condition[2]
-                for condition in conditions
-                if _identify_condition(condition, self.__timestamp_col, "<")
-            ),
-            None,
-        )
         from_date_ast, to_date_ast = get_time_range(query, self.__timestamp_col)
-
-        if not from_date_str or not to_date_str:
-            return None
-
         date_align, split_step = state.get_configs(
             [("date_align_seconds", 1), ("split_step", 3600)]  # default 1 hour
         )
-        to_date = util.parse_datetime(to_date_str, date_align)
-        from_date = util.parse_datetime(from_date_str, date_align)
-
-        if from_date != from_date_ast:
-            logger.warning(
-                "Mismatch in start date on time splitter.",
-                extra={"ast": str(from_date_ast), "legacy": str(from_date)},
-                exc_info=True,
+
+        if query.is_ast_only():
+            if from_date_ast is None or to_date_ast is None:
+                return None
+            from_date, to_date = from_date_ast, to_date_ast
+        else:
+            conditions = query.get_conditions() or []
+            from_date_str = next(
+                (
+                    condition[2]
+                    for condition in conditions
+                    if _identify_condition(condition, self.__timestamp_col, ">=")
+                ),
+                None,
+            )
+
+            to_date_str = next(
+                (
+                    condition[2]
+                    for condition in conditions
+                    if _identify_condition(condition, self.__timestamp_col, "<")
+                ),
+                None,
+            )
+
+            if not from_date_str or not to_date_str:
+                return None
+
+            to_date = util.parse_datetime(to_date_str, date_align)
+            from_date = util.parse_datetime(from_date_str, date_align)
+
+            if from_date != from_date_ast:
+                logger.warning(
+                    "Mismatch in start date on time splitter.",
+                    extra={"ast": str(from_date_ast), "legacy": str(from_date)},
+                    exc_info=True,
+                )
+                metrics.increment("mismatch.ast_from_date")
+
+        speculative_windows = self.__get_speculative_windows(request_settings)
+        if speculative_windows > 0:
+            assert split_step is not None
+            return self.__execute_speculative(
+                query,
+                request_settings,
+                runner,
+                canceller,
+                from_date,
+                to_date,
+                limit,
+                split_step,
+                speculative_windows,
             )
-            metrics.increment("mismatch.ast_from_date")
 
         remaining_offset = query.get_offset()
 
@@ -170,27 +220,11 @@ class TimeSplitQueryStrategy(QuerySplitStrategy):
         split_start = max(split_end - timedelta(seconds=split_step), from_date)
         total_results = 0
         while split_start < split_end and total_results < limit:
-            # We need to make a copy to use during the query execution because we replace
-            # the start-end conditions on the query at each iteration of this loop.
-            split_query = copy.deepcopy(query)
-
-            _replace_condition(
-                split_query, self.__timestamp_col, ">=", split_start.isoformat()
-            )
-            _replace_ast_condition(
-                split_query, self.__timestamp_col, ">=", LiteralExpr(None, split_start)
-            )
-            _replace_condition(
-                split_query, self.__timestamp_col, "<", split_end.isoformat()
-            )
-            _replace_ast_condition(
-                split_query, self.__timestamp_col, "<", LiteralExpr(None, split_end)
-            )
-
             # Because its paged, we have to ask for (limit+offset) results
             # and set offset=0 so we can then trim them ourselves.
-            split_query.set_offset(0)
-            split_query.set_limit(limit - total_results + remaining_offset)
+            split_query = self.__build_split_query(
+                query, split_start, split_end, limit - total_results + remaining_offset
+            )
 
             # At every iteration we only append the "data" key from the results returned by
             # the runner. The "extra" key is only populated at the first iteration of the
@@ -233,6 +267,152 @@ class TimeSplitQueryStrategy(QuerySplitStrategy):
 
         return overall_result
 
+    def __build_split_query(
+        self, query: Query, split_start: datetime, split_end: datetime, limit: int
+    ) -> Query:
+        # We need to make a copy to use during the query execution because we replace
+        # the start-end conditions on the query for every window.
+        split_query = copy.copy(query)
+
+        _replace_condition(
+            split_query, self.__timestamp_col, ">=", split_start.isoformat()
+        )
+        _replace_ast_condition(
+            split_query, self.__timestamp_col, ">=", LiteralExpr(None, split_start)
+        )
+        _replace_condition(
+            split_query, self.__timestamp_col, "<", split_end.isoformat()
+        )
+        _replace_ast_condition(
+            split_query, self.__timestamp_col, "<", LiteralExpr(None, split_end)
+        )
+
+        split_query.set_offset(0)
+        split_query.set_limit(limit)
+        return split_query
+
+    def __get_speculative_windows(self, request_settings: RequestSettings) -> int:
+        windows = state.get_config("time_split_speculative_windows", 0)
+        assert windows is not None
+        # Every speculative query counts towards the concurrent limits of
+        # the request, so they must leave room for the current query.
+        for rate_limit in request_settings.get_rate_limit_params():
+            if rate_limit.concurrent_limit is not None:
+                windows = min(windows, rate_limit.concurrent_limit - 1)
+        return max(int(windows), 0)
+
+    def __execute_speculative(
+        self,
+        query: Query,
+        request_settings: RequestSettings,
+        runner: SplitQueryRunner,
+        canceller: Optional[QueryCanceller],
+        from_date: datetime,
+        to_date: datetime,
+        limit: int,
+        split_step: int,
+        speculative_windows: int,
+    ) -> Optional[QueryResult]:
+        remaining_offset = query.get_offset()
+
+        windows: List[Tuple[datetime, datetime]] = []
+        split_end = to_date
+        while split_end > from_date:
+            try:
+                split_start = max(split_end - timedelta(seconds=split_step), from_date)
+            except OverflowError:
+                split_start = from_date
+            windows.append((split_start, split_end))
+            split_end = split_start
+            split_step = split_step * STEP_GROWTH
+
+        def build_window_query(index: int) -> Query:
+            return self.__build_split_query(
+                query, *windows[index], limit - total_results + remaining_offset,
+            )
+
+        pending: Deque[Tuple[int, str, Future[QueryResult]]] = deque()
+
+        def submit(index: int) -> None:
+            query_id = uuid.uuid4().hex
+            pending.append(
+                (
+                    index,
+                    query_id,
+                    speculative_executor.submit(
+                        runner,
+                        build_window_query(index),
+                        CancellableRequestSettings(request_settings, query_id),
+                    ),
+                )
+            )
+
+        def get_result(index: int) -> QueryResult:
+            if index == 0:
+                return runner(build_window_query(index), request_settings)
+
+            _, _, future = pending.popleft()
+            if not future.cancel():
+                try:
+                    return future.result()
+                except Exception:
+                    # The query may have been rejected because of the
+                    # speculative queries running at the same time.
+                    logger.warning("Speculative time split query failed", exc_info=True)
+                    metrics.increment("speculative.error")
+            return runner(build_window_query(index), request_settings)
+
+        overall_result = None
+        total_results = 0
+        for index in range(1, min(speculative_windows + 1, len(windows))):
+            submit(index)
+
+        # The speculative queries that are still pending are always cancelled
+        # (even if a query failed), since nothing will wait for their results.
+        try:
+            for index in range(len(windows)):
+                result = get_result(index)
+
+                if overall_result is None:
+                    overall_result = result
+                else:
+                    overall_result.result["data"].extend(result.result["data"])
+
+                if remaining_offset > 0 and len(overall_result.result["data"]) > 0:
+                    to_trim = min(remaining_offset, len(overall_result.result["data"]))
+                    overall_result.result["data"] = overall_result.result["data"][
+                        to_trim:
+                    ]
+                    remaining_offset -= to_trim
+
+                # The speculative queries may return more results than needed since
+                # their limit was set before the previous results were known.
+                overall_result.result["data"] = overall_result.result["data"][:limit]
+                total_results = len(overall_result.result["data"])
+
+                if total_results >= limit:
+                    break
+
+                next_index = index + speculative_windows + 1
+                if next_index < len(windows):
+                    submit(next_index)
+        finally:
+            while pending:
+                _, query_id, future = pending.popleft()
+                if future.cancel() or future.done():
+                    continue
+                metrics.increment("speculative.cancelled")
+                if canceller is not None:
+                    try:
+                        canceller(query_id)
+                    except Exception:
+                        logger.warning(
+                            "Failed to cancel speculative time split query",
+                            exc_info=True,
+                        )
+
+        return overall_result
+
 
 class ColumnSplitQueryStrategy(QuerySplitStrategy):
     """
@@ -250,7 +430,11 @@ class ColumnSplitQueryStrategy(QuerySplitStrategy):
         self.__timestamp_column = timestamp_column
 
     def execute(
-        self, query: Query, request_settings: RequestSettings, runner: SplitQueryRunner,
+        self,
+        query: Query,
+        request_settings: RequestSettings,
+        runner: SplitQueryRunner,
+        canceller: Optional[QueryCanceller] = None,
     ) -> Optional[QueryResult]:
         """
         Split query in 2 steps if a large number of columns is being selected.
@@ -293,7 +477,7 @@ class ColumnSplitQueryStrategy(QuerySplitStrategy):
             for col in query.get_all_ast_referenced_columns()
         }
 
-        minimal_query = copy.deepcopy(query)
+        minimal_query = copy.copy(query)
         minimal_query.set_selected_columns(
             [self.__id_column, self.__project_column, self.__timestamp_column]
         )
@@ -337,15 +521,17 @@ class ColumnSplitQueryStrategy(QuerySplitStrategy):
         if not minimal_query.validate_aliases():
             return None
 
-        legacy_references = set(minimal_query.get_all_referenced_columns())
-        ast_column_names = {
-            c.column_name for c in minimal_query.get_all_ast_referenced_columns()
-        }
-        # Ensures the legacy minimal query (which does not expand alias references)
-        # does not contain alias references we removed when creating minimal_query.
-        if legacy_references - ast_column_names:
-            metrics.increment("columns.skip_invalid_legacy_query")
-            return None
+        if not query.is_ast_only():
+            legacy_references = set(minimal_query.get_all_referenced_columns())
+            ast_column_names = {
+                c.column_name for c in minimal_query.get_all_ast_referenced_columns()
+            }
+            # Ensures the legacy minimal query (which does not expand alias
+            # references) does not contain alias references we removed when
+            # creating minimal_query.
+            if legacy_references - ast_column_names:
+                metrics.increment("columns.skip_invalid_legacy_query")
+                return None
 
         result = runner(minimal_query, request_settings)
         del minimal_query
@@ -355,7 +541,7 @@ class ColumnSplitQueryStrategy(QuerySplitStrategy):
 
         # Making a copy just in case runner returned None (which would drive the execution
         # strategy to ignore the result of this splitter and try the next one).
-        query = copy.deepcopy(query)
+        query = copy.copy(query)
 
         event_ids = list(
             set([event[self.__id_column] for event in result.result["data"]])
@@ -14,7 +14,6 @@ from markdown import markdown
 
 from snuba import environment, settings, state, util
 from snuba.clickhouse.errors import ClickhouseError
-from snuba.clickhouse.http import JSONRowEncoder
 from snuba.clusters.cluster import ClickhouseClientSettings
 from snuba.consumer import KafkaMessageMetadata
 from snuba.datasets.dataset import Dataset
@@ -43,6 +42,7 @@ from snuba.utils.streams import Message, Partition, Topic
 from snuba.utils.streams.backends.kafka import KafkaPayload
 from snuba.web import QueryException
 from snuba.web.converters import DatasetConverter
+from snuba.web.encoding import stream_json
 from snuba.web.query import parse_and_run_query
 from snuba.writer import BatchWriterEncoderWrapper, WriterTableRow
 
@@ -358,6 +358,11 @@ def dataset_query(dataset: Dataset, body, timer: Timer) -> Response:
     if settings.STATS_IN_RESPONSE or request.settings.get_debug():
         payload.update(result.extra)
 
+    if state.get_config("stream_query_response", 1):
+        # Stream the encoded rows instead of holding a copy of the entire
+        # encoded response in memory while it is being sent.
+        return Response(stream_json(payload), 200, {"Content-Type": "application/json"})
+
     return Response(json.dumps(payload), 200, {"Content-Type": "application/json"})
 
 
@@ -418,8 +423,9 @@ if application.debug or application.testing:
                 assert isinstance(processed_message, InsertBatch)
                 rows.extend(processed_message.rows)
 
+        table_writer = enforce_table_writer(dataset)
         BatchWriterEncoderWrapper(
-            enforce_table_writer(dataset).get_batch_writer(metrics), JSONRowEncoder(),
+            table_writer.get_batch_writer(metrics), table_writer.get_row_encoder(),
         ).write(rows)
 
         return ("ok", 200, {"Content-Type": "text/plain"})
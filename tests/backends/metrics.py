@@ -20,6 +20,7 @@ class Timing(NamedTuple):
     name: str
     value: Union[int, float]
     tags: Optional[Tags]
+    sample_rate: float = 1.0
 
 
 class TestingMetricsBackend(MetricsBackend):
@@ -45,6 +46,10 @@ class TestingMetricsBackend(MetricsBackend):
         self.calls.append(Gauge(name, value, tags))
 
     def timing(
-        self, name: str, value: Union[int, float], tags: Optional[Tags] = None
+        self,
+        name: str,
+        value: Union[int, float],
+        tags: Optional[Tags] = None,
+        sample_rate: float = 1.0,
     ) -> None:
-        self.calls.append(Timing(name, value, tags))
+        self.calls.append(Timing(name, value, tags, sample_rate))
@@ -8,7 +8,6 @@ from hashlib import md5
 from typing import Iterator, MutableSequence, Optional, Sequence
 
 from snuba import settings
-from snuba.clickhouse.http import JSONRowEncoder
 from snuba.consumer import KafkaMessageMetadata
 from snuba.datasets.dataset import Dataset
 from snuba.datasets.events_processor_base import InsertEvent
@@ -69,11 +68,10 @@ class BaseDatasetTest(BaseTest):
         self.write_rows(rows)
 
     def write_rows(self, rows: Sequence[WriterTableRow]) -> None:
+        table_writer = enforce_table_writer(self.dataset)
         BatchWriterEncoderWrapper(
-            enforce_table_writer(self.dataset).get_batch_writer(
-                metrics=DummyMetricsBackend(strict=True)
-            ),
-            JSONRowEncoder(),
+            table_writer.get_batch_writer(metrics=DummyMetricsBackend(strict=True)),
+            table_writer.get_row_encoder(),
         ).write(rows)
 
 
@@ -1,6 +1,9 @@
+import uuid
 from datetime import datetime, timedelta
+from unittest.mock import Mock
+
 from dateutil.tz import tz
-from snuba.clickhouse.native import transform_datetime
+from snuba.clickhouse.native import NativeDriverReader, transform_datetime
 
 
 def test_transform_datetime() -> None:
@@ -14,3 +17,61 @@ def test_transform_datetime() -> None:
         transform_datetime(now.replace(tzinfo=tz.tzoffset("PST", offset)) + offset)
         == fmt
     )
+
+
+def test_reader_transforms_columnar_result() -> None:
+    client = Mock()
+    client.execute.return_value = (
+        [
+            (1, 2, 3),
+            (datetime(2020, 1, 2), None, datetime(2020, 1, 3)),
+            (uuid.UUID(int=1), uuid.UUID(int=2), uuid.UUID(int=3)),
+            ("a", "b", "c"),
+        ],
+        [
+            ("id", "UInt64"),
+            ("time", "Nullable(DateTime)"),
+            ("event_id", "UUID"),
+            ("id", "String"),
+        ],
+    )
+
+    reader = NativeDriverReader(client)
+
+    result = reader.execute(Mock(), with_totals=True)
+
+    assert client.execute.call_args[1]["columnar"] is True
+    assert result == {
+        "meta": [
+            {"name": "id", "type": "String"},
+            {"name": "time", "type": "Nullable(DateTime)"},
+            {"name": "event_id", "type": "UUID"},
+        ],
+        "data": [
+            {
+                "id": "a",
+                "time": "2020-01-02T00:00:00+00:00",
+                "event_id": "00000000-0000-0000-0000-000000000001",
+            },
+            {
+                "id": "b",
+                "time": None,
+                "event_id": "00000000-0000-0000-0000-000000000002",
+            },
+        ],
+        "totals": {
+            "id": "c",
+            "time": "2020-01-03T00:00:00+00:00",
+            "event_id": "00000000-0000-0000-0000-000000000003",
+        },
+    }
+
+
+def test_reader_empty_result() -> None:
+    client = Mock()
+    client.execute.return_value = ([], [("count", "UInt64")])
+
+    assert NativeDriverReader(client).execute(Mock()) == {
+        "meta": [{"name": "count", "type": "UInt64"}],
+        "data": [],
+    }
@@ -1,3 +1,4 @@
+import copy
 from datetime import datetime, timedelta
 from uuid import UUID
 
@@ -327,4 +328,10 @@ def test_error_processor() -> None:
         }
     )
 
+    # Batches are processed the same way as individual messages, even though
+    # the events of a batch share the processed modules and timestamps.
+    assert processor.process_batch(
+        [(copy.deepcopy(error), meta), (copy.deepcopy(error), meta)]
+    ) == [InsertBatch([expected_result]), InsertBatch([expected_result])]
+
     assert processor.process_message(error, meta) == InsertBatch([expected_result])
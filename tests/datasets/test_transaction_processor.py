@@ -330,3 +330,8 @@ class TestTransactionsProcessor(BaseTest):
         assert TransactionsMessageProcessor().process_message(
             message.serialize(), meta
         ) == InsertBatch([message.build_result(meta)])
+
+        # Batches are processed the same way as individual messages.
+        assert TransactionsMessageProcessor().process_batch(
+            [(message.serialize(), meta), ((2, "delete", {}), meta)]
+        ) == [InsertBatch([message.build_result(meta)]), None]
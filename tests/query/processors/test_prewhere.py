@@ -1,3 +1,4 @@
+import copy
 from typing import Any, MutableMapping, Optional, Sequence
 
 import pytest
@@ -165,7 +166,7 @@ def test_prewhere(
 ) -> None:
     settings.MAX_PREWHERE_CONDITIONS = 2
     events = get_dataset("events")
-    query = parse_query(query_body, events)
+    query = parse_query(copy.deepcopy(query_body), events)
     query.set_data_source(TableSource("my_table", ColumnSet([]), None, keys))
 
     request_settings = HTTPRequestSettings()
@@ -176,3 +177,32 @@ def test_prewhere(
     assert query.get_condition_from_ast() == new_ast_condition
     assert query.get_prewhere() == prewhere_conditions
     assert query.get_prewhere_ast() == new_prewhere_ast_condition
+
+
+@pytest.mark.parametrize(
+    "query_body, keys, new_conditions, new_ast_condition, prewhere_conditions, new_prewhere_ast_condition",
+    test_data,
+)
+def test_prewhere_ast_only(
+    query_body: MutableMapping[str, Any],
+    keys: Sequence[str],
+    new_conditions: Sequence[Condition],
+    new_ast_condition: Optional[Expression],
+    prewhere_conditions: Sequence[Condition],
+    new_prewhere_ast_condition: Optional[Expression],
+) -> None:
+    settings.MAX_PREWHERE_CONDITIONS = 2
+    events = get_dataset("events")
+    query = parse_query(copy.deepcopy(query_body), events)
+    query.set_data_source(TableSource("my_table", ColumnSet([]), None, keys))
+    query.set_ast_only()
+    conditions = query.get_conditions()
+
+    request_settings = HTTPRequestSettings()
+    processor = PrewhereProcessor()
+    processor.process_query(Query(query), request_settings)
+
+    assert query.get_conditions() == conditions
+    assert query.get_condition_from_ast() == new_ast_condition
+    assert query.get_prewhere() == []
+    assert query.get_prewhere_ast() == new_prewhere_ast_condition
@@ -1,7 +1,11 @@
+import copy
+
 from snuba.clickhouse.columns import ColumnSet
 from snuba.datasets.factory import get_dataset
 from snuba.datasets.schemas.tables import TableSource
-from snuba.query.logical import Query
+from snuba.query.conditions import ConditionFunctions, binary_condition
+from snuba.query.expressions import Column, Literal
+from snuba.query.logical import Query, SelectedExpression
 
 
 def test_empty_query():
@@ -110,6 +114,70 @@ def test_edit_query():
     assert query.get_prewhere() == [["pc6", "=", "10"]]
 
 
+def test_copy_query():
+    query = Query(
+        {
+            "selected_columns": ["c1"],
+            "conditions": [["c1", "=", "a"]],
+            "groupby": ["project_id"],
+            "limit": 100,
+        },
+        TableSource("my_table", ColumnSet([])),
+        selected_columns=[SelectedExpression("c1", Column("c1", None, "c1"))],
+    )
+    query_copy = copy.copy(query)
+
+    query.add_conditions([["c5", "=", "9"]])
+    query.add_groupby(["more"])
+    query.set_limit(10)
+    query.set_final(True)
+    query.add_condition_to_ast(
+        binary_condition(
+            None, ConditionFunctions.EQ, Column(None, None, "c5"), Literal(None, "9")
+        )
+    )
+    query.set_ast_selected_columns([])
+
+    assert query_copy.get_conditions() == [["c1", "=", "a"]]
+    assert query_copy.get_groupby() == ["project_id"]
+    assert query_copy.get_limit() == 100
+    assert query_copy.get_final() is False
+    assert query_copy.get_condition_from_ast() is None
+    assert query_copy.get_selected_columns_from_ast() == [
+        SelectedExpression("c1", Column("c1", None, "c1"))
+    ]
+    assert query_copy.get_data_source().format_from() == "my_table"
+
+
+def test_ast_only_query():
+    query = Query(
+        {"conditions": [["c1", "=", "a"]], "groupby": ["project_id"], "limit": 100},
+        TableSource("my_table", ColumnSet([])),
+    )
+    query.set_ast_only()
+    assert query.is_ast_only()
+    assert copy.copy(query).is_ast_only()
+
+    query.add_conditions([["c5", "=", "9"]])
+    query.set_conditions([["c6", "=", "10"]])
+    query.add_groupby(["more"])
+    query.set_selected_columns(["c4"])
+    query.set_prewhere([["pc6", "=", "10"]])
+    query.set_limit(10)
+    condition = binary_condition(
+        None, ConditionFunctions.EQ, Column(None, None, "c5"), Literal(None, "9")
+    )
+    query.add_condition_to_ast(condition)
+
+    # The legacy representation keeps its initial values.
+    assert query.get_conditions() == [["c1", "=", "a"]]
+    assert query.get_groupby() == ["project_id"]
+    assert query.get_selected_columns() is None
+    assert query.get_prewhere() == []
+    assert query.get_limit() == 10
+    assert query.get_condition_from_ast() == condition
+
+
 def test_referenced_columns():
     # a = 1 AND b = 1
     dataset = get_dataset("events")
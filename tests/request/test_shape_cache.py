@@ -0,0 +1,294 @@
+from datetime import datetime, timedelta
+from typing import Any, MutableMapping, Sequence, Tuple
+
+import pytest
+
+from snuba.clickhouse.astquery import AstSqlQuery
+from snuba.datasets.factory import get_dataset
+from snuba.request import Request
+from snuba.request import schema as request_schema
+from snuba.request.exceptions import JsonSchemaValidationException
+from snuba.request.request_settings import HTTPRequestSettings
+from snuba.request.schema import RequestSchema
+from snuba.request.shape_cache import ParsedQueryCache, get_query_shape_fingerprint
+from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+
+# Query shapes sent to the API (mostly taken from the API tests), by dataset.
+# The project (or organization) ids and the time range are added by
+# ``build_body``.
+test_data: Sequence[Tuple[str, MutableMapping[str, Any]]] = [
+    ("events", {"aggregations": [["count()", "", "aggregate"]], "groupby": "time"}),
+    (
+        "events",
+        {
+            "granularity": 3600,
+            "groupby": "group_id",
+            "conditions": [["group_id", "IN", [100, 200]]],
+        },
+    ),
+    (
+        "events",
+        {
+            "groupby": ["project_id"],
+            "aggregations": [["count()", "", "count"]],
+            "orderby": "-count",
+            "offset": 1,
+            "limit": 1,
+        },
+    ),
+    (
+        "events",
+        {
+            "selected_columns": ["event_id", "tags[foo]", "contexts[device.model]"],
+            "conditions": [
+                [["environment", "=", "prod"], ["environment", "IS NULL", None]],
+                ["tags[foo]", "!=", ""],
+            ],
+            "orderby": ["-timestamp", "event_id"],
+            "limit": 10,
+        },
+    ),
+    (
+        "events",
+        {
+            "aggregations": [
+                ["uniq", "tags_key", "unique_tags"],
+                ["topK(3)", "tags_value", "top_values"],
+            ],
+            "groupby": ["tags_key"],
+            "having": [["unique_tags", ">", 1]],
+            "arrayjoin": "tags",
+        },
+    ),
+    (
+        "events",
+        {
+            "selected_columns": [
+                ["arrayJoin", ["exception_stacks.type"], "exception_type"],
+                ["coalesce", ["email", "username"], "user_name"],
+            ],
+            "conditions": [
+                [["positionCaseInsensitive", ["message", "'abc'"]], "!=", 0],
+                ["exception_stacks.type", "LIKE", "Arithmetic%"],
+            ],
+            "sample": 0.1,
+        },
+    ),
+    (
+        "events",
+        {
+            "aggregations": [
+                ["quantile(0.95)", "duration", "p95"],
+                ["argMax", ["event_id", "timestamp"], "latest_event"],
+            ],
+            "conditions": [["type", "=", "transaction"]],
+            "groupby": ["transaction"],
+            "totals": True,
+        },
+    ),
+    (
+        "transactions",
+        {
+            "selected_columns": ["transaction_name", "duration", "tags[foo]"],
+            "conditions": [["transaction_op", "=", "http"], ["duration", ">", 100]],
+            "orderby": "-duration",
+        },
+    ),
+    (
+        "transactions",
+        {
+            "aggregations": [["apdex(duration, 300)", "", "apdex"]],
+            "groupby": ["transaction_name", "time"],
+            "granularity": 60,
+        },
+    ),
+    (
+        "discover",
+        {
+            "aggregations": [["count()", "", "count"]],
+            "conditions": [["type", "=", "transaction"], ["duration", ">", 1000]],
+            "groupby": ["transaction"],
+        },
+    ),
+    (
+        "discover",
+        {
+            "selected_columns": ["event_id", "title", "tags[environment]"],
+            "conditions": [["type", "!=", "transaction"]],
+            "limitby": [1, "title"],
+        },
+    ),
+    (
+        "outcomes",
+        {
+            "aggregations": [["sum", "times_seen", "aggregate"]],
+            "groupby": ["outcome", "time"],
+            "conditions": [["outcome", "IN", [0, 1]]],
+        },
+    ),
+    (
+        "sessions",
+        {
+            "aggregations": [["sessions", None, "sessions"]],
+            "groupby": ["release", "environment"],
+            "conditions": [["release", "!=", ""]],
+        },
+    ),
+]
+
+
+def build_body(
+    dataset_name: str,
+    query: MutableMapping[str, Any],
+    projects: Sequence[int],
+    from_date: datetime,
+) -> MutableMapping[str, Any]:
+    extensions = get_dataset(dataset_name).get_extensions()
+    ids: MutableMapping[str, Any] = {}
+    if "organization" in extensions:
+        ids["organization"] = projects[0]
+    if "project" in extensions:
+        ids["project"] = [*projects]
+
+    return {
+        **query,
+        **ids,
+        "from_date": from_date.isoformat(),
+        "to_date": (from_date + timedelta(hours=6)).isoformat(),
+    }
+
+
+def build_sql(dataset_name: str, body: MutableMapping[str, Any]) -> str:
+    """
+    Builds the request and runs all the query processing that is not
+    specific to a storage.
+    """
+    dataset = get_dataset(dataset_name)
+    schema = RequestSchema.build_with_extensions(
+        dataset.get_extensions(), HTTPRequestSettings
+    )
+    request = schema.validate(body, dataset, "test")
+
+    for name, extension in dataset.get_extensions().items():
+        extension.get_processor().process_query(
+            request.query, request.extensions[name], request.settings
+        )
+    for processor in dataset.get_query_processors():
+        processor.process_query(request.query, request.settings)
+
+    query_plan = dataset.get_query_plan_builder().build_plan(request)
+    for clickhouse_processor in query_plan.plan_processors:
+        clickhouse_processor.process_query(query_plan.query, request.settings)
+
+    return AstSqlQuery(query_plan.query, request.settings).format_sql()
+
+
+def set_cache(monkeypatch: Any, max_size: int) -> None:
+    monkeypatch.setattr(
+        request_schema,
+        "parsed_query_cache",
+        ParsedQueryCache(max_size, DummyMetricsBackend()),
+    )
+
+
+@pytest.mark.parametrize("dataset_name, query", test_data)
+def test_cached_query_processing(
+    monkeypatch: Any, dataset_name: str, query: MutableMapping[str, Any]
+) -> None:
+    base_time = datetime(2020, 6, 1, 12)
+    parameters = [
+        ([1], base_time),
+        ([2, 3], base_time - timedelta(days=1)),
+        ([1], base_time + timedelta(days=40)),
+    ]
+
+    set_cache(monkeypatch, 0)
+    expected = [
+        build_sql(dataset_name, build_body(dataset_name, query, projects, from_date))
+        for projects, from_date in parameters
+    ]
+
+    # The first request populates the cache, the following ones only bind
+    # their own parameters to the cached query.
+    set_cache(monkeypatch, 10)
+    assert [
+        build_sql(dataset_name, build_body(dataset_name, query, projects, from_date))
+        for projects, from_date in parameters
+    ] == expected
+
+
+def validate(
+    dataset_name: str, body: MutableMapping[str, Any], referrer: str = "test"
+) -> Request:
+    dataset = get_dataset(dataset_name)
+    schema = RequestSchema.build_with_extensions(
+        dataset.get_extensions(), HTTPRequestSettings
+    )
+    return schema.validate(body, dataset, referrer)
+
+
+def test_cached_request(monkeypatch: Any) -> None:
+    set_cache(monkeypatch, 10)
+
+    query = {"aggregations": [["count()", "", "count"]], "groupby": ["project_id"]}
+    first = validate("events", build_body("events", query, [1], datetime(2020, 6, 1)))
+    first.query.set_limit(5)
+    first.query.set_ast_selected_columns([])
+
+    second = validate(
+        "events",
+        {**build_body("events", query, [2], datetime(2020, 6, 2)), "turbo": True},
+        "other",
+    )
+    assert second.id != first.id
+    assert second.referrer == "other"
+    assert second.settings.get_turbo()
+    assert second.extensions["project"] == {"project": [2]}
+    assert second.extensions["timeseries"]["from_date"] == "2020-06-02T00:00:00"
+    # The changes to the first query do not affect the cached query.
+    assert second.query.get_limit() == 1000
+    assert [c.name for c in second.query.get_selected_columns_from_ast()] == [
+        "project_id",
+        "count",
+    ]
+
+    # The parameters of a request with a cached query are still validated.
+    with pytest.raises(JsonSchemaValidationException):
+        validate("events", {**query, "project": "abc"})
+    with pytest.raises(JsonSchemaValidationException):
+        validate("events", {**query, "project": 1, "unknown": 1})
+
+
+def test_query_shape_fingerprint() -> None:
+    query = {"aggregations": [["count()", "", "count"]], "conditions": []}
+    assert get_query_shape_fingerprint(query) == get_query_shape_fingerprint(
+        {"conditions": [], "aggregations": [["count()", "", "count"]]}
+    )
+    assert get_query_shape_fingerprint(query) != get_query_shape_fingerprint(
+        {**query, "conditions": [["environment", "=", "prod"]]}
+    )
+
+
+def test_cache_eviction() -> None:
+    dataset = get_dataset("events")
+    schema = RequestSchema.build_with_extensions(
+        dataset.get_extensions(), HTTPRequestSettings
+    )
+    queries = [
+        schema.validate({"project": 1, "limit": limit}, dataset, "test").query
+        for limit in range(3)
+    ]
+
+    cache = ParsedQueryCache(2, DummyMetricsBackend())
+    for i, query in enumerate(queries):
+        cache.set(dataset, str(i), query)
+
+    assert cache.get(dataset, "0") is None
+    cached = cache.get(dataset, "1")
+    assert cached is not None and cached is not queries[1]
+    assert cached.get_limit() == 1
+
+    cache.set(dataset, "0", queries[0])
+    assert cache.get(dataset, "2") is None
+    assert cache.get(dataset, "1") is not None
+    assert cache.get(get_dataset("transactions"), "1") is None
@@ -1,5 +1,6 @@
 import os  # NOQA
 import pytest
+from unittest.mock import patch
 
 from snuba.snapshots.postgres_snapshot import PostgresSnapshot
 
@@ -89,3 +90,28 @@ class TestPostgresSnapshot:
             snapshot = PostgresSnapshot.load("snuba", snapshot_base)
             with snapshot.get_table_file("sentry_groupedmessage") as table:
                 next(table)
+
+    @pytest.mark.parametrize("range_size, block_size", [(1, 1024), (20, 7), (1000, 3)])
+    def test_table_ranges(self, tmp_path, range_size, block_size):
+        # Quoted fields can contain line feeds, which are not record
+        # boundaries.
+        snapshot_base = self.__prepare_directory(
+            tmp_path,
+            "id,status,message\n"
+            '0,1,"a single line"\n'
+            '1,0,"a ""quoted""\nmessage, on\nthree lines"\n'
+            "2,1,\n"
+            '3,1,"\n"\n',
+        )
+        snapshot = PostgresSnapshot.load("snuba", snapshot_base)
+        with snapshot.get_table_file("sentry_groupedmessage") as table:
+            expected = list(table)
+
+        with patch("snuba.snapshots.postgres_snapshot.SPLIT_BLOCK_SIZE", block_size):
+            ranges = snapshot.get_table_ranges("sentry_groupedmessage", range_size)
+
+        assert len({table_range.get_id() for table_range in ranges}) == len(ranges)
+        assert all(table_range.get_size() >= range_size for table_range in ranges[:-1])
+        assert [row for table_range in ranges for row in table_range.read()] == expected
+        if range_size == 1:
+            assert len(ranges) == 4
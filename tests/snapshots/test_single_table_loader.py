@@ -0,0 +1,87 @@
+import json
+
+from snuba.clusters.cluster import ClickhouseClientSettings
+from snuba.datasets.factory import enforce_table_writer
+from snuba.snapshots.postgres_snapshot import PostgresSnapshot
+from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+from tests.base import BaseDatasetTest
+
+POSTGRES_TABLE = "sentry_groupedmessage"
+
+
+class TestSingleTableBulkLoader(BaseDatasetTest):
+    def setup_method(self, test_method):
+        super().setup_method(test_method, "groupedmessage")
+
+    def __prepare_snapshot(self, tmp_path, rows: int) -> PostgresSnapshot:
+        snapshot_base = tmp_path / "cdc-snapshot"
+        snapshot_base.mkdir()
+        (snapshot_base / "metadata.json").write_text(
+            json.dumps(
+                {
+                    "snapshot_id": "50a86ad6-b4b7-11e9-a46f-acde48001122",
+                    "product": "snuba",
+                    "transactions": {"xmin": 1, "xmax": 2, "xip_list": []},
+                    "content": [{"table": POSTGRES_TABLE}],
+                    "start_timestamp": 1564703503.682226,
+                }
+            )
+        )
+        tables = snapshot_base / "tables"
+        tables.mkdir()
+        (tables / f"{POSTGRES_TABLE}.csv").write_text(
+            "project_id,id,status,last_seen,first_seen,active_at,first_release_id\n"
+            + "".join(
+                f"2,{i},0,2019-06-28 17:57:32+00,2019-06-28 06:40:17+00,"
+                f"2019-06-28 06:40:17+00,26\n"
+                for i in range(rows)
+            )
+        )
+        return PostgresSnapshot.load("snuba", str(snapshot_base))
+
+    def test_load_parallel(self, tmp_path):
+        table_writer = enforce_table_writer(self.dataset)
+        storage = self.dataset.get_writable_storage()
+        dest_table = table_writer.get_schema().get_table_name()
+
+        loader = table_writer.get_bulk_loader(
+            self.__prepare_snapshot(tmp_path, 1000),
+            POSTGRES_TABLE,
+            dest_table,
+            storage.get_row_processor(),
+        )
+        checkpoint_path = str(tmp_path / "checkpoint.json")
+
+        def load():
+            loader.load_parallel(
+                [
+                    table_writer.get_batch_writer(
+                        DummyMetricsBackend(), table_name=dest_table
+                    )
+                    for _ in range(2)
+                ],
+                table_writer.get_row_encoder(),
+                processes=2,
+                range_size=1000,
+                checkpoint_path=checkpoint_path,
+            )
+
+        def count():
+            return (
+                storage.get_cluster()
+                .get_query_connection(ClickhouseClientSettings.QUERY)
+                .execute(f"SELECT count(), uniq(id) FROM {dest_table}")[0]
+            )
+
+        load()
+        assert count() == (1000, 1000)
+
+        # The checkpoint contains a header and a line per range.
+        with open(checkpoint_path) as checkpoint_file:
+            assert len(checkpoint_file.readlines()) > 2
+
+        # All the ranges are recorded in the checkpoint, so resuming the load
+        # does not load them again (and does not fail because the table is
+        # not empty.)
+        load()
+        assert count() == (1000, 1000)
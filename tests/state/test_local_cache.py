@@ -0,0 +1,124 @@
+from typing import Callable, MutableMapping, Optional
+from unittest import mock
+
+from snuba.state.cache.abstract import Cache
+from snuba.state.cache.local import LocalCache
+from snuba.utils.codecs import JSONCodec
+from snuba.utils.metrics.timer import Timer
+from tests.assertions import assert_changes, assert_does_not_change
+from tests.backends.metrics import Increment, TestingMetricsBackend
+
+
+class DictCache(Cache[str]):
+    def __init__(self) -> None:
+        self.values: MutableMapping[str, str] = {}
+        self.gets = 0
+
+    def get(self, key: str) -> Optional[str]:
+        self.gets += 1
+        return self.values.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self.values[key] = value
+
+    def get_readthrough(
+        self,
+        key: str,
+        function: Callable[[], str],
+        timeout: int,
+        timer: Optional[Timer] = None,
+    ) -> str:
+        if key not in self.values:
+            self.values[key] = function()
+        return self.values[key]
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.time = 0.0
+
+    def __call__(self) -> float:
+        return self.time
+
+
+def count(metrics: TestingMetricsBackend, name: str) -> int:
+    return sum(
+        call.value
+        for call in metrics.calls
+        if isinstance(call, Increment) and call.name == name
+    )
+
+
+def test_get_and_expiry() -> None:
+    backend = DictCache()
+    metrics = TestingMetricsBackend()
+    clock = Clock()
+    cache = LocalCache(backend, JSONCodec(), 1000, metrics, clock)
+
+    backend.set("key", '{"value":1}')
+
+    with assert_changes(lambda: backend.gets, 0, 1):
+        assert cache.get("key") == {"value": 1}
+        assert count(metrics, "miss") == 1
+
+    # Subsequent lookups are served from memory with a new value each time.
+    with assert_does_not_change(lambda: backend.gets, 1):
+        value = cache.get("key")
+        assert value == {"value": 1}
+        value["value"] = 2
+        assert cache.get("key") == {"value": 1}
+        assert count(metrics, "hit") == 2
+
+    # Once the value expired it is fetched from the shared cache again.
+    clock.time += 1
+    backend.set("key", '{"value":3}')
+    with assert_changes(lambda: backend.gets, 1, 2):
+        assert cache.get("key") == {"value": 3}
+
+    assert cache.get("missing") is None
+
+
+def test_eviction() -> None:
+    backend = DictCache()
+    metrics = TestingMetricsBackend()
+    cache = LocalCache(backend, JSONCodec(), 10, metrics, Clock())
+
+    cache.set("a", "aaa")  # 5 bytes encoded
+    cache.set("b", "bbb")
+    assert cache.get("a") == "aaa"
+
+    # "b" is the least recently used value, so it is evicted first.
+    cache.set("c", "ccc")
+    assert count(metrics, "eviction") == 1
+
+    with assert_does_not_change(lambda: backend.gets, 0):
+        assert cache.get("a") == "aaa"
+        assert cache.get("c") == "ccc"
+
+    with assert_changes(lambda: backend.gets, 0, 1):
+        assert cache.get("b") == "bbb"
+
+    # Values larger than the cache are never kept in memory.
+    cache.set("d", "d" * 10)
+    with assert_changes(lambda: backend.gets, 1, 2):
+        assert cache.get("d") == "d" * 10
+
+
+def test_get_readthrough() -> None:
+    backend = DictCache()
+    cache = LocalCache(backend, JSONCodec(), 1000, TestingMetricsBackend(), Clock())
+
+    value = {"value": 1}
+    function = mock.Mock(return_value=value)
+
+    # The client executing the function receives the value it returned.
+    assert cache.get_readthrough("key", function, 5) is value
+    assert backend.values["key"] == '{"value":1}'
+
+    with assert_does_not_change(lambda: function.call_count, 1):
+        assert cache.get_readthrough("key", function, 5) == value
+
+    # Values computed by other processes are decoded from the shared cache.
+    backend.set("other", '{"value":2}')
+    assert cache.get_readthrough("other", function, 5) == {"value": 2}
+    assert function.call_count == 1
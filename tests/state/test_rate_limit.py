@@ -2,8 +2,10 @@ import pytest
 from unittest.mock import patch
 import uuid
 
+from redis.connection import Connection
+
 from tests.base import BaseTest
-from snuba import state
+from snuba import settings, state
 from snuba.state.rate_limit import (
     rate_limit,
     RateLimitAggregator,
@@ -113,6 +115,70 @@ class TestRateLimit(BaseTest):
             ):
                 pass
 
+    def test_aggregator_exceeded_not_counted(self):
+        bucket = uuid.uuid4().hex
+        rate_limit_params_outer = RateLimitParameters("foo", bucket, None, 5)
+        rate_limit_params_inner = RateLimitParameters("bar", bucket, None, 1)
+
+        with RateLimitAggregator([rate_limit_params_outer]) as stats:
+            assert stats.get_stats("foo") == RateLimitStats(rate=0, concurrent=1)
+
+            # The query exceeds the inner rate limit, so it is not counted
+            # towards the outer rate limit either.
+            with pytest.raises(RateLimitExceeded):
+                with RateLimitAggregator(
+                    [rate_limit_params_outer, rate_limit_params_inner]
+                ):
+                    pass
+
+            assert state.get_concurrent(bucket) == 1
+
+        assert state.get_concurrent(bucket) == 0
+        assert state.rds.zcard(f"{state.ratelimit_prefix}{bucket}") == 1
+
+    def test_aggregator_without_script(self):
+        bucket = uuid.uuid4().hex
+        rate_limit_params_outer = RateLimitParameters("foo", bucket, None, 5)
+        rate_limit_params_inner = RateLimitParameters("bar", bucket, None, 1)
+
+        with patch.object(settings, "USE_REDIS_CLUSTER", True):
+            with RateLimitAggregator([rate_limit_params_outer]) as stats:
+                assert stats.get_stats("foo") == RateLimitStats(rate=0, concurrent=1)
+
+                with pytest.raises(RateLimitExceeded):
+                    with RateLimitAggregator(
+                        [rate_limit_params_outer, rate_limit_params_inner]
+                    ):
+                        pass
+
+                assert state.get_concurrent(bucket) == 1
+
+        assert state.get_concurrent(bucket) == 0
+
+    def test_aggregator_round_trips(self):
+        def count_round_trips():
+            rate_limit_params = [
+                RateLimitParameters("foo", uuid.uuid4().hex, None, 5),
+                RateLimitParameters("bar", uuid.uuid4().hex, 5, 5),
+            ]
+            with patch.object(
+                Connection,
+                "send_packed_command",
+                autospec=True,
+                side_effect=Connection.send_packed_command,
+            ) as round_trips:
+                with RateLimitAggregator(rate_limit_params):
+                    pass
+            return round_trips.call_count
+
+        with patch.object(settings, "USE_REDIS_CLUSTER", True):
+            pipeline_round_trips = count_round_trips()
+
+        # Load the script before counting.
+        count_round_trips()
+
+        assert count_round_trips() < pipeline_round_trips
+
     def test_rate_limit_container(self):
         rate_limit_container = RateLimitStatsContainer()
         rate_limit_stats = RateLimitStats(rate=0.5, concurrent=2)
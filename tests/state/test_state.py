@@ -1,7 +1,7 @@
-import random
-import time
+import threading
 from collections import ChainMap
 from functools import partial
+from unittest import mock
 
 from snuba import state
 from snuba.state import safe_dumps
@@ -35,17 +35,6 @@ class TestState(BaseEventsTest):
             all_configs[k] == v for k, v in [("foo", 1), ("bar", "quux"), ("baz", 3)]
         )
 
-    def test_memoize(self):
-        @state.memoize(0.1)
-        def rand():
-            return random.random()
-
-        assert rand() == rand()
-        rand1 = rand()
-        assert rand1 == rand()
-        time.sleep(0.1)
-        assert rand1 != rand()
-
     def test_abtest(self):
         assert state.abtest("1000:1/2000:1") in (1000, 2000)
         assert state.abtest("1000/2000") in (1000, 2000)
@@ -53,6 +42,77 @@ class TestState(BaseEventsTest):
         assert state.abtest("1000/2000:0") == 1000
         assert state.abtest("1.5:1/-1.5:1") in (1.5, -1.5)
 
+    def test_config_snapshot_loader(self):
+        now = 100.0
+        loader = state.ConfigSnapshotLoader(10, 60, clock=lambda: now)
+        state.set_config("foo", 1)
+
+        snapshot = loader.get()
+        assert snapshot.get("foo") == 1
+
+        # Changes are only seen once the refresh interval expired.
+        state.set_config("foo", 2)
+        now += 5
+        assert loader.get() is snapshot
+        now += 6
+        snapshot = loader.get()
+        assert snapshot.get("foo") == 2
+
+        # The config is not loaded again if the version did not change.
+        now += 11
+        assert loader.get() is snapshot
+
+        # Unless the snapshot is too old.
+        now += 50
+        assert loader.get() is not snapshot
+
+        state.rds.flushdb()
+        now += 11
+        assert loader.get().get("foo") is None
+
+    def test_query_recorder(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def produce(*args, **kwargs):
+            started.set()
+            release.wait()
+
+        producer = mock.Mock()
+        producer.produce.side_effect = produce
+        recorder = state.QueryRecorder(
+            max_queue_size=2, batch_size=10, max_redis_queries=3, producer=producer
+        )
+
+        # The first query is taken by the recording thread, which is blocked
+        # by the producer, so the following ones are queued until the queue
+        # is full.
+        assert recorder.record({"id": 0})
+        started.wait()
+        assert recorder.record({"id": 1})
+        assert recorder.record({"id": 2})
+        assert not recorder.record({"id": 3})
+
+        release.set()
+        recorder.flush()
+        assert producer.produce.call_count == 3
+
+        assert recorder.record({"id": 4})
+        recorder.flush()
+        assert [q["id"] for q in state.get_queries()] == [4, 2, 1]
+
+
+def test_config_snapshot():
+    snapshot = state.ConfigSnapshot(
+        None, {"foo": 1, "bar": "quux", "test": "1000/2000:0"}, 0
+    )
+    assert snapshot.get("foo") == 1
+    assert snapshot.get("bar") == "quux"
+    assert snapshot.get("test") == 1000
+    assert snapshot.get("noexist", 4) == 4
+    assert snapshot.get_all() == {"foo": 1, "bar": "quux", "test": 1000}
+    assert snapshot.configs["test"] == "1000/2000:0"
+
 
 def test_safe_dumps():
     assert safe_dumps(ChainMap({"a": 1}, {"b": 2}), sort_keys=True,) == safe_dumps(
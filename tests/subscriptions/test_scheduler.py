@@ -118,3 +118,51 @@ class TestSubscriptionScheduler(BaseTest):
             expected=expected,
             sort_key=self.sort_key,
         )
+
+    def test_incremental_refresh(self) -> None:
+        store = RedisSubscriptionDataStore(
+            redis_client, self.dataset, self.partition_id, max_changes=2
+        )
+        scheduler = SubscriptionScheduler(
+            store, self.partition_id, timedelta(), DummyMetricsBackend(strict=True),
+        )
+
+        def find() -> Collection[Subscription]:
+            return sorted(
+                (
+                    task.task
+                    for task in scheduler.find(
+                        self.build_interval(timedelta(minutes=-1), timedelta())
+                    )
+                ),
+                key=lambda subscription: subscription.identifier.uuid,
+            )
+
+        subscription = self.build_subscription(timedelta(minutes=1))
+        store.create(subscription.identifier.uuid, subscription.data)
+        assert find() == [subscription]
+
+        # Changes are applied to the subscriptions that were already loaded.
+        other_subscription = self.build_subscription(timedelta(minutes=1))
+        store.create(other_subscription.identifier.uuid, other_subscription.data)
+        store.delete(subscription.identifier.uuid)
+        assert find() == [other_subscription]
+
+        updated_subscription = Subscription(
+            other_subscription.identifier,
+            SubscriptionData(1, [], [], timedelta(minutes=1), timedelta(minutes=2)),
+        )
+        store.create(
+            updated_subscription.identifier.uuid, updated_subscription.data,
+        )
+        assert find() == []
+
+        # Changes that are no longer in the change log cause a full reload.
+        subscriptions = [
+            self.build_subscription(timedelta(minutes=1)) for _ in range(3)
+        ]
+        for subscription in subscriptions:
+            store.create(subscription.identifier.uuid, subscription.data)
+        assert find() == sorted(
+            subscriptions, key=lambda subscription: subscription.identifier.uuid
+        )
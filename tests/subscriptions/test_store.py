@@ -3,7 +3,10 @@ from uuid import uuid1
 
 from snuba.redis import redis_client
 from snuba.subscriptions.data import SubscriptionData
-from snuba.subscriptions.store import RedisSubscriptionDataStore
+from snuba.subscriptions.store import (
+    RedisSubscriptionDataStore,
+    SubscriptionDataChanges,
+)
 from tests.subscriptions import BaseSubscriptionTest
 
 
@@ -18,8 +21,10 @@ class TestRedisSubscriptionStore(BaseSubscriptionTest):
             resolution=timedelta(minutes=1),
         )
 
-    def build_store(self, key="1") -> RedisSubscriptionDataStore:
-        return RedisSubscriptionDataStore(redis_client, self.dataset, key)
+    def build_store(self, key="1", max_changes=10000) -> RedisSubscriptionDataStore:
+        return RedisSubscriptionDataStore(
+            redis_client, self.dataset, key, max_changes=max_changes
+        )
 
     def test_create(self):
         store = self.build_store()
@@ -74,3 +79,44 @@ class TestRedisSubscriptionStore(BaseSubscriptionTest):
         store_2.create(new_subscription_id, new_subscription)
         assert store_1.all() == [(subscription_id, self.subscription)]
         assert store_2.all() == [(new_subscription_id, new_subscription)]
+
+    def test_changes(self):
+        store = self.build_store()
+        version = store.get_version()
+        assert version == 0
+        assert store.get_changes(version) == SubscriptionDataChanges(0, [])
+
+        subscription_id = uuid1()
+        store.create(subscription_id, self.subscription)
+        assert store.get_changes(version) == SubscriptionDataChanges(
+            1, [(subscription_id, self.subscription)]
+        )
+
+        new_subscription_id = uuid1()
+        store.create(new_subscription_id, self.subscription)
+        store.delete(subscription_id)
+        assert store.get_version() == 3
+        assert store.get_changes(version) == SubscriptionDataChanges(
+            3, [(new_subscription_id, self.subscription), (subscription_id, None)]
+        )
+        assert store.get_changes(2) == SubscriptionDataChanges(
+            3, [(subscription_id, None)]
+        )
+        assert store.get_changes(3) == SubscriptionDataChanges(3, [])
+
+        # The store cannot provide changes for versions it has not reached.
+        assert store.get_changes(4) is None
+
+    def test_changes_trimmed(self):
+        store = self.build_store(max_changes=1)
+        subscription_id = uuid1()
+        store.create(subscription_id, self.subscription)
+        assert store.get_changes(0) == SubscriptionDataChanges(
+            1, [(subscription_id, self.subscription)]
+        )
+
+        # The change log only keeps the most recent change, so the changes
+        # since the initial version are no longer available.
+        store.create(uuid1(), self.subscription)
+        assert store.get_changes(0) is None
+        assert store.get_changes(1) is not None
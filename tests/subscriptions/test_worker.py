@@ -1,11 +1,12 @@
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Iterable, Iterator, MutableMapping, Tuple
+from typing import Iterable, Iterator, MutableMapping, Sequence, Tuple
 from uuid import UUID, uuid1
 
 import pytest
 
 from snuba.datasets.dataset import Dataset
+from snuba.query.logical import Aggregation
 from snuba.subscriptions.consumer import Tick
 from snuba.subscriptions.data import (
     PartitionId,
@@ -18,8 +19,10 @@ from snuba.subscriptions.store import SubscriptionDataStore
 from snuba.subscriptions.worker import (
     SubscriptionWorker,
     SubscriptionTaskResult,
+    get_batch_key,
 )
 from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+from snuba.utils.scheduler import ScheduledTask
 from snuba.utils.streams import Message, Partition, Topic
 from snuba.utils.streams.backends.local.backend import LocalBroker as Broker
 from snuba.utils.types import Interval
@@ -132,3 +135,104 @@ def test_subscription_worker(
             "meta": [{"name": "count", "type": "UInt64"}],
             "data": [{"count": 0}],
         }
+
+
+def build_task(
+    project_id: int, aggregations: Sequence[Aggregation], timestamp: datetime
+) -> ScheduledTask[Subscription]:
+    return ScheduledTask(
+        timestamp,
+        Subscription(
+            SubscriptionIdentifier(PartitionId(0), uuid1()),
+            SubscriptionData(
+                project_id=project_id,
+                conditions=[["platform", "=", "python"]],
+                aggregations=aggregations,
+                time_window=timedelta(minutes=60),
+                resolution=timedelta(minutes=1),
+            ),
+        ),
+    )
+
+
+def test_get_batch_key() -> None:
+    now = datetime(2000, 1, 1)
+    count = [["count()", "", "count"]]
+
+    key = get_batch_key(build_task(1, count, now))
+    assert key is not None
+    assert get_batch_key(build_task(2, count, now)) == key
+    assert get_batch_key(build_task(1, count, now - timedelta(minutes=1))) != key
+    assert get_batch_key(build_task(1, [["uniq", "user", "count"]], now)) != key
+
+    # Aggregations without a known value for projects without any rows, or
+    # without an alias, cannot be batched.
+    assert get_batch_key(build_task(1, [["avg", "duration", "avg"]], now)) is None
+    assert get_batch_key(build_task(1, [["count()", "", None]], now)) is None
+
+
+def test_subscription_worker_batch_queries(
+    dataset: Dataset, broker: Broker[SubscriptionTaskResult],
+) -> None:
+    result_topic = Topic("subscription-results")
+
+    broker.create_topic(result_topic, partitions=1)
+
+    frequency = timedelta(minutes=1)
+    evaluations = 3
+
+    store = DummySubscriptionDataStore()
+    for project_id, aggregations in [
+        (1, [["count()", "", "count"]]),
+        (2, [["count()", "", "count"]]),
+        (2, [["count()", "", "count"], ["uniq", "user", "users"]]),
+        (3, [["max", "offset", "max_offset"]]),
+    ]:
+        store.create(
+            uuid1(),
+            SubscriptionData(
+                project_id=project_id,
+                conditions=[],
+                aggregations=aggregations,
+                time_window=timedelta(minutes=60),
+                resolution=frequency,
+            ),
+        )
+
+    now = datetime(2000, 1, 1)
+
+    tick = Tick(
+        offsets=Interval(0, 1),
+        timestamps=Interval(now - (frequency * evaluations), now),
+    )
+
+    def get_results(batch_queries: bool) -> Sequence[SubscriptionTaskResult]:
+        metrics = DummyMetricsBackend(strict=True)
+        worker = SubscriptionWorker(
+            dataset,
+            ThreadPoolExecutor(),
+            {0: SubscriptionScheduler(store, PartitionId(0), timedelta(), metrics)},
+            broker.get_producer(),
+            result_topic,
+            metrics,
+            batch_queries=batch_queries,
+        )
+
+        result_futures = worker.process_message(
+            Message(Partition(Topic("events"), 0), 0, tick, now)
+        )
+        assert result_futures is not None
+
+        return [
+            SubscriptionTaskResult(task, future.result())
+            for task, future in result_futures
+        ]
+
+    expected = get_results(batch_queries=False)
+    results = get_results(batch_queries=True)
+
+    assert len(results) == len(expected) == 4 * evaluations
+    for result, expected_result in zip(results, expected):
+        assert result.task == expected_result.task
+        assert result.result[0].body == expected_result.result[0].body
+        assert result.result[1] == expected_result.result[1]
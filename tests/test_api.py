@@ -1829,6 +1829,15 @@ class TestApi(BaseApiTest):
             assert metadata["request"]["referrer"] == "test"
             assert len(metadata["query_list"]) == expected_query_count
 
+        # Queries are not recorded if the sample rate of their referrer is 0.
+        state.set_config("querylog_sample_rate:test", 0)
+        record_query_mock.reset_mock()
+        response = self.app.post(
+            "/query", data=json.dumps({"project": 1, "selected_columns": ["event_id"]})
+        )
+        assert response.status_code == 200
+        assert record_query_mock.call_count == 0
+
 
 class TestCreateSubscriptionApi(BaseApiTest):
     def test(self):
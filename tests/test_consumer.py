@@ -1,6 +1,8 @@
 import calendar
 import itertools
 import pickle
+import threading
+import time
 from datetime import datetime, timedelta
 from pickle import PickleBuffer
 from typing import MutableSequence
@@ -14,11 +16,13 @@ from snuba.consumer import (
     ConsumerWorker,
     JSONRowInsertBatch,
     StreamingConsumerStrategyFactory,
+    process_message,
+    process_message_batch,
 )
 from snuba.datasets.factory import enforce_table_writer
 from snuba.datasets.storages import StorageKey
 from snuba.datasets.storages.factory import get_storage
-from snuba.processor import InsertBatch, ReplacementBatch
+from snuba.processor import InsertBatch, MessageProcessor, ReplacementBatch
 from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
 from snuba.utils.streams import Message, Partition, Topic
 from snuba.utils.streams.backends.kafka import KafkaPayload
@@ -197,6 +201,207 @@ def test_streaming_consumer_strategy() -> None:
         strategy.join()
 
 
+def test_streaming_consumer_strategy_submit_batch() -> None:
+    messages = [
+        Message(
+            Partition(Topic("events"), 0),
+            i,
+            KafkaPayload(None, b"{}", None),
+            datetime.now(),
+        )
+        for i in range(3)
+    ]
+
+    processor = Mock()
+    processor.process_batch.return_value = [
+        InsertBatch([{}]),
+        None,
+        InsertBatch([{}]),
+    ]
+
+    writer = Mock()
+
+    factory = StreamingConsumerStrategyFactory(
+        None,
+        processor,
+        writer,
+        TestingMetricsBackend(),
+        max_batch_size=10,
+        max_batch_time=60,
+        processes=None,
+        input_block_size=None,
+        output_block_size=None,
+    )
+
+    strategy = factory.create(Mock())
+
+    # The messages submitted together are processed together.
+    strategy.poll()
+    assert strategy.submit_batch(messages) == 3
+    assert processor.process_batch.call_count == 1
+    assert processor.process_message.call_count == 0
+
+    strategy.close()
+    strategy.join()
+
+    assert writer.write.call_count == 1
+    assert list(writer.write.call_args[0][0]) == [b"{}", b"{}"]
+
+
+def test_streaming_consumer_strategy_pending_batches() -> None:
+    messages = (
+        Message(
+            Partition(Topic("events"), 0),
+            i,
+            KafkaPayload(None, b"{}", None),
+            datetime.now(),
+        )
+        for i in itertools.count()
+    )
+
+    replacements_producer = FakeConfluentKafkaProducer()
+
+    processor = Mock()
+    processor.process_message.side_effect = [
+        InsertBatch([{}]),
+        ReplacementBatch("key", [{}]),
+    ]
+
+    write_event = threading.Event()
+    writer = Mock()
+    writer.write.side_effect = lambda rows: write_event.wait()
+
+    factory = StreamingConsumerStrategyFactory(
+        None,
+        processor,
+        writer,
+        TestingMetricsBackend(),
+        max_batch_size=2,
+        max_batch_time=60,
+        processes=None,
+        input_block_size=None,
+        output_block_size=None,
+        replacements_producer=replacements_producer,
+        replacements_topic=Topic("replacements"),
+        max_pending_batches=1,
+    )
+
+    commit_function = Mock()
+    strategy = factory.create(commit_function)
+
+    for i in range(2):
+        strategy.poll()
+        strategy.submit(next(messages))
+
+    # Closing the batch starts the write without waiting for it, and nothing
+    # is committed or replaced until the write has been completed.
+    strategy.poll()
+    assert commit_function.call_count == 0
+    assert replacements_producer.messages == []
+
+    # Polling while there is no open batch does not wait for the write.
+    strategy.poll()
+    assert commit_function.call_count == 0
+
+    # Once the write is complete, the batch is committed and its
+    # replacements are produced even if no more messages arrive.
+    write_event.set()
+    deadline = time.time() + 5
+    while commit_function.call_count == 0 and time.time() < deadline:
+        strategy.poll()
+        time.sleep(0.01)
+
+    assert writer.write.call_count == 1
+    assert commit_function.call_count == 1
+    assert len(replacements_producer.messages) == 1
+
+    strategy.close()
+    strategy.join()
+
+    assert commit_function.call_count == 1
+
+
+def test_streaming_consumer_strategy_batch_size_policy() -> None:
+    messages = (
+        Message(
+            Partition(Topic("events"), 0),
+            i,
+            KafkaPayload(None, b"{}", None),
+            datetime.now() - timedelta(seconds=30),
+        )
+        for i in itertools.count()
+    )
+
+    processor = Mock()
+    processor.process_message.side_effect = [
+        InsertBatch([{}]),
+        InsertBatch([{}, {}]),
+    ]
+
+    batch_size_policy = Mock()
+    batch_size_policy.get_max_batch_size.return_value = 2
+    batch_size_policy.get_max_batch_time.return_value = 60.0
+
+    factory = StreamingConsumerStrategyFactory(
+        None,
+        processor,
+        Mock(),
+        TestingMetricsBackend(),
+        max_batch_size=10,
+        max_batch_time=60,
+        processes=None,
+        input_block_size=None,
+        output_block_size=None,
+        batch_size_policy=batch_size_policy,
+    )
+
+    strategy = factory.create(Mock())
+
+    for i in range(2):
+        strategy.poll()
+        strategy.submit(next(messages))
+
+    # The batch is closed according to the limits of the policy, and the
+    # written batch is recorded.
+    with assert_changes(lambda: batch_size_policy.record_batch.call_count, 0, 1):
+        strategy.poll()
+
+    length, size, latency, lag = batch_size_policy.record_batch.call_args[0]
+    assert length == 2
+    assert size == len(b"{}") * 3
+    assert 0 <= latency < lag
+    assert lag >= 30
+
+
+def test_process_message_batch() -> None:
+    messages = [
+        Message(
+            Partition(Topic("events"), 0),
+            i,
+            KafkaPayload(None, json.dumps(value).encode("utf-8"), None),
+            datetime.now(),
+        )
+        for i, value in enumerate([{"a": 1}, None, {"b": 2}])
+    ]
+
+    class Processor(MessageProcessor):
+        def process_message(self, message, metadata):
+            if message is None:
+                return None
+            return InsertBatch([{**message, "offset": metadata.offset}])
+
+    processor = Processor()
+
+    assert process_message_batch(processor, messages) == [
+        process_message(processor, message) for message in messages
+    ]
+    assert process_message_batch(processor, messages) == [
+        JSONRowInsertBatch([b'{"a":1,"offset":0}']),
+        None,
+        JSONRowInsertBatch([b'{"b":2,"offset":2}']),
+    ]
+
+
 def test_json_row_batch_pickle_simple() -> None:
     batch = JSONRowInsertBatch([b"foo", b"bar", b"baz"])
     assert pickle.loads(pickle.dumps(batch)) == batch
@@ -1,6 +1,8 @@
 import pytz
 import re
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime, timedelta
 from functools import partial
 import simplejson as json
 
@@ -10,6 +12,8 @@ from snuba.datasets.errors_replacer import FLATTENED_COLUMN_TEMPLATE, ReplacerSt
 from snuba.datasets import errors_replacer
 from snuba.datasets.storages import StorageKey
 from snuba.datasets.storages.factory import get_storage
+from snuba.redis import redis_client
+from snuba.replacers.replacer_processor import ReplacementMessage
 from snuba.settings import PAYLOAD_DATETIME_FORMAT
 from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
 from snuba.utils.streams import Message, Partition, Topic
@@ -311,6 +315,68 @@ class TestReplacer(BaseEventsTest):
 
         assert self._issue_count(1) == [{"count": 1, "group_id": 2}]
 
+    def test_coalesced_insert(self):
+        self.event["project_id"] = self.project_id
+        self.event["group_id"] = 1
+        self.write_events(
+            [
+                self.event,
+                {**self.event, "event_id": "b" * 32, "group_id": 2},
+                {**self.event, "event_id": "c" * 32, "group_id": 3},
+                {**self.event, "event_id": "d" * 32, "project_id": 2},
+            ]
+        )
+
+        timestamp = datetime.now(tz=pytz.utc)
+        messages = [
+            (
+                2,
+                "end_merge",
+                {
+                    "project_id": self.project_id,
+                    "new_group_id": 4,
+                    "previous_group_ids": [1],
+                    "datetime": timestamp.strftime(PAYLOAD_DATETIME_FORMAT),
+                },
+            ),
+            (
+                2,
+                "end_delete_groups",
+                {
+                    "project_id": 2,
+                    "group_ids": [1],
+                    "datetime": timestamp.strftime(PAYLOAD_DATETIME_FORMAT),
+                },
+            ),
+            (
+                2,
+                "end_merge",
+                {
+                    "project_id": self.project_id,
+                    "new_group_id": 4,
+                    "previous_group_ids": [2],
+                    "datetime": (timestamp + timedelta(seconds=1)).strftime(
+                        PAYLOAD_DATETIME_FORMAT
+                    ),
+                },
+            ),
+        ]
+
+        with ThreadPoolExecutor() as executor:
+            worker = replacer.ReplacerWorker(
+                get_storage(StorageKey.EVENTS),
+                DummyMetricsBackend(strict=True),
+                executor=executor,
+            )
+            worker.flush_batch(
+                [worker.process_message(self._wrap(message)) for message in messages]
+            )
+
+        assert sorted(
+            self._issue_count(self.project_id), key=lambda row: row["group_id"]
+        ) == [{"count": 1, "group_id": 3}, {"count": 2, "group_id": 4}]
+        assert self._issue_count(2) == []
+
     def test_unmerge_insert(self):
         self.event["project_id"] = self.project_id
         self.event["group_id"] = 1
@@ -507,3 +573,115 @@ class TestReplacer(BaseEventsTest):
         assert errors_replacer.get_projects_query_flags(
             project_ids, ReplacerState.EVENTS
         ) == (False, [],)
+
+    def test_query_flags_cache(self):
+        now = 1000.0
+        cache = errors_replacer.QueryFlagsCache(10, 60, 10, clock=lambda: now)
+
+        def get_flags(project_ids):
+            return [
+                (flags.needs_final, sorted(flags.exclude_groups))
+                for flags in cache.get(project_ids, ReplacerState.ERRORS)
+            ]
+
+        errors_replacer.set_project_exclude_groups(1, [1, 2], ReplacerState.ERRORS)
+        assert get_flags([1, 2]) == [(False, [1, 2]), (False, [])]
+
+        # Changes are only seen once the check interval expired.
+        errors_replacer.set_project_needs_final(1, ReplacerState.ERRORS)
+        assert get_flags([1]) == [(False, [1, 2])]
+        now += 11
+        assert get_flags([1]) == [(True, [1, 2])]
+
+        # Flags are fetched again when they are too old, even if the
+        # version did not change.
+        redis_client.delete(
+            errors_replacer.get_project_needs_final_key(1, ReplacerState.ERRORS)
+        )
+        now += 11
+        assert get_flags([1]) == [(True, [1, 2])]
+        now += 50
+        assert get_flags([1]) == [(False, [1, 2])]
+
+
+def test_coalesce_replacements() -> None:
+    processor = (
+        get_storage(StorageKey.EVENTS).get_table_writer().get_replacer_processor()
+    )
+    assert processor is not None
+
+    timestamp = datetime(2020, 6, 1, 12)
+
+    def process(type_: str, data, seconds: int = 0):
+        return processor.process_message(
+            ReplacementMessage(
+                type_,
+                {
+                    **data,
+                    "datetime": (timestamp + timedelta(seconds=seconds)).strftime(
+                        PAYLOAD_DATETIME_FORMAT
+                    ),
+                },
+            )
+        )
+
+    delete_1 = process("end_delete_groups", {"project_id": 1, "group_ids": [1, 2]})
+    delete_2 = process("end_delete_groups", {"project_id": 1, "group_ids": [3]})
+    delete_3 = process("end_delete_groups", {"project_id": 1, "group_ids": [2, 4]}, 1)
+    merge_1 = process(
+        "end_merge", {"project_id": 1, "new_group_id": 10, "previous_group_ids": [5]}
+    )
+    merge_2 = process(
+        "end_merge", {"project_id": 1, "new_group_id": 11, "previous_group_ids": [6]}
+    )
+    unmerge = process(
+        "end_unmerge",
+        {
+            "project_id": 1,
+            "previous_group_id": 7,
+            "new_group_id": 8,
+            "hashes": ["a" * 32],
+        },
+    )
+    delete_4 = process("end_delete_groups", {"project_id": 1, "group_ids": [9]})
+
+    assert processor.get_partition_key(delete_1) == 1
+    assert (
+        processor.get_partition_key(
+            process("end_delete_groups", {"project_id": 2, "group_ids": [1]})
+        )
+        == 2
+    )
+
+    coalesced = processor.coalesce_replacements(
+        [delete_1, delete_2, delete_3, merge_1, merge_2, unmerge, delete_4]
+    )
+    assert coalesced[1:] == [merge_1, merge_2, unmerge, delete_4]
+
+    deletes = coalesced[0]
+    assert deletes.count_query_template == delete_1.count_query_template.replace(
+        errors_replacer.RECEIVED_CONDITION,
+        errors_replacer.COALESCED_RECEIVED_CONDITION,
+    )
+    assert deletes.query_args == {
+        **delete_1.query_args,
+        "group_ids": "1, 2, 3, 4",
+        "received_conditions": (
+            "(group_id IN (1, 2, 3) AND received <= CAST('2020-06-01 12:00:00' AS DateTime))"
+            " OR (group_id IN (2, 4) AND received <= CAST('2020-06-01 12:00:01' AS DateTime))"
+        ),
+    }
+    assert deletes.query_time_flags == (
+        errors_replacer.EXCLUDE_GROUPS,
+        1,
+        [1, 2, 3, 4],
+    )
+
+    # Replacements with the same time keep their original queries.
+    assert processor.coalesce_replacements([delete_1, delete_2]) == [
+        replace(
+            delete_1,
+            query_args={**delete_1.query_args, "group_ids": "1, 2, 3"},
+            query_time_flags=(errors_replacer.EXCLUDE_GROUPS, 1, [1, 2, 3]),
+        )
+    ]
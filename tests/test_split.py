@@ -1,5 +1,6 @@
+import threading
 from datetime import datetime
-from typing import Any, MutableMapping, Sequence
+from typing import Any, MutableMapping, Optional, Sequence
 
 import pytest
 
@@ -431,3 +432,166 @@ def test_time_split_ast() -> None:
         ("2019-09-19T01:00:00", "2019-09-19T11:00:00"),
         ("2019-09-18T10:00:00", "2019-09-19T01:00:00"),
     ]
+
+
+def test_time_split_ast_only() -> None:
+    found_timestamps = []
+
+    def do_query(
+        query: ClickhouseQuery, request_settings: RequestSettings,
+    ) -> QueryResult:
+        from_date_ast, to_date_ast = get_time_range(query, "timestamp")
+        assert from_date_ast is not None and to_date_ast is not None
+        assert query.get_conditions() == conditions
+
+        found_timestamps.append((from_date_ast.isoformat(), to_date_ast.isoformat()))
+
+        return QueryResult({"data": []}, {})
+
+    body = {
+        "selected_columns": ["event_id", "timestamp", "project_id"],
+        "conditions": [
+            ("timestamp", ">=", "2019-09-18T10:00:00"),
+            ("timestamp", "<", "2019-09-19T12:00:00"),
+            ("project_id", "IN", [1]),
+        ],
+        "limit": 10,
+        "orderby": ["-timestamp"],
+    }
+
+    events = get_dataset("events")
+    query = parse_query(body, events)
+    query.set_ast_only()
+    conditions = query.get_conditions()
+
+    splitter = TimeSplitQueryStrategy("timestamp")
+    splitter.execute(ClickhouseQuery(query), HTTPRequestSettings(), do_query)
+
+    assert found_timestamps == [
+        ("2019-09-19T11:00:00", "2019-09-19T12:00:00"),
+        ("2019-09-19T01:00:00", "2019-09-19T11:00:00"),
+        ("2019-09-18T10:00:00", "2019-09-19T01:00:00"),
+    ]
+
+
+def test_time_split_speculative() -> None:
+    found_windows = []
+    cancelled = []
+    query_ids: MutableMapping[str, Optional[str]] = {}
+    last_started = threading.Event()
+    killed = threading.Event()
+
+    def do_query(
+        query: ClickhouseQuery, request_settings: RequestSettings,
+    ) -> QueryResult:
+        from_date_ast, to_date_ast = get_time_range(query, "timestamp")
+        assert from_date_ast is not None and to_date_ast is not None
+        window = (from_date_ast.isoformat(), to_date_ast.isoformat())
+        found_windows.append((window, query.get_limit()))
+        query_ids[window[0]] = request_settings.get_query_id()
+
+        if window[0] == "2019-09-19T11:00:00":
+            rows = 3
+        elif window[0] == "2019-09-19T01:00:00":
+            assert last_started.wait(5)
+            rows = 5
+        else:
+            # The last window is still running when enough results were found.
+            last_started.set()
+            assert killed.wait(5)
+            rows = 0
+
+        return QueryResult(
+            {"data": [{"event_id": f"{window[0]}-{i}"} for i in range(rows)]}, {}
+        )
+
+    def cancel(query_id: str) -> None:
+        cancelled.append(query_id)
+        killed.set()
+
+    body = {
+        "selected_columns": ["event_id", "timestamp", "project_id"],
+        "conditions": [
+            ("timestamp", ">=", "2019-09-18T10:00:00"),
+            ("timestamp", "<", "2019-09-19T12:00:00"),
+            ("project_id", "IN", [1]),
+        ],
+        "limit": 5,
+        "orderby": ["-timestamp"],
+    }
+
+    query = parse_query(body, get_dataset("events"))
+
+    state.set_config("time_split_speculative_windows", 2)
+    try:
+        result = TimeSplitQueryStrategy("timestamp").execute(
+            ClickhouseQuery(query), HTTPRequestSettings(), do_query, cancel
+        )
+    finally:
+        state.delete_config("time_split_speculative_windows")
+
+    assert result is not None
+    assert [row["event_id"] for row in result.result["data"]] == [
+        "2019-09-19T11:00:00-0",
+        "2019-09-19T11:00:00-1",
+        "2019-09-19T11:00:00-2",
+        "2019-09-19T01:00:00-0",
+        "2019-09-19T01:00:00-1",
+    ]
+    assert sorted(found_windows) == [
+        (("2019-09-18T10:00:00", "2019-09-19T01:00:00"), 5),
+        (("2019-09-19T01:00:00", "2019-09-19T11:00:00"), 5),
+        (("2019-09-19T11:00:00", "2019-09-19T12:00:00"), 5),
+    ]
+    # Only the speculative queries can be cancelled.
+    assert query_ids["2019-09-19T11:00:00"] is None
+    assert cancelled == [query_ids["2019-09-18T10:00:00"]]
+
+
+def test_time_split_speculative_error() -> None:
+    started = threading.Semaphore(0)
+    killed: MutableMapping[Optional[str], threading.Event] = {}
+
+    def do_query(
+        query: ClickhouseQuery, request_settings: RequestSettings,
+    ) -> QueryResult:
+        query_id = request_settings.get_query_id()
+        if query_id is None:
+            # The first window fails once the speculative queries are running.
+            for _ in range(2):
+                assert started.acquire(timeout=5)
+            raise ValueError("query failed")
+
+        killed[query_id] = threading.Event()
+        started.release()
+        assert killed[query_id].wait(5)
+        return QueryResult({"data": []}, {})
+
+    def cancel(query_id: str) -> None:
+        killed[query_id].set()
+
+    body = {
+        "selected_columns": ["event_id", "timestamp", "project_id"],
+        "conditions": [
+            ("timestamp", ">=", "2019-09-18T10:00:00"),
+            ("timestamp", "<", "2019-09-19T12:00:00"),
+            ("project_id", "IN", [1]),
+        ],
+        "limit": 5,
+        "orderby": ["-timestamp"],
+    }
+
+    query = parse_query(body, get_dataset("events"))
+
+    state.set_config("time_split_speculative_windows", 2)
+    try:
+        with pytest.raises(ValueError):
+            TimeSplitQueryStrategy("timestamp").execute(
+                ClickhouseQuery(query), HTTPRequestSettings(), do_query, cancel
+            )
+    finally:
+        state.delete_config("time_split_speculative_windows")
+
+    # The speculative queries are cancelled even though the query failed.
+    assert len(killed) == 2
+    assert all(event.is_set() for event in killed.values())
@@ -1,10 +1,28 @@
+import gzip
+import zlib
+from datetime import datetime
+from typing import Callable
+
+import lz4.frame
 import pytest
 import rapidjson
+import zstandard
 
 from snuba.clickhouse.errors import ClickhouseWriterError
-from snuba.clickhouse.http import HTTPBatchWriter
+from snuba.clickhouse.http import (
+    HTTPBatchWriter,
+    HTTPCompression,
+    InsertFormat,
+    JSONRowEncoder,
+    build_stream_compressor,
+)
+from snuba.clickhouse.rowbinary import RowBinaryEncoder
+from snuba.clusters.cluster import ClickhouseClientSettings
+from snuba.consumer import KafkaMessageMetadata
 from snuba.datasets.factory import enforce_table_writer
+from snuba.processor import InsertBatch
 from snuba.utils.metrics.backends.dummy import DummyMetricsBackend
+from snuba.writer import BatchWriterEncoderWrapper
 from tests.backends.metrics import TestingMetricsBackend, Timing
 from tests.base import BaseEventsTest
 
@@ -29,6 +47,53 @@ class TestHTTPBatchWriter(BaseEventsTest):
         assert error.value.code == 41
         assert error.value.row == 2
 
+    def test_row_binary_matches_json(self):
+        storage = self.dataset.get_writable_storage()
+        table_writer = storage.get_table_writer()
+        cluster = storage.get_cluster()
+        metrics = DummyMetricsBackend(strict=True)
+
+        processed = (
+            table_writer.get_stream_loader()
+            .get_processor()
+            .process_message(
+                (2, "insert", self.event, {}),
+                KafkaMessageMetadata(0, 0, datetime.now()),
+            )
+        )
+        assert isinstance(processed, InsertBatch)
+
+        table_name = table_writer.get_schema().get_table_name()
+        BatchWriterEncoderWrapper(
+            cluster.get_batch_writer(
+                table_name,
+                metrics,
+                None,
+                None,
+                insert_format=InsertFormat.JSON_EACH_ROW,
+            ),
+            JSONRowEncoder(),
+        ).write(processed.rows)
+
+        encoder = RowBinaryEncoder(table_writer.get_schema().get_columns())
+        BatchWriterEncoderWrapper(
+            cluster.get_batch_writer(
+                table_name,
+                metrics,
+                None,
+                None,
+                insert_format=InsertFormat.ROW_BINARY,
+                columns=encoder.get_column_names(),
+            ),
+            encoder,
+        ).write(processed.rows)
+
+        json_row, row_binary_row = cluster.get_query_connection(
+            ClickhouseClientSettings.QUERY
+        ).execute(f"SELECT * FROM {table_name}")
+
+        assert json_row == row_binary_row
+
     @pytest.mark.parametrize(
         "chunk_size, input, expected_chunks",
         [
@@ -69,3 +134,53 @@ class TestHTTPBatchWriter(BaseEventsTest):
                 {"table_name": table_name},
             )
         ]
+
+
+@pytest.mark.parametrize(
+    "compression, decompress",
+    [
+        (HTTPCompression.GZIP, gzip.decompress),
+        (HTTPCompression.DEFLATE, zlib.decompress),
+        (HTTPCompression.LZ4, lz4.frame.decompress),
+        (
+            HTTPCompression.ZSTD,
+            lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data),
+        ),
+    ],
+)
+def test_stream_compressor(
+    compression: HTTPCompression, decompress: Callable[[bytes], bytes]
+) -> None:
+    chunks = [b'{"a": %d}\n' % i * 100 for i in range(10)] + [b""]
+
+    compressor = build_stream_compressor(compression)
+    compressed = b"".join(compressor.compress(chunk) for chunk in chunks)
+    compressed += compressor.flush()
+
+    assert decompress(compressed) == b"".join(chunks)
+
+
+def test_compressed_chunks() -> None:
+    metrics = TestingMetricsBackend()
+
+    writer = HTTPBatchWriter(
+        table_name="mysterious_inexistent_table",
+        host="0:0:0:0",
+        port=9000,
+        user="default",
+        password="",
+        database="default",
+        chunk_size=1,
+        metrics=metrics,
+        compression=HTTPCompression.GZIP,
+    )
+
+    rows = [b"a" * 1000, b"b" * 1000]
+    compressed = b"".join(writer._compress_chunks(writer._prepare_chunks(rows)))
+
+    assert gzip.decompress(compressed) == b"".join(rows)
+    assert metrics.calls[-1] == Timing(
+        "writer.total.compressed_size",
+        len(compressed),
+        {"table_name": "mysterious_inexistent_table"},
+    )
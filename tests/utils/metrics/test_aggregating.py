@@ -0,0 +1,54 @@
+from snuba.utils.metrics.backends.aggregating import AggregatingMetricsBackend
+from tests.backends.metrics import Gauge, Increment, TestingMetricsBackend, Timing
+
+
+def test_aggregating_backend() -> None:
+    now = 0.0
+    backend = TestingMetricsBackend()
+    metrics = AggregatingMetricsBackend(
+        backend, 10.0, max_timing_samples=3, clock=lambda: now
+    )
+
+    for i in range(5):
+        metrics.increment("count")
+        metrics.increment("count", 2, tags={"a": "1", "b": "2"})
+        metrics.gauge("gauge", i, tags={"b": "2", "a": "1"})
+        metrics.timing("timing", i)
+    metrics.timing("timing", 10, tags={"a": "1"})
+
+    # Nothing is sent until the flush interval expired.
+    assert backend.calls == []
+
+    now = 10.0
+    metrics.increment("count", 0)
+    calls = [*backend.calls]
+    assert calls[:3] == [
+        Increment("count", 5, None),
+        Increment("count", 10, {"a": "1", "b": "2"}),
+        Gauge("gauge", 4, {"b": "2", "a": "1"}),
+    ]
+    # Only a sample of the values of the timings is sent, with the sample
+    # rate that preserves their count.
+    timings = calls[3:]
+    assert len(timings) == 4
+    assert timings[-1] == Timing("timing", 10, {"a": "1"})
+    for timing in timings[:-1]:
+        assert timing.name == "timing" and timing.tags is None
+        assert timing.value in range(5)
+        assert timing.sample_rate == 3 / 5
+
+    # Values that were already sampled count for all the values they stand
+    # for.
+    backend.calls.clear()
+    metrics.timing("timing", 1, sample_rate=0.5)
+    metrics.timing("timing", 2, sample_rate=0.5)
+    metrics.flush()
+    assert backend.calls == [
+        Timing("timing", 1, None, 0.5),
+        Timing("timing", 2, None, 0.5),
+    ]
+
+    backend.calls.clear()
+    metrics.gauge("gauge", 1)
+    metrics.flush()
+    assert backend.calls == [Gauge("gauge", 1, None)]
@@ -0,0 +1,32 @@
+import socket
+from functools import partial
+
+from datadog import DogStatsd
+
+from snuba.utils.metrics.backends.datadog import DatadogMetricsBackend
+
+
+def test_timing_sample_rate() -> None:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(5.0)
+        host, port = receiver.getsockname()
+
+        metrics = DatadogMetricsBackend(partial(DogStatsd, host=host, port=port))
+
+        metrics.timing("timing", 10, tags={"a": "1"})
+        assert receiver.recv(1024) == b"timing:10|ms|#a:1"
+
+        # Values that were already sampled are always sent, together with
+        # their sample rate.
+        for _ in range(10):
+            metrics.timing("timing", 20, sample_rate=0.01)
+            assert receiver.recv(1024) == b"timing:20|ms|@0.01"
+
+        metrics = DatadogMetricsBackend(
+            partial(
+                DogStatsd, host=host, port=port, namespace="ns", constant_tags=["c:2"]
+            )
+        )
+        metrics.timing("timing", 20, tags={"a": "1"}, sample_rate=0.5)
+        assert receiver.recv(1024) == b"ns.timing:20|ms|@0.5|#a:1,c:2"
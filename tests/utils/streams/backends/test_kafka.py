@@ -134,6 +134,27 @@ class KafkaStreamsTestCase(StreamsTestMixin[KafkaPayload], TestCase):
                 with pytest.raises(ConsumerError):
                     consumer.poll(10.0)  # XXX: getting the subcription is slow
 
+    def test_poll_batch_seek_discards_errors(self) -> None:
+        with self.get_topic() as topic:
+            with closing(self.get_producer()) as producer:
+                payloads = self.get_payloads()
+                messages = [
+                    producer.produce(topic, next(payloads)).result(5.0)
+                    for i in range(2)
+                ]
+
+            with closing(self.get_consumer()) as consumer:
+                consumer.subscribe([topic])
+
+                # The end of the partition is received together with the
+                # messages, so it would be raised by the next call...
+                assert consumer.poll_batch(10, 10.0) == messages
+
+                # ...but not after seeking, since it refers to the previous
+                # position of the consumer.
+                consumer.seek({Partition(topic, 0): 0})
+                assert consumer.poll_batch(10, 10.0) == messages
+
     def test_commit_log_consumer(self) -> None:
         # XXX: This would be better as an integration test (or at least a test
         # against an abstract Producer interface) instead of against a test against
@@ -3,6 +3,7 @@ import itertools
 import uuid
 from abc import abstractmethod
 from datetime import datetime
+from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import Iterator, Optional
 from unittest import TestCase
@@ -10,7 +11,12 @@ from unittest import TestCase
 import pytest
 
 from snuba.utils.clock import TestingClock
-from snuba.utils.streams.backends.abstract import Consumer, Producer
+from snuba.utils.streams.backends.abstract import (
+    Consumer,
+    EndOfPartition,
+    OffsetOutOfRange,
+    Producer,
+)
 from snuba.utils.streams.backends.local.backend import LocalBroker
 from snuba.utils.streams.backends.local.storages.abstract import (
     MessageStorage,
@@ -21,6 +27,7 @@ from snuba.utils.streams.backends.local.storages.abstract import (
 from snuba.utils.streams.backends.local.storages.file import (
     FileMessageStorage,
     InvalidChecksum,
+    MappedFileMessageStorage,
 )
 from snuba.utils.streams.backends.local.storages.memory import MemoryMessageStorage
 from snuba.utils.streams.types import Partition, Topic
@@ -60,6 +67,36 @@ class LocalStreamsTestMixin(StreamsTestMixin[int]):
     def test_pause_resume_rebalancing(self) -> None:
         return super().test_pause_resume_rebalancing()
 
+    def test_poll_batch(self) -> None:
+        with self.get_topic(2) as topic:
+            producer = self.get_producer()
+            messages = [
+                producer.produce(Partition(topic, index), payload).result()
+                for index, payload in [(0, 0), (1, 1), (0, 2), (1, 3)]
+            ]
+
+            consumer = self.get_consumer()
+            consumer.subscribe([topic])
+
+            # The messages are returned in the same order as by ``poll``: the
+            # end of the first partition interrupts the batch, and is raised
+            # by the next call.
+            assert consumer.poll_batch(3) == [messages[0], messages[2]]
+            with pytest.raises(EndOfPartition):
+                consumer.poll_batch(3)
+            assert consumer.poll_batch(1) == [messages[1]]
+            assert consumer.poll_batch(3) == [messages[3]]
+            assert consumer.tell() == {
+                Partition(topic, 0): messages[2].next_offset,
+                Partition(topic, 1): messages[3].next_offset,
+            }
+
+            consumer.pause([Partition(topic, 0)])
+            producer.produce(Partition(topic, 0), 4).result()
+            with pytest.raises(EndOfPartition):
+                consumer.poll_batch(3)
+            assert consumer.poll_batch(3) == []
+
     def test_storage(self) -> None:
         topic = Topic(uuid.uuid1().hex)
         partitions = 3
@@ -125,3 +162,60 @@ class LocalStreamsFileStorageTestCase(LocalStreamsTestMixin, TestCase):
 
         with pytest.raises(InvalidChecksum):
             self.storage.consume(partition, invalid_offset)
+
+
+class LocalStreamsMappedFileStorageTestCase(LocalStreamsTestMixin, TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        super().setUp()
+
+    def get_message_storage(self) -> MessageStorage[int]:
+        return MappedFileMessageStorage(self.directory.name, index_interval=3)
+
+    def test_batches(self) -> None:
+        topic = Topic(uuid.uuid1().hex)
+        partition = Partition(topic, 0)
+        self.storage.create_topic(topic, 1)
+
+        messages = self.storage.produce_batch(partition, [*range(10)], datetime.now())
+        assert [message.offset for message in messages] == [*range(10)]
+        assert self.storage.consume_batch(partition, 0, 4) == messages[:4]
+        assert self.storage.consume_batch(partition, 4, 10) == messages[4:]
+        assert self.storage.consume_batch(partition, 10, 10) == []
+        with pytest.raises(OffsetOutOfRange):
+            self.storage.consume_batch(partition, 11, 10)
+
+        # Random reads go through the sparse index.
+        for offset in [7, 2, 9, 0, 5]:
+            assert self.storage.consume(partition, offset) == messages[offset]
+
+        # The index is rebuilt when the files are opened again, and a
+        # partial record at the end of a file is dropped.
+        with open(Path(self.directory.name) / topic.name / "0", "ab") as file:
+            file.write(b"\x00\x00\x00\xff\x00")
+
+        storage: MappedFileMessageStorage[int] = MappedFileMessageStorage(
+            self.directory.name, index_interval=4
+        )
+        assert storage.consume_batch(partition, 5, 10) == messages[5:]
+        message = storage.produce(partition, 10, datetime.now())
+        assert message.offset == 10
+        assert storage.consume(partition, 10) == message
+
+    def test_invalid_checksum(self) -> None:
+        topic = Topic(uuid.uuid1().hex)
+        partition = Partition(topic, 0)
+        self.storage.create_topic(topic, 1)
+        self.storage.produce_batch(partition, [1, 2], datetime.now())
+
+        path = Path(self.directory.name) / topic.name / "0"
+        data = bytearray(path.read_bytes())
+        data[-1] ^= 0xFF
+        path.write_bytes(data)
+
+        storage: MappedFileMessageStorage[int] = MappedFileMessageStorage(
+            self.directory.name
+        )
+        assert storage.consume(partition, 0) is not None
+        with pytest.raises(InvalidChecksum):
+            storage.consume(partition, 1)
@@ -16,12 +16,17 @@ from snuba.utils.streams.types import Message, Topic
 class FakeWorker(AbstractBatchWorker[int, int]):
     def __init__(self) -> None:
         self.processed: MutableSequence[int] = []
+        self.processed_together: MutableSequence[Sequence[int]] = []
         self.flushed: MutableSequence[Sequence[int]] = []
 
     def process_message(self, message: Message[int]) -> int:
         self.processed.append(message.payload)
         return message.payload
 
+    def process_messages(self, messages: Sequence[Message[int]]) -> Sequence[int]:
+        self.processed_together.append([message.payload for message in messages])
+        return super().process_messages(messages)
+
     def flush_batch(self, batch: Sequence[int]) -> None:
         self.flushed.append(batch)
 
@@ -107,3 +112,40 @@ class TestConsumer(object):
         assert worker.flushed == [[1, 2, 3, 4, 5, 6]]
         assert consumer.commit_offsets_calls == 1
         assert consumer.close_calls == 1
+
+    def test_poll_batch(self, broker: Broker[int]) -> None:
+        topic = Topic("topic")
+        broker.create_topic(topic, partitions=1)
+        producer = broker.get_producer()
+        for i in [1, 2, 3, 4, 5]:
+            producer.produce(topic, i).result()
+
+        consumer = broker.get_consumer("group")
+
+        worker = FakeWorker()
+        batching_consumer = StreamProcessor(
+            consumer,
+            topic,
+            BatchProcessingStrategyFactory(
+                worker=worker,
+                max_batch_size=2,
+                max_batch_time=100,
+                metrics=DummyMetricsBackend(strict=True),
+            ),
+            max_poll_batch_size=4,
+        )
+
+        for _ in range(2):
+            batching_consumer._run_once()
+
+        # The batches are flushed as soon as they are full, even in the
+        # middle of the messages fetched at once.
+        assert worker.processed == [1, 2, 3, 4, 5]
+        # The messages fetched together are processed together (up to the
+        # batch size), the last message is fetched and processed on its own.
+        assert worker.processed_together == [[1, 2], [3, 4]]
+        assert worker.flushed == [[1, 2], [3, 4]]
+        assert consumer.commit_offsets_calls == 2
+
+        batching_consumer._shutdown()
+        assert consumer.close_calls == 1
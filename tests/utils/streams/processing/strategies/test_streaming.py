@@ -1,14 +1,19 @@
 import itertools
 import multiprocessing
+import threading
 from datetime import datetime
 from multiprocessing.managers import SharedMemoryManager
-from typing import Iterator
+from typing import Callable, Iterator, Optional, Sequence
 from unittest.mock import Mock, call
 
 import pytest
 
 from snuba.utils.streams.backends.kafka import KafkaPayload
-from snuba.utils.streams.processing.strategies.streaming.collect import CollectStep
+from snuba.utils.streams.processing.strategies.abstract import MessageRejected
+from snuba.utils.streams.processing.strategies.streaming.collect import (
+    AdaptiveBatchSizePolicy,
+    CollectStep,
+)
 from snuba.utils.streams.processing.strategies.streaming.filter import FilterStep
 from snuba.utils.streams.processing.strategies.streaming.transform import (
     MessageBatch,
@@ -16,6 +21,7 @@ from snuba.utils.streams.processing.strategies.streaming.transform import (
     TransformStep,
     ValueTooLarge,
     parallel_transform_worker_apply,
+    parallel_transform_worker_apply_batch,
 )
 from snuba.utils.streams.types import Message, Partition, Topic
 from tests.assertions import assert_changes, assert_does_not_change
@@ -43,6 +49,26 @@ def test_filter() -> None:
 
     assert next_step.submit.call_args == call(pass_message)
 
+    # Only the messages that pass the filter are submitted together. When the
+    # next step rejects some of them, the messages that were filtered out
+    # before the first rejected message are accepted too.
+    next_step.submit_batch.return_value = 1
+    assert (
+        filter_step.submit_batch(
+            [fail_message, pass_message, fail_message, pass_message]
+        )
+        == 3
+    )
+    assert next_step.submit_batch.call_args == call([pass_message, pass_message])
+
+    next_step.submit_batch.return_value = 2
+    assert (
+        filter_step.submit_batch(
+            [fail_message, pass_message, fail_message, pass_message]
+        )
+        == 4
+    )
+
     with assert_changes(lambda: next_step.poll.call_count, 0, 1):
         filter_step.poll()
 
@@ -74,6 +100,29 @@ def test_transform() -> None:
         )
     )
 
+    # Messages submitted together are transformed with a single call to the
+    # batch function.
+    batch_function = Mock(
+        side_effect=lambda messages: [transform_function(m) for m in messages]
+    )
+    batch_transform_step = TransformStep(
+        transform_function, next_step, batch_function=batch_function
+    )
+    next_step.submit_batch.return_value = 2
+    assert batch_transform_step.submit_batch([original_message] * 2) == 2
+    assert batch_function.call_count == 1
+    assert next_step.submit_batch.call_args == call(
+        [
+            Message(
+                original_message.partition,
+                original_message.offset,
+                transform_function(original_message),
+                original_message.timestamp,
+            )
+        ]
+        * 2
+    )
+
     with assert_changes(lambda: next_step.poll.call_count, 0, 1):
         transform_step.poll()
 
@@ -83,6 +132,50 @@ def test_transform() -> None:
         transform_step.join()
 
 
+def test_transform_batch_rejected() -> None:
+    next_step = Mock()
+
+    def transform_function(message: Message[int]) -> int:
+        return message.payload * 2
+
+    batch_function = Mock(
+        side_effect=lambda messages: [transform_function(m) for m in messages]
+    )
+    transform_step = TransformStep(
+        transform_function, next_step, batch_function=batch_function
+    )
+
+    partition = Partition(Topic("topic"), 0)
+    messages = [Message(partition, i, i, datetime.now()) for i in range(4)]
+    transformed = [
+        Message(m.partition, m.offset, transform_function(m), m.timestamp)
+        for m in messages
+    ]
+
+    # The batch is accepted even if the next step only accepts part of it.
+    next_step.submit_batch.return_value = 1
+    assert transform_step.submit_batch(messages[:3]) == 3
+    assert next_step.submit_batch.call_args == call(transformed[:3])
+
+    # No more messages are accepted while some are held...
+    next_step.submit_batch.return_value = 0
+    assert transform_step.submit_batch(messages[3:]) == 0
+    with pytest.raises(MessageRejected):
+        transform_step.submit(messages[3])
+
+    # ...until they are accepted by the next step when polled.
+    next_step.submit_batch.return_value = 2
+    transform_step.poll()
+    assert next_step.submit_batch.call_args == call(transformed[1:3])
+
+    next_step.submit_batch.return_value = 1
+    assert transform_step.submit_batch(messages[3:]) == 1
+    assert next_step.submit_batch.call_args == call(transformed[3:])
+
+    # Every message was transformed exactly once.
+    assert [m for args in batch_function.call_args_list for m in args[0][0]] == messages
+
+
 def message_generator(
     partition: Partition, starting_offset: int = 0
 ) -> Iterator[Message[int]]:
@@ -132,6 +225,285 @@ def test_collect() -> None:
         collect_step.join()
 
 
+def test_collect_submit_batch() -> None:
+    inner_steps = []
+
+    def step_factory() -> Mock:
+        inner_steps.append(Mock())
+        return inner_steps[-1]
+
+    commit_function = Mock()
+    partition = Partition(Topic("topic"), 0)
+    messages = message_generator(partition, 0)
+
+    collect_step = CollectStep(step_factory, commit_function, 2, 60)
+
+    # The batches are closed as soon as they are full, even in the middle of
+    # the submitted messages.
+    assert collect_step.submit_batch([next(messages) for _ in range(5)]) == 5
+
+    assert [step.submit.call_count for step in inner_steps] == [2, 2, 1]
+    assert [step.close.call_count for step in inner_steps] == [1, 1, 0]
+    assert commit_function.call_args_list == [
+        call({partition: 2}),
+        call({partition: 4}),
+    ]
+
+
+def test_collect_pending_batches() -> None:
+    inner_steps = []
+
+    def step_factory() -> Mock:
+        inner_steps.append(Mock())
+        inner_steps[-1].done.return_value = False
+        return inner_steps[-1]
+
+    commit_function = Mock()
+    partition = Partition(Topic("topic"), 0)
+    messages = message_generator(partition, 0)
+
+    collect_step = CollectStep(
+        step_factory, commit_function, 1, 60, max_pending_batches=1
+    )
+
+    # The first batch is closed but can be joined later.
+    collect_step.submit(next(messages))  # offset 0
+    with assert_does_not_change(lambda: commit_function.call_count, 0):
+        collect_step.poll()
+
+    assert inner_steps[0].close.call_count == 1
+    assert inner_steps[0].join.call_count == 0
+
+    # Closing a second batch exceeds the limit, so the oldest batch is joined.
+    collect_step.submit(next(messages))  # offset 1
+    with assert_changes(lambda: commit_function.call_count, 0, 1):
+        collect_step.poll()
+
+    assert commit_function.call_args == call({partition: 1})
+    assert inner_steps[0].join.call_count == 1
+    assert inner_steps[1].close.call_count == 1
+    assert inner_steps[1].join.call_count == 0
+
+    # The remaining batch is not joined while it is not done.
+    with assert_does_not_change(lambda: commit_function.call_count, 1):
+        collect_step.poll()
+
+    # Batches are joined in order when the step is joined.
+    collect_step.submit(next(messages))  # offset 2
+    collect_step.close()
+
+    with assert_changes(lambda: commit_function.call_count, 1, 3):
+        collect_step.join()
+
+    assert commit_function.call_args_list[-2:] == [
+        call({partition: 2}),
+        call({partition: 3}),
+    ]
+
+
+def test_collect_pending_batches_idle() -> None:
+    step_factory = Mock()
+    step_factory.return_value = inner_step = Mock()
+    inner_step.done.return_value = False
+
+    commit_function = Mock()
+    partition = Partition(Topic("topic"), 0)
+    messages = message_generator(partition, 0)
+
+    collect_step = CollectStep(
+        step_factory, commit_function, 10, 0, max_pending_batches=1
+    )
+
+    # The batch is closed by the time limit and no more messages arrive.
+    collect_step.submit(next(messages))  # offset 0
+    collect_step.poll()
+    assert inner_step.close.call_count == 1
+
+    with assert_does_not_change(lambda: commit_function.call_count, 0):
+        collect_step.poll()
+
+    assert inner_step.join.call_count == 0
+
+    # The batch is joined (without blocking) once it is done.
+    inner_step.done.return_value = True
+    with assert_changes(lambda: commit_function.call_count, 0, 1):
+        collect_step.poll()
+
+    assert commit_function.call_args == call({partition: 1})
+    assert inner_step.join.call_count == 1
+
+    with assert_does_not_change(lambda: commit_function.call_count, 1):
+        collect_step.poll()
+
+
+def test_collect_pending_batch_join_error() -> None:
+    step_factory = Mock()
+    step_factory.return_value = inner_step = Mock()
+    inner_step.join.side_effect = [TimeoutError(), None]
+
+    commit_function = Mock()
+    partition = Partition(Topic("topic"), 0)
+    messages = message_generator(partition, 0)
+
+    collect_step = CollectStep(step_factory, commit_function, 1, 60)
+
+    collect_step.submit(next(messages))  # offset 0
+    with pytest.raises(TimeoutError):
+        collect_step.poll()
+
+    assert commit_function.call_count == 0
+
+    # The batch is still pending, so it is joined again with the step.
+    collect_step.close()
+    with assert_changes(lambda: commit_function.call_count, 0, 1):
+        collect_step.join()
+
+    assert commit_function.call_args == call({partition: 1})
+    assert inner_step.join.call_count == 2
+
+
+def test_collect_pending_batches_processor_order() -> None:
+    write_complete = threading.Event()
+
+    def join(timeout: Optional[float] = None) -> None:
+        # Joining the first batch would block until its write is complete.
+        assert write_complete.is_set()
+
+    inner_steps = []
+
+    def step_factory() -> Mock:
+        inner_steps.append(Mock())
+        inner_steps[-1].done.return_value = False
+        if len(inner_steps) == 1:
+            inner_steps[0].join.side_effect = join
+        return inner_steps[-1]
+
+    commit_function = Mock()
+    partition = Partition(Topic("topic"), 0)
+    messages = message_generator(partition, 0)
+
+    collect_step = CollectStep(
+        step_factory, commit_function, 2, 60, max_pending_batches=1
+    )
+
+    # The stream processor always polls the step before submitting the
+    # messages it received, if any.
+    def run_once(message: Optional[Message[int]]) -> None:
+        collect_step.poll()
+        if message is not None:
+            collect_step.submit(message)
+
+    # The first batch is filled, then it is closed during a run without
+    # messages. The second batch is then filled while the first batch is
+    # still being written.
+    for message in [next(messages), next(messages), None]:
+        run_once(message)
+
+    assert inner_steps[0].close.call_count == 1
+
+    for message in [next(messages), next(messages)]:
+        run_once(message)
+
+    assert len(inner_steps) == 2
+    assert inner_steps[0].close.call_count == 1
+    assert inner_steps[0].join.call_count == 0
+    assert inner_steps[1].submit.call_count == 2
+    assert commit_function.call_count == 0
+
+    # Closing the second batch exceeds the limit, so the first batch is joined.
+    write_complete.set()
+    with assert_changes(lambda: commit_function.call_count, 0, 1):
+        collect_step.poll()
+
+    assert commit_function.call_args == call({partition: 2})
+    assert inner_steps[0].join.call_count == 1
+    assert inner_steps[1].close.call_count == 1
+
+
+def test_adaptive_batch_size_policy() -> None:
+    metrics = TestingMetricsBackend()
+    policy = AdaptiveBatchSizePolicy(
+        min_batch_size=10,
+        max_batch_size=100,
+        min_batch_time=1.0,
+        max_batch_time=8.0,
+        max_batch_bytes=4000,
+        metrics=metrics,
+        max_lag=10.0,
+        max_latency=5.0,
+    )
+
+    assert policy.get_max_batch_size() == 10
+    assert policy.get_max_batch_time() == 1.0
+
+    # Batches grow while the consumer is lagging behind...
+    policy.record_batch(10, 100, latency=0.1, lag=20.0)
+    assert policy.get_max_batch_size() == 20
+    assert policy.get_max_batch_time() == 2.0
+
+    # ...up to the upper bounds.
+    for _ in range(5):
+        policy.record_batch(10, 100, latency=0.1, lag=20.0)
+    assert policy.get_max_batch_size() == 100
+    assert policy.get_max_batch_time() == 8.0
+
+    assert metrics.calls[-2:] == [
+        GaugeCall("max_batch_size", 100, None),
+        GaugeCall("max_batch_time_ms", 8000.0, None),
+    ]
+
+    # Large messages limit the batch size to the maximum number of bytes.
+    policy.record_batch(10, 1000, latency=0.1, lag=20.0)
+    assert policy.get_max_batch_size() == 40
+    assert policy.get_max_batch_time() == 8.0
+
+    # Slow writes reduce the batch size, even while lagging behind.
+    policy.record_batch(10, 100, latency=6.0, lag=20.0)
+    assert policy.get_max_batch_size() == 20
+    assert policy.get_max_batch_time() == 8.0
+
+    # The limits are kept steady while the lag is moderate...
+    policy.record_batch(10, 100, latency=0.1, lag=8.0)
+    assert policy.get_max_batch_size() == 20
+    assert policy.get_max_batch_time() == 8.0
+
+    # ...and shrink down to the lower bounds once the consumer caught up.
+    for _ in range(5):
+        policy.record_batch(10, 100, latency=0.1, lag=1.0)
+    assert policy.get_max_batch_size() == 10
+    assert policy.get_max_batch_time() == 1.0
+
+
+def test_collect_batch_size_policy() -> None:
+    step_factory = Mock()
+    step_factory.return_value = inner_step = Mock()
+
+    commit_function = Mock()
+    partition = Partition(Topic("topic"), 0)
+    messages = message_generator(partition, 0)
+
+    policy = Mock()
+    policy.get_max_batch_size.return_value = 3
+    policy.get_max_batch_time.return_value = 60.0
+
+    # The fixed limits are ignored when a policy is provided.
+    collect_step = CollectStep(
+        step_factory, commit_function, 1, 60, batch_size_policy=policy
+    )
+
+    with assert_does_not_change(lambda: inner_step.close.call_count, 0):
+        for _ in range(2):
+            collect_step.submit(next(messages))
+            collect_step.poll()
+
+    # The limits are read again each time the batch is checked.
+    policy.get_max_batch_size.return_value = 2
+    with assert_changes(lambda: inner_step.close.call_count, 0, 1):
+        collect_step.poll()
+
+    assert commit_function.call_args == call({partition: 2})
+
+
 def test_message_batch() -> None:
     partition = Partition(Topic("test"), 0)
 
@@ -139,8 +511,10 @@ def test_message_batch() -> None:
         block = smm.SharedMemory(4096)
         assert block.size == 4096
 
+        # The payload is slightly smaller than the block, leaving space for
+        # the header and serialized payload of the message record.
         message = Message(
-            partition, 0, KafkaPayload(None, b"\x00" * 4000, None), datetime.now()
+            partition, 0, KafkaPayload(None, b"\x00" * 3900, None), datetime.now()
         )
 
         batch: MessageBatch[KafkaPayload] = MessageBatch(block)
@@ -162,6 +536,12 @@ def transform_payload_expand(message: Message[KafkaPayload]) -> KafkaPayload:
     )
 
 
+def transform_payloads_expand(
+    messages: Sequence[Message[KafkaPayload]],
+) -> Sequence[KafkaPayload]:
+    return [transform_payload_expand(message) for message in messages]
+
+
 def test_parallel_transform_worker_apply() -> None:
     messages = [
         Message(
@@ -170,7 +550,7 @@ def test_parallel_transform_worker_apply() -> None:
             KafkaPayload(None, b"\x00" * size, None),
             datetime.now(),
         )
-        for i, size in enumerate([1000, 1000, 2000, 4000])
+        for i, size in enumerate([900, 900, 1900, 3900])
     ]
 
     with SharedMemoryManager() as smm:
@@ -209,11 +589,52 @@ def test_parallel_transform_worker_apply() -> None:
             )
 
 
+def test_parallel_transform_worker_apply_batch() -> None:
+    messages = [
+        Message(
+            Partition(Topic("test"), 0),
+            i,
+            KafkaPayload(None, b"\x00" * size, None),
+            datetime.now(),
+        )
+        for i, size in enumerate([900, 900, 1900, 3900])
+    ]
+
+    function = Mock(side_effect=transform_payloads_expand)
+
+    with SharedMemoryManager() as smm:
+        input_batch = MessageBatch(smm.SharedMemory(8192))
+        for message in messages:
+            input_batch.append(message)
+
+        output_block = smm.SharedMemory(4096)
+
+        # All of the messages are transformed with a single call. The values
+        # that do not fit in the output batch are returned separately, rather
+        # than being transformed again.
+        output_batch, overflow = parallel_transform_worker_apply_batch(
+            function, input_batch, output_block,
+        )
+        assert function.call_count == 1
+        assert [message.payload for message in output_batch] == [
+            transform_payload_expand(message) for message in messages[:2]
+        ]
+        assert [message.payload for message in overflow] == [
+            transform_payload_expand(message) for message in messages[2:]
+        ]
+        assert [message.offset for message in overflow] == [2, 3]
+
+
 def get_subprocess_count() -> int:
     return len(multiprocessing.active_children())
 
 
-def test_parallel_transform_step() -> None:
+@pytest.mark.parametrize("batch_function", [None, transform_payloads_expand])
+def test_parallel_transform_step(
+    batch_function: Optional[
+        Callable[[Sequence[Message[KafkaPayload]]], Sequence[KafkaPayload]]
+    ],
+) -> None:
     next_step = Mock()
 
     messages = [
@@ -223,7 +644,7 @@ def test_parallel_transform_step() -> None:
             KafkaPayload(None, b"\x00" * size, None),
             datetime.now(),
         )
-        for i, size in enumerate([1000, 1000, 2000, 2000])
+        for i, size in enumerate([1000, 1000, 1500, 1500])
     ]
 
     starting_processes = get_subprocess_count()
@@ -252,6 +673,7 @@ def test_parallel_transform_step() -> None:
             input_block_size=4096,
             output_block_size=4096,
             metrics=metrics,
+            batch_function=batch_function,
         )
 
         for message in messages:
@@ -274,6 +696,9 @@ def test_parallel_transform_step() -> None:
         transform_step.join()
 
     assert next_step.submit.call_count == len(messages)
+    assert [call[0][0].payload for call in next_step.submit.call_args_list] == [
+        transform_payload_expand(message) for message in messages
+    ]
 
 
 def test_parallel_transform_step_terminate_workers() -> None:
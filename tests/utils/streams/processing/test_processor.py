@@ -3,6 +3,7 @@ from unittest import mock
 
 import pytest
 
+from snuba.utils.streams.backends.kafka import TransportError
 from snuba.utils.streams.processing.processor import InvalidStateError, StreamProcessor
 from snuba.utils.streams.processing.strategies.abstract import MessageRejected
 from snuba.utils.streams.types import Message, Partition, Topic
@@ -126,3 +127,87 @@ def test_stream_processor_termination_on_error() -> None:
         processor.run()
 
     assert e.value == exception
+
+
+def test_stream_processor_poll_batch() -> None:
+    topic = Topic("topic")
+
+    consumer = mock.Mock()
+    strategy = mock.Mock()
+    factory = mock.Mock()
+    factory.create.return_value = strategy
+
+    processor: StreamProcessor[int] = StreamProcessor(
+        consumer, topic, factory, max_poll_batch_size=3
+    )
+
+    subscribe_args, subscribe_kwargs = consumer.subscribe.call_args
+    offsets = {Partition(topic, 0): 0}
+    subscribe_kwargs["on_assign"](offsets)
+    consumer.tell.return_value = offsets
+
+    messages = [Message(Partition(topic, 0), i, i, datetime.now()) for i in range(3)]
+
+    # Messages are fetched and submitted in batches.
+    consumer.poll_batch.return_value = messages
+    strategy.submit_batch.return_value = 3
+    processor._run_once()
+    assert consumer.poll_batch.call_args == mock.call(3, 1.0)
+    assert strategy.submit_batch.call_args == mock.call(messages)
+    assert consumer.poll.call_count == 0
+
+    # If only some messages are accepted, the consumer is paused and the
+    # remaining messages are held for later.
+    strategy.submit_batch.return_value = 1
+    with assert_changes(lambda: consumer.pause.call_count, 0, 1):
+        processor._run_once()
+
+    consumer.poll_batch.return_value = []
+    strategy.submit_batch.return_value = 2
+    with assert_changes(lambda: consumer.resume.call_count, 0, 1):
+        processor._run_once()
+    assert strategy.submit_batch.call_args == mock.call(messages[1:])
+
+    # A single message is submitted by itself.
+    consumer.poll_batch.return_value = messages[:1]
+    with assert_changes(lambda: strategy.submit.call_count, 0, 1):
+        processor._run_once()
+    assert strategy.submit.call_args == mock.call(messages[0])
+
+
+def test_stream_processor_poll_batch_recoverable_error() -> None:
+    topic = Topic("topic")
+
+    consumer = mock.Mock()
+    strategy = mock.Mock()
+    factory = mock.Mock()
+    factory.create.return_value = strategy
+
+    processor: StreamProcessor[int] = StreamProcessor(
+        consumer,
+        topic,
+        factory,
+        recoverable_errors=[TransportError],
+        max_poll_batch_size=3,
+    )
+
+    subscribe_args, subscribe_kwargs = consumer.subscribe.call_args
+    offsets = {Partition(topic, 0): 0}
+    subscribe_kwargs["on_assign"](offsets)
+    consumer.tell.return_value = offsets
+
+    messages = [Message(Partition(topic, 0), i, i, datetime.now()) for i in range(3)]
+
+    consumer.poll_batch.return_value = messages
+    strategy.submit_batch.return_value = 1
+    with assert_changes(lambda: consumer.pause.call_count, 0, 1):
+        processor._run_once()
+
+    # An error received together with the messages that were carried over
+    # is raised while the consumer is paused, and does not stop the
+    # processor from submitting these messages.
+    consumer.poll_batch.side_effect = TransportError()
+    strategy.submit_batch.return_value = 2
+    with assert_changes(lambda: consumer.resume.call_count, 0, 1):
+        processor._run_once()
+    assert strategy.submit_batch.call_args == mock.call(messages[1:])
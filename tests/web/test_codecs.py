@@ -0,0 +1,55 @@
+from typing import Any, Mapping
+
+import pytest
+import rapidjson
+
+from snuba.utils.codecs import JSONCodec
+from snuba.web.codecs import ResultCodec
+
+
+META = [{"name": "project_id", "type": "UInt64"}, {"name": "title", "type": "String"}]
+
+test_data = [
+    {"data": [], "meta": META},
+    {"meta": META, "data": [{"project_id": 1, "title": "ü"}]},
+    {
+        "data": [{"project_id": i, "title": f"title {i}"} for i in range(1000)],
+        "meta": META,
+        "totals": {"project_id": 1000, "title": ""},
+    },
+    # Rows that do not match the metadata are stored as they are.
+    {"data": [{"title": "a", "project_id": 1}], "meta": META},
+    {"data": [{"project_id": 1, "extra": None}], "meta": META},
+]
+
+
+@pytest.mark.parametrize("value", test_data)
+def test_result_codec(value: Mapping[str, Any]) -> None:
+    codec = ResultCodec(compression_threshold=100)
+    decoded = codec.decode(codec.encode(value))
+    assert decoded == value
+    assert list(decoded) == list(value)
+    assert [list(row) for row in decoded["data"]] == [
+        list(row) for row in value["data"]
+    ]
+
+
+def test_result_codec_format() -> None:
+    value = test_data[2]
+    encoded = ResultCodec().encode(value)
+
+    assert encoded[:2] == b"\x01\x01"
+    assert len(encoded) < len(JSONCodec().encode(value)) / 10
+
+    assert ResultCodec(compression_threshold=len(encoded) * 100).encode(value)[
+        :2
+    ] == bytes([1, 0])
+
+    # Values encoded as JSON can be decoded regardless of the format used to
+    # encode new values.
+    json_value = rapidjson.dumps(value).encode("utf-8")
+    assert ResultCodec(binary=False).encode(value) == json_value
+    assert ResultCodec().decode(json_value) == value
+
+    with pytest.raises(ValueError):
+        ResultCodec().decode(b"\x02" + encoded[1:])
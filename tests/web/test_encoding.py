@@ -0,0 +1,77 @@
+from decimal import Decimal
+from typing import Any, Mapping
+
+import pytest
+import simplejson as json
+
+from snuba.web.encoding import stream_json
+
+META = [
+    {"name": "event_id", "type": "String"},
+    {"name": "count", "type": "UInt64"},
+    {"name": "avg", "type": "Float64"},
+    {"name": "title", "type": "LowCardinality(Nullable(String))"},
+    {"name": "timestamp", "type": "DateTime"},
+    {"name": "tags.key", "type": "Array(String)"},
+]
+
+test_data = [
+    {},
+    {"data": [], "meta": META},
+    {"meta": META, "data": [], "timing": {"timestamp": 1}},
+    {
+        "data": [
+            {
+                "event_id": "a" * 32,
+                "count": 10,
+                "avg": 0.1,
+                "title": 'ü " \\ \n  ',
+                "timestamp": "2020-01-02T03:04:05+00:00",
+                "tags.key": ["a", "b"],
+            },
+            {
+                "event_id": None,
+                "count": 2 ** 64 - 1,
+                "avg": float("nan"),
+                "title": None,
+                "timestamp": None,
+                "tags.key": [],
+            },
+            # Values that do not match the column types and columns that
+            # are not part of the metadata.
+            {
+                "count": 1.5,
+                "avg": float("-inf"),
+                "title": 1,
+                "event_id": True,
+                "extra": {"key": Decimal("1.10")},
+            },
+            {"avg": 1e-20, "count": True, "timestamp": 1},
+        ],
+        "meta": META,
+        "totals": {"count": 12, "avg": 1.0},
+        "timing": {"timestamp": 1, "duration_ms": 10},
+        "stats": {"sample": None, "final": False},
+    },
+]
+
+
+@pytest.mark.parametrize("payload", test_data)
+@pytest.mark.parametrize("block_size", [1, 2, 1000])
+def test_stream_json(payload: Mapping[str, Any], block_size: int) -> None:
+    assert "".join(stream_json(payload, block_size)) == json.dumps(payload)
+
+
+def test_stream_json_yields_blocks() -> None:
+    payload = {"data": [{"count": i} for i in range(5)], "meta": META}
+    assert list(stream_json(payload, 2)) == [
+        '{"data": ',
+        "[",
+        '{"count": 0}, {"count": 1}',
+        ', {"count": 2}, {"count": 3}',
+        ', {"count": 4}',
+        "]",
+        ', "meta": ',
+        json.dumps(META),
+        "}",
+    ]